@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import argparse
+import asyncio
+import json
+import sys
+
+import tabulate
+from colorama import Fore, Style
+from loguru import logger as loguru_logger
+
+from . import (
+    bench_db,
+    bench_grid,
+    bench_http,
+    bench_metrics,
+    bench_order_id,
+    bench_placement,
+    bench_ratelimiter,
+)
+from .harness import BenchContext, compare_results, load_results, save_results
+
+BENCHMARKS = {
+    "grid": bench_grid,
+    "placement": bench_placement,
+    "order_id": bench_order_id,
+    "db": bench_db,
+    "ratelimiter": bench_ratelimiter,
+    "metrics": bench_metrics,
+    "http": bench_http,
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--scales", type=str, default="50,500,5000", help="comma separated workload sizes")
+    parser.add_argument("--only", type=str, default="", help=f"comma separated subset of {','.join(BENCHMARKS)}")
+    parser.add_argument("--output", type=str, default="benchmarks/results", help="directory of the JSON results")
+    parser.add_argument("--compare", type=str, default="", help="JSON results of a previous run to compare with")
+    parser.add_argument("--redis_url", type=str, default="redis://127.0.0.1:6379/0")
+    parser.add_argument("--mongodb_conf", type=str, default="", help="mongodb config file, the benchmark is skipped without it")
+    parser.add_argument("--verbose", action="store_true", help="output debug-level message")
+    return parser.parse_args()
+
+
+async def run(args) -> int:
+    ctx = BenchContext(scales=[int(s) for s in args.scales.split(",") if s.strip() != ""], redis_url=args.redis_url)
+    if args.mongodb_conf != "":
+        with open(args.mongodb_conf, "r") as fr:
+            ctx.mongodb_conf = json.load(fr)
+    names = [n for n in args.only.split(",") if n != ""] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            loguru_logger.error(f"Unknown benchmark:{name}, choose among {','.join(BENCHMARKS)}.")
+            return 1
+
+    results = []
+    for name in names:
+        loguru_logger.info(f"Running {name} benchmarks at scales:{ctx.scales}...")
+        results.extend(await BENCHMARKS[name].run(ctx))
+
+    table = [["name", "scale", "ops", "ops/s", "p50 (us)", "p99 (us)", "max (us)"]]
+    for r in results:
+        table.append([r.name, r.scale, r.ops, f"{r.ops_per_sec:.1f}", f"{r.p50_in_us:.1f}", f"{r.p99_in_us:.1f}", f"{r.max_in_us:.1f}"])
+    print(f"{Fore.GREEN} ======================================= BENCHMARKS ======================================= {Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{tabulate.tabulate(table, headers='firstrow', tablefmt='mixed_grid')}{Style.RESET_ALL}")
+
+    if args.compare != "":
+        rows = compare_results(load_results(args.compare), results)
+        table = [["name", "scale", "old ops/s", "ops/s", "change", "old p99 (us)", "p99 (us)", "change"]] + rows
+        print(f"{Fore.GREEN} ======================================= COMPARISON ======================================= {Style.RESET_ALL}")
+        print(f"{Fore.CYAN}{tabulate.tabulate(table, headers='firstrow', tablefmt='mixed_grid')}{Style.RESET_ALL}")
+
+    path = save_results(results, args.output)
+    loguru_logger.info(f"Saved benchmark results to {path}.")
+    return 0
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    loguru_logger.remove()
+    loguru_logger.add(sys.stderr, level="DEBUG" if args.verbose else "WARNING")
+    sys.exit(asyncio.run(run(args)))
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+from typing import List
+
+from loguru import logger as loguru_logger
+
+from .harness import BenchContext, BenchResult, ameasure, measure
+from internal.db import init_instance as init_db_instance
+from internal.db import instance as db_instance
+from internal.db.order_store import GridOrder, open_order_store
+from internal.infra.orderid import new_order_id
+
+
+def _order(i: int) -> dict:
+    return {
+        "clientOrderId": new_order_id(),
+        "orderId": i,
+        "origQty": "0.00100000",
+        "price": f"{30000 + i}.00",
+        "side": "BUY",
+        "status": "NEW",
+        "symbol": "BTCUSDT",
+        "timeInForce": "GTC",
+        "transactTime": int(time.time() * 1000),
+    }
+
+
+async def run(ctx: BenchContext) -> List[BenchResult]:
+    results = []
+    path = os.path.join(ctx.workdir, "bench_grid_trading_orders.sqlite3")
+    try:
+        for kind in ("memory", "sqlite"):
+            for scale in ctx.scales:
+                if os.path.exists(path):
+                    os.remove(path)
+                store = open_order_store(kind=kind, path=path)
+                orders = iter([
+                    GridOrder(client_order_id=new_order_id(), symbol="BTCUSDT", side="BUY" if i % 2 else "SELL", level=i, price=30000.0 + i)
+                    for i in range(scale + 10)
+                ])
+                # The grid registering its orders, then the fills and cancellations of them.
+                results.append(measure(f"db.{kind}_upsert", scale, lambda: store.upsert(next(orders)), ops=scale))
+                active = iter([o.client_order_id for o in store.active_orders()])
+                results.append(measure(f"db.{kind}_set_status", scale, lambda: store.set_status(next(active), "FILLED"), ops=scale // 2))
+                results.append(measure(f"db.{kind}_active_orders", scale, lambda: store.active_orders(symbol="BTCUSDT"), ops=100))
+                results.append(measure(f"db.{kind}_price_range", scale, lambda: store.orders_in_price_range(30000.0, 30000.0 + scale / 10), ops=100))
+                store.close()
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    if ctx.mongodb_conf is None:
+        loguru_logger.warning("Skip mongodb benchmarks, no mongodb config given.")
+        return results
+    init_db_instance(client_conf=ctx.mongodb_conf)
+    if not await db_instance().is_connected():
+        loguru_logger.warning("Skip mongodb benchmarks, mongodb is unreachable.")
+        return results
+    for scale in ctx.scales:
+        orders = iter([_order(i) for i in range(scale + 10)])
+        results.append(await ameasure("db.mongo_add_limit_order", scale, lambda: db_instance().add_new_spot_limit_order(next(orders)), ops=scale))
+    await db_instance().close()
+    return results
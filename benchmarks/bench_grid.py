@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+import random
+from typing import List
+
+from .harness import BenchContext, BenchResult, measure
+from internal.strategy import GridLadder
+
+LOWER_RANGE_PRICE = 30000
+UPPER_RANGE_PRICE = 80000
+
+
+async def run(ctx: BenchContext) -> List[BenchResult]:
+    results = []
+    rng = random.Random(0)
+    for scale in ctx.scales:
+        results.append(measure(
+            "grid.ladder_build", scale,
+            lambda: GridLadder(LOWER_RANGE_PRICE, UPPER_RANGE_PRICE, scale),
+            ops=200,
+        ))
+        ladder = GridLadder(LOWER_RANGE_PRICE, UPPER_RANGE_PRICE, scale)
+        prices = [rng.uniform(LOWER_RANGE_PRICE, UPPER_RANGE_PRICE) for _ in range(10000)]
+        it = iter(prices * 2)
+        results.append(measure("grid.split", scale, lambda: ladder.split(next(it)), ops=1000))
+        it = iter(prices * 2)
+        results.append(measure("grid.index_of", scale, lambda: ladder.index_of(next(it)), ops=10000))
+    return results
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from typing import List, Optional, Tuple
+
+from aiohttp import web
+from loguru import logger as loguru_logger
+
+from .harness import BenchContext, BenchResult, ameasure_concurrent
+from internal.infra.http.http_client import H2_AVAILABLE, HttpClient
+
+if H2_AVAILABLE:
+    import h2.config
+    import h2.connection
+    import h2.events
+    import h2.exceptions
+    import h2.settings
+
+# Concurrent requests of the fan-outs, whatever the scales of the run.
+CONCURRENCIES = (100, 1000, 10000)
+# Time the local servers take to answer, like a close exchange API.
+SERVER_LATENCY_IN_SEC = 0.005
+BODY = b'{"ok":true}'
+
+
+async def _start_http11_server() -> Tuple[web.AppRunner, str]:
+    async def handle(request: web.Request) -> web.Response:
+        await asyncio.sleep(SERVER_LATENCY_IN_SEC)
+        return web.Response(body=BODY, content_type="application/json")
+
+    app = web.Application()
+    app.router.add_get("/", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0, backlog=4096)
+    await site.start()
+    return runner, f"http://127.0.0.1:{runner.addresses[0][1]}/"
+
+
+class _H2cProtocol(asyncio.Protocol):
+    """A HTTP/2 over plain TCP (h2c, prior knowledge) server answering every request with BODY."""
+
+    def __init__(self):
+        self._h2_state = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False, header_encoding="utf-8"))
+        self._h2_state.local_settings = h2.settings.Settings(
+            client=False,
+            initial_values={h2.settings.SettingCodes.MAX_CONCURRENT_STREAMS: 1000},
+        )
+        self._transport: Optional[asyncio.Transport] = None
+
+    def connection_made(self, transport: asyncio.Transport):
+        self._transport = transport
+        self._h2_state.initiate_connection()
+        transport.write(self._h2_state.data_to_send())
+
+    def data_received(self, data: bytes):
+        try:
+            events = self._h2_state.receive_data(data)
+        except h2.exceptions.ProtocolError:
+            self._transport.write(self._h2_state.data_to_send())
+            self._transport.close()
+            return
+        for event in events:
+            if isinstance(event, h2.events.RequestReceived):
+                asyncio.get_running_loop().call_later(SERVER_LATENCY_IN_SEC, self._respond, event.stream_id)
+            elif isinstance(event, h2.events.ConnectionTerminated):
+                self._transport.close()
+        self._transport.write(self._h2_state.data_to_send())
+
+    def _respond(self, stream_id: int):
+        if self._transport.is_closing():
+            return
+        self._h2_state.send_headers(stream_id, [
+            (":status", "200"),
+            ("content-type", "application/json"),
+            ("content-length", str(len(BODY))),
+        ])
+        self._h2_state.send_data(stream_id, BODY, end_stream=True)
+        self._transport.write(self._h2_state.data_to_send())
+
+
+async def _start_h2c_server() -> Tuple[asyncio.AbstractServer, str]:
+    server = await asyncio.get_running_loop().create_server(_H2cProtocol, "127.0.0.1", 0, backlog=4096)
+    return server, f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/"
+
+
+async def _fan_out(name: str, client: HttpClient, url: str, concurrency: int) -> BenchResult:
+    aclient = client.get_aclient()
+    await aclient.get(url)  # warm up the connection
+    versions = set()
+
+    async def _get():
+        resp = await aclient.get(url)
+        versions.add(resp.http_version)
+
+    result = await ameasure_concurrent(name, concurrency, [_get for _ in range(concurrency)])
+    result.extra["http_version"] = ",".join(sorted(versions))
+    return result
+
+
+async def run(ctx: BenchContext) -> List[BenchResult]:
+    results = []
+    runner, http11_url = await _start_http11_server()
+    try:
+        for concurrency in CONCURRENCIES:
+            # The default pool of 32 HTTP/1.1 connections.
+            client = HttpClient()
+            try:
+                results.append(await _fan_out("http.http11", client, http11_url, concurrency))
+            finally:
+                await client.close()
+    finally:
+        await runner.cleanup()
+
+    if not H2_AVAILABLE:
+        loguru_logger.warning("Skipped the HTTP/2 benchmarks, h2 is not installed (pip install httpx[http2]).")
+        return results
+    server, h2c_url = await _start_h2c_server()
+    try:
+        for concurrency in CONCURRENCIES:
+            for streams in (100, 1000):
+                # One multiplexed connection, at most 'streams' requests in flight.
+                client = HttpClient(prior_knowledge=True, max_concurrent_streams=streams)
+                try:
+                    results.append(await _fan_out(f"http.http2_{streams}_streams", client, h2c_url, concurrency))
+                finally:
+                    await client.close()
+    finally:
+        server.close()
+        await server.wait_closed()
+    return results
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from typing import List
+
+from .harness import BenchContext, BenchResult, measure
+from internal.infra.metrics import MetricsRegistry
+
+
+def _noop():
+    pass
+
+
+async def run(ctx: BenchContext) -> List[BenchResult]:
+    registry = MetricsRegistry(enabled=False)
+    timed = registry.timed("bench_latency")(_noop)
+    histogram = registry.histogram("bench_record")
+    results = [
+        measure("metrics.bare_call", 1, _noop, ops=100000),
+        measure("metrics.timed_disabled", 1, timed, ops=100000),
+    ]
+    registry.enabled = True
+    results.append(measure("metrics.timed_enabled", 1, timed, ops=100000))
+    results.append(measure("metrics.histogram_record", 1, lambda: histogram.record(123456), ops=100000))
+    return results
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+from typing import List
+
+from .harness import BenchContext, BenchResult, measure
+from internal.infra.orderid import ORDER_ID_LENGTH, OrderIdGenerator
+from internal.utils.helper import gen_n_digit_nums_and_letters
+
+# Processes sharing an account in the collision check.
+PROCESSES = 4
+
+
+def _generate(args) -> List[str]:
+    node, n = args
+    return OrderIdGenerator(node).take(n)
+
+
+def _collisions(n: int) -> int:
+    """Duplicates among n IDs from each of PROCESSES processes, each on its own node."""
+    with multiprocessing.Pool(PROCESSES) as pool:
+        batches = pool.map(_generate, [(node, n) for node in range(PROCESSES)])
+    ids = [order_id for batch in batches for order_id in batch]
+    return len(ids) - len(set(ids))
+
+
+async def run(ctx: BenchContext) -> List[BenchResult]:
+    g = OrderIdGenerator()
+    results = [
+        measure("order_id.random", ORDER_ID_LENGTH, lambda: gen_n_digit_nums_and_letters(ORDER_ID_LENGTH), ops=100000),
+        measure("order_id.generate", ORDER_ID_LENGTH, g.new_id, ops=100000, collisions=_collisions(100000)),
+    ]
+    for scale in ctx.scales:
+        results.append(measure("order_id.take", scale, lambda: g.take(scale), ops=max(10, 100000 // scale), ids_per_op=scale))
+    return results
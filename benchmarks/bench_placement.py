@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import time
+from typing import List
+
+from .harness import BenchContext, BenchResult, ameasure, summarize
+from internal.exchange import BinanceAsyncClient
+from internal.exchange.mock import MockBinanceServer, MockExchange, SymbolRules
+from internal.infra.scheduler import OrderPlacementScheduler
+
+SYMBOL = "BTCUSDT"
+
+
+async def _start_mock(scale: int) -> MockBinanceServer:
+    exchange = MockExchange(
+        [SymbolRules(symbol=SYMBOL, base_asset="BTC", quote_asset="USDT", max_num_orders=scale * 4)],
+        balances={"USDT": "1000000000", "BTC": "1000"},
+        # Only the client-side fan-out is measured here, the exchange never throttles.
+        weight_limit_per_minute=scale * 100,
+        order_limit_per_10s=scale * 4,
+    )
+    exchange.set_book(SYMBOL, bids=[("29999.00", "100")], asks=[("30001.00", "100")])
+    server = MockBinanceServer(exchange)
+    await server.start()
+    return server
+
+
+async def run(ctx: BenchContext) -> List[BenchResult]:
+    results = []
+    for scale in ctx.scales:
+        server = await _start_mock(scale)
+        aclient = BinanceAsyncClient(api_key="bench", api_secret="bench", api_url=server.api_url)
+        try:
+            # One order at a time, the round trip of a single placement.
+            prices = iter(range(1, 10 ** 6))
+            results.append(await ameasure(
+                "placement.sequential", scale,
+                lambda: aclient.order_limit_buy(symbol=SYMBOL, quantity="0.001", price=f"{20000 + next(prices) % 5000}.00"),
+                ops=min(scale, 500),
+            ))
+
+            # The grid's initial fan-out through the placement scheduler.
+            scheduler = OrderPlacementScheduler(max_orders=scale * 2, interval_in_sec=10, max_concurrency=50)
+            latencies = []
+
+            def _job(level: int):
+                async def _place():
+                    t0 = time.perf_counter()
+                    resp = await aclient.order_limit_buy(symbol=SYMBOL, quantity="0.001", price=f"{25000 + level}.00")
+                    latencies.append(time.perf_counter() - t0)
+                    return resp
+                return _place
+
+            st = time.perf_counter()
+            placed = await scheduler.place_all([_job(level) for level in range(scale)])
+            elapsed = time.perf_counter() - st
+            results.append(summarize(
+                "placement.fan_out", scale, latencies, elapsed,
+                failed=sum(1 for r in placed if r is None),
+                used_weight=server.exchange.used_weight(),
+            ))
+        finally:
+            await aclient.close_connection()
+            await server.stop()
+    return results
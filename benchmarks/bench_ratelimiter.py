@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from typing import List
+
+import redis
+import redis.asyncio as aio_redis
+from loguru import logger as loguru_logger
+
+from .harness import BenchContext, BenchResult, ameasure, measure
+from internal.infra.ratelimiter import MemoryRateLimiter, RateLimiter
+from internal.infra.ratelimiter.redis_gcra import per_second
+
+
+async def run(ctx: BenchContext) -> List[BenchResult]:
+    limit = per_second(10 ** 9)
+    memory_limiter = MemoryRateLimiter(key_prefix="bench:")
+    results = [measure("ratelimiter.memory_allow", 1, lambda: memory_limiter.allow("orders", limit), ops=100000)]
+
+    conn = redis.Redis.from_url(ctx.redis_url)
+    try:
+        conn.ping()
+    except redis.exceptions.RedisError as e:
+        loguru_logger.warning(f"Skip redis rate-limiter benchmarks, redis is unreachable, err:{e}.")
+        return results
+    limiter = RateLimiter(redis_conn=conn, async_mode=False, key_prefix="bench:")
+    results.append(measure("ratelimiter.allow", 1, lambda: limiter.allow("orders", limit), ops=2000))
+    limiter.reset("orders")
+    for scale in ctx.scales:
+        # One key per symbol, the whole budget of a multi-symbol bot in a single round trip.
+        requests = [(f"orders:{i}", limit, 1) for i in range(scale)]
+        results.append(measure("ratelimiter.allow_batch", scale, lambda: limiter.allow_batch(requests), ops=100, keys_per_op=scale))
+        for key, _, _ in requests:
+            limiter.reset(key)
+    conn.close()
+
+    aconn = aio_redis.Redis.from_url(ctx.redis_url)
+    alimiter = RateLimiter(redis_conn=aconn, async_mode=True, key_prefix="bench:")
+    try:
+        results.append(await ameasure("ratelimiter.aallow", 1, lambda: alimiter.aallow("orders", limit), ops=2000))
+        await alimiter.areset("orders")
+    finally:
+        await aconn.aclose()
+    return results
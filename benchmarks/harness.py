@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+
+@dataclass
+class BenchResult:
+    """
+    -   'name' is the hot path measured, 'scale' the size of the workload
+        (grid levels, orders, ...).
+    -   'ops' is the number of operations timed, 'elapsed_in_sec' their
+        total wall time and 'ops_per_sec' the resulting throughput.
+    -   'p50_in_us' / 'p99_in_us' / 'max_in_us' are the per-operation
+        latencies.
+    -   'extra' holds benchmark-specific figures.
+    """
+    name: str
+    scale: int
+    ops: int
+    elapsed_in_sec: float
+    ops_per_sec: float
+    p50_in_us: float
+    p99_in_us: float
+    max_in_us: float
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    def __str__(self) -> str:
+        return (
+            f"BenchResult(name={self.name}, scale={self.scale}, ops={self.ops}, ops_per_sec={self.ops_per_sec:.1f}, "
+            f"p50={self.p50_in_us:.1f}us, p99={self.p99_in_us:.1f}us, max={self.max_in_us:.1f}us)"
+        )
+
+
+@dataclass
+class BenchContext:
+    """Options shared by all benchmarks."""
+    scales: List[int]
+    redis_url: str = "redis://127.0.0.1:6379/0"
+    mongodb_conf: Optional[Dict[str, Any]] = None
+    workdir: str = "."
+
+
+def summarize(name: str, scale: int, latencies_in_sec: List[float], elapsed_in_sec: float, **extra) -> BenchResult:
+    lat = np.asarray(latencies_in_sec, dtype=np.float64) * 1e6
+    ops = len(lat)
+    return BenchResult(
+        name=name,
+        scale=scale,
+        ops=ops,
+        elapsed_in_sec=elapsed_in_sec,
+        ops_per_sec=ops / elapsed_in_sec if elapsed_in_sec > 0 else 0.0,
+        p50_in_us=float(np.percentile(lat, 50)) if ops > 0 else 0.0,
+        p99_in_us=float(np.percentile(lat, 99)) if ops > 0 else 0.0,
+        max_in_us=float(lat.max()) if ops > 0 else 0.0,
+        extra=extra,
+    )
+
+
+def measure(name: str, scale: int, fn: Callable[[], Any], ops: int, warmup: int = 10, **extra) -> BenchResult:
+    """Time 'ops' sequential calls of fn."""
+    for _ in range(min(warmup, ops)):
+        fn()
+    latencies = [0.0] * ops
+    st = time.perf_counter()
+    for i in range(ops):
+        t0 = time.perf_counter()
+        fn()
+        latencies[i] = time.perf_counter() - t0
+    return summarize(name, scale, latencies, time.perf_counter() - st, **extra)
+
+
+async def ameasure(name: str, scale: int, fn: Callable[[], Awaitable[Any]], ops: int, warmup: int = 10, **extra) -> BenchResult:
+    """Time 'ops' sequential awaits of fn()."""
+    for _ in range(min(warmup, ops)):
+        await fn()
+    latencies = [0.0] * ops
+    st = time.perf_counter()
+    for i in range(ops):
+        t0 = time.perf_counter()
+        await fn()
+        latencies[i] = time.perf_counter() - t0
+    return summarize(name, scale, latencies, time.perf_counter() - st, **extra)
+
+
+async def ameasure_concurrent(name: str, scale: int, fns: List[Callable[[], Awaitable[Any]]], **extra) -> BenchResult:
+    """Time fns run all at once, the throughput is the fan-out's one."""
+    async def _timed(fn):
+        t0 = time.perf_counter()
+        await fn()
+        return time.perf_counter() - t0
+
+    st = time.perf_counter()
+    latencies = await asyncio.gather(*[_timed(fn) for fn in fns])
+    return summarize(name, scale, list(latencies), time.perf_counter() - st, **extra)
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def save_results(results: List[BenchResult], output_dir: str) -> str:
+    """Save a run as <output_dir>/<time>-<git revision>.json, return the path."""
+    os.makedirs(output_dir, exist_ok=True)
+    revision = _git_revision()
+    path = os.path.join(output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{revision}.json")
+    with open(path, "w") as fw:
+        json.dump({
+            "meta": {
+                "revision": revision,
+                "timestamp": int(time.time()),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+            },
+            "results": [asdict(r) for r in results],
+        }, fw, indent=2)
+    return path
+
+
+def load_results(path: str) -> List[BenchResult]:
+    with open(path, "r") as fr:
+        return [BenchResult(**r) for r in json.load(fr)["results"]]
+
+
+def compare_results(baseline: List[BenchResult], results: List[BenchResult]) -> List[List[Any]]:
+    """Rows of (name, scale, baseline ops/s, ops/s, change, baseline p99, p99, change)."""
+    baseline_by_key = {(r.name, r.scale): r for r in baseline}
+    rows = []
+    for r in results:
+        b = baseline_by_key.get((r.name, r.scale))
+        if b is None:
+            continue
+        rows.append([
+            r.name,
+            r.scale,
+            f"{b.ops_per_sec:.1f}",
+            f"{r.ops_per_sec:.1f}",
+            f"{(r.ops_per_sec / b.ops_per_sec - 1) if b.ops_per_sec > 0 else 0.0:+.1%}",
+            f"{b.p99_in_us:.1f}",
+            f"{r.p99_in_us:.1f}",
+            f"{(r.p99_in_us / b.p99_in_us - 1) if b.p99_in_us > 0 else 0.0:+.1%}",
+        ])
+    return rows
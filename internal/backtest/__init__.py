@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+from .data import load_price_path
+from .grid_backtest import GridBacktestResult, backtest_grid
+from .optimizer import GridParams, grid_param_space, rank_results, sweep_grid_params
+
+__all__ = [
+    "GridBacktestResult",
+    "GridParams",
+    "backtest_grid",
+    "grid_param_space",
+    "load_price_path",
+    "rank_results",
+    "sweep_grid_params",
+]
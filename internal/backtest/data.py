@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import os
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+# Column layout of the headerless CSV dumps published on https://data.binance.vision.
+KLINE_COLUMNS = [
+    "open_time", "open", "high", "low", "close", "volume", "close_time",
+    "quote_volume", "count", "taker_buy_volume", "taker_buy_quote_volume", "ignore",
+]
+TRADE_COLUMNS = ["id", "price", "qty", "quote_qty", "time", "is_buyer_maker", "is_best_match"]
+
+
+def _read_frame(path: str, columns: list) -> pd.DataFrame:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".parquet", ".pq"):
+        return pd.read_parquet(path)
+    frame = pd.read_csv(path, header=None)
+    # Dumps from data.binance.vision have no header, other exports usually do.
+    if isinstance(frame.iloc[0, 0], str) and not frame.iloc[0, 0].replace(".", "", 1).isdigit():
+        frame = pd.read_csv(path)
+    else:
+        frame = frame.iloc[:, :len(columns)]
+        frame.columns = columns[:frame.shape[1]]
+    return frame
+
+
+def kline_price_path(frame: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Expand klines into a price path of 4 ticks per candle.
+
+    The high and the low of a candle are visited in the order which is the most
+    likely one: open -> low -> high -> close for a rising candle, and
+    open -> high -> low -> close for a falling one.
+    """
+    opens = frame["open"].to_numpy(dtype=np.float64)
+    highs = frame["high"].to_numpy(dtype=np.float64)
+    lows = frame["low"].to_numpy(dtype=np.float64)
+    closes = frame["close"].to_numpy(dtype=np.float64)
+    rising = closes >= opens
+    path = np.empty((len(opens), 4), dtype=np.float64)
+    path[:, 0] = opens
+    path[:, 1] = np.where(rising, lows, highs)
+    path[:, 2] = np.where(rising, highs, lows)
+    path[:, 3] = closes
+    timestamps = np.repeat(frame["open_time"].to_numpy(dtype=np.int64), 4)
+    return (timestamps, path.reshape(-1))
+
+
+def load_price_path(path: str, kind: str = "klines") -> Tuple[np.ndarray, np.ndarray]:
+    """Load (timestamps in ms, prices) from a kline or trade CSV/Parquet file."""
+    if kind == "klines":
+        return kline_price_path(_read_frame(path, KLINE_COLUMNS))
+    if kind == "trades":
+        frame = _read_frame(path, TRADE_COLUMNS)
+        return (frame["time"].to_numpy(dtype=np.int64), frame["price"].to_numpy(dtype=np.float64))
+    raise ValueError(f"Unknown kind of market data: {kind}.")
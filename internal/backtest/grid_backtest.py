@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from internal.strategy.grid_ladder import GridLadder
+
+
+@dataclass
+class GridBacktestResult:
+    """
+    -   'fill_count' / 'buy_count' / 'sell_count' are the numbers of grid
+        orders filled during the replay.
+    -   'realized_pnl' is the gross profit of the filled SELL orders, in
+        quote asset. The base asset bought by the initial market order is
+        accounted at the price it was bought at.
+    -   'fees' is the total commission paid, in quote asset, and 'fee_drag'
+        is 'fees' relative to 'total_investment'.
+    -   'final_equity' is the cash plus the inventory marked at the last
+        price, 'total_return' is 'final_equity' relative to
+        'total_investment', and 'max_drawdown' is the largest relative drop
+        of the equity curve from its running peak.
+    -   'curves' has one row per tick of the price path, with the level of
+        the empty grid slot, the inventory, cash, equity, cumulative
+        realized PnL and cumulative fees.
+    -   'fills' has one row per filled grid order, if requested.
+    """
+    lower_range_price: float
+    upper_range_price: float
+    grids: int
+    total_investment: float
+    fill_count: int
+    buy_count: int
+    sell_count: int
+    realized_pnl: float
+    fees: float
+    fee_drag: float
+    final_equity: float
+    total_return: float
+    max_drawdown: float
+    curves: pd.DataFrame
+    fills: Optional[pd.DataFrame] = None
+
+    def __str__(self) -> str:
+        return (
+            f"GridBacktestResult(lower_range_price={self.lower_range_price}, upper_range_price={self.upper_range_price}, "
+            f"grids={self.grids}, total_investment={self.total_investment}, fills={self.fill_count} "
+            f"(buy={self.buy_count}, sell={self.sell_count}), realized_pnl={self.realized_pnl:.2f}, fees={self.fees:.2f}, "
+            f"fee_drag={self.fee_drag:.4%}, total_return={self.total_return:.4%}, max_drawdown={self.max_drawdown:.4%})"
+        )
+
+
+def _clamp_scan(lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Inclusive prefix scan of the clamp functions x -> clip(x, lo[i], hi[i]).
+
+    Clamps compose into a clamp: applying clip(., a1, b1) then clip(., a2, b2)
+    equals clip(., clip(a1, a2, b2), clip(b1, a2, b2)). The composition is
+    associative, so the prefix scan is done in log2(n) vectorized passes
+    (Hillis-Steele).
+    """
+    lo = lo.copy()
+    hi = hi.copy()
+    d = 1
+    n = len(lo)
+    while d < n:
+        new_lo = np.clip(lo[:-d], lo[d:], hi[d:])
+        new_hi = np.clip(hi[:-d], lo[d:], hi[d:])
+        lo[d:] = new_lo
+        hi[d:] = new_hi
+        d *= 2
+    return (lo, hi)
+
+
+def backtest_grid(
+    timestamps: np.ndarray,
+    prices: np.ndarray,
+    lower_range_price: float,
+    upper_range_price: float,
+    grids: int,
+    total_investment: float,
+    fee_rate: float = 0.001,
+    taker_fee_rate: float = 0.001,
+    with_fills: bool = True,
+) -> GridBacktestResult:
+    """Replay a price path through the grid of BinanceGridTradingBot.
+
+    The grid is set up like BinanceGridTradingBot.trade does: a market order
+    buys the base asset for the part of the investment above the first price,
+    every level below the first price gets a BUY order, every level above it
+    gets a SELL order, and the nearest level is left empty. A filled BUY at
+    level i moves to level i+1 as a SELL of the same quantity, a filled SELL
+    at level i moves to level i-1 as a BUY, so the orders keep their order
+    along the ladder and only the empty level moves. Orders fill at their
+    limit price once the price path touches it.
+
+    After each tick the empty level 'e' becomes clip(e, floor, ceil), where
+    floor/ceil are the levels right below/above the price. The whole path is
+    evaluated with a prefix scan of those clamps, and the cash flows of the
+    orders crossed by each move of 'e' are read from prefix sums over the
+    ladder, so the replay costs O(n log n) NumPy work for n ticks whatever
+    the number of levels.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    timestamps = np.asarray(timestamps)
+    if len(prices) == 0:
+        raise ValueError("price path is empty.")
+    ladder = GridLadder(lower_range_price, upper_range_price, grids)
+    levels = np.asarray(ladder.prices, dtype=np.float64)
+    top = len(levels) - 1
+    first_price = float(prices[0])
+    if first_price < lower_range_price or first_price > upper_range_price:
+        raise ValueError(f"First price ({first_price}) is out of range ({lower_range_price}, {upper_range_price}).")
+
+    # Initial orders, order n sits at level n below the empty level and at level n+1 above it.
+    empty = ladder.nearest_index(first_price)
+    initial_quote_spent = (upper_range_price - first_price) / (upper_range_price - lower_range_price) * total_investment
+    initial_fee = initial_quote_spent * taker_fee_rate
+    initial_base_qty = initial_quote_spent / first_price
+    qty = np.empty(top, dtype=np.float64)
+    qty[:empty] = (total_investment // grids) / levels[:empty]
+    qty[empty:] = initial_base_qty / max(1, top - empty)
+
+    # Prefix sums over the orders.
+    zero = np.zeros(1)
+    buy_notional_cum = np.concatenate([zero, np.cumsum(qty * levels[:-1])])
+    sell_notional_cum = np.concatenate([zero, np.cumsum(qty * levels[1:])])
+    qty_cum = np.concatenate([zero, np.cumsum(qty)])
+    # Extra profit of the first sale of the initial inventory, bought at the first price.
+    initial_inventory_cum = np.concatenate([zero, np.cumsum(np.where(np.arange(top) >= empty, qty * (levels[:-1] - first_price), 0.0))])
+
+    floor = np.clip(np.searchsorted(levels, prices, side="right") - 1, 0, top)
+    ceil = np.clip(np.searchsorted(levels, prices, side="left"), 0, top)
+    lo, hi = _clamp_scan(floor, ceil)
+    level = np.clip(empty, lo, hi)
+    prev_level = np.concatenate([[empty], level[:-1]])
+
+    down = np.maximum(prev_level, level)
+    up = np.minimum(prev_level, level)
+    buy_notional = buy_notional_cum[down] - buy_notional_cum[level]
+    sell_notional = sell_notional_cum[level] - sell_notional_cum[up]
+    buy_counts = down - level
+    sell_counts = level - up
+    reach = np.maximum.accumulate(np.maximum(level, empty))
+    prev_reach = np.concatenate([[empty], reach[:-1]])
+    realized = (sell_notional - (buy_notional_cum[level] - buy_notional_cum[up])) + (initial_inventory_cum[reach] - initial_inventory_cum[prev_reach])
+    fees = (buy_notional + sell_notional) * fee_rate
+
+    fees_cum = np.cumsum(fees) + initial_fee
+    cash = total_investment - initial_quote_spent - np.cumsum(buy_notional) + np.cumsum(sell_notional) - fees_cum
+    inventory = qty_cum[-1] - qty_cum[level]
+    equity = cash + inventory * prices
+    peak = np.maximum.accumulate(equity)
+    drawdown = 1 - equity / peak
+    realized_cum = np.cumsum(realized)
+
+    curves = pd.DataFrame({
+        "timestamp": timestamps,
+        "price": prices,
+        "level": level,
+        "inventory": inventory,
+        "cash": cash,
+        "equity": equity,
+        "realized_pnl": realized_cum,
+        "fees": fees_cum,
+    })
+
+    fills = None
+    if with_fills:
+        counts = buy_counts + sell_counts
+        tick = np.repeat(np.arange(len(prices)), counts)
+        offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        is_buy = np.repeat(buy_counts > 0, counts)
+        start = prev_level[tick]
+        # Falling prices fill the BUY orders from the top, rising ones the SELL orders from the bottom.
+        order = np.where(is_buy, start - 1 - offset, start + offset)
+        fill_level = np.where(is_buy, order, order + 1)
+        fills = pd.DataFrame({
+            "timestamp": timestamps[tick],
+            "side": np.where(is_buy, "BUY", "SELL"),
+            "level": fill_level,
+            "price": levels[fill_level],
+            "qty": qty[order],
+        })
+
+    total_fees = float(fees_cum[-1])
+    return GridBacktestResult(
+        lower_range_price=lower_range_price,
+        upper_range_price=upper_range_price,
+        grids=grids,
+        total_investment=total_investment,
+        fill_count=int(buy_counts.sum() + sell_counts.sum()),
+        buy_count=int(buy_counts.sum()),
+        sell_count=int(sell_counts.sum()),
+        realized_pnl=float(realized_cum[-1]),
+        fees=total_fees,
+        fee_drag=total_fees / total_investment,
+        final_equity=float(equity[-1]),
+        total_return=float(equity[-1]) / total_investment - 1,
+        max_drawdown=float(drawdown.max()),
+        curves=curves,
+        fills=fills,
+    )
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+from internal.backtest.data import kline_price_path, load_price_path
+from internal.backtest.grid_backtest import _clamp_scan, backtest_grid
+from internal.strategy.grid_ladder import GridLadder
+
+
+def replay_one_by_one(prices, lower, upper, grids, total_investment, fee_rate):
+    """Order-by-order replay of the grid, the reference for the vectorized one."""
+    ladder = GridLadder(lower, upper, grids)
+    levels = ladder.prices
+    first_price = prices[0]
+    buy_levels, sell_levels = ladder.split(first_price)
+    initial_base_qty = (upper - first_price) / (upper - lower) * total_investment / first_price
+    # level -> (side, qty, cost price)
+    orders = {}
+    for level in buy_levels:
+        orders[level] = ("BUY", (total_investment // grids) / levels[level], None)
+    for level in sell_levels:
+        orders[level] = ("SELL", initial_base_qty / max(1, len(sell_levels)), first_price)
+    fills, realized, fees = [], 0.0, 0.0
+    for price in prices[1:]:
+        while 1:
+            hits = sorted(
+                [lv for lv, (side, _, _) in orders.items() if (side == "BUY" and price <= levels[lv]) or (side == "SELL" and price >= levels[lv])],
+                reverse=any(orders[lv][0] == "BUY" and price <= levels[lv] for lv in orders),
+            )
+            if len(hits) == 0:
+                break
+            lv = hits[0]
+            side, qty, cost = orders.pop(lv)
+            fills.append((side, lv))
+            fees += qty * levels[lv] * fee_rate
+            if side == "BUY":
+                orders[lv + 1] = ("SELL", qty, levels[lv])
+            else:
+                realized += qty * (levels[lv] - cost)
+                orders[lv - 1] = ("BUY", qty, None)
+    return (fills, realized, fees)
+
+
+def test_clamp_scan_matches_sequential_clamps():
+    rng = np.random.default_rng(7)
+    lo = rng.integers(0, 50, size=1000)
+    hi = lo + rng.integers(0, 3, size=1000)
+    scan_lo, scan_hi = _clamp_scan(lo, hi)
+    x = 25
+    for i in range(1000):
+        x = min(max(x, lo[i]), hi[i])
+        assert min(max(25, scan_lo[i]), scan_hi[i]) == x
+
+
+def test_backtest_matches_order_by_order_replay():
+    rng = np.random.default_rng(42)
+    prices = 30500 + np.cumsum(rng.normal(0, 40, size=3000))
+    prices = np.clip(prices, 29000, 32000)
+    prices[0] = 30512
+    result = backtest_grid(np.arange(len(prices)), prices, 30000, 31000, 50, 10000, fee_rate=0.001)
+    fills, realized, fees = replay_one_by_one(list(prices), 30000, 31000, 50, 10000, 0.001)
+
+    assert result.fill_count == len(fills) > 0
+    assert list(zip(result.fills["side"], result.fills["level"])) == fills
+    assert result.realized_pnl == pytest.approx(realized)
+    assert result.fees == pytest.approx(fees + result.curves["fees"].iloc[0])
+    assert result.curves["equity"].iloc[0] == pytest.approx(10000 - result.curves["fees"].iloc[0])
+
+
+def test_round_trip_earns_one_step_per_order():
+    prices = np.array([30060.0, 30000.0, 30100.0])
+    result = backtest_grid(np.arange(3), prices, 30000, 31000, 10, 10000, fee_rate=0.0, taker_fee_rate=0.0)
+    # The BUY at 30000 fills, then comes back as a SELL of the same quantity at 30100.
+    assert (result.buy_count, result.sell_count) == (1, 1)
+    qty = (10000 // 10) / 30000
+    assert result.realized_pnl == pytest.approx(qty * 100)
+
+
+def test_kline_price_path_visits_extremes_in_candle_order(tmp_path):
+    frame = pd.DataFrame({
+        "open_time": [0, 60000],
+        "open": [10.0, 12.0],
+        "high": [13.0, 12.5],
+        "low": [9.0, 8.0],
+        "close": [12.0, 9.0],
+    })
+    timestamps, prices = kline_price_path(frame)
+    assert list(prices) == [10.0, 9.0, 13.0, 12.0, 12.0, 12.5, 8.0, 9.0]
+    assert list(timestamps) == [0, 0, 0, 0, 60000, 60000, 60000, 60000]
+
+    path = tmp_path / "klines.csv"
+    path.write_text("0,10,13,9,12,1,59999,12,1,0,0,0\n60000,12,12.5,8,9,1,119999,9,1,0,0,0\n")
+    _, loaded = load_price_path(str(path), kind="klines")
+    assert list(loaded) == list(prices)
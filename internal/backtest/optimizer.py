@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger as loguru_logger
+
+from .grid_backtest import backtest_grid
+
+
+@dataclass(frozen=True)
+class GridParams:
+    """
+    网格参数
+    """
+    lower_range_price: int
+    upper_range_price: int
+    grids: int
+    total_investment: int
+
+
+def grid_param_space(
+    lower_range_prices: Iterable[int],
+    upper_range_prices: Iterable[int],
+    grids: Iterable[int],
+    total_investments: Iterable[int],
+) -> List[GridParams]:
+    """Cartesian product of the candidates, skipping empty price ranges."""
+    return [
+        GridParams(lower, upper, n, investment)
+        for lower, upper, n, investment in itertools.product(lower_range_prices, upper_range_prices, grids, total_investments)
+        if lower < upper
+    ]
+
+
+# Views on the shared price path, set up once per worker process.
+_shared_blocks: List[shared_memory.SharedMemory] = []
+_shared_timestamps: Optional[np.ndarray] = None
+_shared_prices: Optional[np.ndarray] = None
+
+
+def _attach_shared_path(timestamps_name: str, prices_name: str, n: int):
+    global _shared_timestamps, _shared_prices
+    timestamps_block = shared_memory.SharedMemory(name=timestamps_name)
+    prices_block = shared_memory.SharedMemory(name=prices_name)
+    _shared_blocks.extend([timestamps_block, prices_block])
+    _shared_timestamps = np.ndarray((n,), dtype=np.int64, buffer=timestamps_block.buf)
+    _shared_prices = np.ndarray((n,), dtype=np.float64, buffer=prices_block.buf)
+
+
+def _run_one(args: Tuple[GridParams, float]) -> Optional[Tuple[GridParams, int, float, float, float, float, float]]:
+    params, fee_rate = args
+    try:
+        result = backtest_grid(
+            _shared_timestamps,
+            _shared_prices,
+            lower_range_price=params.lower_range_price,
+            upper_range_price=params.upper_range_price,
+            grids=params.grids,
+            total_investment=params.total_investment,
+            fee_rate=fee_rate,
+            with_fills=False,
+        )
+    except ValueError:
+        # The grid is invalid, or the path does not start inside its range.
+        return None
+    return (params, result.fill_count, result.realized_pnl, result.fees, result.total_return, result.max_drawdown, result.final_equity)
+
+
+def _to_shared(array: np.ndarray) -> shared_memory.SharedMemory:
+    block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+    return block
+
+
+def rank_results(results: pd.DataFrame) -> pd.DataFrame:
+    """Rank parameter sets by the mean of their ranks in return, drawdown and fill count."""
+    if len(results) == 0:
+        return results
+    results = results.copy()
+    results["score"] = (
+        results["total_return"].rank(ascending=False)
+        + results["max_drawdown"].rank(ascending=True)
+        + results["fill_count"].rank(ascending=False)
+    ) / 3
+    results = results.sort_values(["score", "total_return"], ascending=[True, False], kind="stable").reset_index(drop=True)
+    results.index += 1
+    results.index.name = "rank"
+    return results
+
+
+def sweep_grid_params(
+    timestamps: np.ndarray,
+    prices: np.ndarray,
+    param_sets: List[GridParams],
+    fee_rate: float = 0.001,
+    max_workers: Optional[int] = None,
+) -> pd.DataFrame:
+    """Backtest every parameter set on all CPU cores, return them ranked.
+
+    The price path is copied once into shared memory, the worker processes
+    map it instead of receiving their own copy with every task.
+    """
+    timestamps = np.ascontiguousarray(timestamps, dtype=np.int64)
+    prices = np.ascontiguousarray(prices, dtype=np.float64)
+    max_workers = max_workers or os.cpu_count() or 1
+    timestamps_block = _to_shared(timestamps)
+    prices_block = _to_shared(prices)
+    rows = []
+    st = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_attach_shared_path,
+            initargs=(timestamps_block.name, prices_block.name, len(prices)),
+        ) as executor:
+            chunksize = max(1, len(param_sets) // (max_workers * 4))
+            for row in executor.map(_run_one, [(params, fee_rate) for params in param_sets], chunksize=chunksize):
+                if row is None:
+                    continue
+                params, fill_count, realized_pnl, fees, total_return, max_drawdown, final_equity = row
+                rows.append({
+                    "lower_range_price": params.lower_range_price,
+                    "upper_range_price": params.upper_range_price,
+                    "grids": params.grids,
+                    "total_investment": params.total_investment,
+                    "fill_count": fill_count,
+                    "realized_pnl": realized_pnl,
+                    "fees": fees,
+                    "total_return": total_return,
+                    "max_drawdown": max_drawdown,
+                    "final_equity": final_equity,
+                })
+    finally:
+        timestamps_block.close()
+        timestamps_block.unlink()
+        prices_block.close()
+        prices_block.unlink()
+    loguru_logger.info(
+        f"Backtested {len(param_sets)} parameter sets ({len(rows)} valid) over {len(prices)} ticks "
+        f"with {max_workers} workers in {time.perf_counter() - st:.3f} secs."
+    )
+    return rank_results(pd.DataFrame(rows, columns=[
+        "lower_range_price", "upper_range_price", "grids", "total_investment",
+        "fill_count", "realized_pnl", "fees", "total_return", "max_drawdown", "final_equity",
+    ]))
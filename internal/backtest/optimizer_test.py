@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+from internal.backtest.grid_backtest import backtest_grid
+from internal.backtest.optimizer import grid_param_space, rank_results, sweep_grid_params
+
+
+def test_sweep_matches_serial_backtests():
+    rng = np.random.default_rng(11)
+    prices = np.clip(30500 + np.cumsum(rng.normal(0, 30, size=5000)), 29000, 32000)
+    prices[0] = 30500
+    timestamps = np.arange(len(prices)) * 60000
+    param_sets = grid_param_space([29000, 30000, 30600], [31000, 32000], [10, 50], [10000])
+
+    results = sweep_grid_params(timestamps, prices, param_sets, max_workers=2)
+
+    # Grids starting above the first price are skipped.
+    assert len(results) == len([p for p in param_sets if p.lower_range_price <= 30500])
+    for row in results.itertuples():
+        expected = backtest_grid(
+            timestamps, prices, row.lower_range_price, row.upper_range_price, row.grids, row.total_investment, with_fills=False,
+        )
+        assert row.fill_count == expected.fill_count
+        assert row.total_return == pytest.approx(expected.total_return)
+        assert row.max_drawdown == pytest.approx(expected.max_drawdown)
+    assert list(results.index) == list(range(1, len(results) + 1))
+    assert results["score"].is_monotonic_increasing
+
+
+def test_rank_prefers_dominating_parameter_sets():
+    results = pd.DataFrame({
+        "total_return": [0.01, 0.05, 0.03],
+        "max_drawdown": [0.20, 0.05, 0.10],
+        "fill_count": [10, 300, 100],
+    })
+    ranked = rank_results(results)
+    assert list(ranked["total_return"]) == [0.05, 0.03, 0.01]
@@ -1,41 +1,85 @@
 # -*- coding: utf-8 -*-
 import asyncio
 import decimal
+import functools
 import os
-import shelve
-import time
 from typing import Any, Dict, NoReturn, Optional, Tuple
 
+import aiohttp
 import tabulate
 from binance.client import AsyncClient as AsyncBinanceRestAPIClient
 from binance.exceptions import BinanceAPIException, BinanceRequestException
-from binance.streams import BinanceSocketManager
 from colorama import Fore, Style
 from loguru import logger as loguru_logger
 
-from internal.classes.singleton import Singleton
 from internal.db import instance as db_instance
-from internal.utils.helper import gen_n_digit_nums_and_letters, timeit
-
-
-class BinanceGridTradingBot(metaclass=Singleton):
+from internal.db.order_store import OrderStore, open_order_store
+from internal.exchange import (
+    FINAL_ORDER_STATUSES,
+    BinanceAsyncClient,
+    BinanceStreamManager,
+    ClockSync,
+    LocalOrderBook,
+    MarketDataHub,
+    OrderState,
+    UsageSync,
+    UserDataStream,
+    account_key,
+)
+from internal.infra.orderid import ainit_default_generator, new_order_id
+from internal.infra.ratelimiter import binance_spot_limits, open_rate_limiter
+from internal.infra.scheduler import OrderPlacementScheduler, TriggerScheduler
+from internal.strategy import GridLadder, GridRebalancer
+from internal.utils.helper import timeit
+
+# APIError(code=-1015): Too many new orders; current limit is 50 orders per 10 SECOND.
+TOO_MANY_NEW_ORDERS_CODE = -1015
+# Embedded store of the grid orders, shared by 'trade' and 'cancelall'.
+GRID_TRADING_ORDERS_DB = "grid_trading_orders.sqlite3"
+
+# Request weight per minute and new orders per 10 seconds and per day, all counted per account.
+BINANCE_SPOT_LIMITS = binance_spot_limits()
+
+
+class BinanceGridTradingBot:
     """
     币安网格交易机器人
     """
 
-    def __init__(self, use_proxy: bool = False, use_testnet: bool = False):
+    def __init__(
+        self,
+        use_proxy: bool = False,
+        use_testnet: bool = False,
+        api_key: Optional[str] = None,
+        api_secret: Optional[str] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+        order_limiter: Optional[Any] = None,
+        market_data: Optional[MarketDataHub] = None,
+    ):
         self._inited = False
         self._is_ready = False
         self._aclient = None
-
-        ak, sk = None, None
-        if use_testnet:
+        self._order_limiter = None
+        self._owns_limiter = True
+        self._usage_sync = None
+        self._account_key = None
+        self._clock_sync = None
+        self._trigger = None
+        self._user_stream = None
+        self._order_books: Dict[str, LocalOrderBook] = {}
+        # Books of a shared hub are fed once for all the bots and stopped by the hub.
+        self._market_data = market_data
+        self._order_store: Optional[OrderStore] = None
+
+        # Keys given by the caller, e.g. one account per bot of a BotPool, win over the env.
+        ak, sk = api_key, api_secret
+        if (ak is None or sk is None) and use_testnet:
             ak = os.getenv("BINANCE_TESTNET_API_KEY")
             sk = os.getenv("BINANCE_TESTNET_SECRET_KEY")
             if (ak is None or len(ak) == 0) or (sk is None or len(sk) == 0):
                 loguru_logger.critical("Please set env for BINANCE_TESTNET_API_KEY and BINANCE_TESTNET_SECRET_KEY.")
                 return
-        else:
+        elif ak is None or sk is None:
             ak = os.getenv("BINANCE_MAINNET_API_KEY")
             sk = os.getenv("BINANCE_MAINNET_SECRET_KEY")
             if (ak is None or len(ak) == 0) or (sk is None or len(sk) == 0):
@@ -54,14 +98,33 @@ class BinanceGridTradingBot(metaclass=Singleton):
                 "https": https_proxy
             }
             requests_params[proxies] = proxies
-        self._aclient = AsyncBinanceRestAPIClient(
+        # With a shared redis every process on the API key throttles on the usage Binance reports,
+        # a limiter given by the caller is shared by the bots on the same API key.
+        self._owns_limiter = order_limiter is None
+        self._order_limiter = order_limiter if order_limiter is not None else open_rate_limiter(os.getenv("BINANCE_RATE_LIMITER_REDIS_URL"))
+        # The limits of the account are counted under a key of its own, whoever shares the limiter.
+        self._account_key = account_key(ak)
+        self._usage_sync = UsageSync(self._order_limiter, BINANCE_SPOT_LIMITS, key=self._account_key)
+        self._aclient = BinanceAsyncClient(
             api_key=ak,
             api_secret=sk,
             requests_params=requests_params,
             testnet=use_testnet,
+            response_hooks=[self._usage_sync],
+            session=session,
         )
-        self._sock_mgr = BinanceSocketManager(client=self._aclient)
+        # Order timestamps and triggers follow the server clock.
+        self._clock_sync = ClockSync(self._aclient)
+        self._trigger = TriggerScheduler(clock=self._clock_sync.exchange_now)
+        self._sock_mgr = BinanceStreamManager(client=self._aclient)
         self._trade_data_q = asyncio.Queue()
+        self._user_stream = UserDataStream(sock_mgr=self._sock_mgr)
+        self._placement_scheduler = OrderPlacementScheduler(
+            max_orders=50,
+            interval_in_sec=10,
+            max_concurrency=50,
+            is_throttled=lambda e: isinstance(e, BinanceAPIException) and e.code == TOO_MANY_NEW_ORDERS_CODE,
+        )
 
         self._inited = True
 
@@ -72,21 +135,47 @@ class BinanceGridTradingBot(metaclass=Singleton):
 
         try:
             await self._aclient.ping()
-            res = await self._aclient.get_server_time()
-            self._is_ready = True
+            # The processes on the account must not generate the same clientOrderIds.
+            await ainit_default_generator(os.getenv("BINANCE_RATE_LIMITER_REDIS_URL"))
+            self._is_ready = await self._clock_sync.start()
         except (BinanceRequestException, BinanceAPIException) as e:
             loguru_logger.critical(f"BinanceGridTradingBot is not ready, binance's exception:{e}.")
         except Exception as e:
             loguru_logger.critical(f"BinanceGridTradingBot is not ready, internal exception:{e}.")
         finally:
             if self._is_ready:
-                timestamp_offset = res["serverTime"] - int(time.time() * 1000)
-                loguru_logger.info(f"BinanceGridTradingBot is ready for operations, timestamp offset from binance server: {timestamp_offset}.")
+                loguru_logger.info(
+                    f"BinanceGridTradingBot is ready for operations, timestamp offset from binance server: {self._aclient.timestamp_offset}ms, "
+                    f"rtt: {self._clock_sync.rtt_in_sec * 1000:.1f}ms."
+                )
             return self._is_ready
 
     async def close(self):
+        if self._user_stream is not None:
+            await self._user_stream.stop()
+        if self._market_data is None:
+            for book in self._order_books.values():
+                await book.stop()
+        if self._clock_sync is not None:
+            await self._clock_sync.stop()
         if self._aclient is not None:
             await self._aclient.close_connection()
+        if self._usage_sync is not None:
+            await self._usage_sync.close()
+        if self._order_limiter is not None and self._owns_limiter:
+            await self._order_limiter.aclose()
+        if self._order_store is not None:
+            self._order_store.close()
+            self._order_store = None
+
+    @property
+    def order_store(self) -> OrderStore:
+        """
+        网格订单存储
+        """
+        if self._order_store is None:
+            self._order_store = open_order_store(path=GRID_TRADING_ORDERS_DB)
+        return self._order_store
 
     @property
     def lower_range_price(self) -> float:
@@ -236,12 +325,27 @@ class BinanceGridTradingBot(metaclass=Singleton):
                 print(f"{Fore.CYAN}{table_output}{Style.RESET_ALL}")
                 print(f"{Fore.GREEN} ======================================= SYMBOL EXTRA INFORMATION ======================================= {Style.RESET_ALL}")
 
+    async def watch_orderbook(self, sym: str) -> bool:
+        """Maintain a local Order Book for the market, fed by the depth diff stream."""
+        book = self._order_books.get(sym)
+        if book is None:
+            if self._market_data is not None:
+                book = self._market_data.order_book(sym)
+            else:
+                book = LocalOrderBook(aclient=self._aclient, sock_mgr=self._sock_mgr, symbol=sym)
+            self._order_books[sym] = book
+        return await book.start()
+
     @timeit
     async def latest_orderbook(self, sym: str, verbose: bool = True) -> Optional[Dict[str, Any]]:
         """Get the Order Book for the BTCUSDT market."""
         orderbook = None
         try:
-            orderbook = await self._aclient.get_order_book(symbol=sym, limit=5)
+            book = self._order_books.get(sym)
+            if book is not None and book.is_synced:
+                orderbook = book.top(5)
+            else:
+                orderbook = await self._aclient.get_order_book(symbol=sym, limit=5)
         except (BinanceRequestException, BinanceAPIException) as e:
             loguru_logger.error(f"Failed to get the Order Book for the {sym} market, binance's exception:{e}.")
         except Exception as e:
@@ -339,6 +443,53 @@ class BinanceGridTradingBot(metaclass=Singleton):
                 done = True
             return done
 
+    async def _reconcile_grid_orders(self, sym: str, rebalancer: GridRebalancer) -> int:
+        """
+        Feed the rebalancer with the final state of its orders which are no
+        longer open, return how many there were.
+        """
+        active = rebalancer.active_order_ids("BUY") + rebalancer.active_order_ids("SELL")
+        if len(active) == 0:
+            return 0
+        try:
+            await self._order_limiter.acquire_composite(self._account_key, BINANCE_SPOT_LIMITS, endpoint="GET /openOrders")
+            open_orders = await self._aclient.get_open_orders(symbol=sym, recvWindow=5000)
+        except (BinanceRequestException, BinanceAPIException) as e:
+            loguru_logger.error(f"Failed to get open orders for symbol:{sym}, binance's exception:{e}.")
+            return 0
+        except Exception as e:
+            loguru_logger.error(f"Failed to get open orders for symbol:{sym}, internal exception:{e}.")
+            return 0
+        still_open = set(o["clientOrderId"] for o in open_orders)
+        ended = 0
+        for client_order_id in active:
+            if client_order_id in still_open:
+                continue
+            try:
+                await self._order_limiter.acquire_composite(self._account_key, BINANCE_SPOT_LIMITS, endpoint="GET /order")
+                resp = await self._aclient.get_order(symbol=sym, origClientOrderId=client_order_id, recvWindow=5000)
+            except (BinanceRequestException, BinanceAPIException) as e:
+                loguru_logger.error(f"Failed to check order<order_id:{client_order_id}>, binance's exception:{e}.")
+                continue
+            except Exception as e:
+                loguru_logger.error(f"Failed to check order<order_id:{client_order_id}>, internal exception:{e}.")
+                continue
+            rebalancer.on_order_update(OrderState.from_order(resp))
+            ended += 1
+        loguru_logger.info(f"Reconciled {ended} grid orders which ended while the user data stream was down.")
+        return ended
+
+    @timeit
+    async def cancel_all_orders(self, sym: str) -> int:
+        """Cancel the active grid orders of the order store, return the number of cancelled ones."""
+        cancelled = 0
+        for order in self.order_store.active_orders(symbol=sym):
+            if await self.cancel_order(sym=sym, order_id=order.client_order_id):
+                self.order_store.set_status(order.client_order_id, "CANCELED")
+                cancelled += 1
+        loguru_logger.info(f"Cancelled {cancelled} active grid orders for symbol:{sym}.")
+        return cancelled
+
     @timeit
     async def cancel_order(self, sym: str, order_id: str, verbose: bool = True) -> bool:
         """Cancel an active order."""
@@ -457,16 +608,29 @@ class BinanceGridTradingBot(metaclass=Singleton):
                 loguru_logger.error(f"Failed to receive trade data<symbol:{sym}> anymore, binance's exception:{e}.")
                 break
 
+    async def _record_spot_limit_order(self, sym: str, order: Dict[str, Any]):
+        """Persist a placed spot-limit order, the order is live whether or not it could be recorded."""
+        try:
+            await db_instance().add_new_spot_limit_order(order=order)
+        except Exception as e:
+            loguru_logger.error(f"Failed to record spot-limit-order<order_id:{order.get('clientOrderId')}> for symbol:{sym}, internal exception:{e}.")
+
     async def _buy_base_asset(self, sym: str, quote_qty: float, price: str) -> Tuple[str, str, bool]:
+        """Place a spot-limit BUY order.
+
+        APIError(code=-1015) is re-raised so that the placement scheduler can back off and retry.
+        """
         done = False
-        client_order_id = gen_n_digit_nums_and_letters(22)
+        client_order_id = new_order_id()
         binance_order_id = ""
+        resp = None
         try:
+            await self._order_limiter.acquire_composite(self._account_key, BINANCE_SPOT_LIMITS, endpoint="POST /order")
             resp = await self._aclient.create_order(
                 symbol=sym,
                 side="BUY",
                 type="LIMIT",
-                quantity=decimal.Decimal(f"{quote_qty / price:.5f}"),
+                quantity=decimal.Decimal(f"{quote_qty / float(price):.5f}"),
                 price=price,
                 timeInForce="GTC",
                 newClientOrderId=client_order_id,
@@ -475,22 +639,29 @@ class BinanceGridTradingBot(metaclass=Singleton):
             done = True
             if resp is not None:
                 binance_order_id = resp["orderId"]
-                print(f"resp == {resp}")
-                await db_instance().add_new_spot_limit_order(order=resp)
         except BinanceRequestException as e:
             loguru_logger.error(f"Failed to create spot-limit-order for symbol:{sym}, err:{e}.")
         except BinanceAPIException as e:
             loguru_logger.error(f"Failed to create spot-limit-order for symbol:{sym}, err:{e}.")
-        finally:
-            if done:
-                loguru_logger.debug(f"Created spot-limit-order<order_id:{client_order_id}> for symbol:{sym}.")
-            return (client_order_id, binance_order_id, done)
+            if e.code == TOO_MANY_NEW_ORDERS_CODE:
+                raise
+        if done:
+            loguru_logger.debug(f"Created spot-limit-order<order_id:{client_order_id}> for symbol:{sym}.")
+            if resp is not None:
+                await self._record_spot_limit_order(sym, resp)
+        return (client_order_id, binance_order_id, done)
 
     async def _sell_base_asset(self, sym: str, base_qty: float, price: str) -> Tuple[str, str, bool]:
+        """Place a spot-limit SELL order.
+
+        APIError(code=-1015) is re-raised so that the placement scheduler can back off and retry.
+        """
         done = False
-        client_order_id = gen_n_digit_nums_and_letters(22)
+        client_order_id = new_order_id()
         binance_order_id = ""
+        resp = None
         try:
+            await self._order_limiter.acquire_composite(self._account_key, BINANCE_SPOT_LIMITS, endpoint="POST /order")
             resp = await self._aclient.create_order(
                 symbol=sym,
                 side="SELL",
@@ -504,16 +675,17 @@ class BinanceGridTradingBot(metaclass=Singleton):
             done = True
             if resp is not None:
                 binance_order_id = resp["orderId"]
-                print(f"resp == {resp}")
-                await db_instance().add_new_spot_limit_order(order=resp)
         except BinanceRequestException as e:
             loguru_logger.error(f"Failed to create spot-limit-order for symbol:{sym}, err:{e}.")
         except BinanceAPIException as e:
             loguru_logger.error(f"Failed to create spot-limit-order for symbol:{sym}, err:{e}.")
-        finally:
-            if done:
-                loguru_logger.debug(f"Created spot-limit-order<order_id:{client_order_id}> for symbol:{sym}.")
-            return (client_order_id, binance_order_id, done)
+            if e.code == TOO_MANY_NEW_ORDERS_CODE:
+                raise
+        if done:
+            loguru_logger.debug(f"Created spot-limit-order<order_id:{client_order_id}> for symbol:{sym}.")
+            if resp is not None:
+                await self._record_spot_limit_order(sym, resp)
+        return (client_order_id, binance_order_id, done)
 
     # async def _do_grid_trading(self, sym: str):
     #     for trading_price in target_price_list:
@@ -539,6 +711,13 @@ class BinanceGridTradingBot(metaclass=Singleton):
     #         except BinanceAPIException as e:
     #             loguru_logger.error("Failed to create order for symbol:{}, err:{}.".format(sym, e))
 
+    def _grid_order_job(self, sym: str, side: str, level: int, base_qty: float):
+        """Placement job of a grid order of 'base_qty' at the given level of the ladder."""
+        price = self._ladder.price_of(level)
+        if side == "SELL":
+            return functools.partial(self._sell_base_asset, sym=sym, base_qty=base_qty, price=str(price))
+        return functools.partial(self._buy_base_asset, sym=sym, quote_qty=base_qty * price, price=str(price))
+
     @timeit
     async def trade(self, sym: str, when: int):
         """Run grid-trading for a long time."""
@@ -553,14 +732,23 @@ class BinanceGridTradingBot(metaclass=Singleton):
             loguru_logger.warning("No need to trade, there are pending orders existed.")
             return
 
-        now = time.time()
-        while now < when:
-            await asyncio.sleep(0.001)
-            now = time.time()
+        # The streams take a while to sync, get them ready before the trigger fires.
+        if not await self.watch_orderbook(sym):
+            loguru_logger.warning(f"Local Order Book for the {sym} market is unavailable, fall back on REST.")
+        if not await self._user_stream.start():
+            loguru_logger.warning("User data stream is unavailable, fall back on polling order status.")
 
-        self._step_price = (self._upper_range_price - self._lower_range_price) // self._grids
+        await self._trigger.wait_until(when)
+        loguru_logger.info(f"Triggered at {when}, {self._trigger.stats}.")
+
+        try:
+            self._ladder = GridLadder(self._lower_range_price, self._upper_range_price, self._grids)
+        except ValueError as e:
+            loguru_logger.error(f"Invalid grid settings, err:{e}.")
+            return
+        self._step_price = self._ladder.step_price
         self._single_trading_capacity = self._total_investment // self._grids
-        self._target_price_list = [self._lower_range_price + i * self._step_price for i in range(self._grids)]
+        self._target_price_list = self._ladder.prices
         print(f"{Fore.GREEN} ======================================= GRID TRADING INITIAL SETTINGS ======================================= {Style.RESET_ALL}")
         print(f"{Fore.CYAN} base_asset              : {self._base_asset} {Style.RESET_ALL}")
         print(f"{Fore.CYAN} quote_asset             : {self._quote_asset} {Style.RESET_ALL}")
@@ -576,10 +764,14 @@ class BinanceGridTradingBot(metaclass=Singleton):
         print(f"{Fore.GREEN} ======================================= GRID TRADING INITIAL TRADING ======================================= {Style.RESET_ALL}")
         latest_price = None
         try:
-            resp = await self._aclient.get_symbol_ticker(
-                symbol=sym,
-            )
-            latest_price = float(resp["price"])
+            book = self._order_books[sym]
+            if book.is_synced and book.best_bid() is not None and book.best_ask() is not None:
+                latest_price = (float(book.best_bid()[0]) + float(book.best_ask()[0])) / 2
+            else:
+                resp = await self._aclient.get_symbol_ticker(
+                    symbol=sym,
+                )
+                latest_price = float(resp["price"])
         except (BinanceRequestException, BinanceAPIException) as e:
             loguru_logger.error(f"Failed to get latest price for symbol:{sym}, binance's exception:{e}.")
         except Exception as e:
@@ -597,9 +789,10 @@ class BinanceGridTradingBot(metaclass=Singleton):
 
         initial_usdt_spent = (self._upper_range_price - latest_price) / (self._upper_range_price - self._lower_range_price) * self._total_investment
         loguru_logger.debug(f"Try to spend {initial_usdt_spent:.1f} USDT at first...")
-        order_id = gen_n_digit_nums_and_letters(22)
+        order_id = new_order_id()
         resp = None
         try:
+            await self._order_limiter.acquire_composite(self._account_key, BINANCE_SPOT_LIMITS, endpoint="POST /order")
             resp = await self._aclient.create_order(
                 symbol=sym,
                 side="BUY",
@@ -622,8 +815,21 @@ class BinanceGridTradingBot(metaclass=Singleton):
             if resp["status"] == "FILLED":
                 initial_base_asset_qty = float(resp["executedQty"])
                 break
-            await asyncio.sleep(3)
-            
+            if resp["status"] in FINAL_ORDER_STATUSES:
+                loguru_logger.error(f"Order<order_id:{order_id}> will never be filled, status:{resp['status']}.")
+                return
+
+            # Wait for the fill pushed by the user data stream, fall back on REST polling if nothing arrived.
+            state = None
+            if self._user_stream.is_running:
+                state = await self._user_stream.wait_for_final(order_id, timeout=30)
+            else:
+                await asyncio.sleep(3)
+            if state is not None:
+                resp = state.to_order()
+                continue
+
+            inner_resp = None
             try:
                 inner_resp = await self._aclient.get_order(
                     symbol=sym,
@@ -639,42 +845,61 @@ class BinanceGridTradingBot(metaclass=Singleton):
                     resp = inner_resp
         loguru_logger.debug(f"Spent {initial_usdt_spent:.1f} USDT at first, got base asset:{initial_base_asset_qty:.5f}.")
 
-        sell_price = []
-        for target_price in self._target_price_list:
-            if target_price > latest_price:
-                sell_price.append(target_price)
-        self._single_trading_base_asset_capacity = initial_base_asset_qty / len(sell_price)
+        buy_levels, sell_levels = self._ladder.split(latest_price)
+        self._single_trading_base_asset_capacity = initial_base_asset_qty / max(1, len(sell_levels))
         print(f"{Fore.GREEN} ======================================= GRID TRADING INITIAL TRADING ======================================= {Style.RESET_ALL}")
 
+        # Fills of the initial orders may arrive before their placement returns, the rebalancer
+        # listens from the start and every order is registered as soon as it is placed.
+        rebalancer = GridRebalancer(
+            ladder=self._ladder,
+            scheduler=self._placement_scheduler,
+            make_job=functools.partial(self._grid_order_job, sym),
+            store=self.order_store,
+            symbol=sym,
+            lookup=self._user_stream.get,
+        )
+        reconciling = set()
+        if self._user_stream.is_running:
+            self._user_stream.add_listener(rebalancer.on_order_update)
+
+            # The events sent while the stream reconnected are lost, the open orders tell which grid orders ended meanwhile.
+            def _on_reconnected():
+                task = asyncio.create_task(self._reconcile_grid_orders(sym, rebalancer))
+                reconciling.add(task)
+                task.add_done_callback(reconciling.discard)
+
+            self._user_stream.add_reconnect_listener(_on_reconnected)
+
+        jobs = []
+        for level in sell_levels:
+            job = self._grid_order_job(sym, "SELL", level, self._single_trading_base_asset_capacity)
+            jobs.append(rebalancer.registering_job("SELL", level, job))
+        for level in buy_levels:
+            job = functools.partial(
+                self._buy_base_asset,
+                sym=sym,
+                quote_qty=self._single_trading_capacity,
+                price=str(self._ladder.price_of(level)),
+            )
+            jobs.append(rebalancer.registering_job("BUY", level, job))
+        await self._placement_scheduler.place_all(jobs)
         print(f"{Fore.GREEN} ======================================= GRID TRADING PLACED ALL TARGET ORDERS ======================================= {Style.RESET_ALL}")
-        sell_orders = []
-        buy_orders = []
-        with shelve.open("grid_trading_orders.db", flag="w", writeback=True) as db:
-            db["active_sell"] = []
-            db["active_buy"] = []
-
-            for target_price in self._target_price_list:
-                if target_price > latest_price:
-                    # SELL
-                    client_order_id, binance_order_id, ok = await self._sell_base_asset(
-                        sym=sym,
-                        base_qty=self._single_trading_base_asset_capacity,
-                        price=str(target_price),
-                    )
-                    if ok:
-                        db["active_sell"].append(client_order_id)
-                        sell_orders.append((client_order_id, binance_order_id))
-                else:
-                    # BUY
-                    client_order_id, binance_order_id, ok = await self._buy_base_asset(
-                        sym=sym,
-                        quote_qty=self._single_trading_capacity,
-                        price=str(target_price),
-                    )
-                    if ok:
-                        db["active_buy"].append(client_order_id)
-                        buy_orders.append((client_order_id, binance_order_id))
-        print(f"{Fore.GREEN} ======================================= GRID TRADING PLACED ALL TARGET ORDERS ======================================= {Style.RESET_ALL}")
+
+        if not self._user_stream.is_running:
+            loguru_logger.warning("User data stream is unavailable, the grid will not be rebalanced after fills.")
+            return
+        loguru_logger.info(
+            f"Grid with {len(rebalancer.active_order_ids('SELL'))} sell orders and "
+            f"{len(rebalancer.active_order_ids('BUY'))} buy orders is rebalancing on fills..."
+        )
+        task_rebalance = asyncio.create_task(rebalancer.run())
+        task_stream_dead = asyncio.create_task(self._user_stream.wait_dead())
+        await asyncio.wait([task_rebalance, task_stream_dead], return_when=asyncio.FIRST_COMPLETED)
+        for task in [task_rebalance, task_stream_dead, *reconciling]:
+            task.cancel()
+        if self._user_stream.is_dead:
+            loguru_logger.critical("User data stream is dead, the grid stops rebalancing on fills.")
 
         # task_feed_klines = asyncio.create_task(self._feed_klines(sym=sym, interval=AsyncBinanceRestAPIClient.KLINE_INTERVAL_5MINUTE))
         # task_feed_trade_data = asyncio.create_task(self._feed_trade_data(sym=sym))
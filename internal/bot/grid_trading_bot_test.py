@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from internal.bot.grid_trading_bot import BinanceGridTradingBot
+from internal.db.order_store import MemoryOrderStore
+from internal.exchange.mock import MockBinanceServer, MockExchange, SymbolRules
+from internal.infra.scheduler import OrderPlacementScheduler
+from internal.strategy import GridLadder, GridRebalancer
+
+
+@pytest.fixture
+async def server(monkeypatch):
+    exchange = MockExchange(
+        [SymbolRules(symbol="BTCUSDT", base_asset="BTC", quote_asset="USDT")],
+        balances={"USDT": "100000", "BTC": "1"},
+    )
+    exchange.set_book("BTCUSDT", bids=[("29999.00", "1.0")], asks=[("30001.00", "1.0")])
+    server = MockBinanceServer(exchange, latency_in_ms=1)
+    await server.start()
+    monkeypatch.setenv("BINANCE_API_URL", server.api_url)
+    monkeypatch.setenv("BINANCE_STREAM_URL", server.stream_url)
+    monkeypatch.delenv("BINANCE_RATE_LIMITER_REDIS_URL", raising=False)
+    yield server
+    await server.stop()
+
+
+async def test_reconcile_grid_orders_ended_while_stream_was_down(server):
+    bot = BinanceGridTradingBot(use_testnet=True, api_key="key", api_secret="secret")
+    store = MemoryOrderStore()
+    rebalancer = GridRebalancer(
+        ladder=GridLadder(29000, 30000, 10),
+        scheduler=OrderPlacementScheduler(),
+        make_job=lambda side, level, qty: None,
+        store=store,
+        symbol="BTCUSDT",
+    )
+    try:
+        for cid, price, level in [("buy-9", "29900.00", 9), ("buy-8", "29800.00", 8)]:
+            await bot._aclient.create_order(
+                symbol="BTCUSDT", side="BUY", type="LIMIT", timeInForce="GTC",
+                quantity="0.001", price=price, newClientOrderId=cid,
+            )
+            rebalancer.register(cid, level, "BUY")
+        # Filled without the user data stream telling.
+        server.exchange.trade("BTCUSDT", "29900.00")
+
+        assert await bot._reconcile_grid_orders("BTCUSDT", rebalancer) == 1
+        assert store.get("buy-9").status == "FILLED"
+        assert store.get("buy-8").status == "NEW"
+        assert rebalancer._fills.qsize() == 1
+    finally:
+        await bot.close()
+
+
+async def test_streams_started_before_the_trigger(server):
+    bot = BinanceGridTradingBot(use_testnet=True, api_key="key", api_secret="secret")
+    bot.total_investment = 1000
+    calls = []
+
+    class Triggered(Exception):
+        pass
+
+    async def wait_until(when):
+        calls.append("trigger")
+        raise Triggered()
+
+    async def start():
+        calls.append("user_stream")
+        return True
+
+    async def watch_orderbook(sym):
+        calls.append("orderbook")
+        return True
+
+    bot._trigger.wait_until = wait_until
+    bot._user_stream.start = start
+    bot.watch_orderbook = watch_orderbook
+    try:
+        with pytest.raises(Triggered):
+            await bot.trade("BTCUSDT", 0)
+        assert calls == ["orderbook", "user_stream", "trigger"]
+    finally:
+        await bot.close()
+
+
+async def test_placed_order_survives_a_failed_record(server, monkeypatch):
+    bot = BinanceGridTradingBot(use_testnet=True, api_key="key", api_secret="secret")
+
+    class BrokenDB:
+        async def add_new_spot_limit_order(self, order):
+            raise RuntimeError("database is down")
+
+    monkeypatch.setattr("internal.bot.grid_trading_bot.db_instance", lambda: BrokenDB())
+    try:
+        client_order_id, binance_order_id, done = await bot._buy_base_asset(sym="BTCUSDT", quote_qty=29.9, price="29900.00")
+        assert done and binance_order_id != ""
+        order = await bot._aclient.get_order(symbol="BTCUSDT", origClientOrderId=client_order_id)
+        assert order["status"] == "NEW"
+    finally:
+        await bot.close()
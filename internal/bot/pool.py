@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+import inspect
+import os
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from loguru import logger as loguru_logger
+
+from internal.exchange import BinanceAsyncClient, BinanceStreamManager, MarketDataHub
+from internal.infra.http.http_tracing import http_trace_config
+from internal.infra.orderid import ainit_default_generator
+from internal.infra.ratelimiter import open_rate_limiter
+
+
+class BotPool:
+    """
+    机器人池
+
+    Hosts many bots, each with its own account, symbols and parameters, in
+    one event loop instead of one process per bot:
+
+    -   all the REST clients send their requests through one
+        aiohttp.ClientSession, so the bots share its connection pool of at
+        most 'connection_limit' connections;
+    -   the bots on the same API key share one rate limiter, the weight and
+        order limits are counted per account by Binance, so every bot
+        charges them under the account_key of its API key, also when all
+        the limiters are on the same redis;
+    -   the order books come from one MarketDataHub, fed by a client
+        without key, one depth stream per symbol whatever the number of
+        bots which watch it.
+
+    Every bot keeps its own clock sync and user data stream.
+    """
+
+    def __init__(
+        self,
+        *,
+        use_proxy: bool = False,
+        use_testnet: bool = False,
+        connection_limit: int = 100,
+        redis_url: Optional[str] = None,
+    ):
+        if connection_limit <= 0:
+            raise ValueError("connection_limit must be positive.")
+        self._use_proxy = use_proxy
+        self._use_testnet = use_testnet
+        self._connection_limit = connection_limit
+        self._redis_url = redis_url if redis_url is not None else os.getenv("BINANCE_RATE_LIMITER_REDIS_URL")
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._market_client: Optional[BinanceAsyncClient] = None
+        self._market_data: Optional[MarketDataHub] = None
+        self._limiters: Dict[str, Any] = {}
+        self._bots: Dict[str, Any] = {}
+
+    @property
+    def session(self) -> Optional[aiohttp.ClientSession]:
+        return self._session
+
+    @property
+    def market_data(self) -> Optional[MarketDataHub]:
+        return self._market_data
+
+    def __len__(self) -> int:
+        return len(self._bots)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._bots
+
+    def names(self) -> List[str]:
+        return list(self._bots)
+
+    def get(self, name: str) -> Optional[Any]:
+        return self._bots.get(name)
+
+    def _open(self):
+        if self._session is not None:
+            return
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self._connection_limit),
+            trace_configs=[http_trace_config],
+        )
+        self._market_client = BinanceAsyncClient(
+            requests_params={"timeout": 10},
+            testnet=self._use_testnet,
+            session=self._session,
+        )
+        self._market_data = MarketDataHub(aclient=self._market_client, sock_mgr=BinanceStreamManager(client=self._market_client))
+
+    def limiter_of(self, api_key: Optional[str]) -> Any:
+        """The rate limiter shared by the bots on the API key, those on the env keys share one too."""
+        key = api_key or ""
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            limiter = open_rate_limiter(self._redis_url)
+            self._limiters[key] = limiter
+        return limiter
+
+    async def add(
+        self,
+        name: str,
+        bot_cls: type,
+        *,
+        api_key: Optional[str] = None,
+        api_secret: Optional[str] = None,
+        **settings,
+    ) -> Optional[Any]:
+        """
+        Create a bot of 'bot_cls' on the account of 'api_key', set its
+        'settings' (like lower_range_price or grids of a grid bot) and test
+        its connectivity. Return the bot, None if it is not ready, the keys
+        of the env are used when none are given.
+        """
+        if name in self._bots:
+            raise ValueError(f"Bot {name} is already in the pool.")
+        self._open()
+        # The bots of the pool share the clientOrderId node of the process, claimed on the redis of the pool.
+        try:
+            await ainit_default_generator(self._redis_url)
+        except Exception as e:
+            loguru_logger.error(f"Failed to add the bot:{name} to the pool, no clientOrderId node, internal exception:{e}.")
+            return None
+        kwargs = {
+            "use_proxy": self._use_proxy,
+            "use_testnet": self._use_testnet,
+            "api_key": api_key,
+            "api_secret": api_secret,
+            "session": self._session,
+            "order_limiter": self.limiter_of(api_key),
+        }
+        if "market_data" in inspect.signature(bot_cls).parameters:
+            kwargs["market_data"] = self._market_data
+        bot = bot_cls(**kwargs)
+        for k, v in settings.items():
+            setattr(bot, k, v)
+        if not await bot.is_ready():
+            loguru_logger.error(f"Failed to add the bot:{name} to the pool, it is not ready.")
+            await bot.close()
+            return None
+        self._bots[name] = bot
+        loguru_logger.info(f"Added the bot:{name} ({bot_cls.__name__}) to the pool, {len(self._bots)} bots in total.")
+        return bot
+
+    async def remove(self, name: str) -> bool:
+        """Close the bot and drop it from the pool, False if there is no such bot."""
+        bot = self._bots.pop(name, None)
+        if bot is None:
+            return False
+        await bot.close()
+        return True
+
+    async def close(self):
+        for name in list(self._bots):
+            await self.remove(name)
+        if self._market_data is not None:
+            await self._market_data.close()
+            self._market_data = None
+        if self._market_client is not None:
+            await self._market_client.close_connection()
+            self._market_client = None
+        for limiter in self._limiters.values():
+            await limiter.aclose()
+        self._limiters.clear()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
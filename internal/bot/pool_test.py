@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import secrets
+
+import pytest
+
+from internal.bot.grid_trading_bot import BINANCE_SPOT_LIMITS, BinanceGridTradingBot
+from internal.bot.pool import BotPool
+from internal.bot.simple_trading_bot import BinanceSimpleTradingBot
+from internal.exchange.mock import MockBinanceServer, MockExchange, SymbolRules
+
+
+@pytest.fixture
+async def server(monkeypatch):
+    exchange = MockExchange(
+        [SymbolRules(symbol="BTCUSDT", base_asset="BTC", quote_asset="USDT")],
+        balances={"USDT": "100000", "BTC": "1"},
+    )
+    exchange.set_book("BTCUSDT", bids=[("29999.00", "1.0")], asks=[("30001.00", "1.0")])
+    server = MockBinanceServer(exchange, latency_in_ms=1)
+    await server.start()
+    monkeypatch.setenv("BINANCE_API_URL", server.api_url)
+    monkeypatch.setenv("BINANCE_STREAM_URL", server.stream_url)
+    monkeypatch.delenv("BINANCE_RATE_LIMITER_REDIS_URL", raising=False)
+    yield server
+    await server.stop()
+
+
+async def test_bots_share_the_session_and_the_order_books(server):
+    pool = BotPool(use_testnet=True)
+    try:
+        a = await pool.add("a", BinanceGridTradingBot, api_key="key-a", api_secret="secret-a", grids=100)
+        b = await pool.add("b", BinanceGridTradingBot, api_key="key-b", api_secret="secret-b", grids=200)
+        c = await pool.add("c", BinanceSimpleTradingBot, api_key="key-a", api_secret="secret-a")
+        assert None not in (a, b, c)
+        assert len({id(a), id(b), id(c)}) == 3
+        assert (a.grids, b.grids) == (100, 200)
+        assert pool.names() == ["a", "b", "c"]
+        with pytest.raises(ValueError):
+            await pool.add("a", BinanceGridTradingBot, api_key="key-a", api_secret="secret-a")
+
+        # One connection pool, one limiter per account.
+        assert a._aclient.session is pool.session and c._aclient.session is pool.session
+        assert a._order_limiter is c._order_limiter
+        assert a._order_limiter is not b._order_limiter
+
+        # Each request carries the key of its bot, though the session is shared.
+        keys = []
+        for bot in (a, b, c):
+            bot._aclient.add_response_hook(lambda response: keys.append(response.request_info.headers.get("X-MBX-APIKEY")))
+            await bot._aclient.get_account()
+        assert keys == ["key-a", "key-b", "key-a"]
+
+        # One depth stream for both grids.
+        assert await a.watch_orderbook("BTCUSDT")
+        assert await b.watch_orderbook("BTCUSDT")
+        assert a._order_books["BTCUSDT"] is b._order_books["BTCUSDT"]
+        assert pool.market_data.symbols == ["BTCUSDT"]
+
+        # A bot leaving the pool leaves the session and the books to the others.
+        assert await pool.remove("a")
+        assert not await pool.remove("a")
+        assert not pool.session.closed
+        assert pool.market_data.get("BTCUSDT").is_synced
+        assert await b._aclient.get_server_time()
+    finally:
+        session = pool.session
+        await pool.close()
+    assert len(pool) == 0
+    assert session.closed
+
+
+async def test_api_keys_do_not_share_a_budget_on_redis(server):
+    pool = BotPool(use_testnet=True, redis_url="redis://:sOmE_sEcUrE_pAsS@localhost:6379/0")
+    # Fresh keys, the buckets of a previous run may not be expired yet.
+    key_a, key_b = f"key-a-{secrets.token_hex(4)}", f"key-b-{secrets.token_hex(4)}"
+    try:
+        a = await pool.add("a", BinanceGridTradingBot, api_key=key_a, api_secret="secret-a")
+        b = await pool.add("b", BinanceGridTradingBot, api_key=key_b, api_secret="secret-b")
+        c = await pool.add("c", BinanceSimpleTradingBot, api_key=key_a, api_secret="secret-a")
+        assert a._account_key != b._account_key and a._account_key == c._account_key
+
+        # The bots on key_a use up its order budget.
+        burst = BINANCE_SPOT_LIMITS.buckets["orders_10s"].burst
+        result, error = await a._order_limiter.aallow_composite(a._account_key, BINANCE_SPOT_LIMITS, costs={"orders_10s": burst})
+        assert error is None and result.allowed
+        result, _ = await c._order_limiter.aallow_composite(c._account_key, BINANCE_SPOT_LIMITS, endpoint="POST /order")
+        assert (result.allowed, result.limited_by) == (False, "orders_10s")
+        # The bot on key_b still has all of its own.
+        result, _ = await b._order_limiter.aallow_composite(b._account_key, BINANCE_SPOT_LIMITS, endpoint="POST /order")
+        assert result.allowed and result.remaining["orders_10s"] == burst - 1
+    finally:
+        await pool.close()
@@ -1,35 +1,54 @@
 # -*- coding: utf-8 -*-
 import os
-import time
+from typing import Any, Optional
 
+import aiohttp
 import tabulate
-from binance.client import AsyncClient as AsyncBinanceRestAPIClient
 from binance.exceptions import BinanceAPIException, BinanceOrderException, BinanceRequestException
 from colorama import Fore, Style
 from loguru import logger as loguru_logger
 
-from internal.classes.singleton import Singleton
-from internal.utils.helper import gen_n_digit_nums_and_letters, timeit
+from internal.exchange import BinanceAsyncClient, ClockSync, UsageSync, account_key
+from internal.infra.orderid import ainit_default_generator, new_order_id
+from internal.infra.ratelimiter import binance_spot_limits, open_rate_limiter
+from internal.utils.helper import timeit
 
+# Request weight per minute and new orders per 10 seconds and per day, all counted per account.
+BINANCE_SPOT_LIMITS = binance_spot_limits()
 
-class BinanceSimpleTradingBot(metaclass=Singleton):
+
+class BinanceSimpleTradingBot:
     """
     币安现货交易机器人
     """
     
-    def __init__(self, use_proxy: bool = False, use_testnet: bool = False):
+    def __init__(
+        self,
+        use_proxy: bool = False,
+        use_testnet: bool = False,
+        api_key: Optional[str] = None,
+        api_secret: Optional[str] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+        order_limiter: Optional[Any] = None,
+    ):
         self._inited = False
         self._is_ready = False
         self._aclient = None
+        self._order_limiter = None
+        self._owns_limiter = True
+        self._usage_sync = None
+        self._account_key = None
+        self._clock_sync = None
 
-        ak, sk = None, None
-        if use_testnet:
+        # Keys given by the caller, e.g. one account per bot of a BotPool, win over the env.
+        ak, sk = api_key, api_secret
+        if (ak is None or sk is None) and use_testnet:
             ak = os.getenv("BINANCE_TESTNET_API_KEY")
             sk = os.getenv("BINANCE_TESTNET_SECRET_KEY")
             if (ak is None or len(ak) == 0) or (sk is None or len(sk) == 0):
                 loguru_logger.critical("Please set env for BINANCE_TESTNET_API_KEY and BINANCE_TESTNET_SECRET_KEY.")
                 return
-        else:
+        elif ak is None or sk is None:
             ak = os.getenv("BINANCE_MAINNET_API_KEY")
             sk = os.getenv("BINANCE_MAINNET_SECRET_KEY")
             if (ak is None or len(ak) == 0) or (sk is None or len(sk) == 0):
@@ -61,12 +80,23 @@ class BinanceSimpleTradingBot(metaclass=Singleton):
                 "https": https_proxy
             }
             requests_params[proxies] = proxies
-        self._aclient = AsyncBinanceRestAPIClient(
+        # With a shared redis every process on the API key throttles on the usage Binance reports,
+        # a limiter given by the caller is shared by the bots on the same API key.
+        self._owns_limiter = order_limiter is None
+        self._order_limiter = order_limiter if order_limiter is not None else open_rate_limiter(os.getenv("BINANCE_RATE_LIMITER_REDIS_URL"))
+        # The limits of the account are counted under a key of its own, whoever shares the limiter.
+        self._account_key = account_key(ak)
+        self._usage_sync = UsageSync(self._order_limiter, BINANCE_SPOT_LIMITS, key=self._account_key)
+        self._aclient = BinanceAsyncClient(
             api_key=ak,
             api_secret=sk,
             requests_params=requests_params,
             testnet=use_testnet,
+            response_hooks=[self._usage_sync],
+            session=session,
         )
+        # Order timestamps and triggers follow the server clock.
+        self._clock_sync = ClockSync(self._aclient)
 
         self._inited = True
     
@@ -77,21 +107,30 @@ class BinanceSimpleTradingBot(metaclass=Singleton):
 
         try:
             await self._aclient.ping()
-            res = await self._aclient.get_server_time()
-            self._is_ready = True
+            # The processes on the account must not generate the same clientOrderIds.
+            await ainit_default_generator(os.getenv("BINANCE_RATE_LIMITER_REDIS_URL"))
+            self._is_ready = await self._clock_sync.start()
         except (BinanceRequestException, BinanceAPIException) as e:
             loguru_logger.critical(f"BinanceSimpleTradingBot is not ready, binance's exception:{e}.")
         except Exception as e:
             loguru_logger.critical(f"BinanceSimpleTradingBot is not ready, internal exception:{e}.")
         finally:
             if self._is_ready:
-                timestamp_offset = res["serverTime"] - int(time.time() * 1000)
-                loguru_logger.info(f"BinanceSimpleTradingBot is ready for operations, timestamp offset from binance server: {timestamp_offset}.")
+                loguru_logger.info(
+                    f"BinanceSimpleTradingBot is ready for operations, timestamp offset from binance server: {self._aclient.timestamp_offset}ms, "
+                    f"rtt: {self._clock_sync.rtt_in_sec * 1000:.1f}ms."
+                )
             return self._is_ready
 
     async def close(self):
+        if self._clock_sync is not None:
+            await self._clock_sync.stop()
         if self._aclient is not None:
             await self._aclient.close_connection()
+        if self._usage_sync is not None:
+            await self._usage_sync.close()
+        if self._order_limiter is not None and self._owns_limiter:
+            await self._order_limiter.aclose()
 
     @timeit
     async def show_balances(self):
@@ -153,10 +192,11 @@ class BinanceSimpleTradingBot(metaclass=Singleton):
     async def trade(self, sym: str, base_qty: float = 0, quote_qty: float = 0, side: str = "BUY") -> bool:
         """Buy/Sell some quantities of a specific coin."""
         done = False
-        order_id = gen_n_digit_nums_and_letters(22)
+        order_id = new_order_id()
         try:
             resp = None
             loguru_logger.info(f"Try to trade a new spot-market-order<order_id:{order_id}>...")
+            await self._order_limiter.acquire_composite(self._account_key, BINANCE_SPOT_LIMITS, endpoint="POST /order")
             if side == "BUY":
                 resp = await self._aclient.order_market_buy(
                     symbol=sym,
@@ -1,40 +1,74 @@
 # -*- coding: utf-8 -*-
 import asyncio
 import os
-import time
 from typing import Any, Dict, Optional, Tuple
 
+import aiohttp
 import tabulate
-from binance.client import AsyncClient as AsyncBinanceRestAPIClient
-from binance.client import Client as BinanceRestAPIClient
 from binance.exceptions import BinanceAPIException, BinanceOrderException, BinanceRequestException
 from colorama import Fore, Style
 from loguru import logger as loguru_logger
 
-from internal.classes.singleton import Singleton
 from internal.db import instance as db_instance
-from internal.utils.helper import gen_n_digit_nums_and_letters, timeit
+from internal.exchange import (
+    BinanceAsyncClient,
+    BinanceClient,
+    BinanceStreamManager,
+    ClockSync,
+    LocalOrderBook,
+    MarketDataHub,
+    UsageSync,
+    UserDataStream,
+    account_key,
+)
+from internal.infra.orderid import ainit_default_generator, new_order_id
+from internal.infra.ratelimiter import binance_spot_limits, open_rate_limiter
+from internal.infra.scheduler import TriggerScheduler
+from internal.utils.helper import timeit
 
+# Request weight per minute and new orders per 10 seconds and per day, all counted per account.
+BINANCE_SPOT_LIMITS = binance_spot_limits()
 
-class BinanceStablecoinSwapBot(metaclass=Singleton):
+
+class BinanceStablecoinSwapBot:
     """
     币安打新机器人
     """
     
-    def __init__(self, use_proxy: bool = False, use_testnet: bool = False):
+    def __init__(
+        self,
+        use_proxy: bool = False,
+        use_testnet: bool = False,
+        api_key: Optional[str] = None,
+        api_secret: Optional[str] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+        order_limiter: Optional[Any] = None,
+        market_data: Optional[MarketDataHub] = None,
+    ):
         self._inited = False
         self._is_ready = False
         self._aclient = None
+        self._order_limiter = None
+        self._owns_limiter = True
+        self._usage_sync = None
+        self._account_key = None
+        self._clock_sync = None
+        self._trigger = None
         self._client = None
+        self._user_stream = None
+        self._order_book = None
+        # Books of a shared hub are fed once for all the bots and stopped by the hub.
+        self._market_data = market_data
 
-        ak, sk = None, None
-        if use_testnet:
+        # Keys given by the caller, e.g. one account per bot of a BotPool, win over the env.
+        ak, sk = api_key, api_secret
+        if (ak is None or sk is None) and use_testnet:
             ak = os.getenv("BINANCE_TESTNET_API_KEY")
             sk = os.getenv("BINANCE_TESTNET_SECRET_KEY")
             if (ak is None or len(ak) == 0) or (sk is None or len(sk) == 0):
                 loguru_logger.critical("Please set env for BINANCE_TESTNET_API_KEY and BINANCE_TESTNET_SECRET_KEY.")
                 return
-        else:
+        elif ak is None or sk is None:
             ak = os.getenv("BINANCE_MAINNET_API_KEY")
             sk = os.getenv("BINANCE_MAINNET_SECRET_KEY")
             if (ak is None or len(ak) == 0) or (sk is None or len(sk) == 0):
@@ -53,7 +87,7 @@ class BinanceStablecoinSwapBot(metaclass=Singleton):
                 "https": https_proxy
             }
             requests_params[proxies] = proxies
-        self._client = BinanceRestAPIClient(
+        self._client = BinanceClient(
             api_key=ak,
             api_secret=sk,
             requests_params=requests_params,
@@ -72,12 +106,30 @@ class BinanceStablecoinSwapBot(metaclass=Singleton):
                 "https": https_proxy
             }
             requests_params[proxies] = proxies
-        self._aclient = AsyncBinanceRestAPIClient(
+        # With a shared redis every process on the API key throttles on the usage Binance reports,
+        # a limiter given by the caller is shared by the bots on the same API key.
+        self._owns_limiter = order_limiter is None
+        self._order_limiter = order_limiter if order_limiter is not None else open_rate_limiter(os.getenv("BINANCE_RATE_LIMITER_REDIS_URL"))
+        # The limits of the account are counted under a key of its own, whoever shares the limiter.
+        self._account_key = account_key(ak)
+        self._usage_sync = UsageSync(self._order_limiter, BINANCE_SPOT_LIMITS, key=self._account_key)
+        self._aclient = BinanceAsyncClient(
             api_key=ak,
             api_secret=sk,
             requests_params=requests_params,
             testnet=use_testnet,
+            response_hooks=[self._usage_sync],
+            session=session,
         )
+        # Order timestamps and triggers follow the server clock.
+        self._clock_sync = ClockSync(self._aclient)
+        self._trigger = TriggerScheduler(clock=self._clock_sync.exchange_now)
+        self._sock_mgr = BinanceStreamManager(client=self._aclient)
+        self._user_stream = UserDataStream(sock_mgr=self._sock_mgr)
+        if market_data is not None:
+            self._order_book = market_data.order_book("BUSDUSDT")
+        else:
+            self._order_book = LocalOrderBook(aclient=self._aclient, sock_mgr=self._sock_mgr, symbol="BUSDUSDT")
         
         self._inited = True
     
@@ -88,21 +140,34 @@ class BinanceStablecoinSwapBot(metaclass=Singleton):
 
         try:
             await self._aclient.ping()
-            res = await self._aclient.get_server_time()
-            self._is_ready = True
+            # The processes on the account must not generate the same clientOrderIds.
+            await ainit_default_generator(os.getenv("BINANCE_RATE_LIMITER_REDIS_URL"))
+            self._is_ready = await self._clock_sync.start()
         except (BinanceRequestException, BinanceAPIException) as e:
             loguru_logger.critical(f"BinanceStablecoinSwapBot is not ready, binance's exception:{e}.")
         except Exception as e:
             loguru_logger.critical(f"BinanceStablecoinSwapBot is not ready, internal exception:{e}.")
         finally:
             if self._is_ready:
-                timestamp_offset = res["serverTime"] - int(time.time() * 1000)
-                loguru_logger.info(f"BinanceStablecoinSwapBot is ready for operations, timestamp offset from binance server: {timestamp_offset}.")
+                loguru_logger.info(
+                    f"BinanceStablecoinSwapBot is ready for operations, timestamp offset from binance server: {self._aclient.timestamp_offset}ms, "
+                    f"rtt: {self._clock_sync.rtt_in_sec * 1000:.1f}ms."
+                )
             return self._is_ready
 
     async def close(self):
+        if self._user_stream is not None:
+            await self._user_stream.stop()
+        if self._order_book is not None and self._market_data is None:
+            await self._order_book.stop()
+        if self._clock_sync is not None:
+            await self._clock_sync.stop()
         if self._aclient is not None:
             await self._aclient.close_connection()
+        if self._usage_sync is not None:
+            await self._usage_sync.close()
+        if self._order_limiter is not None and self._owns_limiter:
+            await self._order_limiter.aclose()
         if self._client is not None:
             self._client.close_connection()
 
@@ -222,7 +287,10 @@ class BinanceStablecoinSwapBot(metaclass=Singleton):
         """Get the Order Book for the BUSDUSDT market."""
         orderbook = None
         try:
-            orderbook = await self._aclient.get_order_book(symbol="BUSDUSDT", limit=5)
+            if self._order_book is not None and self._order_book.is_synced:
+                orderbook = self._order_book.top(5)
+            else:
+                orderbook = await self._aclient.get_order_book(symbol="BUSDUSDT", limit=5)
         except (BinanceRequestException, BinanceAPIException) as e:
             loguru_logger.error(f"Failed to get the Order Book for the BUSDUSDT market, binance's exception:{e}.")
         except Exception as e:
@@ -335,17 +403,21 @@ class BinanceStablecoinSwapBot(metaclass=Singleton):
             loguru_logger.warning("No need to swap, there are pending orders existed.")
             return
 
-        now = time.time()
-        while now < when:
-            await asyncio.sleep(0.001)
-            now = time.time()
+        # The streams take a while to sync, get them ready before the trigger fires.
+        if not await self._user_stream.start():
+            loguru_logger.warning("User data stream is unavailable, fall back on polling order status.")
+        if not await self._order_book.start():
+            loguru_logger.warning("Local Order Book for the BUSDUSDT market is unavailable, fall back on REST.")
+
+        await self._trigger.wait_until(when)
+        loguru_logger.info(f"Triggered at {when}, {self._trigger.stats}.")
 
         side = "BUY"
         if usdt_free_amount < busd_free_amount:
             side = "SELL"
         while 1:
             # 1. Place new order.
-            order_id = gen_n_digit_nums_and_letters(22)
+            order_id = new_order_id()
             retries = 0
             done = False
             resp = None
@@ -358,6 +430,8 @@ class BinanceStablecoinSwapBot(metaclass=Singleton):
 
             while retries < retry_cnt:
                 try:
+                    # Wait for the order budget instead of being rejected with APIError(code=-1015).
+                    await self._order_limiter.acquire_composite(self._account_key, BINANCE_SPOT_LIMITS, endpoint="POST /order")
                     # BUSD is the base asset (use quantity to measure the amount),
                     # while USDT is the quote asset (use quoteOrderQty to measure the amount).
                     if side == "BUY":
@@ -417,13 +491,26 @@ class BinanceStablecoinSwapBot(metaclass=Singleton):
             if not done:
                 break
             
-            # 3. Wait for the pending order to be filled.
+            # 3. Wait for the pending order to be filled, the fill is pushed by the user data stream,
+            #    REST polling is only used if no event arrived in time.
+            filled = False
             while 1:
+                state = None
+                if self._user_stream.is_running:
+                    state = await self._user_stream.wait_for_final(order_id, timeout=30)
+                if state is not None:
+                    filled = state.status == "FILLED"
+                    if not filled:
+                        loguru_logger.warning(f"Order<order_id:{order_id}> will never be filled, status:{state.status}.")
+                    break
                 filled = await self.check_order(order_id=order_id, verbose=False)
                 if filled:
                     break
-                loguru_logger.debug(f"Order<order_id:{order_id}> has not been filled, wait for 30s to check later...")
-                await asyncio.sleep(30)
+                if not self._user_stream.is_running:
+                    loguru_logger.debug(f"Order<order_id:{order_id}> has not been filled, wait for 30s to check later...")
+                    await asyncio.sleep(30)
+            if not filled:
+                break
 
             resp["status"] = "FILLED"
             await db_instance().add_new_spot_limit_order(order=resp)
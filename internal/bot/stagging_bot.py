@@ -2,39 +2,71 @@
 import asyncio
 import os
 import pprint
-import time
+from typing import Any, Dict, Optional
 
+import aiohttp
+import redis.exceptions as redis_exceptions
 import tabulate
-from binance.client import AsyncClient as AsyncBinanceRestAPIClient
-from binance.client import Client as BinanceRestAPIClient
 from binance.exceptions import BinanceAPIException, BinanceOrderException, BinanceRequestException
 from colorama import Fore, Style
 from loguru import logger as loguru_logger
 
-from internal.classes.singleton import Singleton
 from internal.db import instance as db_instance
-from internal.utils.helper import gen_n_digit_nums_and_letters, timeit
+from internal.exchange import (
+    BINANCE_API_ENDPOINTS,
+    BinanceAsyncClient,
+    BinanceClient,
+    ClockSync,
+    ConnectionPrewarmer,
+    HedgedOrderSubmitter,
+    UsageSync,
+    account_key,
+)
+from internal.infra.orderid import ainit_default_generator, new_order_id
+from internal.infra.ratelimiter import MemoryRateLimiter, binance_spot_limits, open_rate_limiter
+from internal.infra.scheduler import TriggerScheduler
+from internal.utils.helper import timeit
 
+# Request weight per minute and new orders per 10 seconds and per day, all counted per account.
+BINANCE_SPOT_LIMITS = binance_spot_limits()
 
-class BinanceStaggingBot(metaclass=Singleton):
+
+class BinanceStaggingBot:
     """
     币安打新机器人
     """
     
-    def __init__(self, use_proxy: bool = False, use_testnet: bool = False):
+    def __init__(
+        self,
+        use_proxy: bool = False,
+        use_testnet: bool = False,
+        api_key: Optional[str] = None,
+        api_secret: Optional[str] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+        order_limiter: Optional[Any] = None,
+    ):
         self._inited = False
         self._is_ready = False
         self._aclient = None
+        self._order_limiter = None
+        self._owns_limiter = True
+        self._usage_sync = None
+        self._account_key = None
+        self._clock_sync = None
+        self._trigger = None
+        self._hedge_aclients: Dict[str, BinanceAsyncClient] = {}
+        self._hedger = None
         self._client = None
 
-        ak, sk = None, None
-        if use_testnet:
+        # Keys given by the caller, e.g. one account per bot of a BotPool, win over the env.
+        ak, sk = api_key, api_secret
+        if (ak is None or sk is None) and use_testnet:
             ak = os.getenv("BINANCE_TESTNET_API_KEY")
             sk = os.getenv("BINANCE_TESTNET_SECRET_KEY")
             if (ak is None or len(ak) == 0) or (sk is None or len(sk) == 0):
                 loguru_logger.critical("Please set env for BINANCE_TESTNET_API_KEY and BINANCE_TESTNET_SECRET_KEY.")
                 return
-        else:
+        elif ak is None or sk is None:
             ak = os.getenv("BINANCE_MAINNET_API_KEY")
             sk = os.getenv("BINANCE_MAINNET_SECRET_KEY")
             if (ak is None or len(ak) == 0) or (sk is None or len(sk) == 0):
@@ -53,7 +85,7 @@ class BinanceStaggingBot(metaclass=Singleton):
                 "https": https_proxy
             }
             requests_params[proxies] = proxies
-        self._client = BinanceRestAPIClient(
+        self._client = BinanceClient(
             api_key=ak,
             api_secret=sk,
             requests_params=requests_params,
@@ -72,12 +104,37 @@ class BinanceStaggingBot(metaclass=Singleton):
                 "https": https_proxy
             }
             requests_params[proxies] = proxies
-        self._aclient = AsyncBinanceRestAPIClient(
+        # With a shared redis every process on the API key throttles on the usage Binance reports,
+        # a limiter given by the caller is shared by the bots on the same API key.
+        self._owns_limiter = order_limiter is None
+        self._order_limiter = order_limiter if order_limiter is not None else open_rate_limiter(os.getenv("BINANCE_RATE_LIMITER_REDIS_URL"))
+        # The limits of the account are counted under a key of its own, whoever shares the limiter.
+        self._account_key = account_key(ak)
+        self._usage_sync = UsageSync(self._order_limiter, BINANCE_SPOT_LIMITS, key=self._account_key)
+        self._aclient = BinanceAsyncClient(
             api_key=ak,
             api_secret=sk,
             requests_params=requests_params,
             testnet=use_testnet,
+            response_hooks=[self._usage_sync],
+            session=session,
         )
+        # Order timestamps and triggers follow the server clock.
+        self._clock_sync = ClockSync(self._aclient)
+        self._trigger = TriggerScheduler(clock=self._clock_sync.exchange_now)
+        # The same API behind the other hostnames, for the hedged orders, the testnet has only one.
+        self._hedge_aclients = {"": self._aclient}
+        if not use_testnet:
+            for endpoint in BINANCE_API_ENDPOINTS[1:]:
+                self._hedge_aclients[endpoint] = BinanceAsyncClient(
+                    api_key=ak,
+                    api_secret=sk,
+                    requests_params=requests_params,
+                    base_endpoint=endpoint,
+                    response_hooks=[self._usage_sync],
+                    session=session,
+                )
+        self._hedger = HedgedOrderSubmitter(self._hedge_aclients)
 
         self._inited = True
     
@@ -88,21 +145,33 @@ class BinanceStaggingBot(metaclass=Singleton):
 
         try:
             await self._aclient.ping()
-            res = await self._aclient.get_server_time()
-            self._is_ready = True
+            # The processes on the account must not generate the same clientOrderIds.
+            await ainit_default_generator(os.getenv("BINANCE_RATE_LIMITER_REDIS_URL"))
+            self._is_ready = await self._clock_sync.start()
         except (BinanceRequestException, BinanceAPIException) as e:
             loguru_logger.critical(f"BinanceStaggingBot is not ready, binance's exception:{e}.")
         except Exception as e:
             loguru_logger.critical(f"BinanceStaggingBot is not ready, internal exception:{e}.")
         finally:
             if self._is_ready:
-                timestamp_offset = res["serverTime"] - int(time.time() * 1000)
-                loguru_logger.info(f"BinanceStaggingBot is ready for operations, timestamp offset from binance server: {timestamp_offset}.")
+                loguru_logger.info(
+                    f"BinanceStaggingBot is ready for operations, timestamp offset from binance server: {self._aclient.timestamp_offset}ms, "
+                    f"rtt: {self._clock_sync.rtt_in_sec * 1000:.1f}ms."
+                )
             return self._is_ready
 
     async def close(self):
+        if self._clock_sync is not None:
+            await self._clock_sync.stop()
+        for endpoint, aclient in self._hedge_aclients.items():
+            if endpoint != "":
+                await aclient.close_connection()
         if self._aclient is not None:
             await self._aclient.close_connection()
+        if self._usage_sync is not None:
+            await self._usage_sync.close()
+        if self._order_limiter is not None and self._owns_limiter:
+            await self._order_limiter.aclose()
         if self._client is not None:
             self._client.close_connection()
 
@@ -161,20 +230,100 @@ class BinanceStaggingBot(metaclass=Singleton):
                 print(f"{Fore.GREEN} ======================================= RECENT N ORDERS ======================================= {Style.RESET_ALL}")
 
     @timeit
-    async def trade(self, sym: str, quantity: int, when: int, side: str = "BUY", retry_cnt: int = 5) -> bool:
-        """Buy some quantities of a specific coin at particular time."""
-        now = time.time()
-        while now < when:
-            await asyncio.sleep(0.001)
-            now = time.time()
+    async def _acquire_order_budget(self, orders: int = 1):
+        """
+        Wait for the budget of 'orders' orders of the account. If the shared
+        limiter fails, like when its redis is unreachable, this process
+        falls back to a limiter of its own for the rest of the run, rather
+        than missing the listing.
+        """
+        costs = {name: cost * orders for name, cost in BINANCE_SPOT_LIMITS.cost_of("POST /order").items()}
+        try:
+            await self._order_limiter.acquire_composite(self._account_key, BINANCE_SPOT_LIMITS, costs=costs)
+            return
+        except (redis_exceptions.RedisError, OSError) as e:
+            loguru_logger.error(f"Failed to acquire the order budget, falling back to the in-memory rate limiter, internal exception:{e}.")
+        if self._owns_limiter:
+            try:
+                await self._order_limiter.aclose()
+            except Exception as e:
+                loguru_logger.warning(f"Failed to close the rate limiter, internal exception:{e}.")
+        self._order_limiter = MemoryRateLimiter()
+        self._owns_limiter = True
+        self._usage_sync.limiter = self._order_limiter
+        await self._order_limiter.acquire_composite(self._account_key, BINANCE_SPOT_LIMITS, costs=costs)
+
+    async def trade(
+        self,
+        sym: str,
+        quantity: int,
+        when: int,
+        side: str = "BUY",
+        retry_cnt: int = 5,
+        prewarm_connections: int = 4,
+        prewarm_in_sec: float = 3.0,
+        hedge_endpoints: int = 1,
+    ) -> bool:
+        """
+        Buy some quantities of a specific coin at particular time, through
+        the 'hedge_endpoints' fastest API hosts at once when more than one.
+        A hedged MARKET buy may be executed by several hosts, what the
+        duplicates bought is sold back at once.
+        """
+        hedge_endpoints = min(hedge_endpoints, len(self._hedge_aclients))
+        # Every host the order is sent through counts against the order limits of the account.
+        hedge = hedge_endpoints if side == "BUY" and hedge_endpoints > 1 else 1
+        prewarmers = []
+        if prewarm_connections > 0 or hedge_endpoints > 1:
+            await self._trigger.wait_until(when - prewarm_in_sec)
+        if hedge_endpoints > 1:
+            await self._hedger.probe()
+            loguru_logger.info(f"Hedge the order over the endpoints:{['api' + e for e in self._hedger.fastest(hedge_endpoints)]}.")
+        if prewarm_connections > 0:
+            # Open the connections shortly before, so that the order does not pay the handshakes.
+            endpoints = self._hedger.fastest(hedge_endpoints) if hedge_endpoints > 1 else [""]
+            for endpoint in endpoints:
+                prewarmer = ConnectionPrewarmer(self._hedge_aclients[endpoint], connections=prewarm_connections, clock=self._clock_sync.exchange_now)
+                if await prewarmer.warm():
+                    prewarmer.start(when)
+                else:
+                    loguru_logger.warning(f"Failed to pre-warm the connections to api{endpoint}, the order may pay the handshakes.")
+                prewarmers.append(prewarmer)
+        for aclient in self._hedge_aclients.values():
+            aclient.timestamp_offset = self._aclient.timestamp_offset
+        order_id = new_order_id()
+        loguru_logger.info(f"Try to trade a new order<order_id:{order_id}> at {when}...")
+        # Wait for the order budget instead of being rejected with APIError(code=-1015), before
+        # the trigger, so that nothing but the order follows it.
+        try:
+            await self._acquire_order_budget(hedge)
+        except Exception as e:
+            loguru_logger.error(f"Failed to trade new order<order_id:{order_id}>, internal exception:{e}.")
+            for prewarmer in prewarmers:
+                await prewarmer.stop()
+            return False
+        await self._trigger.wait_until(when)
 
         done = False
         retries = 0
-        order_id = gen_n_digit_nums_and_letters(22)
         while retries < retry_cnt:
             try:
-                loguru_logger.info(f"Try to trade a new order<order_id:{order_id}>...")
-                if side == "BUY":
+                if retries > 0:
+                    loguru_logger.info(f"Try to trade the new order<order_id:{order_id}> again...")
+                    await self._acquire_order_budget(hedge)
+                hedged = None
+                if side == "BUY" and hedge_endpoints > 1:
+                    hedged = await self._hedger.submit(
+                        lambda aclient: aclient.order_market_buy(
+                            symbol=sym,
+                            quoteOrderQty=quantity,
+                            newClientOrderId=order_id,
+                            recvWindow=2000,
+                        ),
+                        hedge=hedge_endpoints,
+                    )
+                    resp = hedged.order
+                elif side == "BUY":
                     resp = await self._aclient.order_market_buy(
                         symbol=sym,
                         quoteOrderQty=quantity,
@@ -187,6 +336,26 @@ class BinanceStaggingBot(metaclass=Singleton):
                 print(f"{Fore.GREEN} ======================================= NEW ORDER ======================================= {Style.RESET_ALL}")
                 await db_instance().add_new_spot_market_order(order=resp)
                 done = True
+                if hedged is not None:
+                    # The duplicates were bought too, they are recorded like the order and sold back.
+                    duplicates = await hedged.reconciled
+                    for duplicate in duplicates:
+                        await db_instance().add_new_spot_market_order(order=duplicate)
+                    if len(duplicates) > 0:
+                        await self._acquire_order_budget(len(duplicates))
+                        offsets = await self._hedger.unwind(
+                            duplicates,
+                            lambda aclient, duplicate: aclient.order_market_sell(
+                                symbol=sym,
+                                quantity=duplicate["executedQty"],
+                                newClientOrderId=new_order_id(),
+                                recvWindow=2000,
+                            ),
+                        )
+                        for offset in offsets:
+                            await db_instance().add_new_spot_market_order(order=offset)
+                    for stats in self._hedger.stats.values():
+                        loguru_logger.info(f"{stats}")
             except (BinanceRequestException, BinanceAPIException, BinanceOrderException) as e:
                 loguru_logger.error(f"Failed to trade new order<order_id:{order_id}>, binance's exception:{e}.")
                 await asyncio.sleep(0.001)
@@ -197,5 +366,8 @@ class BinanceStaggingBot(metaclass=Singleton):
             finally:
                 if done:
                     break
-        
+        loguru_logger.info(f"Triggered at {when}, {self._trigger.stats}.")
+        for prewarmer in prewarmers:
+            await prewarmer.stop()
+            loguru_logger.info(f"Pre-warmed the connections, {prewarmer.stats}.")
         return done
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from internal.bot.stagging_bot import BINANCE_SPOT_LIMITS, BinanceStaggingBot
+from internal.exchange import UsageSync, account_key
+from internal.infra.ratelimiter import MemoryRateLimiter, open_rate_limiter
+
+
+async def test_falls_back_to_memory_limiter_when_redis_fails():
+    # Nothing listens on the port.
+    limiter = open_rate_limiter("redis://127.0.0.1:1/0")
+    # Only the limiter part of the bot, its constructor talks to the exchange.
+    bot = BinanceStaggingBot.__new__(BinanceStaggingBot)
+    bot._order_limiter = limiter
+    bot._owns_limiter = False
+    bot._account_key = account_key("key")
+    bot._usage_sync = UsageSync(limiter, BINANCE_SPOT_LIMITS, key=bot._account_key)
+    try:
+        await bot._acquire_order_budget()
+        assert isinstance(bot._order_limiter, MemoryRateLimiter)
+        assert bot._usage_sync.limiter is bot._order_limiter
+        assert bot._owns_limiter
+        # The budget is taken from the fallback from now on.
+        await bot._acquire_order_budget()
+    finally:
+        await limiter.aclose()
+
+
+async def test_order_budget_counts_every_hedged_order():
+    bot = BinanceStaggingBot.__new__(BinanceStaggingBot)
+    bot._order_limiter = MemoryRateLimiter()
+    bot._owns_limiter = True
+    bot._account_key = account_key("key")
+    bot._usage_sync = UsageSync(bot._order_limiter, BINANCE_SPOT_LIMITS, key=bot._account_key)
+    try:
+        await bot._acquire_order_budget(3)
+        result, error = await bot._order_limiter.aallow_composite(bot._account_key, BINANCE_SPOT_LIMITS, endpoint="POST /order")
+        assert error is None
+        # The 3 hedged orders and this one.
+        assert result.remaining["orders_10s"] == BINANCE_SPOT_LIMITS.buckets["orders_10s"].burst - 4
+        assert result.remaining["orders_1d"] == BINANCE_SPOT_LIMITS.buckets["orders_1d"].burst - 4
+    finally:
+        await bot._order_limiter.aclose()
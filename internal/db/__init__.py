@@ -2,7 +2,7 @@
 import asyncio
 import logging
 import time
-from typing import Any, Callable, Dict, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import jsonschema
 import pymongo
@@ -17,7 +17,9 @@ from tenacity import (
     wait_exponential,
 )
 
+from .write_behind import WriteBehindBuffer
 from internal.classes.singleton import Singleton
+from internal.infra.metrics import default_registry
 
 
 def _create_retry_decorator(min_secs: int = 1, max_secs: int = 60, max_retries: int = 3) -> Callable[[Any], Any]:
@@ -56,6 +58,9 @@ class MongoClient(metaclass=Singleton):
             "auth_mechanism": {"type": "string"},
             "database": {"type": "string"},
             "collection": {"type": "string"},
+            "write_batch_size": {"type": "integer", "minimum": 1},
+            "write_flush_interval_in_ms": {"type": "integer", "minimum": 1},
+            "max_pending_writes": {"type": "integer", "minimum": 1},
         },
         "required": [
             "endpoint",
@@ -95,6 +100,14 @@ class MongoClient(metaclass=Singleton):
                 connectTimeoutMS=2000,
             )
         self._conf = client_conf
+        # Order upserts are written behind, batched into bulk_write, so that placing
+        # an order never waits on a database round trip.
+        self._writes = WriteBehindBuffer(
+            self._bulk_write,
+            batch_size=client_conf.get("write_batch_size", 500),
+            flush_interval_in_sec=client_conf.get("write_flush_interval_in_ms", 200) / 1000,
+            max_pending=client_conf.get("max_pending_writes", 10000),
+        )
 
     def _validate_config(self, conf: Optional[Dict[str, Any]] = None) -> bool:
         valid = False
@@ -131,67 +144,69 @@ class MongoClient(metaclass=Singleton):
         finally:
             return connected
 
+    @staticmethod
+    def _upsert_order(order: Dict[str, Any]) -> pymongo.UpdateOne:
+        query = {"clientOrderId": order["clientOrderId"]}
+        update_ts = int(time.time())
+        update = {"$set": {
+            "clientOrderId": order["clientOrderId"],
+            "orderId": order["orderId"],
+            "origQty": order["origQty"],
+            "price": order["price"],
+            "side": order["side"],
+            "status": order["status"],
+            "symbol": order["symbol"],
+            "timeInForce": order["timeInForce"],
+            "transactTime": order["transactTime"],
+            "updateTime": update_ts,
+        }}
+        return pymongo.UpdateOne(query, update, upsert=True)
+
     @retry_decorator
+    @default_registry().timed("db_latency", op="bulk_write")
+    async def _bulk_write(self, ops: List[pymongo.UpdateOne]):
+        await self._store.bulk_write(ops, ordered=False)
+        loguru_logger.debug(f"Wrote {len(ops)} buffered spot orders.")
+
+    @default_registry().timed("db_latency", op="count_documents")
+    async def _count_documents(self, query: Dict[str, Any]) -> int:
+        return await self._store.count_documents(query)
+
     async def add_new_spot_market_order(self, order: Dict[str, Any]) -> bool:
+        """Queue the upsert of the order, it is written in the background by a later bulk_write."""
         done = False
         try:
-            query = {"clientOrderId": order["clientOrderId"]}
-            update_ts = int(time.time())
-            update = {"$set": {
-                "clientOrderId": order["clientOrderId"],
-                "orderId": order["orderId"],
-                "origQty": order["origQty"],
-                "price": order["price"],
-                "side": order["side"],
-                "status": order["status"],
-                "symbol": order["symbol"],
-                "timeInForce": order["timeInForce"],
-                "transactTime": order["transactTime"],
-                "updateTime": update_ts,
-            }}
-            await self._store.update_one(query, update, upsert=True)
+            await self._writes.put(order["clientOrderId"], self._upsert_order(order))
             loguru_logger.debug(f"Added a new spot-market-order:{order['clientOrderId']}.")
             done = True
-        except perrors.NetworkTimeout:
-            loguru_logger.error(f"Timeout to add spot-market-order:{order['clientOrderId']}.")
         except Exception as e:
             loguru_logger.error(f"Failed to add spot-market-order:{order['clientOrderId']}, err:{e}.")
         finally:
             return done
 
-    @retry_decorator
     async def add_new_spot_limit_order(self, order: Dict[str, Any]) -> bool:
+        """Queue the upsert of the order, it is written in the background by a later bulk_write."""
         done = False
         try:
-            query = {"clientOrderId": order["clientOrderId"]}
-            update_ts = int(time.time())
-            update = {"$set": {
-                "clientOrderId": order["clientOrderId"],
-                "orderId": order["orderId"],
-                "origQty": order["origQty"],
-                "price": order["price"],
-                "side": order["side"],
-                "status": order["status"],
-                "symbol": order["symbol"],
-                "timeInForce": order["timeInForce"],
-                "transactTime": order["transactTime"],
-                "updateTime": update_ts,
-            }}
-            await self._store.update_one(query, update, upsert=True)
+            await self._writes.put(order["clientOrderId"], self._upsert_order(order))
             loguru_logger.debug(f"Added a new spot-limit-order:{order['clientOrderId']}.")
             done = True
-        except perrors.NetworkTimeout:
-            loguru_logger.error(f"Timeout to add spot-limit-order:{order['clientOrderId']}.")
         except Exception as e:
             loguru_logger.error(f"Failed to add spot-limit-order:{order['clientOrderId']}, err:{e}.")
         finally:
             return done
 
+    async def flush(self) -> bool:
+        """Write the buffered orders now, False if some of them could not be written."""
+        return await self._writes.flush()
+
     async def count_spot_limit_orders_of_x_status(self, sym: str = "BUSDUSDT", status: str = "FILLED") -> Tuple[int, bool]:
         done = False
         cnt = 0
         try:
-            cnt = await self._store.count_documents({"symbol": sym, "status": status})
+            # Count the buffered orders as well.
+            await self._writes.flush()
+            cnt = await self._count_documents({"symbol": sym, "status": status})
             done = True
         except perrors.NetworkTimeout:
             loguru_logger.error(f"Timeout to count spot-limit-orders of status:{status}.")
@@ -200,7 +215,9 @@ class MongoClient(metaclass=Singleton):
         finally:
             return (cnt, done)
 
-    def close(self):
+    async def close(self):
+        """Write the buffered orders, then release the connection (pool)."""
+        await self._writes.close()
         self._client.close()
 
 
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+import bisect
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Set, Tuple
+
+# Status of an order which may still be filled or cancelled.
+ACTIVE_ORDER_STATUSES = ("NEW", "PARTIALLY_FILLED")
+
+
+@dataclass
+class GridOrder:
+    """
+    -   'client_order_id' is the newClientOrderId the order was placed with.
+    -   'level' is the index of the order's price level on the grid ladder.
+    -   'status' is the latest known Binance order status.
+    -   'update_time' is the unix time in ms of the latest change.
+    """
+    client_order_id: str
+    symbol: str
+    side: str
+    level: int
+    price: float
+    status: str = "NEW"
+    update_time: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"GridOrder(client_order_id={self.client_order_id}, symbol={self.symbol}, side={self.side}, "
+            f"level={self.level}, price={self.price}, status={self.status}, update_time={self.update_time})"
+        )
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ACTIVE_ORDER_STATUSES
+
+
+class OrderStore(ABC):
+    """
+    网格订单存储
+
+    Keeps the grid orders by clientOrderId, every change is written through
+    on its own, so a crash loses at most the change in flight.
+    """
+
+    @abstractmethod
+    def upsert(self, order: GridOrder):
+        pass
+
+    @abstractmethod
+    def set_status(self, client_order_id: str, status: str) -> bool:
+        """Update the status of a known order, False if the order is unknown."""
+
+    @abstractmethod
+    def get(self, client_order_id: str) -> Optional[GridOrder]:
+        pass
+
+    @abstractmethod
+    def active_orders(self, symbol: Optional[str] = None, side: Optional[str] = None) -> List[GridOrder]:
+        """Active orders, by ascending price."""
+
+    @abstractmethod
+    def orders_in_price_range(self, lower_price: float, upper_price: float, side: Optional[str] = None) -> List[GridOrder]:
+        """Orders priced within [lower_price, upper_price], by ascending price."""
+
+    @abstractmethod
+    def count(self, status: str) -> int:
+        pass
+
+    def close(self):
+        pass
+
+
+def _now_in_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class MemoryOrderStore(OrderStore):
+    """
+    内存订单存储，用于测试和回放
+    """
+
+    def __init__(self):
+        self._orders: Dict[str, GridOrder] = {}
+        self._by_status: Dict[str, Set[str]] = {}
+        # Ascending (price, clientOrderId) pairs.
+        self._by_price: List[Tuple[float, str]] = []
+
+    def upsert(self, order: GridOrder):
+        order = replace(order, update_time=order.update_time or _now_in_ms())
+        prev = self._orders.get(order.client_order_id)
+        if prev is not None:
+            self._by_status[prev.status].discard(prev.client_order_id)
+            del self._by_price[bisect.bisect_left(self._by_price, (prev.price, prev.client_order_id))]
+        self._orders[order.client_order_id] = order
+        self._by_status.setdefault(order.status, set()).add(order.client_order_id)
+        bisect.insort(self._by_price, (order.price, order.client_order_id))
+
+    def set_status(self, client_order_id: str, status: str) -> bool:
+        order = self._orders.get(client_order_id)
+        if order is None:
+            return False
+        self._by_status[order.status].discard(client_order_id)
+        self._by_status.setdefault(status, set()).add(client_order_id)
+        order.status = status
+        order.update_time = _now_in_ms()
+        return True
+
+    def get(self, client_order_id: str) -> Optional[GridOrder]:
+        return self._orders.get(client_order_id)
+
+    def active_orders(self, symbol: Optional[str] = None, side: Optional[str] = None) -> List[GridOrder]:
+        orders = [self._orders[cid] for status in ACTIVE_ORDER_STATUSES for cid in self._by_status.get(status, ())]
+        orders = [o for o in orders if (symbol is None or o.symbol == symbol) and (side is None or o.side == side)]
+        orders.sort(key=lambda o: (o.price, o.client_order_id))
+        return orders
+
+    def orders_in_price_range(self, lower_price: float, upper_price: float, side: Optional[str] = None) -> List[GridOrder]:
+        st = bisect.bisect_left(self._by_price, (lower_price, ""))
+        orders = []
+        for price, cid in self._by_price[st:]:
+            if price > upper_price:
+                break
+            order = self._orders[cid]
+            if side is None or order.side == side:
+                orders.append(order)
+        return orders
+
+    def count(self, status: str) -> int:
+        return len(self._by_status.get(status, ()))
+
+
+class SqliteOrderStore(OrderStore):
+    """
+    SQLite订单存储
+
+    The database runs in WAL mode with autocommit, each change is one small
+    transaction appended to the log, and the orders are indexed by
+    clientOrderId (primary key), (status, side) and price.
+    """
+
+    _SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS grid_orders (
+            client_order_id TEXT PRIMARY KEY,
+            symbol TEXT NOT NULL,
+            side TEXT NOT NULL,
+            level INTEGER NOT NULL,
+            price REAL NOT NULL,
+            status TEXT NOT NULL,
+            update_time INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS grid_orders_status_side ON grid_orders (status, side)",
+        "CREATE INDEX IF NOT EXISTS grid_orders_price ON grid_orders (price)",
+    )
+    _COLUMNS = "client_order_id, symbol, side, level, price, status, update_time"
+
+    def __init__(self, path: str = "grid_trading_orders.sqlite3"):
+        self._path = path
+        self._conn = sqlite3.connect(path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # With WAL a commit survives a crash of the process, only a power loss may lose the latest ones.
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for stmt in self._SCHEMA:
+            self._conn.execute(stmt)
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def upsert(self, order: GridOrder):
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO grid_orders ({self._COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (order.client_order_id, order.symbol, order.side, order.level, order.price, order.status, order.update_time or _now_in_ms()),
+        )
+
+    def set_status(self, client_order_id: str, status: str) -> bool:
+        cur = self._conn.execute(
+            "UPDATE grid_orders SET status = ?, update_time = ? WHERE client_order_id = ?",
+            (status, _now_in_ms(), client_order_id),
+        )
+        return cur.rowcount > 0
+
+    def get(self, client_order_id: str) -> Optional[GridOrder]:
+        row = self._conn.execute(f"SELECT {self._COLUMNS} FROM grid_orders WHERE client_order_id = ?", (client_order_id,)).fetchone()
+        return GridOrder(*row) if row is not None else None
+
+    def active_orders(self, symbol: Optional[str] = None, side: Optional[str] = None) -> List[GridOrder]:
+        sql = f"SELECT {self._COLUMNS} FROM grid_orders WHERE status IN ({', '.join('?' * len(ACTIVE_ORDER_STATUSES))})"
+        params: list = list(ACTIVE_ORDER_STATUSES)
+        if symbol is not None:
+            sql += " AND symbol = ?"
+            params.append(symbol)
+        if side is not None:
+            sql += " AND side = ?"
+            params.append(side)
+        sql += " ORDER BY price, client_order_id"
+        return [GridOrder(*row) for row in self._conn.execute(sql, params)]
+
+    def orders_in_price_range(self, lower_price: float, upper_price: float, side: Optional[str] = None) -> List[GridOrder]:
+        sql = f"SELECT {self._COLUMNS} FROM grid_orders WHERE price BETWEEN ? AND ?"
+        params: list = [lower_price, upper_price]
+        if side is not None:
+            sql += " AND side = ?"
+            params.append(side)
+        sql += " ORDER BY price, client_order_id"
+        return [GridOrder(*row) for row in self._conn.execute(sql, params)]
+
+    def count(self, status: str) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM grid_orders WHERE status = ?", (status,)).fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+def open_order_store(kind: str = "sqlite", path: str = "grid_trading_orders.sqlite3") -> OrderStore:
+    """Open the order store of the given kind, 'sqlite' or 'memory'."""
+    if kind == "sqlite":
+        return SqliteOrderStore(path)
+    if kind == "memory":
+        return MemoryOrderStore()
+    raise ValueError(f"Unknown order store:{kind}, choose among sqlite, memory.")
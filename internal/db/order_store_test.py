@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+from internal.db.order_store import (
+    GridOrder,
+    MemoryOrderStore,
+    OrderStore,
+    SqliteOrderStore,
+    open_order_store,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    store = open_order_store(kind=request.param, path=str(tmp_path / "orders.sqlite3"))
+    yield store
+    store.close()
+
+
+def _order(cid: str, side: str, level: int) -> GridOrder:
+    return GridOrder(client_order_id=cid, symbol="BTCUSDT", side=side, level=level, price=30000.0 + level * 100)
+
+
+def test_status_updates_and_queries(store):
+    store.upsert(_order("sell-3", "SELL", 3))
+    store.upsert(_order("buy-1", "BUY", 1))
+    store.upsert(_order("buy-0", "BUY", 0))
+    store.upsert(GridOrder(client_order_id="eth", symbol="ETHUSDT", side="BUY", level=0, price=2000.0))
+
+    assert store.set_status("buy-1", "FILLED")
+    assert not store.set_status("unknown", "FILLED")
+    assert store.get("buy-1").status == "FILLED"
+    assert store.count("FILLED") == 1
+
+    assert [o.client_order_id for o in store.active_orders(symbol="BTCUSDT")] == ["buy-0", "sell-3"]
+    assert [o.client_order_id for o in store.active_orders(side="BUY")] == ["eth", "buy-0"]
+    assert [o.client_order_id for o in store.orders_in_price_range(30000.0, 30100.0)] == ["buy-0", "buy-1"]
+    assert [o.client_order_id for o in store.orders_in_price_range(30000.0, 30300.0, side="SELL")] == ["sell-3"]
+
+    store.upsert(_order("buy-1", "BUY", 2))
+    assert store.get("buy-1").status == "NEW"
+    assert [o.client_order_id for o in store.orders_in_price_range(30150.0, 30250.0)] == ["buy-1"]
+
+
+def test_sqlite_store_survives_reopen(tmp_path):
+    path = str(tmp_path / "orders.sqlite3")
+    store = SqliteOrderStore(path)
+    store.upsert(_order("buy-0", "BUY", 0))
+    store.set_status("buy-0", "PARTIALLY_FILLED")
+    # Not closed, as after a crash.
+    del store
+
+    store = SqliteOrderStore(path)
+    assert [(o.client_order_id, o.status) for o in store.active_orders()] == [("buy-0", "PARTIALLY_FILLED")]
+    assert os.path.exists(path + "-wal")
+    store.close()
+
+
+def test_open_unknown_store():
+    assert isinstance(open_order_store(kind="memory"), MemoryOrderStore)
+    with pytest.raises(ValueError):
+        open_order_store(kind="shelve")
+
+
+def test_incomplete_store_fails_on_creation():
+    class UpsertOnlyStore(OrderStore):
+        def upsert(self, order: GridOrder):
+            pass
+
+    with pytest.raises(TypeError):
+        UpsertOnlyStore()
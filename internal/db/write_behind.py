@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, List, Optional, Tuple
+
+from loguru import logger as loguru_logger
+
+
+class WriteBehindBuffer:
+    """
+    写后缓冲
+
+    Coalesces write operations keyed by document id (a newer operation on the
+    same id replaces the pending one) and hands them to 'write' in batches of
+    at most 'batch_size', as soon as a batch is full or every
+    'flush_interval_in_sec'. Once 'max_pending' operations are pending,
+    writers wait for a flush to make room, so a slow database slows the
+    writers down instead of growing the buffer without bound.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[List[Any]], Awaitable[Any]],
+        *,
+        batch_size: int = 500,
+        flush_interval_in_sec: float = 0.2,
+        max_pending: int = 10000,
+    ):
+        if batch_size <= 0 or flush_interval_in_sec <= 0 or max_pending < batch_size:
+            raise ValueError("batch_size and flush_interval_in_sec must be positive, max_pending must not be less than batch_size.")
+        self._write = write
+        self._batch_size = batch_size
+        self._flush_interval_in_sec = flush_interval_in_sec
+        self._max_pending = max_pending
+        self._pending: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._has_room = asyncio.Event()
+        self._has_room.set()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self.written = 0
+        self.coalesced = 0
+        self.failed_batches = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def put(self, key: Hashable, op: Any):
+        """Queue op, waits only while the buffer is full."""
+        if self._closed:
+            raise RuntimeError("Write-behind buffer has been closed.")
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        while key not in self._pending and len(self._pending) >= self._max_pending:
+            self._has_room.clear()
+            self._wakeup.set()
+            await self._has_room.wait()
+        if key in self._pending:
+            self.coalesced += 1
+        self._pending[key] = op
+        if len(self._pending) >= self._batch_size:
+            self._wakeup.set()
+
+    async def flush(self) -> bool:
+        """Write all pending operations, False if a batch failed and was queued again."""
+        async with self._flush_lock:
+            while len(self._pending) > 0:
+                batch = []
+                while len(batch) < self._batch_size and len(self._pending) > 0:
+                    batch.append(self._pending.popitem(last=False))
+                try:
+                    await self._write([op for _, op in batch])
+                    self.written += len(batch)
+                except asyncio.CancelledError:
+                    self._requeue(batch)
+                    raise
+                except Exception as e:
+                    self.failed_batches += 1
+                    loguru_logger.error(f"Failed to write {len(batch)} buffered operations, internal exception:{e}.")
+                    self._requeue(batch)
+                    return False
+                finally:
+                    if len(self._pending) < self._max_pending:
+                        self._has_room.set()
+            return True
+
+    def _requeue(self, batch: List[Tuple[Hashable, Any]]):
+        # Put the batch back in front, unless a newer operation on the same id came in meanwhile.
+        for key, op in reversed(batch):
+            if key not in self._pending:
+                self._pending[key] = op
+                self._pending.move_to_end(key, last=False)
+
+    async def close(self):
+        """Stop the background flusher and write everything still pending."""
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        if not await self.flush():
+            loguru_logger.error(f"Dropped {len(self._pending)} buffered operations which could not be written.")
+            self._pending.clear()
+            self._has_room.set()
+
+    async def _run(self):
+        while 1:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._flush_interval_in_sec)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if len(self._pending) > 0:
+                await self.flush()
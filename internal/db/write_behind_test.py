@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+from internal.db.write_behind import WriteBehindBuffer
+
+
+class FakeStore:
+    def __init__(self, fail_times: int = 0, delay_in_sec: float = 0.0):
+        self.batches = []
+        self._fail_times = fail_times
+        self._delay_in_sec = delay_in_sec
+
+    async def write(self, ops):
+        await asyncio.sleep(self._delay_in_sec)
+        if self._fail_times > 0:
+            self._fail_times -= 1
+            raise ConnectionError("mongodb is down")
+        self.batches.append(list(ops))
+
+
+async def test_put_coalesces_and_flushes_in_batches():
+    store = FakeStore()
+    buffer = WriteBehindBuffer(store.write, batch_size=3, flush_interval_in_sec=10, max_pending=10)
+    for i in range(5):
+        await buffer.put(f"order-{i}", ("NEW", i))
+    await buffer.put("order-1", ("FILLED", 1))
+    assert buffer.coalesced == 1
+
+    await buffer.close()
+    assert store.batches[0] == [("NEW", 0), ("FILLED", 1), ("NEW", 2)]
+    assert [op for batch in store.batches for op in batch] == [("NEW", 0), ("FILLED", 1), ("NEW", 2), ("NEW", 3), ("NEW", 4)]
+    assert buffer.written == 5
+    assert len(buffer) == 0
+
+
+async def test_flush_by_time():
+    store = FakeStore()
+    buffer = WriteBehindBuffer(store.write, batch_size=100, flush_interval_in_sec=0.05, max_pending=100)
+    await buffer.put("order-0", "op")
+    await asyncio.sleep(0.2)
+    assert store.batches == [["op"]]
+    await buffer.close()
+
+
+async def test_put_waits_while_full():
+    store = FakeStore(delay_in_sec=0.05)
+    buffer = WriteBehindBuffer(store.write, batch_size=2, flush_interval_in_sec=10, max_pending=4)
+    for i in range(20):
+        await buffer.put(i, i)
+        assert len(buffer) <= 4
+    await buffer.close()
+    assert sorted(op for batch in store.batches for op in batch) == list(range(20))
+
+
+async def test_failed_batch_is_queued_again():
+    store = FakeStore(fail_times=1)
+    buffer = WriteBehindBuffer(store.write, batch_size=10, flush_interval_in_sec=10, max_pending=10)
+    await buffer.put("order-0", "NEW")
+    assert not await buffer.flush()
+    await buffer.put("order-1", "NEW")
+    assert await buffer.flush()
+    assert store.batches == [["NEW", "NEW"]]
+    assert buffer.failed_batches == 1
+    await buffer.close()
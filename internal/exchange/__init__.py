@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from .client import BinanceAsyncClient, BinanceClient, BinanceStreamManager
+from .clock_sync import ClockSample, ClockSync
+from .hedged import BINANCE_API_ENDPOINTS, EndpointStats, HedgedOrderSubmitter, HedgedResult
+from .market_data import MarketDataHub
+from .order_book import LocalOrderBook
+from .prewarm import ConnectionPrewarmer, PrewarmStats
+from .usage_sync import BINANCE_USAGE_HEADERS, UsageSync, account_key
+from .user_data_stream import FINAL_ORDER_STATUSES, OrderState, UserDataStream
+
+__all__ = [
+    "BINANCE_API_ENDPOINTS",
+    "BINANCE_USAGE_HEADERS",
+    "BinanceAsyncClient",
+    "BinanceClient",
+    "BinanceStreamManager",
+    "ClockSample",
+    "ClockSync",
+    "ConnectionPrewarmer",
+    "EndpointStats",
+    "FINAL_ORDER_STATUSES",
+    "HedgedOrderSubmitter",
+    "HedgedResult",
+    "LocalOrderBook",
+    "MarketDataHub",
+    "OrderState",
+    "PrewarmStats",
+    "UsageSync",
+    "UserDataStream",
+    "account_key",
+]
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+from binance.client import AsyncClient, BaseClient, Client
+from binance.streams import BinanceSocketManager
+from loguru import logger as loguru_logger
+
+from internal.infra.http.http_tracing import http_trace_config
+from internal.infra.metrics import default_registry
+
+# response_hook(response) is called with the aiohttp response of every REST call, it must not block.
+ResponseHook = Callable[[Any], None]
+
+
+def _url_from_env(name: str) -> Optional[str]:
+    url = os.getenv(name)
+    if url is None or len(url) == 0:
+        return None
+    return url
+
+
+class _ApiUrlOverride:
+    # Base URL of the spot REST API, like 'http://127.0.0.1:8080/api', None for Binance.
+    _api_url: Optional[str] = None
+
+    def _create_api_uri(self, path: str, signed: bool = True, version: str = BaseClient.PUBLIC_API_VERSION) -> str:
+        if self._api_url is None:
+            return super()._create_api_uri(path, signed, version)
+        v = self.PRIVATE_API_VERSION if signed else version
+        return self._api_url + "/" + v + "/" + path
+
+
+class BinanceClient(_ApiUrlOverride, Client):
+    """
+    币安REST客户端（同步）
+
+    Same as binance.client.Client, but talks to 'api_url' (or the
+    BINANCE_API_URL env) instead of Binance when given, e.g. to a
+    MockBinanceServer.
+    """
+
+    def __init__(self, *args, api_url: Optional[str] = None, **kwargs):
+        # Client pings the server in its constructor, the URL must be known before.
+        self._api_url = api_url or _url_from_env("BINANCE_API_URL")
+        super().__init__(*args, **kwargs)
+
+
+class BinanceAsyncClient(_ApiUrlOverride, AsyncClient):
+    """
+    币安REST客户端（异步）
+
+    Same as binance.client.AsyncClient, but talks to 'api_url' (or the
+    BINANCE_API_URL env) instead of Binance when given, and carries the
+    websocket base URL 'stream_url' (or the BINANCE_STREAM_URL env) for
+    BinanceStreamManager. The 'response_hooks' see every response, errors
+    included, before it is parsed, e.g. to read the usage headers.
+
+    With the metrics registry enabled, the latency of every request goes to
+    the 'binance_request_latency' histogram labeled with its endpoint, like
+    'POST /api/v3/order', and its failures to 'binance_request_errors'. Its
+    own session also records the connection timings of the http_* metrics.
+
+    Given a 'session', the client sends its requests through that
+    aiohttp.ClientSession shared with other clients (its API key goes in
+    the headers of every request then) and leaves it open on close.
+    """
+
+    def __init__(
+        self,
+        *args,
+        api_url: Optional[str] = None,
+        stream_url: Optional[str] = None,
+        response_hooks: Optional[List[ResponseHook]] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+        **kwargs,
+    ):
+        self._api_url = api_url or _url_from_env("BINANCE_API_URL")
+        self.stream_url = stream_url or _url_from_env("BINANCE_STREAM_URL")
+        self._response_hooks: List[ResponseHook] = list(response_hooks or [])
+        # The constructor opens the session, the shared one must be known before.
+        self._shared_session = session
+        session_params = dict(kwargs.pop("session_params", None) or {})
+        session_params.setdefault("trace_configs", [http_trace_config])
+        kwargs["session_params"] = session_params
+        super().__init__(*args, **kwargs)
+
+    def _init_session(self) -> aiohttp.ClientSession:
+        if self._shared_session is not None:
+            return self._shared_session
+        return super()._init_session()
+
+    def _get_request_kwargs(self, method, signed: bool, force_params: bool = False, **kwargs) -> Dict:
+        kwargs = super()._get_request_kwargs(method, signed, force_params, **kwargs)
+        if self._shared_session is not None:
+            kwargs["headers"] = self._get_headers()
+        return kwargs
+
+    async def close_connection(self):
+        if self._shared_session is None:
+            await super().close_connection()
+
+    async def _request(self, method, uri: str, signed: bool, force_params: bool = False, **kwargs):
+        metrics = default_registry()
+        if not metrics.enabled:
+            return await super()._request(method, uri, signed, force_params, **kwargs)
+        endpoint = f"{method.upper()} {urlsplit(uri).path}"
+        st = time.perf_counter_ns()
+        try:
+            return await super()._request(method, uri, signed, force_params, **kwargs)
+        except Exception:
+            metrics.counter("binance_request_errors", endpoint=endpoint).inc()
+            raise
+        finally:
+            metrics.histogram("binance_request_latency", endpoint=endpoint).record(time.perf_counter_ns() - st)
+
+    def add_response_hook(self, hook: ResponseHook):
+        self._response_hooks.append(hook)
+
+    async def _handle_response(self, response: Any):
+        for hook in self._response_hooks:
+            try:
+                hook(response)
+            except Exception as e:
+                loguru_logger.error(f"Failed to run the response hook:{hook}, internal exception:{e}.")
+        return await super()._handle_response(response)
+
+
+class BinanceStreamManager(BinanceSocketManager):
+    """
+    币安websocket管理器
+
+    Same as binance.streams.BinanceSocketManager, but connects the spot
+    streams to the 'stream_url' of a BinanceAsyncClient when it has one.
+    """
+
+    def __init__(self, client: AsyncClient, **kwargs):
+        super().__init__(client, **kwargs)
+        stream_url = getattr(client, "stream_url", None)
+        if stream_url is not None:
+            if not stream_url.endswith("/"):
+                stream_url += "/"
+            self.STREAM_URL = stream_url
+            self.STREAM_TESTNET_URL = stream_url
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Optional
+
+from binance.client import AsyncClient as AsyncBinanceRestAPIClient
+from binance.exceptions import BinanceAPIException, BinanceRequestException
+from loguru import logger as loguru_logger
+
+
+@dataclass
+class ClockSample:
+    """
+    -   'local_time' is the local unix time in secs at the middle of the
+        round trip of a get_server_time call.
+    -   'offset_in_sec' is the server time minus 'local_time'.
+    -   'rtt_in_sec' is the round-trip time of the call, the offset is off
+        by at most half of it.
+    """
+    local_time: float
+    offset_in_sec: float
+    rtt_in_sec: float
+
+    def __str__(self) -> str:
+        return f"ClockSample(local_time={self.local_time:.3f}, offset={self.offset_in_sec * 1000:.2f}ms, rtt={self.rtt_in_sec * 1000:.2f}ms)"
+
+
+class ClockSync:
+    """
+    服务器时钟同步
+
+    Estimates the offset of the Binance server clock from the local one the
+    way NTP does: every 'interval_in_sec' it calls get_server_time
+    'samples_per_sync' times back to back and keeps the sample of the
+    smallest round trip, the one whose offset is the least uncertain. The
+    drift of the local clock is the slope of a least-squares line through
+    the kept samples of the last 'window' syncs, so the offset keeps being
+    extrapolated between two syncs.
+
+    Every sync also sets 'timestamp_offset' of the client, which the
+    signed requests are stamped with.
+    """
+
+    def __init__(
+        self,
+        aclient: AsyncBinanceRestAPIClient,
+        *,
+        interval_in_sec: float = 30.0,
+        samples_per_sync: int = 4,
+        window: int = 16,
+        clock: Callable[[], float] = time.time,
+    ):
+        if interval_in_sec <= 0 or samples_per_sync <= 0 or window <= 0:
+            raise ValueError("interval_in_sec, samples_per_sync and window must be positive.")
+        self._aclient = aclient
+        self._interval_in_sec = interval_in_sec
+        self._samples_per_sync = samples_per_sync
+        self._clock = clock
+        self._samples: Deque[ClockSample] = deque(maxlen=window)
+        self._offset_in_sec = 0.0
+        self._drift = 0.0
+        self._ref_time = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_synced(self) -> bool:
+        return len(self._samples) > 0
+
+    @property
+    def rtt_in_sec(self) -> float:
+        """Round trip of the latest kept sample."""
+        return self._samples[-1].rtt_in_sec if len(self._samples) > 0 else 0.0
+
+    @property
+    def drift_ppm(self) -> float:
+        """How fast the server clock runs ahead of the local one, in microseconds per second."""
+        return self._drift * 1e6
+
+    def offset_at(self, local_time: float) -> float:
+        """Estimated server time minus local time, in secs, at the local time given."""
+        return self._offset_in_sec + self._drift * (local_time - self._ref_time)
+
+    @property
+    def offset_in_sec(self) -> float:
+        return self.offset_at(self._clock())
+
+    def exchange_now(self) -> float:
+        """Estimated Binance server time, unix time in secs."""
+        now = self._clock()
+        return now + self.offset_at(now)
+
+    def exchange_now_in_ms(self) -> int:
+        return int(self.exchange_now() * 1000)
+
+    async def sample(self) -> Optional[ClockSample]:
+        """One get_server_time round trip, None if it failed."""
+        try:
+            st = self._clock()
+            res = await self._aclient.get_server_time()
+            ed = self._clock()
+        except (BinanceRequestException, BinanceAPIException) as e:
+            loguru_logger.error(f"Failed to get the server time, binance's exception:{e}.")
+            return None
+        except Exception as e:
+            loguru_logger.error(f"Failed to get the server time, internal exception:{e}.")
+            return None
+        local_time = (st + ed) / 2
+        return ClockSample(local_time=local_time, offset_in_sec=res["serverTime"] / 1000 - local_time, rtt_in_sec=ed - st)
+
+    async def sync(self) -> bool:
+        """Take a round of samples and update the estimate, False if none of them succeeded."""
+        best: Optional[ClockSample] = None
+        for _ in range(self._samples_per_sync):
+            sample = await self.sample()
+            if sample is not None and (best is None or sample.rtt_in_sec < best.rtt_in_sec):
+                best = sample
+        if best is None:
+            return False
+        self._samples.append(best)
+        self._estimate()
+        self._aclient.timestamp_offset = int(round(self.offset_in_sec * 1000))
+        loguru_logger.debug(f"Synced the clock with binance server, {best}, drift={self.drift_ppm:.1f}ppm.")
+        return True
+
+    def _estimate(self):
+        samples = self._samples
+        latest = samples[-1]
+        self._ref_time = latest.local_time
+        self._offset_in_sec = latest.offset_in_sec
+        self._drift = 0.0
+        if len(samples) < 3:
+            return
+        n = len(samples)
+        mean_t = sum(s.local_time for s in samples) / n
+        mean_o = sum(s.offset_in_sec for s in samples) / n
+        var_t = sum((s.local_time - mean_t) ** 2 for s in samples)
+        if var_t <= 0:
+            return
+        self._drift = sum((s.local_time - mean_t) * (s.offset_in_sec - mean_o) for s in samples) / var_t
+        # The fitted line averages out the error of single samples.
+        self._offset_in_sec = mean_o + self._drift * (self._ref_time - mean_t)
+
+    async def start(self) -> bool:
+        """Sync once, then keep syncing in the background, False if the first sync failed."""
+        if not await self.sync():
+            return False
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return True
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    async def _run(self):
+        while 1:
+            await asyncio.sleep(self._interval_in_sec)
+            await self.sync()
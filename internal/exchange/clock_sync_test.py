@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+from internal.exchange import BinanceAsyncClient, ClockSync
+from internal.exchange.mock import MockBinanceServer, MockExchange, SymbolRules
+
+
+class FakeServerClient:
+    """The server clock runs 100us/s faster and 2s ahead, every call takes a varying round trip."""
+
+    def __init__(self):
+        self.local_now = 1_700_000_000.0
+        self.timestamp_offset = 0
+        self._rtts = [0.030, 0.004, 0.012, 0.050]
+        self._calls = 0
+
+    def clock(self) -> float:
+        return self.local_now
+
+    def server_time(self, local_time: float) -> float:
+        return local_time + 2.0 + 100e-6 * (local_time - 1_700_000_000.0)
+
+    async def get_server_time(self):
+        rtt = self._rtts[self._calls % len(self._rtts)]
+        self._calls += 1
+        # The server answers at 3/4 of the round trip, the asymmetry is what min-RTT filtering bounds.
+        server_time = self.server_time(self.local_now + rtt * 0.75)
+        self.local_now += rtt
+        return {"serverTime": int(server_time * 1000)}
+
+
+async def test_min_rtt_filtering_and_drift():
+    aclient = FakeServerClient()
+    clock_sync = ClockSync(aclient, samples_per_sync=4, clock=aclient.clock)
+    for _ in range(10):
+        assert await clock_sync.sync()
+        aclient.local_now += 30
+    # The 4ms round trip is kept, its offset is off by 1ms at most.
+    assert clock_sync.rtt_in_sec == pytest.approx(0.004, abs=1e-6)
+    assert clock_sync.drift_ppm == pytest.approx(100, abs=5)
+    expected = aclient.server_time(aclient.local_now)
+    assert clock_sync.exchange_now() == pytest.approx(expected, abs=0.002)
+    # The signed requests were stamped with the offset of the last sync.
+    assert aclient.timestamp_offset == pytest.approx(clock_sync.offset_at(aclient.local_now - 30) * 1000, abs=1)
+
+
+async def test_offset_from_mock_server():
+    exchange = MockExchange(
+        [SymbolRules(symbol="BTCUSDT", base_asset="BTC", quote_asset="USDT")],
+        clock=lambda: time.time() + 0.25,
+    )
+    server = MockBinanceServer(exchange, latency_in_ms=1, jitter_in_ms=0.5)
+    await server.start()
+    aclient = BinanceAsyncClient(api_key="key", api_secret="secret", api_url=server.api_url)
+    clock_sync = ClockSync(aclient, interval_in_sec=0.05)
+    try:
+        assert await clock_sync.start()
+        assert clock_sync.offset_in_sec == pytest.approx(0.25, abs=0.01)
+        assert aclient.timestamp_offset == pytest.approx(250, abs=10)
+        assert abs(clock_sync.exchange_now_in_ms() - exchange.now_ms()) < 10
+    finally:
+        await clock_sync.stop()
+        await aclient.close_connection()
+        await server.stop()
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from binance.client import AsyncClient as AsyncBinanceRestAPIClient
+from binance.exceptions import BinanceAPIException, BinanceRequestException
+from loguru import logger as loguru_logger
+
+# The equivalent hostnames of the Binance spot REST API, as 'base_endpoint' of the client: api, api1, ..., api4.
+BINANCE_API_ENDPOINTS = ("", "1", "2", "3", "4")
+
+# place(aclient) sends the order through one client and returns its response.
+PlaceOrder = Callable[[AsyncBinanceRestAPIClient], Awaitable[Dict[str, Any]]]
+# offset(aclient, duplicate) sends the order which undoes a duplicate and returns its response.
+OffsetOrder = Callable[[AsyncBinanceRestAPIClient, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+@dataclass
+class EndpointStats:
+    """
+    -   'requests' / 'wins' / 'failures' count the orders sent through the
+        endpoint, those it answered first and those it failed.
+    -   'ewma_rtt_in_ms' is the moving average of its round trips, None
+        until it answered once.
+    """
+    endpoint: str
+    requests: int = 0
+    wins: int = 0
+    failures: int = 0
+    ewma_rtt_in_ms: Optional[float] = None
+
+    def __str__(self) -> str:
+        rtt = f"{self.ewma_rtt_in_ms:.2f}ms" if self.ewma_rtt_in_ms is not None else "n/a"
+        return (
+            f"EndpointStats(endpoint=api{self.endpoint}, requests={self.requests}, wins={self.wins}, "
+            f"failures={self.failures}, ewma_rtt={rtt})"
+        )
+
+
+@dataclass
+class HedgedResult:
+    """
+    -   'order' is the response of the first endpoint which accepted the
+        order, and 'endpoint' that endpoint.
+    -   'duplicates' are the responses of other endpoints which executed
+        an order of their own (another orderId) in spite of the shared
+        clientOrderId, known once 'reconciled' is done.
+    -   'errors' maps the endpoints which failed to their exception.
+    """
+    order: Dict[str, Any]
+    endpoint: str
+    duplicates: List[Dict[str, Any]] = field(default_factory=list)
+    errors: Dict[str, BaseException] = field(default_factory=dict)
+    reconciled: Optional[asyncio.Task] = None
+
+
+class HedgedOrderSubmitter:
+    """
+    对冲下单
+
+    Sends the same order, with the same newClientOrderId, through the
+    'hedge' fastest of several equivalent API endpoints at once and takes
+    the first success, so a single slow host does not decide the fill. The
+    exchange takes a clientOrderId only once among the open orders, but a
+    MARKET order is filled and closed at once, so the other endpoints may
+    still execute it again: the slower responses are reconciled in the
+    background and such duplicates are reported, it is up to the caller
+    to undo them with unwind. Every submission counts as 'hedge' orders
+    against the rate limits of the account.
+
+    The speed of the endpoints is a moving average of their round trips,
+    those never measured come first, and a failure counts as a round trip
+    of 'failure_penalty_in_ms'.
+    """
+
+    def __init__(
+        self,
+        aclients: Dict[str, AsyncBinanceRestAPIClient],
+        *,
+        hedge: int = 2,
+        alpha: float = 0.3,
+        failure_penalty_in_ms: float = 1000.0,
+    ):
+        if len(aclients) == 0 or hedge <= 0:
+            raise ValueError("At least one client is needed and hedge must be positive.")
+        self._aclients = aclients
+        self._hedge = hedge
+        self._alpha = alpha
+        self._failure_penalty_in_ms = failure_penalty_in_ms
+        self.stats: Dict[str, EndpointStats] = {endpoint: EndpointStats(endpoint=endpoint) for endpoint in aclients}
+
+    def _observe(self, endpoint: str, rtt_in_ms: float):
+        stats = self.stats[endpoint]
+        if stats.ewma_rtt_in_ms is None:
+            stats.ewma_rtt_in_ms = rtt_in_ms
+        else:
+            stats.ewma_rtt_in_ms += self._alpha * (rtt_in_ms - stats.ewma_rtt_in_ms)
+
+    def fastest(self, n: Optional[int] = None) -> List[str]:
+        """The n (default 'hedge') fastest endpoints, fastest first."""
+        ranked = sorted(
+            self.stats.values(),
+            key=lambda s: (s.ewma_rtt_in_ms is not None, s.ewma_rtt_in_ms or 0.0, s.endpoint),
+        )
+        return [s.endpoint for s in ranked[:n or self._hedge]]
+
+    async def _timed(self, endpoint: str, call: Callable[[AsyncBinanceRestAPIClient], Awaitable[Any]]) -> Tuple[Any, float]:
+        st = time.perf_counter()
+        try:
+            result = await call(self._aclients[endpoint])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._observe(endpoint, self._failure_penalty_in_ms)
+            raise
+        rtt_in_ms = (time.perf_counter() - st) * 1000
+        self._observe(endpoint, rtt_in_ms)
+        return (result, rtt_in_ms)
+
+    async def probe(self):
+        """Ping every endpoint once at the same time to rank them."""
+        results = await asyncio.gather(
+            *[self._timed(endpoint, lambda aclient: aclient.ping()) for endpoint in self._aclients],
+            return_exceptions=True,
+        )
+        for endpoint, result in zip(self._aclients, results):
+            if isinstance(result, BaseException):
+                loguru_logger.warning(f"Failed to probe the endpoint:api{endpoint}, exception:{result}.")
+
+    async def submit(self, place: PlaceOrder, hedge: Optional[int] = None) -> HedgedResult:
+        """
+        Place the order through the 'hedge' fastest endpoints at once and
+        return as soon as one accepted it. Raises the exception of the
+        fastest endpoint if all of them failed.
+        """
+        endpoints = self.fastest(hedge)
+        tasks = {asyncio.create_task(self._timed(endpoint, place)): endpoint for endpoint in endpoints}
+        for endpoint in endpoints:
+            self.stats[endpoint].requests += 1
+        errors: Dict[str, BaseException] = {}
+        pending = set(tasks)
+        while len(pending) > 0:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = None
+            for task in done:
+                endpoint = tasks[task]
+                if task.exception() is not None:
+                    errors[endpoint] = task.exception()
+                    self.stats[endpoint].failures += 1
+                elif winner is None:
+                    winner = task
+            if winner is not None:
+                endpoint = tasks[winner]
+                self.stats[endpoint].wins += 1
+                order, rtt_in_ms = winner.result()
+                loguru_logger.debug(f"Placed the hedged order<order_id:{order.get('clientOrderId')}> through api{endpoint} in {rtt_in_ms:.2f}ms.")
+                result = HedgedResult(order=order, endpoint=endpoint, errors=errors)
+                others = [task for task in done if task is not winner and task.exception() is None]
+                result.reconciled = asyncio.create_task(self._reconcile(result, others, pending, tasks))
+                return result
+        raise errors[endpoints[0]] if endpoints[0] in errors else next(iter(errors.values()))
+
+    async def _reconcile(
+        self,
+        result: HedgedResult,
+        done: List[asyncio.Task],
+        pending: set,
+        tasks: Dict[asyncio.Task, str],
+    ) -> List[Dict[str, Any]]:
+        if len(pending) > 0:
+            await asyncio.wait(pending)
+        for task in list(done) + list(pending):
+            endpoint = tasks[task]
+            if task.exception() is not None:
+                e = task.exception()
+                result.errors[endpoint] = e
+                self.stats[endpoint].failures += 1
+                if not isinstance(e, (BinanceAPIException, BinanceRequestException)):
+                    loguru_logger.warning(f"Unknown outcome of the hedged order through api{endpoint}, internal exception:{e}.")
+                continue
+            order, _ = task.result()
+            if order.get("orderId") != result.order.get("orderId"):
+                result.duplicates.append(order)
+                loguru_logger.critical(
+                    f"Hedged order<order_id:{order.get('clientOrderId')}> was executed twice, "
+                    f"orderId:{order.get('orderId')} through api{endpoint} besides orderId:{result.order.get('orderId')}."
+                )
+        return result.duplicates
+
+    async def unwind(self, duplicates: List[Dict[str, Any]], offset: OffsetOrder) -> List[Dict[str, Any]]:
+        """
+        Send the offsetting order of every duplicate, like a SELL of what a
+        duplicated BUY bought, through the fastest endpoint. Return the
+        responses of the offsetting orders which went through, the others
+        are logged.
+        """
+        offsets = []
+        for duplicate in duplicates:
+            endpoint = self.fastest(1)[0]
+            try:
+                order, _ = await self._timed(endpoint, lambda aclient: offset(aclient, duplicate))
+            except asyncio.CancelledError:
+                raise
+            except (BinanceAPIException, BinanceRequestException) as e:
+                loguru_logger.critical(f"Failed to unwind the duplicate orderId:{duplicate.get('orderId')} through api{endpoint}, binance's exception:{e}.")
+                continue
+            except Exception as e:
+                loguru_logger.critical(f"Failed to unwind the duplicate orderId:{duplicate.get('orderId')} through api{endpoint}, internal exception:{e}.")
+                continue
+            loguru_logger.warning(
+                f"Unwound the duplicate orderId:{duplicate.get('orderId')} with order<order_id:{order.get('clientOrderId')}> "
+                f"through api{endpoint}, executed qty:{order.get('executedQty')}."
+            )
+            offsets.append(order)
+        return offsets
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import pytest
+from binance.exceptions import BinanceAPIException
+
+from internal.exchange import BinanceAsyncClient, HedgedOrderSubmitter
+from internal.exchange.mock import MockBinanceServer, MockExchange, SymbolRules
+
+
+@pytest.fixture
+async def aclients():
+    # Two hosts in front of the same exchange, one of them slow.
+    exchange = MockExchange(
+        [SymbolRules(symbol="BTCUSDT", base_asset="BTC", quote_asset="USDT")],
+        balances={"USDT": "100000", "BTC": "1"},
+    )
+    exchange.set_book("BTCUSDT", bids=[("29999.00", "1.0")], asks=[("30001.00", "10.0")])
+    servers = [MockBinanceServer(exchange, latency_in_ms=1), MockBinanceServer(exchange, latency_in_ms=40)]
+    for server in servers:
+        await server.start()
+    aclients = {
+        endpoint: BinanceAsyncClient(api_key="key", api_secret="secret", api_url=server.api_url)
+        for endpoint, server in zip(["", "1"], servers)
+    }
+    yield aclients
+    for aclient in aclients.values():
+        await aclient.close_connection()
+    for server in servers:
+        await server.stop()
+
+
+async def test_first_success_wins_and_duplicates_are_reported(aclients):
+    submitter = HedgedOrderSubmitter(aclients, hedge=2)
+    await submitter.probe()
+    assert submitter.fastest() == ["", "1"]
+
+    # A MARKET order is closed at once, the slow host executes it again.
+    result = await submitter.submit(
+        lambda aclient: aclient.order_market_buy(symbol="BTCUSDT", quoteOrderQty="100", newClientOrderId="hedged-1")
+    )
+    assert result.endpoint == "" and result.order["status"] == "FILLED"
+    duplicates = await result.reconciled
+    assert [o["clientOrderId"] for o in duplicates] == ["hedged-1"]
+    assert duplicates[0]["orderId"] != result.order["orderId"]
+
+    # What the duplicate bought is sold back.
+    offsets = await submitter.unwind(
+        duplicates,
+        lambda aclient, duplicate: aclient.order_market_sell(symbol="BTCUSDT", quantity=duplicate["executedQty"], newClientOrderId="unwind-1"),
+    )
+    assert [(o["side"], o["status"], o["executedQty"]) for o in offsets] == [("SELL", "FILLED", duplicates[0]["executedQty"])]
+    # An offsetting order which fails is left out.
+    assert await submitter.unwind(
+        duplicates,
+        lambda aclient, duplicate: aclient.order_market_sell(symbol="ETHUSDT", quantity=duplicate["executedQty"]),
+    ) == []
+
+    # An open LIMIT order is taken once, the other host is rejected.
+    result = await submitter.submit(
+        lambda aclient: aclient.order_limit_buy(symbol="BTCUSDT", quantity="0.01", price="29000.00", newClientOrderId="hedged-2")
+    )
+    assert await result.reconciled == []
+    assert isinstance(result.errors["1"], BinanceAPIException) and result.errors["1"].code == -2010
+    assert (submitter.stats[""].wins, submitter.stats["1"].failures) == (2, 1)
+
+
+async def test_all_endpoints_failing_raises(aclients):
+    submitter = HedgedOrderSubmitter(aclients, hedge=2)
+    with pytest.raises(BinanceAPIException):
+        await submitter.submit(lambda aclient: aclient.order_market_buy(symbol="ETHUSDT", quoteOrderQty="100"))
+    assert all(stats.failures == 1 for stats in submitter.stats.values())
+    # Failures count as slow round trips.
+    assert submitter.stats[""].ewma_rtt_in_ms == pytest.approx(1000.0)
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from typing import Dict, List, Optional
+
+from binance.client import AsyncClient as AsyncBinanceRestAPIClient
+from binance.streams import BinanceSocketManager
+
+from .order_book import LocalOrderBook
+
+
+class MarketDataHub:
+    """
+    共享行情
+
+    Keeps one LocalOrderBook per symbol, fed by a single depth stream and
+    one snapshot, for all the bots which trade the symbol, so N bots on the
+    same market cost one websocket instead of N. Market data is public: the
+    client of the hub needs no API key and the books outlive the bots which
+    use them, they are stopped by close.
+    """
+
+    def __init__(self, aclient: AsyncBinanceRestAPIClient, sock_mgr: BinanceSocketManager):
+        self._aclient = aclient
+        self._sock_mgr = sock_mgr
+        self._books: Dict[str, LocalOrderBook] = {}
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self._books)
+
+    def order_book(self, symbol: str) -> LocalOrderBook:
+        """The shared book of the symbol, created on first use and not started yet."""
+        book = self._books.get(symbol)
+        if book is None:
+            book = LocalOrderBook(aclient=self._aclient, sock_mgr=self._sock_mgr, symbol=symbol)
+            self._books[symbol] = book
+        return book
+
+    def get(self, symbol: str) -> Optional[LocalOrderBook]:
+        return self._books.get(symbol)
+
+    async def watch(self, symbol: str, timeout: float = 10.0) -> bool:
+        """Start the book of the symbol if needed, return once it is in sync."""
+        return await self.order_book(symbol).start(timeout=timeout)
+
+    async def close(self):
+        for book in self._books.values():
+            await book.stop()
+        self._books.clear()
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+from .engine import MockExchange, MockExchangeError, ScriptStep, SymbolRules
+from .server import MockBinanceServer
+
+__all__ = ["MockBinanceServer", "MockExchange", "MockExchangeError", "ScriptStep", "SymbolRules"]
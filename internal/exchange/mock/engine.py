@@ -0,0 +1,684 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import itertools
+import time
+from dataclasses import dataclass, field
+from decimal import ROUND_DOWN, Decimal
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+ZERO = Decimal(0)
+
+
+def _fmt(value: Decimal) -> str:
+    return f"{value:.8f}"
+
+
+class MockExchangeError(Exception):
+    """An error answered by the mock exchange, with Binance's HTTP status, code and message."""
+
+    def __init__(self, status: int, code: int, msg: str):
+        super().__init__(f"APIError(code={code}): {msg}")
+        self.status = status
+        self.code = code
+        self.msg = msg
+
+
+def _mandatory(name: str) -> MockExchangeError:
+    return MockExchangeError(400, -1102, f"Mandatory parameter '{name}' was not sent, was empty/null, or malformed.")
+
+
+@dataclass
+class SymbolRules:
+    """
+    -   'tick_size' / 'min_price' / 'max_price' make the PRICE_FILTER.
+    -   'step_size' / 'min_qty' / 'max_qty' make the LOT_SIZE filter.
+    -   'min_notional' makes the NOTIONAL filter.
+    -   'max_num_orders' makes the MAX_NUM_ORDERS filter.
+    """
+    symbol: str
+    base_asset: str
+    quote_asset: str
+    tick_size: str = "0.01"
+    min_price: str = "0.01"
+    max_price: str = "1000000.00"
+    step_size: str = "0.00001"
+    min_qty: str = "0.00001"
+    max_qty: str = "9000.00000"
+    min_notional: str = "5.00"
+    max_num_orders: int = 200
+
+    def to_symbol_info(self) -> Dict[str, Any]:
+        """Render the rules like a symbol of GET /api/v3/exchangeInfo."""
+        return {
+            "symbol": self.symbol,
+            "status": "TRADING",
+            "baseAsset": self.base_asset,
+            "baseAssetPrecision": 8,
+            "quoteAsset": self.quote_asset,
+            "quotePrecision": 8,
+            "quoteAssetPrecision": 8,
+            "orderTypes": ["LIMIT", "LIMIT_MAKER", "MARKET"],
+            "icebergAllowed": False,
+            "ocoAllowed": False,
+            "quoteOrderQtyMarketAllowed": True,
+            "allowTrailingStop": False,
+            "cancelReplaceAllowed": False,
+            "isSpotTradingAllowed": True,
+            "isMarginTradingAllowed": False,
+            "filters": [
+                {"filterType": "PRICE_FILTER", "minPrice": self.min_price, "maxPrice": self.max_price, "tickSize": self.tick_size},
+                {"filterType": "LOT_SIZE", "minQty": self.min_qty, "maxQty": self.max_qty, "stepSize": self.step_size},
+                {"filterType": "NOTIONAL", "minNotional": self.min_notional, "applyMinToMarket": True, "maxNotional": "9000000.00", "applyMaxToMarket": False, "avgPriceMins": 5},
+                {"filterType": "MAX_NUM_ORDERS", "maxNumOrders": self.max_num_orders},
+            ],
+            "permissions": ["SPOT"],
+        }
+
+
+class _FixedWindowCounter:
+    """Counter of a fixed window aligned to the epoch, like the exchange's limits."""
+
+    def __init__(self, interval_in_sec: int, limit: int):
+        self._interval_in_sec = interval_in_sec
+        self._limit = limit
+        self._window = -1
+        self._used = 0
+
+    def used(self, now: float) -> int:
+        if int(now // self._interval_in_sec) != self._window:
+            return 0
+        return self._used
+
+    def try_add(self, n: int, now: float) -> bool:
+        window = int(now // self._interval_in_sec)
+        if window != self._window:
+            self._window = window
+            self._used = 0
+        if self._used + n > self._limit:
+            return False
+        self._used += n
+        return True
+
+
+@dataclass
+class _MockOrder:
+    order_id: int
+    client_order_id: str
+    symbol: str
+    side: str
+    order_type: str
+    time_in_force: str
+    price: Decimal
+    orig_qty: Decimal
+    quote_order_qty: Decimal
+    time: int
+    status: str = "NEW"
+    executed_qty: Decimal = ZERO
+    cummulative_quote_qty: Decimal = ZERO
+    update_time: int = 0
+    # Amount of the quote (BUY) or base (SELL) asset locked for the unfilled part.
+    reserved: Decimal = ZERO
+    fills: List[Dict[str, str]] = field(default_factory=list)
+
+    @property
+    def remaining_qty(self) -> Decimal:
+        return self.orig_qty - self.executed_qty
+
+    @property
+    def is_open(self) -> bool:
+        return self.status in ("NEW", "PARTIALLY_FILLED")
+
+    def to_order(self) -> Dict[str, Any]:
+        return {
+            "symbol": self.symbol,
+            "orderId": self.order_id,
+            "orderListId": -1,
+            "clientOrderId": self.client_order_id,
+            "price": _fmt(self.price),
+            "origQty": _fmt(self.orig_qty),
+            "executedQty": _fmt(self.executed_qty),
+            "cummulativeQuoteQty": _fmt(self.cummulative_quote_qty),
+            "status": self.status,
+            "timeInForce": self.time_in_force,
+            "type": self.order_type,
+            "side": self.side,
+            "stopPrice": _fmt(ZERO),
+            "icebergQty": _fmt(ZERO),
+            "time": self.time,
+            "updateTime": self.update_time or self.time,
+            "isWorking": True,
+            "origQuoteOrderQty": _fmt(self.quote_order_qty),
+            "selfTradePreventionMode": "NONE",
+        }
+
+
+@dataclass
+class ScriptStep:
+    """
+    One step of a scripted market, applied 'at_in_sec' after MockExchange.play
+    was called: the book levels in 'bids' / 'asks' are set (a zero quantity
+    removes the level), then a public trade happens at 'trade_price'.
+    """
+    at_in_sec: float
+    bids: Sequence[Tuple[str, str]] = ()
+    asks: Sequence[Tuple[str, str]] = ()
+    trade_price: Optional[str] = None
+
+
+class MockExchange:
+    """
+    模拟币安现货交易所
+
+    A single-account spot exchange which matches orders against a scripted
+    order book, and enforces the request weight, order count and symbol
+    filters of Binance. Orders of the account rest in their own table and
+    are not shown in the public book, they fill when the scripted book or
+    a public trade crosses their price.
+
+    Events (executionReport, depthUpdate, trade) are published to queues
+    returned by 'subscribe', with the channels 'user', 'depth:<SYMBOL>'
+    and 'trade:<SYMBOL>'.
+    """
+
+    def __init__(
+        self,
+        symbols: List[SymbolRules],
+        balances: Optional[Dict[str, str]] = None,
+        *,
+        weight_limit_per_minute: int = 6000,
+        order_limit_per_10s: int = 50,
+        order_limit_per_day: int = 160000,
+        commission_rate: str = "0.001",
+        clock: Callable[[], float] = time.time,
+    ):
+        self.rules: Dict[str, SymbolRules] = {rules.symbol: rules for rules in symbols}
+        self._clock = clock
+        self._commission_rate = Decimal(commission_rate)
+        self._weight = _FixedWindowCounter(60, weight_limit_per_minute)
+        self._orders_10s = _FixedWindowCounter(10, order_limit_per_10s)
+        self._orders_1d = _FixedWindowCounter(86400, order_limit_per_day)
+        self._weight_limit_per_minute = weight_limit_per_minute
+        self._order_limit_per_10s = order_limit_per_10s
+        self._order_limit_per_day = order_limit_per_day
+        self._bids: Dict[str, Dict[Decimal, Decimal]] = {s: {} for s in self.rules}
+        self._asks: Dict[str, Dict[Decimal, Decimal]] = {s: {} for s in self.rules}
+        self._update_ids: Dict[str, int] = {s: 1000 for s in self.rules}
+        self._last_prices: Dict[str, Optional[Decimal]] = {s: None for s in self.rules}
+        self._balances: Dict[str, List[Decimal]] = {}
+        for asset, free in (balances or {}).items():
+            self._balances[asset] = [Decimal(free), ZERO]
+        self._orders: Dict[int, _MockOrder] = {}
+        self._order_ids = itertools.count(1)
+        self._trade_ids = itertools.count(1)
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+
+    def now_ms(self) -> int:
+        return int(self._clock() * 1000)
+
+    def charge_weight(self, weight: int) -> int:
+        """Account the request weight, return the weight used in the current minute."""
+        now = self._clock()
+        if not self._weight.try_add(weight, now):
+            raise MockExchangeError(
+                429, -1003,
+                f"Too much request weight used; current limit is {self._weight_limit_per_minute} request weight per 1 MINUTE. "
+                "Please use WebSocket Streams for live updates to avoid polling the API.",
+            )
+        return self._weight.used(now)
+
+    def charge_order(self) -> Tuple[int, int]:
+        """Account a new order, return the order counts of the current 10 seconds and day."""
+        now = self._clock()
+        if not self._orders_10s.try_add(1, now):
+            raise MockExchangeError(429, -1015, f"Too many new orders; current limit is {self._order_limit_per_10s} orders per TEN_SECONDS.")
+        if not self._orders_1d.try_add(1, now):
+            raise MockExchangeError(429, -1015, f"Too many new orders; current limit is {self._order_limit_per_day} orders per DAY.")
+        return self.order_counts()
+
+    def used_weight(self) -> int:
+        return self._weight.used(self._clock())
+
+    def order_counts(self) -> Tuple[int, int]:
+        now = self._clock()
+        return (self._orders_10s.used(now), self._orders_1d.used(now))
+
+    def exchange_info(self) -> Dict[str, Any]:
+        return {
+            "timezone": "UTC",
+            "serverTime": self.now_ms(),
+            "rateLimits": [
+                {"rateLimitType": "REQUEST_WEIGHT", "interval": "MINUTE", "intervalNum": 1, "limit": self._weight_limit_per_minute},
+                {"rateLimitType": "ORDERS", "interval": "SECOND", "intervalNum": 10, "limit": self._order_limit_per_10s},
+                {"rateLimitType": "ORDERS", "interval": "DAY", "intervalNum": 1, "limit": self._order_limit_per_day},
+            ],
+            "exchangeFilters": [],
+            "symbols": [rules.to_symbol_info() for rules in self.rules.values()],
+        }
+
+    def depth(self, symbol: str, limit: int = 100) -> Dict[str, Any]:
+        self._rules_of(symbol)
+        bids = sorted(self._bids[symbol].items(), reverse=True)[:limit]
+        asks = sorted(self._asks[symbol].items())[:limit]
+        return {
+            "lastUpdateId": self._update_ids[symbol],
+            "bids": [[_fmt(p), _fmt(q)] for p, q in bids],
+            "asks": [[_fmt(p), _fmt(q)] for p, q in asks],
+        }
+
+    def ticker_price(self, symbol: str) -> Dict[str, str]:
+        self._rules_of(symbol)
+        price = self._last_prices[symbol]
+        if price is None:
+            best_bid = max(self._bids[symbol], default=None)
+            best_ask = min(self._asks[symbol], default=None)
+            if best_bid is not None and best_ask is not None:
+                price = (best_bid + best_ask) / 2
+            else:
+                price = best_bid or best_ask or ZERO
+        return {"symbol": symbol, "price": _fmt(price)}
+
+    def account(self) -> Dict[str, Any]:
+        return {
+            "makerCommission": 10,
+            "takerCommission": 10,
+            "canTrade": True,
+            "canWithdraw": True,
+            "canDeposit": True,
+            "updateTime": self.now_ms(),
+            "accountType": "SPOT",
+            "balances": [
+                {"asset": asset, "free": _fmt(free), "locked": _fmt(locked)}
+                for asset, (free, locked) in self._balances.items()
+            ],
+            "permissions": ["SPOT"],
+        }
+
+    def balance_of(self, asset: str) -> Tuple[Decimal, Decimal]:
+        free, locked = self._balances.get(asset, [ZERO, ZERO])
+        return (free, locked)
+
+    def _balance(self, asset: str) -> List[Decimal]:
+        return self._balances.setdefault(asset, [ZERO, ZERO])
+
+    def _rules_of(self, symbol: Optional[str]) -> SymbolRules:
+        if symbol is None or symbol == "":
+            raise _mandatory("symbol")
+        rules = self.rules.get(symbol)
+        if rules is None:
+            raise MockExchangeError(400, -1121, "Invalid symbol.")
+        return rules
+
+    @staticmethod
+    def _decimal(params: Dict[str, str], name: str) -> Optional[Decimal]:
+        value = params.get(name)
+        if value is None or value == "":
+            return None
+        try:
+            return Decimal(value)
+        except ArithmeticError:
+            raise _mandatory(name)
+
+    def _check_filters(self, rules: SymbolRules, price: Optional[Decimal], qty: Optional[Decimal], notional: Decimal):
+        if price is not None:
+            min_price, max_price, tick_size = Decimal(rules.min_price), Decimal(rules.max_price), Decimal(rules.tick_size)
+            if price < min_price or price > max_price or (price - min_price) % tick_size != 0:
+                raise MockExchangeError(400, -1013, "Filter failure: PRICE_FILTER")
+        if qty is not None:
+            min_qty, max_qty, step_size = Decimal(rules.min_qty), Decimal(rules.max_qty), Decimal(rules.step_size)
+            if qty < min_qty or qty > max_qty or (qty - min_qty) % step_size != 0:
+                raise MockExchangeError(400, -1013, "Filter failure: LOT_SIZE")
+        if notional < Decimal(rules.min_notional):
+            raise MockExchangeError(400, -1013, "Filter failure: NOTIONAL")
+        open_orders = sum(1 for order in self._orders.values() if order.symbol == rules.symbol and order.is_open)
+        if open_orders >= rules.max_num_orders:
+            raise MockExchangeError(400, -1013, "Filter failure: MAX_NUM_ORDERS")
+
+    def _walk_book(self, symbol: str, side: str, limit_price: Optional[Decimal], qty: Optional[Decimal], quote_qty: Optional[Decimal]) -> List[Tuple[Decimal, Decimal]]:
+        """Levels of the scripted book a taker order would consume, as (price, qty)."""
+        rules = self.rules[symbol]
+        step_size = Decimal(rules.step_size)
+        levels = sorted(self._asks[symbol].items()) if side == "BUY" else sorted(self._bids[symbol].items(), reverse=True)
+        taken = []
+        for price, level_qty in levels:
+            if limit_price is not None and ((side == "BUY" and price > limit_price) or (side == "SELL" and price < limit_price)):
+                break
+            if quote_qty is not None:
+                want = (quote_qty / price).quantize(step_size, rounding=ROUND_DOWN)
+            else:
+                want = qty
+            take = min(want, level_qty)
+            if take <= 0:
+                break
+            taken.append((price, take))
+            if quote_qty is not None:
+                quote_qty -= price * take
+            else:
+                qty -= take
+            if (quote_qty is not None and quote_qty <= 0) or (qty is not None and qty <= 0):
+                break
+        return taken
+
+    def new_order(self, params: Dict[str, str]) -> Dict[str, Any]:
+        """POST /api/v3/order, the order count must have been charged already."""
+        rules = self._rules_of(params.get("symbol"))
+        side = params.get("side")
+        if side not in ("BUY", "SELL"):
+            raise _mandatory("side")
+        order_type = params.get("type")
+        if order_type not in ("LIMIT", "LIMIT_MAKER", "MARKET"):
+            raise MockExchangeError(400, -1116, "Invalid orderType.")
+        price = self._decimal(params, "price")
+        qty = self._decimal(params, "quantity")
+        quote_qty = self._decimal(params, "quoteOrderQty")
+        time_in_force = params.get("timeInForce", "GTC")
+        client_order_id = params.get("newClientOrderId") or f"mock{next(self._order_ids)}"
+
+        if order_type == "MARKET":
+            if price is not None:
+                raise MockExchangeError(400, -1106, "Parameter 'price' sent when not required.")
+            if (qty is None) == (quote_qty is None):
+                raise MockExchangeError(400, -1102, "Param 'quantity' or 'quoteOrderQty' must be sent, but both were empty/null!")
+            time_in_force = "GTC"
+            taken = self._walk_book(rules.symbol, side, None, qty, quote_qty)
+            notional = quote_qty if quote_qty is not None else sum((p * q for p, q in taken), ZERO)
+            self._check_filters(rules, None, qty, notional)
+            if quote_qty is not None:
+                qty = sum((q for _, q in taken), ZERO)
+        else:
+            if price is None:
+                raise _mandatory("price")
+            if qty is None:
+                raise _mandatory("quantity")
+            if order_type == "LIMIT" and time_in_force not in ("GTC", "IOC", "FOK"):
+                raise _mandatory("timeInForce")
+            self._check_filters(rules, price, qty, price * qty)
+            taken = self._walk_book(rules.symbol, side, price, qty, None)
+            if order_type == "LIMIT_MAKER" and len(taken) > 0:
+                raise MockExchangeError(400, -2010, "Order would immediately match and take.")
+        if any(o.client_order_id == client_order_id and o.is_open for o in self._orders.values()):
+            raise MockExchangeError(400, -2010, "Duplicate order sent.")
+
+        # Lock what the order may spend.
+        if side == "BUY":
+            asset = rules.quote_asset
+            reserved = price * qty if order_type != "MARKET" else sum((p * q for p, q in taken), ZERO)
+        else:
+            asset = rules.base_asset
+            reserved = qty
+        balance = self._balance(asset)
+        if balance[0] < reserved:
+            raise MockExchangeError(400, -2010, "Account has insufficient balance for requested action.")
+        balance[0] -= reserved
+        balance[1] += reserved
+
+        now = self.now_ms()
+        order = _MockOrder(
+            order_id=next(self._order_ids),
+            client_order_id=client_order_id,
+            symbol=rules.symbol,
+            side=side,
+            order_type=order_type,
+            time_in_force=time_in_force,
+            price=price if price is not None else ZERO,
+            orig_qty=qty,
+            quote_order_qty=quote_qty if quote_qty is not None else ZERO,
+            time=now,
+            update_time=now,
+            reserved=reserved,
+        )
+        self._orders[order.order_id] = order
+        self._publish_execution(order, "NEW")
+
+        if order_type == "LIMIT" and time_in_force == "FOK" and sum((q for _, q in taken), ZERO) < qty:
+            taken = []
+            self._finish(order, "EXPIRED")
+        else:
+            book = self._asks[rules.symbol] if side == "BUY" else self._bids[rules.symbol]
+            changed = []
+            for fill_price, fill_qty in taken:
+                book[fill_price] -= fill_qty
+                if book[fill_price] <= 0:
+                    del book[fill_price]
+                changed.append((fill_price, book.get(fill_price, ZERO)))
+                self._fill(order, fill_price, fill_qty, is_maker=False)
+            if len(changed) > 0:
+                self._publish_depth(rules.symbol, [] if side == "BUY" else changed, changed if side == "BUY" else [])
+            if order.is_open and (order_type == "MARKET" or time_in_force == "IOC"):
+                self._finish(order, "EXPIRED")
+
+        resp = order.to_order()
+        resp["transactTime"] = now
+        resp["workingTime"] = now
+        resp["fills"] = list(order.fills)
+        return resp
+
+    def _fill(self, order: _MockOrder, price: Decimal, qty: Decimal, is_maker: bool):
+        rules = self.rules[order.symbol]
+        quote = price * qty
+        if order.side == "BUY":
+            commission, commission_asset = qty * self._commission_rate, rules.base_asset
+            reserved_for_fill = (order.price if order.order_type != "MARKET" else price) * qty
+            quote_balance = self._balance(rules.quote_asset)
+            quote_balance[1] -= reserved_for_fill
+            quote_balance[0] += reserved_for_fill - quote
+            self._balance(rules.base_asset)[0] += qty - commission
+        else:
+            commission, commission_asset = quote * self._commission_rate, rules.quote_asset
+            reserved_for_fill = qty
+            self._balance(rules.base_asset)[1] -= qty
+            self._balance(rules.quote_asset)[0] += quote - commission
+        order.reserved -= reserved_for_fill
+        order.executed_qty += qty
+        order.cummulative_quote_qty += quote
+        order.update_time = self.now_ms()
+        order.status = "FILLED" if order.remaining_qty <= 0 else "PARTIALLY_FILLED"
+        trade_id = next(self._trade_ids)
+        order.fills.append({
+            "price": _fmt(price),
+            "qty": _fmt(qty),
+            "commission": _fmt(commission),
+            "commissionAsset": commission_asset,
+            "tradeId": trade_id,
+        })
+        self._last_prices[order.symbol] = price
+        self._publish_execution(order, "TRADE", last_price=price, last_qty=qty, commission=commission, commission_asset=commission_asset, trade_id=trade_id, is_maker=is_maker)
+        self._publish(f"trade:{order.symbol}", {
+            "e": "trade",
+            "E": order.update_time,
+            "s": order.symbol,
+            "t": trade_id,
+            "p": _fmt(price),
+            "q": _fmt(qty),
+            "T": order.update_time,
+            "m": (order.side == "BUY") == is_maker,
+            "M": True,
+        })
+
+    def _finish(self, order: _MockOrder, status: str, cancel_client_order_id: str = ""):
+        """Move an open order to a final status other than FILLED, releasing what it locked."""
+        rules = self.rules[order.symbol]
+        asset = rules.quote_asset if order.side == "BUY" else rules.base_asset
+        balance = self._balance(asset)
+        balance[1] -= order.reserved
+        balance[0] += order.reserved
+        order.reserved = ZERO
+        order.status = status
+        order.update_time = self.now_ms()
+        self._publish_execution(order, status, cancel_client_order_id=cancel_client_order_id)
+
+    def _find_order(self, params: Dict[str, str]) -> _MockOrder:
+        symbol = self._rules_of(params.get("symbol")).symbol
+        order_id = params.get("orderId")
+        client_order_id = params.get("origClientOrderId")
+        if order_id is None and client_order_id is None:
+            raise MockExchangeError(400, -1102, "Param 'origClientOrderId' or 'orderId' must be sent, but both were empty/null!")
+        for order in reversed(list(self._orders.values())):
+            if order.symbol != symbol:
+                continue
+            if (order_id is not None and str(order.order_id) == str(order_id)) or (order_id is None and order.client_order_id == client_order_id):
+                return order
+        raise MockExchangeError(400, -2013, "Order does not exist.")
+
+    def get_order(self, params: Dict[str, str]) -> Dict[str, Any]:
+        return self._find_order(params).to_order()
+
+    def cancel_order(self, params: Dict[str, str]) -> Dict[str, Any]:
+        try:
+            order = self._find_order(params)
+        except MockExchangeError:
+            raise MockExchangeError(400, -2011, "Unknown order sent.")
+        if not order.is_open:
+            raise MockExchangeError(400, -2011, "Unknown order sent.")
+        cancel_client_order_id = params.get("newClientOrderId") or f"cancel{order.order_id}"
+        self._finish(order, "CANCELED", cancel_client_order_id=cancel_client_order_id)
+        resp = order.to_order()
+        resp["origClientOrderId"] = order.client_order_id
+        resp["clientOrderId"] = cancel_client_order_id
+        return resp
+
+    def open_orders(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [o.to_order() for o in self._orders.values() if o.is_open and (symbol is None or o.symbol == symbol)]
+
+    def all_orders(self, symbol: str, limit: int = 500) -> List[Dict[str, Any]]:
+        self._rules_of(symbol)
+        orders = [o.to_order() for o in self._orders.values() if o.symbol == symbol]
+        return orders[-limit:]
+
+    def update_book(self, symbol: str, bids: Sequence[Tuple[str, str]] = (), asks: Sequence[Tuple[str, str]] = ()):
+        """Set levels of the scripted book, a zero quantity removes the level."""
+        self._rules_of(symbol)
+        changed_bids, changed_asks = [], []
+        for levels, book, changed in ((bids, self._bids[symbol], changed_bids), (asks, self._asks[symbol], changed_asks)):
+            for price, qty in levels:
+                price, qty = Decimal(price), Decimal(qty)
+                if qty <= 0:
+                    book.pop(price, None)
+                else:
+                    book[price] = qty
+                changed.append((price, qty))
+        if len(changed_bids) > 0 or len(changed_asks) > 0:
+            self._publish_depth(symbol, changed_bids, changed_asks)
+        self._match_resting(symbol)
+
+    def set_book(self, symbol: str, bids: Sequence[Tuple[str, str]], asks: Sequence[Tuple[str, str]]):
+        """Replace the whole scripted book."""
+        self._rules_of(symbol)
+        removed_bids = [(_fmt(p), "0") for p in self._bids[symbol] if p not in {Decimal(x) for x, _ in bids}]
+        removed_asks = [(_fmt(p), "0") for p in self._asks[symbol] if p not in {Decimal(x) for x, _ in asks}]
+        self.update_book(symbol, removed_bids + list(bids), removed_asks + list(asks))
+
+    def trade(self, symbol: str, price: str):
+        """A public trade at 'price', which fills every resting order it crosses."""
+        self._rules_of(symbol)
+        price = Decimal(price)
+        self._last_prices[symbol] = price
+        for order in self._resting(symbol):
+            if (order.side == "BUY" and order.price >= price) or (order.side == "SELL" and order.price <= price):
+                self._fill(order, order.price, order.remaining_qty, is_maker=True)
+
+    def _resting(self, symbol: str) -> List[_MockOrder]:
+        return [o for o in self._orders.values() if o.symbol == symbol and o.is_open]
+
+    def _match_resting(self, symbol: str):
+        """Fill resting orders crossed by the scripted book, at their own price."""
+        changed_bids, changed_asks = [], []
+        for order in sorted(self._resting(symbol), key=lambda o: (o.side, -o.price if o.side == "BUY" else o.price, o.order_id)):
+            book = self._asks[symbol] if order.side == "BUY" else self._bids[symbol]
+            changed = changed_asks if order.side == "BUY" else changed_bids
+            while order.is_open and len(book) > 0:
+                best = min(book) if order.side == "BUY" else max(book)
+                if (order.side == "BUY" and best > order.price) or (order.side == "SELL" and best < order.price):
+                    break
+                qty = min(book[best], order.remaining_qty)
+                book[best] -= qty
+                if book[best] <= 0:
+                    del book[best]
+                changed.append((best, book.get(best, ZERO)))
+                self._fill(order, order.price, qty, is_maker=True)
+        if len(changed_bids) > 0 or len(changed_asks) > 0:
+            self._publish_depth(symbol, changed_bids, changed_asks)
+
+    async def play(self, symbol: str, steps: Sequence[ScriptStep]):
+        """Apply the steps of a scripted market at their time."""
+        st = self._clock()
+        for step in steps:
+            delay = st + step.at_in_sec - self._clock()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(step.bids) > 0 or len(step.asks) > 0:
+                self.update_book(symbol, step.bids, step.asks)
+            if step.trade_price is not None:
+                self.trade(symbol, step.trade_price)
+
+    def subscribe(self, channel: str) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(channel, []).append(q)
+        return q
+
+    def unsubscribe(self, channel: str, q: asyncio.Queue):
+        subscribers = self._subscribers.get(channel, [])
+        if q in subscribers:
+            subscribers.remove(q)
+
+    def _publish(self, channel: str, event: Dict[str, Any]):
+        for q in self._subscribers.get(channel, []):
+            q.put_nowait(event)
+
+    def _publish_depth(self, symbol: str, bids: List[Tuple[Any, Any]], asks: List[Tuple[Any, Any]]):
+        first_update_id = self._update_ids[symbol] + 1
+        self._update_ids[symbol] += 1
+        self._publish(f"depth:{symbol}", {
+            "e": "depthUpdate",
+            "E": self.now_ms(),
+            "s": symbol,
+            "U": first_update_id,
+            "u": self._update_ids[symbol],
+            "b": [[_fmt(Decimal(p)), _fmt(Decimal(q))] for p, q in bids],
+            "a": [[_fmt(Decimal(p)), _fmt(Decimal(q))] for p, q in asks],
+        })
+
+    def _publish_execution(
+        self,
+        order: _MockOrder,
+        execution_type: str,
+        last_price: Decimal = ZERO,
+        last_qty: Decimal = ZERO,
+        commission: Decimal = ZERO,
+        commission_asset: Optional[str] = None,
+        trade_id: int = -1,
+        is_maker: bool = False,
+        cancel_client_order_id: str = "",
+    ):
+        self._publish("user", {
+            "e": "executionReport",
+            "E": order.update_time,
+            "s": order.symbol,
+            "c": cancel_client_order_id or order.client_order_id,
+            "S": order.side,
+            "o": order.order_type,
+            "f": order.time_in_force,
+            "q": _fmt(order.orig_qty),
+            "p": _fmt(order.price),
+            "P": _fmt(ZERO),
+            "F": _fmt(ZERO),
+            "g": -1,
+            "C": order.client_order_id if cancel_client_order_id else "",
+            "x": execution_type,
+            "X": order.status,
+            "r": "NONE",
+            "i": order.order_id,
+            "l": _fmt(last_qty),
+            "z": _fmt(order.executed_qty),
+            "L": _fmt(last_price),
+            "n": _fmt(commission),
+            "N": commission_asset,
+            "T": order.update_time,
+            "t": trade_id,
+            "w": order.is_open,
+            "m": is_maker,
+            "M": False,
+            "O": order.time,
+            "Z": _fmt(order.cummulative_quote_qty),
+            "Y": _fmt(last_price * last_qty),
+            "Q": _fmt(order.quote_order_qty),
+        })
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import random
+import secrets
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+from aiohttp import WSMsgType, web
+from loguru import logger as loguru_logger
+
+from .engine import MockExchange, MockExchangeError
+
+Weight = Union[int, Callable[[Dict[str, str]], int]]
+
+
+def _depth_weight(params: Dict[str, str]) -> int:
+    limit = int(params.get("limit", 100))
+    if limit <= 100:
+        return 5
+    if limit <= 500:
+        return 25
+    if limit <= 1000:
+        return 50
+    return 250
+
+
+class MockBinanceServer:
+    """
+    模拟币安现货REST及websocket服务
+
+    Serves a MockExchange over the Binance spot REST API ('/api/v3/...') and
+    websocket streams ('/ws/<listenKey>', '/ws/<symbol>@depth@100ms',
+    '/ws/<symbol>@trade'), with the request weights of Binance and an
+    injected latency of 'latency_in_ms' +/- 'jitter_in_ms' per request and
+    per pushed event. The jitter is drawn from a seeded generator, so runs
+    are reproducible.
+
+    Point a BinanceAsyncClient to it with api_url=server.api_url and
+    stream_url=server.stream_url, or with the BINANCE_API_URL and
+    BINANCE_STREAM_URL envs.
+    """
+
+    def __init__(
+        self,
+        exchange: MockExchange,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_in_ms: float = 0.0,
+        jitter_in_ms: float = 0.0,
+        seed: int = 0,
+        recv_window_in_ms: int = 60000,
+    ):
+        self.exchange = exchange
+        self._host = host
+        self._port = port
+        self._latency_in_ms = latency_in_ms
+        self._jitter_in_ms = jitter_in_ms
+        self._random = random.Random(seed)
+        self._max_recv_window_in_ms = recv_window_in_ms
+        self._listen_keys = set()
+        self._runner: Optional[web.AppRunner] = None
+        self._app = web.Application()
+        self._add_routes()
+
+    @property
+    def port(self) -> int:
+        return self._port
+
+    @property
+    def api_url(self) -> str:
+        return f"http://{self._host}:{self._port}/api"
+
+    @property
+    def stream_url(self) -> str:
+        return f"ws://{self._host}:{self._port}/"
+
+    async def start(self):
+        self._runner = web.AppRunner(self._app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self._host, self._port)
+        await site.start()
+        self._port = self._runner.addresses[0][1]
+        loguru_logger.info(f"Mock Binance server is listening on {self.api_url} and {self.stream_url}.")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _delay(self):
+        latency = self._latency_in_ms
+        if self._jitter_in_ms > 0:
+            latency += self._random.uniform(-self._jitter_in_ms, self._jitter_in_ms)
+        if latency > 0:
+            await asyncio.sleep(latency / 1000)
+
+    def _add_routes(self):
+        ex = self.exchange
+        routes = [
+            ("GET", "/ping", 1, False, False, lambda p: {}),
+            ("GET", "/time", 1, False, False, lambda p: {"serverTime": ex.now_ms()}),
+            ("GET", "/exchangeInfo", 20, False, False, lambda p: ex.exchange_info()),
+            ("GET", "/depth", _depth_weight, False, False, lambda p: ex.depth(p.get("symbol"), int(p.get("limit", 100)))),
+            ("GET", "/ticker/price", 2, False, False, self._ticker_price),
+            ("GET", "/account", 20, True, False, lambda p: ex.account()),
+            ("POST", "/order", 1, True, True, ex.new_order),
+            ("GET", "/order", 4, True, False, ex.get_order),
+            ("DELETE", "/order", 1, True, False, ex.cancel_order),
+            ("GET", "/openOrders", lambda p: 6 if p.get("symbol") else 80, True, False, lambda p: ex.open_orders(p.get("symbol"))),
+            ("GET", "/allOrders", 20, True, False, lambda p: ex.all_orders(p.get("symbol"), int(p.get("limit", 500)))),
+            ("POST", "/userDataStream", 2, False, False, self._new_listen_key),
+            ("PUT", "/userDataStream", 2, False, False, lambda p: {}),
+            ("DELETE", "/userDataStream", 2, False, False, self._close_listen_key),
+        ]
+        for method, path, weight, signed, is_order, handler in routes:
+            # python-binance still calls some endpoints (like userDataStream) through v1.
+            self._app.router.add_route(method, "/api/{version:v1|v3}" + path, self._endpoint(weight, signed, is_order, handler))
+        self._app.router.add_get("/ws/{stream}", self._stream)
+
+    def _ticker_price(self, params: Dict[str, str]) -> Any:
+        if params.get("symbol"):
+            return self.exchange.ticker_price(params["symbol"])
+        return [self.exchange.ticker_price(symbol) for symbol in self.exchange.rules]
+
+    def _new_listen_key(self, params: Dict[str, str]) -> Dict[str, str]:
+        listen_key = secrets.token_hex(30)
+        self._listen_keys.add(listen_key)
+        return {"listenKey": listen_key}
+
+    def _close_listen_key(self, params: Dict[str, str]) -> Dict[str, str]:
+        self._listen_keys.discard(params.get("listenKey"))
+        return {}
+
+    def _check_signed(self, request: web.Request, params: Dict[str, str]):
+        if "X-MBX-APIKEY" not in request.headers:
+            raise MockExchangeError(401, -2014, "API-key format invalid.")
+        if "signature" not in params:
+            raise MockExchangeError(400, -1102, "Mandatory parameter 'signature' was not sent, was empty/null, or malformed.")
+        if "timestamp" not in params:
+            raise MockExchangeError(400, -1102, "Mandatory parameter 'timestamp' was not sent, was empty/null, or malformed.")
+        recv_window = int(params.get("recvWindow", 5000))
+        if recv_window > self._max_recv_window_in_ms:
+            raise MockExchangeError(400, -1131, "recvWindow must be less than 60000")
+        timestamp = int(params["timestamp"])
+        now = self.exchange.now_ms()
+        if timestamp > now + 1000 or now - timestamp > recv_window:
+            raise MockExchangeError(400, -1021, "Timestamp for this request is outside of the recvWindow.")
+
+    def _endpoint(
+        self,
+        weight: Weight,
+        signed: bool,
+        is_order: bool,
+        handler: Callable[[Dict[str, str]], Any],
+    ) -> Callable[[web.Request], Awaitable[web.Response]]:
+        async def _handle(request: web.Request) -> web.Response:
+            await self._delay()
+            params: Dict[str, str] = dict(request.query)
+            if request.can_read_body:
+                params.update(await request.post())
+            headers = {}
+            try:
+                used_weight = self.exchange.charge_weight(weight(params) if callable(weight) else weight)
+                headers["X-MBX-USED-WEIGHT"] = str(used_weight)
+                headers["X-MBX-USED-WEIGHT-1M"] = str(used_weight)
+                if signed:
+                    self._check_signed(request, params)
+                if is_order:
+                    count_10s, count_1d = self.exchange.charge_order()
+                    headers["X-MBX-ORDER-COUNT-10S"] = str(count_10s)
+                    headers["X-MBX-ORDER-COUNT-1D"] = str(count_1d)
+                body = handler(params)
+            except MockExchangeError as e:
+                if "X-MBX-USED-WEIGHT-1M" not in headers:
+                    headers["X-MBX-USED-WEIGHT-1M"] = str(self.exchange.used_weight())
+                if e.code == -1003:
+                    headers["Retry-After"] = "60"
+                return web.json_response({"code": e.code, "msg": e.msg}, status=e.status, headers=headers)
+            return web.json_response(body, headers=headers)
+
+        return _handle
+
+    async def _stream(self, request: web.Request) -> web.WebSocketResponse:
+        stream = request.match_info["stream"]
+        if stream in self._listen_keys:
+            channel = "user"
+        elif "@" in stream:
+            symbol, kind = stream.split("@", 1)
+            if kind.startswith("depth"):
+                channel = f"depth:{symbol.upper()}"
+            elif kind == "trade":
+                channel = f"trade:{symbol.upper()}"
+            else:
+                raise web.HTTPNotFound()
+        else:
+            raise web.HTTPNotFound()
+
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        q = self.exchange.subscribe(channel)
+
+        async def _push():
+            while 1:
+                event = await q.get()
+                await self._delay()
+                await ws.send_json(event)
+
+        pusher = asyncio.create_task(_push())
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.ERROR:
+                    break
+        finally:
+            pusher.cancel()
+            self.exchange.unsubscribe(channel, q)
+        return ws
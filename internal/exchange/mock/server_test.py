@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+from binance.exceptions import BinanceAPIException
+
+from internal.exchange import (
+    BinanceAsyncClient,
+    BinanceStreamManager,
+    LocalOrderBook,
+    UserDataStream,
+)
+from internal.exchange.mock import MockBinanceServer, MockExchange, SymbolRules
+
+
+@pytest.fixture
+async def server():
+    exchange = MockExchange(
+        [SymbolRules(symbol="BTCUSDT", base_asset="BTC", quote_asset="USDT")],
+        balances={"USDT": "100000", "BTC": "1"},
+        order_limit_per_10s=10,
+    )
+    exchange.set_book(
+        "BTCUSDT",
+        bids=[("29999.00", "1.0"), ("29998.00", "2.0")],
+        asks=[("30001.00", "0.5"), ("30002.00", "2.0")],
+    )
+    server = MockBinanceServer(exchange, latency_in_ms=1, jitter_in_ms=0.5)
+    await server.start()
+    yield server
+    await server.stop()
+
+
+@pytest.fixture
+async def aclient(server):
+    aclient = BinanceAsyncClient(api_key="key", api_secret="secret", api_url=server.api_url, stream_url=server.stream_url)
+    yield aclient
+    await aclient.close_connection()
+
+
+async def test_market_order_walks_the_book(server, aclient):
+    resp = await aclient.create_order(symbol="BTCUSDT", side="BUY", type="MARKET", quantity="1.00000")
+    assert resp["status"] == "FILLED"
+    assert [(f["price"], f["qty"]) for f in resp["fills"]] == [("30001.00000000", "0.50000000"), ("30002.00000000", "0.50000000")]
+    book = await aclient.get_order_book(symbol="BTCUSDT", limit=5)
+    assert book["asks"] == [["30002.00000000", "1.50000000"]]
+    assert int(aclient.response.headers["X-MBX-USED-WEIGHT-1M"]) == 6
+
+
+async def test_filters_and_order_rate_limit(server, aclient):
+    with pytest.raises(BinanceAPIException) as e:
+        await aclient.order_limit_buy(symbol="BTCUSDT", quantity="0.001", price="29000.001")
+    assert e.value.code == -1013 and "PRICE_FILTER" in e.value.message
+    with pytest.raises(BinanceAPIException) as e:
+        await aclient.order_limit_buy(symbol="BTCUSDT", quantity="0.0001", price="29000.00")
+    assert e.value.code == -1013 and "NOTIONAL" in e.value.message
+
+    # The two rejected orders counted too.
+    for i in range(8):
+        await aclient.order_limit_buy(symbol="BTCUSDT", quantity="0.001", price=f"{29000 - i}.00")
+    assert aclient.response.headers["X-MBX-ORDER-COUNT-10S"] == "10"
+    with pytest.raises(BinanceAPIException) as e:
+        await aclient.order_limit_buy(symbol="BTCUSDT", quantity="0.001", price="28000.00")
+    assert e.value.status_code == 429 and e.value.code == -1015
+
+
+async def test_streams_follow_scripted_market(server, aclient):
+    sock_mgr = BinanceStreamManager(client=aclient)
+    stream = UserDataStream(sock_mgr=sock_mgr)
+    book = LocalOrderBook(aclient=aclient, sock_mgr=sock_mgr, symbol="BTCUSDT")
+    assert await stream.start()
+    assert await book.start(timeout=5)
+    try:
+        await aclient.order_limit_sell(symbol="BTCUSDT", quantity="0.5", price="30100.00", newClientOrderId="grid-1")
+        server.exchange.update_book("BTCUSDT", bids=[("30100.00", "0.2"), ("30150.00", "0.4")])
+        state = await stream.wait_for_final("grid-1", timeout=5)
+        assert state is not None and state.status == "FILLED"
+        assert state.price == "30100.00000000"
+
+        # The 0.4 at 30150 filled the order, the rest of the book is mirrored locally.
+        for _ in range(100):
+            if book.last_update_id == server.exchange.depth("BTCUSDT")["lastUpdateId"]:
+                break
+            await asyncio.sleep(0.01)
+        assert book.top(5) == server.exchange.depth("BTCUSDT", 5)
+        free, locked = server.exchange.balance_of("BTC")
+        assert (str(free), str(locked)) == ("0.5", "0.0")
+    finally:
+        await book.stop()
+        await stream.stop()
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import bisect
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from binance.client import AsyncClient as AsyncBinanceRestAPIClient
+from binance.exceptions import BinanceAPIException, BinanceRequestException
+from binance.streams import BinanceSocketManager
+from loguru import logger as loguru_logger
+
+
+class _BookSide:
+    """
+    One side of the order book, price levels are kept in an ascending array
+    with their (price, quantity) strings in a dict keyed by price.
+    """
+
+    def __init__(self, descending: bool):
+        self._descending = descending
+        self._prices: List[float] = []
+        self._levels: Dict[float, Tuple[str, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._prices)
+
+    def clear(self):
+        self._prices.clear()
+        self._levels.clear()
+
+    def update(self, price_str: str, qty_str: str):
+        price = float(price_str)
+        if float(qty_str) == 0:
+            if price in self._levels:
+                del self._levels[price]
+                del self._prices[bisect.bisect_left(self._prices, price)]
+            return
+        if price not in self._levels:
+            bisect.insort(self._prices, price)
+        self._levels[price] = (price_str, qty_str)
+
+    def best(self) -> Optional[Tuple[str, str]]:
+        if len(self._prices) == 0:
+            return None
+        return self._levels[self._prices[-1] if self._descending else self._prices[0]]
+
+    def top(self, n: int) -> List[List[str]]:
+        if self._descending:
+            prices = self._prices[:-n - 1:-1] if n < len(self._prices) else self._prices[::-1]
+        else:
+            prices = self._prices[:n]
+        return [list(self._levels[p]) for p in prices]
+
+
+class LocalOrderBook:
+    """
+    本地L2订单簿
+
+    Takes one REST snapshot, then applies the '<symbol>@depth@100ms' diff
+    events of the websocket stream on top of it, following the update-id
+    sequencing rules of Binance:
+
+    1. Events received before the snapshot are buffered.
+    2. Events with 'u' <= lastUpdateId of the book are dropped.
+    3. The next event must satisfy 'U' <= lastUpdateId + 1 <= 'u',
+       otherwise updates were lost, the book is dropped and resynced from
+       a new snapshot.
+
+    When the depth socket fails the book is dropped and the stream
+    reconnects, after a backoff doubling from 'reconnect_backoff_in_sec' up
+    to 'max_reconnect_backoff_in_sec', then resyncs from a new snapshot.
+    After 'max_reconnects' failures in a row the book is dead, see is_dead.
+    """
+
+    def __init__(
+        self,
+        aclient: AsyncBinanceRestAPIClient,
+        sock_mgr: BinanceSocketManager,
+        symbol: str,
+        snapshot_limit: int = 1000,
+        max_reconnects: int = 10,
+        reconnect_backoff_in_sec: float = 0.5,
+        max_reconnect_backoff_in_sec: float = 30.0,
+    ):
+        self._aclient = aclient
+        self._sock_mgr = sock_mgr
+        self._symbol = symbol
+        self._snapshot_limit = snapshot_limit
+        self._bids = _BookSide(descending=True)
+        self._asks = _BookSide(descending=False)
+        self._last_update_id = 0
+        self._synced = False
+        self._buffer: List[Dict[str, Any]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._snapshot_task: Optional[asyncio.Task] = None
+        self._synced_event = asyncio.Event()
+        self._dead = asyncio.Event()
+        self._max_reconnects = max_reconnects
+        self._reconnect_backoff_in_sec = reconnect_backoff_in_sec
+        self._max_reconnect_backoff_in_sec = max_reconnect_backoff_in_sec
+        self.resyncs = 0
+        self.reconnects = 0
+
+    @property
+    def symbol(self) -> str:
+        return self._symbol
+
+    @property
+    def is_synced(self) -> bool:
+        return self._synced
+
+    @property
+    def is_dead(self) -> bool:
+        """True once the depth stream gave up reconnecting, the book is never synced again."""
+        return self._dead.is_set()
+
+    @property
+    def last_update_id(self) -> int:
+        return self._last_update_id
+
+    async def start(self, timeout: float = 10.0) -> bool:
+        """Connect the depth stream, return once the book is in sync."""
+        if self._task is None or self._task.done():
+            self._dead.clear()
+            self._task = asyncio.create_task(self._feed_depth())
+        synced = asyncio.ensure_future(self._synced_event.wait())
+        dead = asyncio.ensure_future(self._dead.wait())
+        try:
+            await asyncio.wait((synced, dead), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            synced.cancel()
+            dead.cancel()
+        if not self._synced_event.is_set():
+            loguru_logger.error(f"Failed to sync the Order Book for the {self._symbol} market in {timeout} secs.")
+            return False
+        return True
+
+    async def stop(self):
+        await self._cancel_snapshot()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        self._reset()
+
+    def best_bid(self) -> Optional[Tuple[str, str]]:
+        return self._bids.best()
+
+    def best_ask(self) -> Optional[Tuple[str, str]]:
+        return self._asks.best()
+
+    def top(self, n: int = 5) -> Dict[str, Any]:
+        """Top n levels, in the same format as AsyncClient.get_order_book."""
+        return {
+            "lastUpdateId": self._last_update_id,
+            "bids": self._bids.top(n),
+            "asks": self._asks.top(n),
+        }
+
+    def apply_snapshot(self, snapshot: Dict[str, Any]) -> bool:
+        """Load a REST snapshot and replay the buffered events on top of it."""
+        last_update_id = snapshot["lastUpdateId"]
+        if len(self._buffer) > 0 and last_update_id < self._buffer[0]["U"] - 1:
+            # The snapshot is older than the first buffered event, a newer one is needed.
+            return False
+        self._bids.clear()
+        self._asks.clear()
+        for price, qty in snapshot["bids"]:
+            self._bids.update(price, qty)
+        for price, qty in snapshot["asks"]:
+            self._asks.update(price, qty)
+        self._last_update_id = last_update_id
+        self._synced = True
+        buffered, self._buffer = self._buffer, []
+        for event in buffered:
+            if not self.on_depth_event(event):
+                return False
+        self._synced_event.set()
+        return True
+
+    def on_depth_event(self, event: Dict[str, Any]) -> bool:
+        """Apply a diff event, False if the book is out of sync and must be resynced."""
+        if not self._synced:
+            self._buffer.append(event)
+            return False
+        if event["u"] <= self._last_update_id:
+            return True
+        if event["U"] > self._last_update_id + 1:
+            loguru_logger.warning(
+                f"Lost depth updates of {self._symbol} between {self._last_update_id} and {event['U']}, resync the Order Book."
+            )
+            self._reset()
+            self._buffer.append(event)
+            self.resyncs += 1
+            return False
+        for price, qty in event["b"]:
+            self._bids.update(price, qty)
+        for price, qty in event["a"]:
+            self._asks.update(price, qty)
+        self._last_update_id = event["u"]
+        return True
+
+    def _reset(self):
+        self._synced = False
+        self._synced_event.clear()
+        self._bids.clear()
+        self._asks.clear()
+        self._last_update_id = 0
+
+    async def _sync_from_snapshot(self):
+        while not self._synced:
+            snapshot = None
+            try:
+                snapshot = await self._aclient.get_order_book(symbol=self._symbol, limit=self._snapshot_limit)
+            except (BinanceRequestException, BinanceAPIException) as e:
+                loguru_logger.error(f"Failed to get the Order Book snapshot for the {self._symbol} market, binance's exception:{e}.")
+            except Exception as e:
+                loguru_logger.error(f"Failed to get the Order Book snapshot for the {self._symbol} market, internal exception:{e}.")
+            if snapshot is not None and self.apply_snapshot(snapshot):
+                loguru_logger.debug(f"Synced the Order Book for the {self._symbol} market at update id:{self._last_update_id}.")
+                break
+            await asyncio.sleep(1)
+
+    async def _cancel_snapshot(self):
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            try:
+                await self._snapshot_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._snapshot_task = None
+
+    async def _feed_depth(self):
+        failures = 0
+        while 1:
+            try:
+                sock_client = self._sock_mgr.depth_socket(symbol=self._symbol, interval=100)
+                async with sock_client:
+                    loguru_logger.debug(f"Ready to receive depth updates<symbol:{self._symbol}>...")
+                    # Events are buffered from now on, the snapshot can be taken without waiting for
+                    # the first one, which may never come on a quiet market.
+                    self._snapshot_task = asyncio.create_task(self._sync_from_snapshot())
+                    connected_at = time.monotonic()
+                    await self._receive_depth(sock_client)
+                    # A connection which lasted is not one more failure in a row.
+                    if time.monotonic() - connected_at >= self._max_reconnect_backoff_in_sec:
+                        failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                loguru_logger.error(f"Failed to connect depth stream<symbol:{self._symbol}>, binance's exception:{e}.")
+            finally:
+                # A snapshot taken now would sync the book with no stream to keep it up to date.
+                await self._cancel_snapshot()
+                self._reset()
+                self._buffer.clear()
+            failures += 1
+            if failures > self._max_reconnects:
+                loguru_logger.critical(f"Order Book for the {self._symbol} market is dead after {self._max_reconnects} failed reconnects.")
+                self._dead.set()
+                return
+            backoff = min(self._reconnect_backoff_in_sec * 2 ** (failures - 1), self._max_reconnect_backoff_in_sec)
+            loguru_logger.warning(f"Reconnect depth stream<symbol:{self._symbol}> in {backoff:.1f} secs ({failures}/{self._max_reconnects})...")
+            await asyncio.sleep(backoff)
+            self.reconnects += 1
+
+    async def _receive_depth(self, sock_client: Any):
+        """Apply the diff events until the socket fails."""
+        while 1:
+            try:
+                msg = await sock_client.recv()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                loguru_logger.error(f"Failed to receive depth updates<symbol:{self._symbol}> anymore, binance's exception:{e}.")
+                return
+            if msg is None:
+                continue
+            if msg.get("e") == "error":
+                loguru_logger.error(f"Failed to receive depth updates<symbol:{self._symbol}> anymore, binance's error:{msg.get('m')}.")
+                return
+            if msg.get("e") != "depthUpdate":
+                continue
+            if not self.on_depth_event(msg) and (self._snapshot_task is None or self._snapshot_task.done()):
+                self._snapshot_task = asyncio.create_task(self._sync_from_snapshot())
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+from internal.exchange.order_book import LocalOrderBook
+
+
+def depth_update(first_id, last_id, bids=(), asks=()):
+    return {
+        "e": "depthUpdate",
+        "E": 1672515782136,
+        "s": "BTCUSDT",
+        "U": first_id,
+        "u": last_id,
+        "b": [list(level) for level in bids],
+        "a": [list(level) for level in asks],
+    }
+
+
+SNAPSHOT = {
+    "lastUpdateId": 100,
+    "bids": [["30000.00", "1.0"], ["29999.00", "2.0"], ["29998.00", "3.0"]],
+    "asks": [["30001.00", "1.5"], ["30002.00", "2.5"], ["30003.00", "3.5"]],
+}
+
+
+def test_buffered_events_are_replayed_on_snapshot():
+    book = LocalOrderBook(aclient=None, sock_mgr=None, symbol="BTCUSDT")
+    # Already contained in the snapshot.
+    assert not book.on_depth_event(depth_update(95, 99, bids=[("29000.00", "9.0")]))
+    # Straddles the snapshot.
+    assert not book.on_depth_event(depth_update(100, 102, bids=[("30000.00", "0")], asks=[("30000.50", "0.1")]))
+    assert not book.on_depth_event(depth_update(103, 103, asks=[("30002.00", "0.0")]))
+
+    assert book.apply_snapshot(SNAPSHOT)
+    assert book.is_synced
+    assert book.last_update_id == 103
+    assert book.best_bid() == ("29999.00", "2.0")
+    assert book.best_ask() == ("30000.50", "0.1")
+    assert book.top(2) == {
+        "lastUpdateId": 103,
+        "bids": [["29999.00", "2.0"], ["29998.00", "3.0"]],
+        "asks": [["30000.50", "0.1"], ["30001.00", "1.5"]],
+    }
+
+
+def test_stale_snapshot_is_rejected():
+    book = LocalOrderBook(aclient=None, sock_mgr=None, symbol="BTCUSDT")
+    book.on_depth_event(depth_update(150, 160))
+    assert not book.apply_snapshot(SNAPSHOT)
+    assert not book.is_synced
+
+
+def test_gap_in_update_ids_triggers_resync():
+    book = LocalOrderBook(aclient=None, sock_mgr=None, symbol="BTCUSDT")
+    assert book.apply_snapshot(SNAPSHOT)
+    assert book.on_depth_event(depth_update(101, 105, bids=[("30000.00", "4.0")]))
+    assert book.best_bid() == ("30000.00", "4.0")
+
+    assert not book.on_depth_event(depth_update(107, 110))
+    assert not book.is_synced
+    assert book.resyncs == 1
+    assert book.best_bid() is None
+
+    # The event which revealed the gap is replayed once a fresh snapshot arrives.
+    assert book.apply_snapshot({"lastUpdateId": 108, "bids": [["30010.00", "1.0"]], "asks": [["30011.00", "1.0"]]})
+    assert book.last_update_id == 110
+    assert book.top(5)["bids"] == [["30010.00", "1.0"]]
+
+
+class FakeDepthSocket:
+    def __init__(self, msgs=()):
+        self.msgs = asyncio.Queue()
+        for msg in msgs:
+            self.msgs.put_nowait(msg)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def recv(self):
+        msg = await self.msgs.get()
+        if isinstance(msg, Exception):
+            raise msg
+        return msg
+
+
+class FakeSocketManager:
+    def __init__(self, sockets):
+        self._sockets = list(sockets)
+        self.opened = 0
+
+    def depth_socket(self, symbol, interval):
+        self.opened += 1
+        if len(self._sockets) == 0:
+            raise ConnectionError("depth stream unavailable")
+        return self._sockets.pop(0)
+
+
+class FakeAsyncClient:
+    def __init__(self, snapshots):
+        self._snapshots = list(snapshots)
+        self.requested = 0
+
+    async def get_order_book(self, symbol, limit):
+        self.requested += 1
+        if len(self._snapshots) == 0:
+            await asyncio.sleep(3600)
+        return self._snapshots.pop(0)
+
+
+async def test_resyncs_after_depth_socket_failure():
+    first, second = FakeDepthSocket([depth_update(101, 105)]), FakeDepthSocket()
+    sock_mgr = FakeSocketManager([first, second])
+    snapshot = {"lastUpdateId": 200, "bids": [["30000.00", "1.0"]], "asks": [["30200.00", "1.0"]]}
+    book = LocalOrderBook(aclient=FakeAsyncClient([SNAPSHOT, snapshot]), sock_mgr=sock_mgr, symbol="BTCUSDT", reconnect_backoff_in_sec=0.01)
+    try:
+        assert await book.start(timeout=1)
+        await asyncio.sleep(0.01)
+        assert book.last_update_id == 105
+
+        first.msgs.put_nowait(ConnectionResetError("reset"))
+        second.msgs.put_nowait(depth_update(201, 202, bids=[("30100.00", "1.0")]))
+        await asyncio.sleep(0.1)
+        # The events sent in between are lost, the book is resynced from a new snapshot.
+        assert book.reconnects == 1 and sock_mgr.opened == 2
+        assert await book.start(timeout=1)
+        assert book.last_update_id == 202
+        assert book.best_bid() == ("30100.00", "1.0")
+        assert not book.is_dead
+    finally:
+        await book.stop()
+
+
+async def test_dead_book_is_never_synced():
+    # The snapshot only arrives after the socket is gone.
+    aclient = FakeAsyncClient([])
+    sock_mgr = FakeSocketManager([FakeDepthSocket([ConnectionResetError("reset")])])
+    book = LocalOrderBook(aclient=aclient, sock_mgr=sock_mgr, symbol="BTCUSDT", max_reconnects=2, reconnect_backoff_in_sec=0.01)
+    try:
+        assert not await book.start(timeout=1)
+        assert book.is_dead and not book.is_synced
+        assert sock_mgr.opened == 3
+        assert book._snapshot_task is None
+        # A late snapshot cannot sync the book, the snapshot task was cancelled with the socket.
+        aclient._snapshots.append(SNAPSHOT)
+        await asyncio.sleep(0.05)
+        assert not book.is_synced
+    finally:
+        await book.stop()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from binance.client import AsyncClient as AsyncBinanceRestAPIClient
+from binance.exceptions import BinanceAPIException, BinanceRequestException
+from loguru import logger as loguru_logger
+
+
+@dataclass
+class PrewarmStats:
+    """
+    -   'connections' is the number of concurrent pings of every round, as
+        many connections are kept in the pool of the client.
+    -   'pings' / 'failed' count all the pings sent and those which failed.
+    -   'cold_rtt_in_ms' is the median round trip of the first round, which
+        paid the DNS lookup and the TCP and TLS handshakes.
+    -   'warm_rtt_in_ms' is the median round trip of the later rounds, on
+        connections already open.
+    -   'saved_in_ms' is what the first order saves by leaving on a warm
+        connection, the difference of both.
+    """
+    connections: int = 0
+    pings: int = 0
+    failed: int = 0
+    cold_rtt_in_ms: float = 0.0
+    warm_rtt_in_ms: float = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"PrewarmStats(connections={self.connections}, pings={self.pings}, failed={self.failed}, "
+            f"cold_rtt={self.cold_rtt_in_ms:.2f}ms, warm_rtt={self.warm_rtt_in_ms:.2f}ms, saved={self.saved_in_ms:.2f}ms)"
+        )
+
+    @property
+    def saved_in_ms(self) -> float:
+        return max(0.0, self.cold_rtt_in_ms - self.warm_rtt_in_ms)
+
+
+def _median(values: List[float]) -> float:
+    if len(values) == 0:
+        return 0.0
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+class ConnectionPrewarmer:
+    """
+    连接预热
+
+    Opens 'connections' connections to the API host of the client by
+    sending as many pings at once (weight 1 each), then pings them again
+    every 'keepalive_interval_in_sec', below the 15 secs aiohttp keeps an
+    idle connection, until shortly before the instant the connections are
+    warmed for. A time-critical request then finds an open connection in
+    the pool instead of paying the handshakes.
+    """
+
+    def __init__(
+        self,
+        aclient: AsyncBinanceRestAPIClient,
+        *,
+        connections: int = 4,
+        keepalive_interval_in_sec: float = 5.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        if connections <= 0 or keepalive_interval_in_sec <= 0:
+            raise ValueError("connections and keepalive_interval_in_sec must be positive.")
+        self._aclient = aclient
+        self._connections = connections
+        self._keepalive_interval_in_sec = keepalive_interval_in_sec
+        self._clock = clock
+        self._cold_rtts: List[float] = []
+        self._warm_rtts: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+        self.stats = PrewarmStats(connections=connections)
+
+    async def _ping(self) -> Optional[float]:
+        st = time.perf_counter()
+        try:
+            await self._aclient.ping()
+        except (BinanceRequestException, BinanceAPIException) as e:
+            loguru_logger.error(f"Failed to ping for the connection pre-warming, binance's exception:{e}.")
+            return None
+        except Exception as e:
+            loguru_logger.error(f"Failed to ping for the connection pre-warming, internal exception:{e}.")
+            return None
+        return (time.perf_counter() - st) * 1000
+
+    async def ping_round(self) -> int:
+        """Ping on all the connections at once, return how many pings succeeded."""
+        rtts = await asyncio.gather(*[self._ping() for _ in range(self._connections)])
+        ok = [rtt for rtt in rtts if rtt is not None]
+        # The first round opens the connections, the later ones reuse them.
+        (self._cold_rtts if self.stats.pings == 0 else self._warm_rtts).extend(ok)
+        self.stats.pings += len(rtts)
+        self.stats.failed += len(rtts) - len(ok)
+        self.stats.cold_rtt_in_ms = _median(self._cold_rtts)
+        self.stats.warm_rtt_in_ms = _median(self._warm_rtts)
+        return len(ok)
+
+    async def warm(self) -> bool:
+        """Open the connections and verify them with a second round, False if no ping succeeded."""
+        if await self.ping_round() == 0:
+            return False
+        return await self.ping_round() > 0
+
+    async def keep_warm_until(self, deadline: float, quiet_in_sec: float = 0.5):
+        """
+        Ping every 'keepalive_interval_in_sec' until 'quiet_in_sec' before
+        'deadline' (in the time of 'clock'), so no ping holds a connection
+        when the deadline comes.
+        """
+        while 1:
+            remaining = deadline - quiet_in_sec - self._clock()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(self._keepalive_interval_in_sec, remaining))
+            if deadline - quiet_in_sec - self._clock() > 0:
+                await self.ping_round()
+
+    def start(self, deadline: float, quiet_in_sec: float = 0.5):
+        """Keep the connections warm in the background until shortly before 'deadline'."""
+        self._task = asyncio.create_task(self.keep_warm_until(deadline, quiet_in_sec))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
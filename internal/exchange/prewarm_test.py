@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+from internal.exchange import BinanceAsyncClient, ConnectionPrewarmer, PrewarmStats
+from internal.exchange.mock import MockBinanceServer, MockExchange, SymbolRules
+
+
+@pytest.fixture
+async def server():
+    exchange = MockExchange([SymbolRules(symbol="BTCUSDT", base_asset="BTC", quote_asset="USDT")])
+    server = MockBinanceServer(exchange, latency_in_ms=1, jitter_in_ms=0.5)
+    await server.start()
+    yield server
+    await server.stop()
+
+
+async def test_warm_and_keep_warm(server):
+    aclient = BinanceAsyncClient(api_key="key", api_secret="secret", api_url=server.api_url)
+    prewarmer = ConnectionPrewarmer(aclient, connections=3, keepalive_interval_in_sec=0.05)
+    try:
+        assert await prewarmer.warm()
+        assert (prewarmer.stats.pings, prewarmer.stats.failed) == (6, 0)
+        # The pool holds the connections the pings opened at once.
+        assert len(aclient.session.connector._conns[next(iter(aclient.session.connector._conns))]) == 3
+
+        prewarmer.start(time.time() + 0.3, quiet_in_sec=0.1)
+        await prewarmer._task
+        # Rounds every 0.05s, none in the last 0.1s.
+        assert 9 <= prewarmer.stats.pings <= 15 and prewarmer.stats.pings % 3 == 0
+        assert prewarmer.stats.warm_rtt_in_ms > 0
+    finally:
+        await prewarmer.stop()
+        await aclient.close_connection()
+
+
+def test_saved_time():
+    stats = PrewarmStats(connections=2, cold_rtt_in_ms=80.0, warm_rtt_in_ms=20.0)
+    assert stats.saved_in_ms == 60.0
+    assert "saved=60.00ms" in str(stats)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import hashlib
+from typing import Any, Dict, Mapping, Optional
+
+from loguru import logger as loguru_logger
+
+from internal.infra.ratelimiter import CompositeLimit
+
+# Usage headers of the Binance spot REST API, mapped to the buckets of binance_spot_limits().
+BINANCE_USAGE_HEADERS: Dict[str, str] = {
+    "X-MBX-USED-WEIGHT-1M": "weight",
+    "X-MBX-ORDER-COUNT-10S": "orders_10s",
+    "X-MBX-ORDER-COUNT-1D": "orders_1d",
+}
+
+
+def account_key(api_key: str) -> str:
+    """
+    The key of the rate limits of the account of 'api_key' in a limiter,
+    the API key itself is never written to redis.
+    """
+    return "account:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class UsageSync:
+    """
+    限频用量同步
+
+    A response hook of BinanceAsyncClient which reads the usage Binance
+    reports in the headers of every response (request weight, new orders
+    per 10s and per day, and Retry-After on 429/418) and tightens the
+    buckets of 'composite' for 'key' in the rate limiter with it, the
+    account_key of the API key of the client. With a RateLimiter on a
+    shared redis, every process on the same API key then throttles on what
+    the server counted for all of them, and only them.
+
+    The hook itself only keeps the highest usage seen, a background task
+    hands it to the limiter, so a response never waits for redis and a
+    burst of responses costs one script call.
+    """
+
+    def __init__(self, limiter: Any, composite: CompositeLimit, key: str, headers: Optional[Dict[str, str]] = None):
+        self._limiter = limiter
+        self._composite = composite
+        self._key = key
+        self._headers = {
+            header: bucket
+            for header, bucket in (headers if headers is not None else BINANCE_USAGE_HEADERS).items()
+            if bucket in composite.buckets
+        }
+        self._used: Dict[str, int] = {}
+        self._blocked_for_in_sec = 0.0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.synced = 0
+        self.failed = 0
+
+    @property
+    def limiter(self) -> Any:
+        return self._limiter
+
+    @limiter.setter
+    def limiter(self, limiter: Any):
+        self._limiter = limiter
+
+    def __call__(self, response: Any):
+        self.observe(response.status, response.headers)
+
+    def observe(self, status: int, headers: Mapping[str, str]):
+        """Keep the usage reported by one response, to be synced soon."""
+        seen = False
+        for header, bucket in self._headers.items():
+            value = headers.get(header)
+            if value is None:
+                continue
+            try:
+                used = int(value)
+            except ValueError:
+                continue
+            # Responses may come back out of order, the highest count of a window is the latest.
+            if used > self._used.get(bucket, -1):
+                self._used[bucket] = used
+            seen = True
+        if status in (418, 429):
+            retry_after = headers.get("Retry-After")
+            if retry_after is not None and retry_after.isdigit():
+                self._blocked_for_in_sec = max(self._blocked_for_in_sec, float(retry_after))
+                seen = True
+        if not seen:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+
+    async def sync(self) -> bool:
+        """Hand the pending usage to the limiter, False if it failed and was dropped."""
+        if len(self._used) == 0 and self._blocked_for_in_sec <= 0:
+            return True
+        used, self._used = self._used, {}
+        blocked_for_in_sec, self._blocked_for_in_sec = self._blocked_for_in_sec, 0.0
+        try:
+            _, error = await self._limiter.aset_usage(self._key, self._composite, used, blocked_for_in_sec)
+        except Exception as e:
+            error = e
+        if error is not None:
+            # The next response reports a fresher usage anyway.
+            self.failed += 1
+            loguru_logger.error(f"Failed to sync the usage<key:{self._key}> of the Binance rate limits, internal exception:{error}.")
+            return False
+        self.synced += 1
+        return True
+
+    async def close(self):
+        """Stop the background task and sync what is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        await self.sync()
+
+    async def _run(self):
+        while 1:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await self.sync()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+from binance.exceptions import BinanceAPIException
+
+from internal.exchange import BinanceAsyncClient, UsageSync, account_key
+from internal.exchange.mock import MockBinanceServer, MockExchange, SymbolRules
+from internal.infra.ratelimiter import MemoryRateLimiter, binance_spot_limits
+
+
+@pytest.fixture
+async def server():
+    exchange = MockExchange(
+        [SymbolRules(symbol="BTCUSDT", base_asset="BTC", quote_asset="USDT")],
+        balances={"USDT": "100000", "BTC": "1"},
+        weight_limit_per_minute=100,
+        # A frozen clock keeps the whole test in one window of the counters.
+        clock=lambda now=time.time(): now,
+    )
+    exchange.set_book("BTCUSDT", bids=[("29999.00", "1.0")], asks=[("30001.00", "1.0")])
+    server = MockBinanceServer(exchange, latency_in_ms=1, jitter_in_ms=0.5)
+    await server.start()
+    yield server
+    await server.stop()
+
+
+async def test_usage_headers_tighten_the_limiter(server):
+    limiter = MemoryRateLimiter()
+    limits = binance_spot_limits(weight_per_minute=100, orders_per_10s=10)
+    key = account_key("key")
+    usage_sync = UsageSync(limiter, limits, key=key)
+    aclient = BinanceAsyncClient(api_key="key", api_secret="secret", api_url=server.api_url, response_hooks=[usage_sync])
+    try:
+        # Another process on the key, which does not share the limiter.
+        other = BinanceAsyncClient(api_key="key", api_secret="secret", api_url=server.api_url)
+        for i in range(3):
+            await other.order_limit_buy(symbol="BTCUSDT", quantity="0.001", price=f"{29000 - i}.00")
+        await other.close_connection()
+
+        await aclient.order_limit_buy(symbol="BTCUSDT", quantity="0.001", price="28000.00")
+        await usage_sync.sync()
+        # 4 orders of weight 1 counted by the server, none charged locally.
+        result, _ = limiter.allow_composite(key, limits, endpoint="GET /ping")
+        assert result.remaining == {"weight": 95}
+        result, _ = limiter.allow_composite(key, limits, costs={"orders_10s": 0})
+        assert result.remaining == {"orders_10s": 6}
+        # The usage of the key does not touch the budget of another account.
+        result, _ = limiter.allow_composite(account_key("another key"), limits, endpoint="GET /ping")
+        assert result.remaining == {"weight": 99}
+
+        # The weight limit is exceeded, Retry-After blocks the whole account.
+        with pytest.raises(BinanceAPIException) as e:
+            for _ in range(5):
+                await aclient.get_account()
+        assert e.value.code == -1003
+        await usage_sync.close()
+        assert usage_sync.failed == 0
+        result, _ = limiter.allow_composite(key, limits, endpoint="GET /ping")
+        assert (result.allowed, result.limited_by) == (False, "weight")
+        assert result.retry_after_in_sec > 60
+    finally:
+        await aclient.close_connection()
+
+
+async def test_failing_hook_does_not_break_requests(server):
+    def broken(response):
+        raise RuntimeError("broken hook")
+
+    seen = []
+    aclient = BinanceAsyncClient(api_key="key", api_secret="secret", api_url=server.api_url, response_hooks=[broken])
+    aclient.add_response_hook(lambda response: seen.append(response.status))
+    try:
+        assert await aclient.get_server_time()
+        assert seen == [200]
+    finally:
+        await aclient.close_connection()
+
+
+def test_account_key():
+    assert account_key("key") == account_key("key")
+    assert account_key("key") != account_key("another key")
+    # A hash, not the API key.
+    assert account_key("key") == "account:2c70e12b7a0646f9"
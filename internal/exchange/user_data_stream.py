@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from binance.streams import BinanceSocketManager
+from loguru import logger as loguru_logger
+
+# Order status after which an order never changes again.
+FINAL_ORDER_STATUSES = frozenset(["FILLED", "CANCELED", "EXPIRED", "EXPIRED_IN_MATCH", "REJECTED"])
+
+
+@dataclass
+class OrderState:
+    """
+    订单状态，由executionReport事件更新
+    """
+    client_order_id: str
+    order_id: int
+    symbol: str
+    side: str
+    order_type: str
+    status: str
+    price: str
+    orig_qty: str
+    executed_qty: str
+    cummulative_quote_qty: str
+    last_executed_qty: str
+    last_executed_price: str
+    update_time: int
+
+    @property
+    def is_final(self) -> bool:
+        return self.status in FINAL_ORDER_STATUSES
+
+    @staticmethod
+    def from_execution_report(msg: Dict[str, Any]) -> "OrderState":
+        # For cancellations 'c' is the clientOrderId of the cancel request, and
+        # 'C' carries the clientOrderId of the original order.
+        client_order_id = msg.get("C") or msg["c"]
+        return OrderState(
+            client_order_id=client_order_id,
+            order_id=msg["i"],
+            symbol=msg["s"],
+            side=msg["S"],
+            order_type=msg["o"],
+            status=msg["X"],
+            price=msg["p"],
+            orig_qty=msg["q"],
+            executed_qty=msg["z"],
+            cummulative_quote_qty=msg["Z"],
+            last_executed_qty=msg["l"],
+            last_executed_price=msg["L"],
+            update_time=msg["T"],
+        )
+
+    @staticmethod
+    def from_order(order: Dict[str, Any]) -> "OrderState":
+        """From a REST order response, like the ones of get_order or get_open_orders."""
+        return OrderState(
+            client_order_id=order["clientOrderId"],
+            order_id=order["orderId"],
+            symbol=order["symbol"],
+            side=order["side"],
+            order_type=order["type"],
+            status=order["status"],
+            price=order["price"],
+            orig_qty=order["origQty"],
+            executed_qty=order["executedQty"],
+            cummulative_quote_qty=order["cummulativeQuoteQty"],
+            last_executed_qty=order["executedQty"],
+            last_executed_price=order["price"],
+            update_time=order.get("updateTime", order.get("transactTime", 0)),
+        )
+
+    def to_order(self) -> Dict[str, Any]:
+        """Render the state like a REST order response, as stored by MongoClient."""
+        return {
+            "clientOrderId": self.client_order_id,
+            "orderId": self.order_id,
+            "symbol": self.symbol,
+            "side": self.side,
+            "type": self.order_type,
+            "status": self.status,
+            "price": self.price,
+            "origQty": self.orig_qty,
+            "executedQty": self.executed_qty,
+            "cummulativeQuoteQty": self.cummulative_quote_qty,
+            "timeInForce": "GTC",
+            "transactTime": self.update_time,
+        }
+
+
+class UserDataStream:
+    """
+    币安用户数据流
+
+    Keeps an in-memory order-state table fed by 'executionReport' events of
+    the user data stream, and resolves the futures of callers waiting for an
+    order (keyed by clientOrderId) to reach a final status.
+
+    When the socket fails the stream reconnects with a new listenKey, after
+    a backoff doubling from 'reconnect_backoff_in_sec' up to
+    'max_reconnect_backoff_in_sec', and tells the reconnect listeners, as
+    the events sent in between are lost. After 'max_reconnects' failures
+    in a row the stream is dead, see is_dead and wait_dead.
+    """
+
+    def __init__(
+        self,
+        sock_mgr: BinanceSocketManager,
+        max_final_orders: int = 10000,
+        max_reconnects: int = 10,
+        reconnect_backoff_in_sec: float = 0.5,
+        max_reconnect_backoff_in_sec: float = 30.0,
+    ):
+        self._sock_mgr = sock_mgr
+        self._orders: Dict[str, OrderState] = {}
+        # Final orders are kept for late waiters, the oldest ones are evicted first.
+        self._final_orders: "OrderedDict[str, OrderState]" = OrderedDict()
+        self._max_final_orders = max_final_orders
+        self._waiters: Dict[str, asyncio.Future] = {}
+        self._listeners: List[Callable[[OrderState], None]] = []
+        self._reconnect_listeners: List[Callable[[], None]] = []
+        self._max_reconnects = max_reconnects
+        self._reconnect_backoff_in_sec = reconnect_backoff_in_sec
+        self._max_reconnect_backoff_in_sec = max_reconnect_backoff_in_sec
+        self._task: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+        # Set on the first connection, unlike _connected a failure right after does not clear it.
+        self._started = asyncio.Event()
+        self._dead = asyncio.Event()
+        self.reconnects = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def is_connected(self) -> bool:
+        return self.is_running and self._connected.is_set()
+
+    @property
+    def is_dead(self) -> bool:
+        """True once the stream gave up reconnecting, no order update arrives anymore."""
+        return self._dead.is_set()
+
+    async def wait_dead(self):
+        await self._dead.wait()
+
+    async def start(self, timeout: float = 10.0) -> bool:
+        """Connect the user data stream, return once it is able to receive events."""
+        if self.is_running:
+            return True
+        self._connected.clear()
+        self._started.clear()
+        self._dead.clear()
+        self._task = asyncio.create_task(self._feed_user_data())
+        try:
+            await asyncio.wait_for(self._started.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            loguru_logger.error(f"Failed to connect user data stream in {timeout} secs.")
+            await self.stop()
+            return False
+        return True
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        for fut in self._waiters.values():
+            if not fut.done():
+                fut.cancel()
+        self._waiters.clear()
+
+    def add_listener(self, listener: Callable[[OrderState], None]):
+        """Register a callback invoked on every executionReport, within the event loop."""
+        self._listeners.append(listener)
+
+    def add_reconnect_listener(self, listener: Callable[[], None]):
+        """Register a callback invoked once the stream is connected again, to look up what was missed."""
+        self._reconnect_listeners.append(listener)
+
+    def get(self, client_order_id: str) -> Optional[OrderState]:
+        state = self._orders.get(client_order_id)
+        if state is None:
+            state = self._final_orders.get(client_order_id)
+        return state
+
+    def track(self, client_order_id: str) -> asyncio.Future:
+        """Return a future resolved with the final OrderState of the order."""
+        fut = self._waiters.get(client_order_id)
+        if fut is None:
+            fut = asyncio.get_running_loop().create_future()
+            state = self._final_orders.get(client_order_id)
+            if state is not None:
+                fut.set_result(state)
+            else:
+                self._waiters[client_order_id] = fut
+        return fut
+
+    async def wait_for_final(self, client_order_id: str, timeout: Optional[float] = None) -> Optional[OrderState]:
+        """Wait for the order to reach a final status, None if timed out."""
+        fut = self.track(client_order_id)
+        try:
+            return await asyncio.wait_for(asyncio.shield(fut), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def on_execution_report(self, msg: Dict[str, Any]):
+        state = OrderState.from_execution_report(msg)
+        if state.is_final:
+            self._orders.pop(state.client_order_id, None)
+            self._final_orders[state.client_order_id] = state
+            self._final_orders.move_to_end(state.client_order_id)
+            while len(self._final_orders) > self._max_final_orders:
+                self._final_orders.popitem(last=False)
+            fut = self._waiters.pop(state.client_order_id, None)
+            if fut is not None and not fut.done():
+                fut.set_result(state)
+        else:
+            self._orders[state.client_order_id] = state
+        for listener in self._listeners:
+            try:
+                listener(state)
+            except Exception as e:
+                loguru_logger.error(f"Failed to notify order<order_id:{state.client_order_id}> listener, internal exception:{e}.")
+
+    async def _feed_user_data(self):
+        failures = 0
+        while 1:
+            try:
+                # A new user socket gets a new listenKey.
+                sock_client = self._sock_mgr.user_socket()
+                async with sock_client:
+                    self._connected.set()
+                    self._started.set()
+                    loguru_logger.debug("Ready to receive user data...")
+                    if self.reconnects > 0:
+                        self._notify_reconnected()
+                    connected_at = time.monotonic()
+                    await self._receive_user_data(sock_client)
+                    # A connection which lasted is not one more failure in a row.
+                    if time.monotonic() - connected_at >= self._max_reconnect_backoff_in_sec:
+                        failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                loguru_logger.error(f"Failed to connect user data stream, binance's exception:{e}.")
+            self._connected.clear()
+            failures += 1
+            if failures > self._max_reconnects:
+                loguru_logger.critical(f"User data stream is dead after {self._max_reconnects} failed reconnects, no order update will arrive anymore.")
+                self._dead.set()
+                return
+            backoff = min(self._reconnect_backoff_in_sec * 2 ** (failures - 1), self._max_reconnect_backoff_in_sec)
+            loguru_logger.warning(f"Reconnect user data stream in {backoff:.1f} secs ({failures}/{self._max_reconnects})...")
+            await asyncio.sleep(backoff)
+            self.reconnects += 1
+
+    async def _receive_user_data(self, sock_client: Any):
+        """Dispatch the events until the socket fails."""
+        while 1:
+            try:
+                msg = await sock_client.recv()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                loguru_logger.error(f"Failed to receive user data, binance's exception:{e}.")
+                return
+            if msg is None:
+                continue
+            if msg.get("e") == "executionReport":
+                self.on_execution_report(msg)
+            elif msg.get("e") == "error":
+                loguru_logger.error(f"Failed to receive user data, binance's error:{msg.get('m')}.")
+                return
+
+    def _notify_reconnected(self):
+        for listener in self._reconnect_listeners:
+            try:
+                listener()
+            except Exception as e:
+                loguru_logger.error(f"Failed to notify user data stream reconnect listener, internal exception:{e}.")
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+from internal.exchange.user_data_stream import UserDataStream
+
+
+def execution_report(client_order_id, status, executed_qty="0.00000000", orig_client_order_id=""):
+    return {
+        "e": "executionReport",
+        "E": 1499405658658,
+        "s": "BTCUSDT",
+        "c": client_order_id,
+        "S": "BUY",
+        "o": "LIMIT",
+        "q": "1.00000000",
+        "p": "30000.00000000",
+        "X": status,
+        "i": 4293153,
+        "l": executed_qty,
+        "z": executed_qty,
+        "L": "30000.00000000",
+        "Z": "0.00000000",
+        "T": 1499405658657,
+        "C": orig_client_order_id,
+    }
+
+
+async def test_wait_for_final_resolves_on_fill():
+    stream = UserDataStream(sock_mgr=None)
+    waiter = asyncio.create_task(stream.wait_for_final("order-1", timeout=1))
+    await asyncio.sleep(0)
+    stream.on_execution_report(execution_report("order-1", "NEW"))
+    assert stream.get("order-1").status == "NEW"
+    stream.on_execution_report(execution_report("order-1", "FILLED", executed_qty="1.00000000"))
+    state = await waiter
+    assert state.status == "FILLED"
+    assert state.to_order()["executedQty"] == "1.00000000"
+
+
+async def test_wait_for_final_after_fill_arrived():
+    stream = UserDataStream(sock_mgr=None)
+    stream.on_execution_report(execution_report("order-2", "FILLED", executed_qty="1.00000000"))
+    state = await stream.wait_for_final("order-2", timeout=0.1)
+    assert state is not None and state.status == "FILLED"
+
+
+async def test_wait_for_final_keys_cancellation_by_original_id():
+    stream = UserDataStream(sock_mgr=None)
+    stream.on_execution_report(execution_report("cancel-req", "CANCELED", orig_client_order_id="order-3"))
+    state = await stream.wait_for_final("order-3", timeout=0.1)
+    assert state is not None and state.status == "CANCELED"
+    assert await stream.wait_for_final("order-4", timeout=0.01) is None
+
+
+class FakeUserSocket:
+    def __init__(self, msgs):
+        self._msgs = list(msgs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def recv(self):
+        if len(self._msgs) == 0:
+            await asyncio.sleep(3600)
+        msg = self._msgs.pop(0)
+        if isinstance(msg, Exception):
+            raise msg
+        return msg
+
+
+class FakeSocketManager:
+    def __init__(self, sockets):
+        self._sockets = list(sockets)
+        self.opened = 0
+
+    def user_socket(self):
+        self.opened += 1
+        if len(self._sockets) == 0:
+            raise ConnectionError("listenKey unavailable")
+        return self._sockets.pop(0)
+
+
+async def test_reconnects_after_socket_failure():
+    sock_mgr = FakeSocketManager([
+        FakeUserSocket([execution_report("order-5", "NEW"), ConnectionResetError("reset")]),
+        FakeUserSocket([{"e": "error", "m": "Max reconnect retries reached"}]),
+        FakeUserSocket([execution_report("order-5", "FILLED", executed_qty="1.00000000")]),
+    ])
+    stream = UserDataStream(sock_mgr=sock_mgr, reconnect_backoff_in_sec=0.01)
+    reconnected = []
+    stream.add_reconnect_listener(lambda: reconnected.append(stream.reconnects))
+    try:
+        assert await stream.start(timeout=1)
+        state = await stream.wait_for_final("order-5", timeout=1)
+        assert state is not None and state.status == "FILLED"
+        assert sock_mgr.opened == 3 and reconnected == [1, 2]
+        assert stream.is_connected and not stream.is_dead
+    finally:
+        await stream.stop()
+
+
+async def test_dead_after_max_reconnects():
+    sock_mgr = FakeSocketManager([FakeUserSocket([ConnectionResetError("reset")])])
+    stream = UserDataStream(sock_mgr=sock_mgr, max_reconnects=3, reconnect_backoff_in_sec=0.01)
+    try:
+        assert await stream.start(timeout=1)
+        await asyncio.wait_for(stream.wait_dead(), timeout=1)
+        assert stream.is_dead and not stream.is_running
+        assert sock_mgr.opened == 4
+    finally:
+        await stream.stop()
@@ -1,37 +1,98 @@
 # -*- coding: utf-8 -*-
 import asyncio
-from typing import Any, Dict, Optional
+import importlib.util
+import os
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
 
 import httpx
 from loguru import logger as loguru_logger
 
+from .http_tracing import HttpTraceMetrics
+
+# HTTP/2 needs the h2 package (pip install httpx[http2]), without it the clients speak HTTP/1.1.
+H2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
 
 class HttpClient:
+    """
+    HTTP客户端
+
+    A sync and an async httpx client sharing the same settings:
+
+    -   HTTP/1.1 (default): a pool of at most 'max_connections'
+        connections, one request per connection at a time.
+    -   HTTP/2 ('http2'): one connection per host carries the concurrent
+        requests as streams, negotiated through ALPN on https so the hosts
+        without HTTP/2 are still served over HTTP/1.1. 'prior_knowledge'
+        speaks HTTP/2 from the start, also over plain http (h2c), for the
+        servers known to support it, without fallback. When h2 is not
+        installed the client falls back to HTTP/1.1.
+
+    In both modes at most 'max_concurrent_streams' requests per host are
+    in flight, the others wait for one to be done.
+    """
+
     _instance: Optional['HttpClient'] = None
     _client: Optional[httpx.Client] = None
     _aclient: Optional[httpx.AsyncClient] = None
 
     @staticmethod
     def get_instance() -> 'HttpClient':
+        """The client of the process, in HTTP/2 mode if the HTTP_CLIENT_HTTP2 env is set (1/true)."""
         if not HttpClient._instance:
-            HttpClient._instance = HttpClient()
+            HttpClient._instance = HttpClient(
+                http2=os.getenv("HTTP_CLIENT_HTTP2", "").lower() in ("1", "true"),
+                max_concurrent_streams=int(os.getenv("HTTP_CLIENT_MAX_CONCURRENT_STREAMS", "100")),
+            )
         return HttpClient._instance
 
-    def __init__(self):
+    def __init__(
+        self,
+        http2: bool = False,
+        max_concurrent_streams: int = 100,
+        prior_knowledge: bool = False,
+        max_connections: int = 32,
+        max_keepalive_connections: int = 16,
+    ):
+        if max_concurrent_streams <= 0:
+            raise ValueError("max_concurrent_streams must be positive.")
+        if (http2 or prior_knowledge) and not H2_AVAILABLE:
+            loguru_logger.warning("Failed to enable HTTP/2, h2 is not installed (pip install httpx[http2]), falling back to HTTP/1.1.")
+            http2 = prior_knowledge = False
+        self._http2 = http2 or prior_knowledge
+        self._max_concurrent_streams = max_concurrent_streams
+        transport_params = {
+            "verify": False,
+            "http1": not prior_knowledge,
+            "http2": self._http2,
+            "limits": httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections, keepalive_expiry=600),
+        }
+        # Connection and request timings per host go to the metrics registry.
+        self._trace_metrics = HttpTraceMetrics()
         self._client = httpx.Client(
-            verify=False,
             timeout=httpx.Timeout(60.0, connect=5.0),
-            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=600),
+            transport=_StreamLimitedTransport(httpx.HTTPTransport(**transport_params), max_concurrent_streams),
+            event_hooks=self._trace_metrics.httpx_event_hooks(),
         )
         self._aclient = httpx.AsyncClient(
-            verify=False,
             timeout=httpx.Timeout(60.0, connect=5.0),
-            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=600),
+            transport=_AsyncStreamLimitedTransport(httpx.AsyncHTTPTransport(**transport_params), max_concurrent_streams),
+            event_hooks=self._trace_metrics.httpx_async_event_hooks(),
         )
 
+    @property
+    def http2(self) -> bool:
+        """Whether HTTP/2 is enabled, False after falling back to HTTP/1.1."""
+        return self._http2
+
+    @property
+    def max_concurrent_streams(self) -> int:
+        return self._max_concurrent_streams
+
     def get_client(self) -> Optional[httpx.Client]:
         return self._client
-    
+
     def get_aclient(self) -> Optional[httpx.AsyncClient]:
         return self._aclient
 
@@ -50,3 +111,99 @@ class HttpClient:
             await asyncio.sleep(0)
         if self._aclient:
             await self._aclient.aclose()
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Body of a response, releasing the slot of its host once closed."""
+
+    def __init__(self, stream: httpx.SyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    """Body of a response, releasing the slot of its host once closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+class _StreamLimitedTransport(httpx.BaseTransport):
+    """Caps the requests in flight per host, from sending one to closing its response."""
+
+    def __init__(self, transport: httpx.BaseTransport, max_concurrent_streams: int):
+        self._transport = transport
+        self._max_concurrent_streams = max_concurrent_streams
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _slot_of(self, host: str) -> threading.BoundedSemaphore:
+        slot = self._slots.get(host)
+        if slot is None:
+            with self._lock:
+                slot = self._slots.setdefault(host, threading.BoundedSemaphore(self._max_concurrent_streams))
+        return slot
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        slot = self._slot_of(request.url.netloc.decode("ascii"))
+        slot.acquire()
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            slot.release()
+            raise
+        response.stream = _ReleasingStream(response.stream, slot.release)
+        return response
+
+    def close(self):
+        self._transport.close()
+
+
+class _AsyncStreamLimitedTransport(httpx.AsyncBaseTransport):
+    """Caps the requests in flight per host, from sending one to closing its response."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, max_concurrent_streams: int):
+        self._transport = transport
+        self._max_concurrent_streams = max_concurrent_streams
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.netloc.decode("ascii")
+        slot = self._slots.get(host)
+        if slot is None:
+            slot = self._slots.setdefault(host, asyncio.Semaphore(self._max_concurrent_streams))
+        await slot.acquire()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            slot.release()
+            raise
+        response.stream = _AsyncReleasingStream(response.stream, slot.release)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from internal.infra.http import http_client
+from internal.infra.http.http_client import HttpClient
+
+
+@pytest.fixture
+async def server():
+    state = {"in_flight": 0, "max_in_flight": 0}
+
+    async def slow(request: web.Request) -> web.Response:
+        state["in_flight"] += 1
+        state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        await asyncio.sleep(0.01)
+        state["in_flight"] -= 1
+        return web.json_response({"ok": True})
+
+    app = web.Application()
+    app.router.add_get("/slow", slow)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    state["url"] = f"http://127.0.0.1:{runner.addresses[0][1]}/slow"
+    yield state
+    await runner.cleanup()
+
+
+async def test_max_concurrent_streams_per_host(server):
+    client = HttpClient(max_concurrent_streams=4)
+    try:
+        resps = await asyncio.gather(*[client.get_aclient().get(server["url"]) for _ in range(20)])
+        assert all(resp.json() == {"ok": True} for resp in resps)
+        assert server["max_in_flight"] == 4
+
+        server["max_in_flight"] = 0
+        async with client.get_aclient().stream("GET", server["url"]) as resp:
+            # The slot is held until the body is read and the response closed.
+            assert client.get_aclient()._transport._slots[resp.url.netloc.decode("ascii")]._value == 3
+            await resp.aread()
+        assert client.get_aclient()._transport._slots[resp.url.netloc.decode("ascii")]._value == 4
+
+        resps = await asyncio.gather(*[asyncio.to_thread(client.get_client().get, server["url"]) for _ in range(8)])
+        assert all(resp.status_code == 200 for resp in resps)
+        assert server["max_in_flight"] <= 4
+    finally:
+        await client.close()
+
+
+async def test_http2_falls_back_to_http11(server, monkeypatch):
+    monkeypatch.setattr(http_client, "H2_AVAILABLE", False)
+    client = HttpClient(http2=True, prior_knowledge=True)
+    try:
+        assert not client.http2
+        resp = await client.get_aclient().get(server["url"])
+        assert resp.http_version == "HTTP/1.1"
+    finally:
+        await client.close()
+
+    with pytest.raises(ValueError):
+        HttpClient(max_concurrent_streams=0)
+
+
+async def test_http2_negotiation_falls_back_to_http11(server):
+    pytest.importorskip("h2")
+    # Plain http without prior knowledge, no ALPN to upgrade with.
+    client = HttpClient(http2=True)
+    try:
+        assert client.http2
+        resp = await client.get_aclient().get(server["url"])
+        assert resp.http_version == "HTTP/1.1"
+    finally:
+        await client.close()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import codecs
+import json
+import re
+from typing import Any, Iterable, Iterator
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def iter_json_array(chunks: Iterable[bytes], key: str) -> Iterator[Any]:
+    """
+    Items of the array under 'key' of the JSON object sent in 'chunks'
+    (like httpx.Response.iter_bytes()), decoded one at a time as the bytes
+    arrive: only the item being decoded and the unread part of the last
+    chunk are held, never the whole document. What follows the array is
+    not read. Raise ValueError if the object has no such array, with its
+    'error' member if any (like the error of a JSON-RPC response), or if
+    the array is malformed or truncated.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buf, pos = "", 0
+
+    def refill() -> bool:
+        nonlocal buf, pos
+        for chunk in chunks:
+            s = text.decode(chunk)
+            if s != "":
+                buf, pos = buf[pos:] + s, 0
+                return True
+        text.decode(b"", final=True)
+        return False
+
+    array_start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    while (m := array_start.search(buf)) is None:
+        if not refill():
+            try:
+                error = json.loads(buf).get("error")
+            except (ValueError, AttributeError):
+                error = None
+            raise ValueError(f"No array {key} in the JSON object, error:{error}.")
+    pos = m.end()
+
+    after_item = False
+    while True:
+        pos = _WHITESPACE.match(buf, pos).end()
+        if pos == len(buf):
+            if not refill():
+                raise ValueError(f"Truncated JSON array {key}.")
+            continue
+        c = buf[pos]
+        if c == "]":
+            return
+        if after_item:
+            if c != ",":
+                raise ValueError(f"Malformed JSON array {key}, expected ',' but got {c!r}.")
+            pos += 1
+            after_item = False
+            continue
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            # Most likely the item goes on in the next chunk.
+            if not refill():
+                raise ValueError(f"Malformed JSON array {key}.")
+            continue
+        if end == len(buf) and not isinstance(item, (dict, list, str)) and refill():
+            # A number may go on in the next chunk too.
+            continue
+        pos = end
+        after_item = True
+        yield item
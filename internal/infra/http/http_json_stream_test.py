@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+from internal.infra.http.http_json_stream import iter_json_array
+
+
+def _chunks(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def test_iter_json_array():
+    result = [
+        {"pubkey": f"addr{i}", "account": {"data": {"parsed": {"info": {"owner": "持有人", "tokenAmount": {"amount": str(i * 1000), "decimals": 6}}}}}}
+        for i in range(50)
+    ] + [12345, "x", [1, [2]], None]
+    doc = json.dumps({"jsonrpc": "2.0", "result": result, "id": 1}, ensure_ascii=False, indent=1).encode("utf-8")
+    # Small chunks cut the items, the numbers and the multi-byte characters.
+    for size in (1, 3, 7, 64, len(doc)):
+        assert list(iter_json_array(_chunks(doc, size), "result")) == result
+
+    assert list(iter_json_array([b'{"result": []}'], "result")) == []
+    # What follows the array is not read.
+    assert list(iter_json_array(iter([b'{"result":[1,2]', b'GARBAGE']), "result")) == [1, 2]
+
+
+def test_iter_json_array_errors():
+    with pytest.raises(ValueError, match="Too many requests"):
+        list(iter_json_array([b'{"jsonrpc":"2.0","error":{"code":429,"message":"Too many requests"},"id":1}'], "result"))
+    with pytest.raises(ValueError, match="Truncated"):
+        list(iter_json_array(_chunks(b'{"result":[{"a":1},{"b":2}', 4), "result"))
+    with pytest.raises(ValueError, match="Malformed"):
+        list(iter_json_array([b'{"result":[{"a":1} {"b":2}]}'], "result"))
+    with pytest.raises(ValueError, match="Malformed"):
+        list(iter_json_array([b'{"result":[{"a":1},{"b":}]}'], "result"))
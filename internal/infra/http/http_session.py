@@ -6,6 +6,8 @@ from typing import Optional
 import aiohttp
 import requests
 
+from .http_tracing import http_trace_config
+
 _AIO_SESSION_MGR: ContextVar[Optional["aiohttp.ClientSession"]] = None
 _SESSION_MGR: ContextVar[Optional["requests.Session"]] = None
 
@@ -17,6 +19,7 @@ async def setup_aio_session_mgr():
             connector=aiohttp.TCPConnector(limit=32),
             connector_owner=True,
             timeout=aiohttp.ClientTimeout(total=60),
+            trace_configs=[http_trace_config],
         )
     )  # Acts as a global aiohttp ClientSession that reuses connections.
     await asyncio.sleep(0)
@@ -1,65 +1,226 @@
 # -*- coding: utf-8 -*-
 import time
 from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
 
 import aiohttp
+import httpx
 from aiohttp.tracing import (
     TraceConnectionCreateEndParams,
     TraceConnectionCreateStartParams,
+    TraceConnectionQueuedEndParams,
+    TraceConnectionQueuedStartParams,
     TraceConnectionReuseconnParams,
+    TraceDnsResolveHostEndParams,
+    TraceDnsResolveHostStartParams,
     TraceRequestEndParams,
+    TraceRequestExceptionParams,
+    TraceRequestHeadersSentParams,
     TraceRequestStartParams,
 )
 from loguru import logger as loguru_logger
 
+from internal.infra.metrics import MetricsRegistry, default_registry
 
-async def on_request_start(
-    session: aiohttp.ClientSession,
-    trace_config_ctx: SimpleNamespace,
-    params: TraceRequestStartParams
-):
-    loguru_logger.trace(f"{params.method} {params.url} HTTP/1.1 >>> on on_request_start state.")
-    trace_config_ctx.start = time.monotonic()
-
-
-async def on_request_end(
-    session: aiohttp.ClientSession,
-    trace_config_ctx: SimpleNamespace,
-    params: TraceRequestEndParams
-):
-    trace_config_ctx.end = time.monotonic()
-    loguru_logger.trace(f"{params.method} {params.url} HTTP/1.1 >>> on on_request_end state, used time: {trace_config_ctx.end - trace_config_ctx.start} sec.")
-
-
-async def on_connection_create_start(
-    session: aiohttp.ClientSession,
-    trace_config_ctx: SimpleNamespace,
-    params: TraceConnectionCreateStartParams
-):
-    loguru_logger.trace("HTTP/1.1 >>> on on_connection_create_start state.")
-    trace_config_ctx.start = time.monotonic()
-
-
-async def on_connection_create_end(
-    session: aiohttp.ClientSession,
-    trace_config_ctx: SimpleNamespace,
-    params: TraceConnectionCreateEndParams
-):
-    trace_config_ctx.end = time.monotonic()
-    loguru_logger.trace(f"HTTP/1.1 >>> on on_connection_create_end state, used time: {trace_config_ctx.end - trace_config_ctx.start} sec.")
-
-
-async def on_connection_reuseconn(
-    session: aiohttp.ClientSession,
-    trace_config_ctx: SimpleNamespace,
-    params: TraceConnectionReuseconnParams
-):
-    loguru_logger.trace("HTTP/1.1 >>> on on_connection_reuseconn state.")
-
-
-http_trace_config = aiohttp.TraceConfig()
-http_trace_config.on_request_start.append(on_request_start)
-http_trace_config.on_request_end.append(on_request_end)
-http_trace_config.on_connection_create_start.append(on_connection_create_start)
-http_trace_config.on_connection_create_end.append(on_connection_create_end)
-http_trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+
+class HttpTraceMetrics:
+    """
+    HTTP连接与请求耗时指标
+
+    Turns the tracing events of aiohttp (TraceConfig) and httpx (event hooks
+    plus the 'trace' extension of httpcore) into metrics of the registry,
+    labeled with the host, all latencies in ns:
+
+    -   'http_pool_wait_latency': waiting for a free connection of the pool
+        (aiohttp only), which grows when the pool is exhausted.
+    -   'http_dns_latency' / 'http_connect_latency' / 'http_tls_latency':
+        name resolution, TCP connect (with the TLS handshake for aiohttp,
+        which does not tell them apart) and TLS handshake (httpx).
+    -   'http_ttfb_latency': from the request sent to the first byte of
+        the response, the time the server took.
+    -   'http_request_latency': from the request started to its response
+        headers, all of the above included.
+    -   'http_connections_created' / 'http_connections_reused' and the
+        gauge 'http_connection_reuse_ratio'.
+    -   'http_in_flight' (gauge) and 'http_request_errors'.
+    """
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self._registry = registry if registry is not None else default_registry()
+
+    @property
+    def registry(self) -> MetricsRegistry:
+        return self._registry
+
+    def observe(self, name: str, host: str, elapsed_in_ns: int):
+        self._registry.histogram(name, host=host).record(elapsed_in_ns)
+
+    def connection(self, host: str, reused: bool):
+        created = self._registry.counter("http_connections_created", host=host)
+        reuses = self._registry.counter("http_connections_reused", host=host)
+        (reuses if reused else created).inc()
+        self._registry.gauge("http_connection_reuse_ratio", host=host).set(reuses.value / (created.value + reuses.value))
+
+    def request_started(self, host: str):
+        self._registry.gauge("http_in_flight", host=host).inc()
+
+    def request_ended(self, host: str, elapsed_in_ns: int, failed: bool = False):
+        self._registry.gauge("http_in_flight", host=host).dec()
+        if failed:
+            self._registry.counter("http_request_errors", host=host).inc()
+        else:
+            self.observe("http_request_latency", host, elapsed_in_ns)
+
+    # aiohttp, the context of the hooks lives as long as the request.
+
+    async def on_request_start(self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: TraceRequestStartParams):
+        ctx.traced = self._registry.enabled
+        if not ctx.traced:
+            return
+        ctx.host = params.url.host
+        ctx.start = time.perf_counter_ns()
+        ctx.sent = None
+        self.request_started(ctx.host)
+
+    async def on_connection_queued_start(self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: TraceConnectionQueuedStartParams):
+        ctx.queued = time.perf_counter_ns()
+
+    async def on_connection_queued_end(self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: TraceConnectionQueuedEndParams):
+        if getattr(ctx, "traced", False):
+            self.observe("http_pool_wait_latency", ctx.host, time.perf_counter_ns() - ctx.queued)
+
+    async def on_dns_resolvehost_start(self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: TraceDnsResolveHostStartParams):
+        ctx.resolving = time.perf_counter_ns()
+
+    async def on_dns_resolvehost_end(self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: TraceDnsResolveHostEndParams):
+        if getattr(ctx, "traced", False):
+            self.observe("http_dns_latency", ctx.host, time.perf_counter_ns() - ctx.resolving)
+
+    async def on_connection_create_start(self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: TraceConnectionCreateStartParams):
+        ctx.connecting = time.perf_counter_ns()
+
+    async def on_connection_create_end(self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: TraceConnectionCreateEndParams):
+        if getattr(ctx, "traced", False):
+            self.observe("http_connect_latency", ctx.host, time.perf_counter_ns() - ctx.connecting)
+            self.connection(ctx.host, reused=False)
+
+    async def on_connection_reuseconn(self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: TraceConnectionReuseconnParams):
+        if getattr(ctx, "traced", False):
+            self.connection(ctx.host, reused=True)
+
+    async def on_request_headers_sent(self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: TraceRequestHeadersSentParams):
+        ctx.sent = time.perf_counter_ns()
+
+    async def on_request_end(self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: TraceRequestEndParams):
+        if not getattr(ctx, "traced", False):
+            return
+        now = time.perf_counter_ns()
+        if ctx.sent is not None:
+            self.observe("http_ttfb_latency", ctx.host, now - ctx.sent)
+        self.request_ended(ctx.host, now - ctx.start)
+        loguru_logger.trace(f"{params.method} {params.url} >>> on on_request_end state, used time: {(now - ctx.start) / 1e9} sec.")
+
+    async def on_request_exception(self, session: aiohttp.ClientSession, ctx: SimpleNamespace, params: TraceRequestExceptionParams):
+        if getattr(ctx, "traced", False):
+            self.request_ended(ctx.host, time.perf_counter_ns() - ctx.start, failed=True)
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self.on_request_start)
+        trace_config.on_connection_queued_start.append(self.on_connection_queued_start)
+        trace_config.on_connection_queued_end.append(self.on_connection_queued_end)
+        trace_config.on_dns_resolvehost_start.append(self.on_dns_resolvehost_start)
+        trace_config.on_dns_resolvehost_end.append(self.on_dns_resolvehost_end)
+        trace_config.on_connection_create_start.append(self.on_connection_create_start)
+        trace_config.on_connection_create_end.append(self.on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(self.on_connection_reuseconn)
+        trace_config.on_request_headers_sent.append(self.on_request_headers_sent)
+        trace_config.on_request_end.append(self.on_request_end)
+        trace_config.on_request_exception.append(self.on_request_exception)
+        return trace_config
+
+    # httpx, the request hook gives every request a trace of its own.
+
+    def _on_httpx_request(self, request: httpx.Request, is_async: bool):
+        if not self._registry.enabled:
+            return
+        trace = _HttpxRequestTrace(self, request.url.host, request.extensions.get("trace"))
+        request.extensions["trace"] = trace.atrace if is_async else trace.trace
+        self.request_started(trace.host)
+
+    def _on_httpx_response(self, response: httpx.Response):
+        trace = getattr(response.request.extensions.get("trace"), "__self__", None)
+        if isinstance(trace, _HttpxRequestTrace):
+            trace.finish(failed=False)
+
+    def httpx_event_hooks(self) -> Dict[str, List[Callable]]:
+        """Event hooks of an httpx.Client."""
+        return {
+            "request": [lambda request: self._on_httpx_request(request, is_async=False)],
+            "response": [self._on_httpx_response],
+        }
+
+    def httpx_async_event_hooks(self) -> Dict[str, List[Callable]]:
+        """Event hooks of an httpx.AsyncClient."""
+        async def on_request(request: httpx.Request):
+            self._on_httpx_request(request, is_async=True)
+
+        async def on_response(response: httpx.Response):
+            self._on_httpx_response(response)
+
+        return {"request": [on_request], "response": [on_response]}
+
+
+class _HttpxRequestTrace:
+    """The 'trace' extension of one httpx request, chained to the one the caller set if any."""
+
+    def __init__(self, metrics: HttpTraceMetrics, host: str, chained: Optional[Callable[[str, Dict[str, Any]], Any]] = None):
+        self.host = host
+        self._metrics = metrics
+        self._chained = chained
+        self._start = time.perf_counter_ns()
+        self._started: Dict[str, int] = {}
+        self._connected = False
+        self._sent: Optional[int] = None
+        self._finished = False
+
+    def finish(self, failed: bool):
+        if self._finished:
+            return
+        self._finished = True
+        self._metrics.request_ended(self.host, time.perf_counter_ns() - self._start, failed=failed)
+
+    def _on_event(self, event_name: str):
+        # Like 'connection.connect_tcp.started' or 'http11.receive_response_headers.complete'.
+        step, _, state = event_name.rpartition(".")
+        now = time.perf_counter_ns()
+        if state == "started":
+            self._started[step] = now
+            if step.endswith(".send_request_headers") and self._sent is None:
+                self._sent = now
+                self._metrics.connection(self.host, reused=not self._connected)
+            return
+        if state == "failed":
+            self.finish(failed=True)
+            return
+        if step == "connection.connect_tcp":
+            self._connected = True
+            self._metrics.observe("http_connect_latency", self.host, now - self._started.get(step, now))
+        elif step == "connection.start_tls":
+            self._metrics.observe("http_tls_latency", self.host, now - self._started.get(step, now))
+        elif step.endswith(".receive_response_headers") and self._sent is not None:
+            self._metrics.observe("http_ttfb_latency", self.host, now - self._sent)
+
+    def trace(self, event_name: str, info: Dict[str, Any]):
+        self._on_event(event_name)
+        if self._chained is not None:
+            self._chained(event_name, info)
+
+    async def atrace(self, event_name: str, info: Dict[str, Any]):
+        self._on_event(event_name)
+        if self._chained is not None:
+            await self._chained(event_name, info)
+
+
+# The trace config of the aiohttp sessions, feeding the metrics registry of the process.
+http_trace_config = HttpTraceMetrics().trace_config()
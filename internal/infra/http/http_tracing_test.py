@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import aiohttp
+import httpx
+import pytest
+from aiohttp import web
+
+from internal.infra.http.http_tracing import HttpTraceMetrics
+from internal.infra.metrics import MetricsRegistry
+
+HOST = "127.0.0.1"
+
+
+@pytest.fixture
+async def server_url():
+    async def slow(request: web.Request) -> web.Response:
+        await asyncio.sleep(0.02)
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_get("/slow", slow)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, HOST, 0)
+    await site.start()
+    yield f"http://{HOST}:{runner.addresses[0][1]}/slow"
+    await runner.cleanup()
+
+
+def _assert_timings(registry: MetricsRegistry, requests: int):
+    assert registry.counter("http_connections_created", host=HOST).value == 1
+    assert registry.counter("http_connections_reused", host=HOST).value == requests - 1
+    assert registry.gauge("http_connection_reuse_ratio", host=HOST).value == pytest.approx((requests - 1) / requests)
+    assert registry.gauge("http_in_flight", host=HOST).value == 0
+    assert registry.histogram("http_connect_latency", host=HOST).count == 1
+    ttfb = registry.histogram("http_ttfb_latency", host=HOST)
+    latency = registry.histogram("http_request_latency", host=HOST)
+    assert ttfb.count == latency.count == requests
+    # The server takes 20ms, the whole request a bit more.
+    assert 20000000 <= ttfb.min and ttfb.max <= latency.max
+
+
+async def test_aiohttp_trace_config(server_url):
+    registry = MetricsRegistry()
+    async with aiohttp.ClientSession(trace_configs=[HttpTraceMetrics(registry).trace_config()]) as session:
+        for _ in range(3):
+            async with session.get(server_url) as resp:
+                await resp.json()
+        _assert_timings(registry, 3)
+
+        # Nothing listens there.
+        with pytest.raises(aiohttp.ClientError):
+            async with session.get(f"http://{HOST}:1/"):
+                pass
+    assert registry.counter("http_request_errors", host=HOST).value == 1
+    assert registry.gauge("http_in_flight", host=HOST).value == 0
+
+
+async def test_httpx_event_hooks(server_url):
+    registry = MetricsRegistry()
+    metrics = HttpTraceMetrics(registry)
+    events = []
+
+    async def chained(event_name, info):
+        events.append(event_name)
+
+    async with httpx.AsyncClient(event_hooks=metrics.httpx_async_event_hooks()) as aclient:
+        for _ in range(3):
+            resp = await aclient.get(server_url, extensions={"trace": chained})
+            assert resp.status_code == 200
+    _assert_timings(registry, 3)
+    # The trace the caller set still sees the events.
+    assert "connection.connect_tcp.complete" in events
+
+    def sync_requests():
+        with httpx.Client(event_hooks=metrics.httpx_event_hooks()) as client:
+            client.get(server_url)
+            with pytest.raises(httpx.ConnectError):
+                client.get(f"http://{HOST}:1/")
+
+    await asyncio.to_thread(sync_requests)
+    assert registry.counter("http_connections_created", host=HOST).value == 2
+    assert registry.counter("http_request_errors", host=HOST).value == 1
+    assert registry.gauge("http_in_flight", host=HOST).value == 0
+
+
+async def test_disabled_registry_records_nothing(server_url):
+    registry = MetricsRegistry(enabled=False)
+    async with aiohttp.ClientSession(trace_configs=[HttpTraceMetrics(registry).trace_config()]) as session:
+        async with session.get(server_url) as resp:
+            await resp.json()
+    assert registry.metrics() == []
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+from .exporter import MetricsServer, SnapshotWriter, start_exporters
+from .registry import QUANTILES, Counter, Gauge, Histogram, MetricsRegistry, default_registry
+
+__all__ = ["Counter", "Gauge", "Histogram", "MetricsRegistry", "MetricsServer", "QUANTILES", "SnapshotWriter", "default_registry", "start_exporters"]
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Optional
+
+import ujson as json
+from aiohttp import web
+from loguru import logger as loguru_logger
+
+from .registry import MetricsRegistry
+
+
+class MetricsServer:
+    """
+    指标抓取服务
+
+    Serves the metrics of 'registry' on 'host':'port', in the Prometheus
+    text format on '/metrics' and as JSON on '/metrics.json'. It listens on
+    the loopback only by default.
+    """
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9108):
+        self._registry = registry
+        self._host = host
+        self._port = port
+        self._runner: Optional[web.AppRunner] = None
+        self._app = web.Application()
+        self._app.router.add_get("/metrics", self._metrics)
+        self._app.router.add_get("/metrics.json", self._metrics_json)
+
+    @property
+    def port(self) -> int:
+        return self._port
+
+    @property
+    def url(self) -> str:
+        return f"http://{self._host}:{self._port}/metrics"
+
+    async def _metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self._registry.render_text(), content_type="text/plain")
+
+    async def _metrics_json(self, request: web.Request) -> web.Response:
+        return web.json_response(self._registry.snapshot(), dumps=json.dumps)
+
+    async def start(self):
+        self._runner = web.AppRunner(self._app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self._host, self._port)
+        await site.start()
+        self._port = self._runner.addresses[0][1]
+        loguru_logger.info(f"Metrics are served on {self.url}.")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+class SnapshotWriter:
+    """
+    指标快照
+
+    Writes the metrics of 'registry' as JSON to 'path' every
+    'interval_in_sec', through a temporary file renamed over it, so a reader
+    never sees a partial snapshot.
+    """
+
+    def __init__(self, registry: MetricsRegistry, path: str, interval_in_sec: float = 60.0):
+        if interval_in_sec <= 0:
+            raise ValueError("interval_in_sec must be positive.")
+        self._registry = registry
+        self._path = path
+        self._interval_in_sec = interval_in_sec
+        self._task: Optional[asyncio.Task] = None
+
+    def write(self) -> bool:
+        tmp_path = self._path + ".tmp"
+        try:
+            with open(tmp_path, "w") as fw:
+                json.dump({"time": time.time(), "metrics": self._registry.snapshot()}, fw)
+            os.replace(tmp_path, self._path)
+        except Exception as e:
+            loguru_logger.error(f"Failed to write the metrics snapshot to {self._path}, internal exception:{e}.")
+            return False
+        return True
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop writing, the last snapshot is written on the way out."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        self.write()
+
+    async def _run(self):
+        while 1:
+            await asyncio.sleep(self._interval_in_sec)
+            self.write()
+
+
+async def start_exporters(
+    registry: MetricsRegistry,
+    port: Optional[int] = None,
+    snapshot_path: Optional[str] = None,
+    snapshot_interval_in_sec: float = 60.0,
+) -> Callable[[], Awaitable[None]]:
+    """
+    Enable the registry and start the scrape endpoint on 'port' and the
+    snapshots to 'snapshot_path', those given. Return the coroutine function
+    stopping them.
+    """
+    registry.enabled = True
+    server = MetricsServer(registry, port=port) if port is not None else None
+    writer = SnapshotWriter(registry, snapshot_path, interval_in_sec=snapshot_interval_in_sec) if snapshot_path is not None else None
+    if server is not None:
+        await server.start()
+    if writer is not None:
+        writer.start()
+
+    async def stop():
+        if server is not None:
+            await server.stop()
+        if writer is not None:
+            await writer.stop()
+
+    return stop
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import aiohttp
+import pytest
+import ujson as json
+
+from internal.exchange import BinanceAsyncClient
+from internal.exchange.mock import MockBinanceServer, MockExchange, SymbolRules
+from internal.infra.metrics import MetricsRegistry, MetricsServer, SnapshotWriter, default_registry
+
+
+@pytest.fixture
+def registry():
+    registry = default_registry()
+    enabled = registry.enabled
+    registry.enabled = True
+    registry.clear()
+    yield registry
+    registry.enabled = enabled
+    registry.clear()
+
+
+async def test_binance_endpoints_are_scraped(registry):
+    exchange = MockExchange(
+        [SymbolRules(symbol="BTCUSDT", base_asset="BTC", quote_asset="USDT")],
+        balances={"USDT": "100000", "BTC": "1"},
+    )
+    exchange.set_book("BTCUSDT", bids=[("29999.00", "1.0")], asks=[("30001.00", "1.0")])
+    mock = MockBinanceServer(exchange, latency_in_ms=2)
+    await mock.start()
+    aclient = BinanceAsyncClient(api_key="key", api_secret="secret", api_url=mock.api_url)
+    server = MetricsServer(registry, port=0)
+    await server.start()
+    try:
+        order = await aclient.order_limit_buy(symbol="BTCUSDT", quantity="0.001", price="29000.00", newClientOrderId="metrics1")
+        for _ in range(3):
+            await aclient.get_order(symbol="BTCUSDT", origClientOrderId=order["clientOrderId"])
+        with pytest.raises(Exception):
+            await aclient.get_order(symbol="BTCUSDT", origClientOrderId="unknown")
+
+        async with aiohttp.ClientSession() as session:
+            async with session.get(server.url) as resp:
+                text = await resp.text()
+            async with session.get(server.url + ".json") as resp:
+                snapshot = await resp.json()
+        assert 'binance_request_latency_count{endpoint="POST /api/v3/order"} 1\n' in text
+        assert 'binance_request_latency_count{endpoint="GET /api/v3/order"} 4\n' in text
+        assert 'binance_request_errors{endpoint="GET /api/v3/order"} 1\n' in text
+        latency = [m for m in snapshot if m["name"] == "binance_request_latency" and m["labels"]["endpoint"] == "GET /api/v3/order"][0]
+        # The mock answers in 2ms.
+        assert latency["quantiles"]["0.99"] >= 2000000
+    finally:
+        await server.stop()
+        await aclient.close_connection()
+        await mock.stop()
+
+
+async def test_snapshot_file(tmp_path):
+    registry = MetricsRegistry()
+    registry.histogram("db_latency", op="bulk_write").record(1500000)
+    path = str(tmp_path / "metrics.json")
+    writer = SnapshotWriter(registry, path, interval_in_sec=60)
+    writer.start()
+    await writer.stop()
+    with open(path, "r") as fr:
+        snapshot = json.load(fr)
+    assert snapshot["metrics"][0]["labels"] == {"op": "bulk_write"}
+    assert snapshot["metrics"][0]["count"] == 1
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import functools
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Quantiles reported by the snapshots of the histograms.
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+# (name, sorted label items) of a metric.
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _labels_str(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if len(labels) == 0:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class Counter:
+    """A value which only goes up, like the number of requests."""
+
+    def __init__(self, name: str, labels: Tuple[Tuple[str, str], ...] = ()):
+        self.name = name
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, n: int = 1):
+        self.value += n
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"type": "counter", "name": self.name, "labels": dict(self.labels), "value": self.value}
+
+
+class Gauge:
+    """A value which goes up and down, like the number of requests in flight."""
+
+    def __init__(self, name: str, labels: Tuple[Tuple[str, str], ...] = ()):
+        self.name = name
+        self.labels = labels
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, n: float = 1):
+        self.value += n
+
+    def dec(self, n: float = 1):
+        self.value -= n
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"type": "gauge", "name": self.name, "labels": dict(self.labels), "value": self.value}
+
+
+class Histogram:
+    """
+    Distribution of non-negative integer values, like latencies in ns, in
+    log-linear buckets the way HdrHistogram does: the values below
+    2**'precision_bits' have a bucket each, every power of two above is cut
+    in 2**('precision_bits' - 1) buckets, so a quantile is off by less than
+    1/2**('precision_bits' - 1) of its value (1.6% with the default 7 bits)
+    whatever the range. Recording a value is a bit_length, a shift and a
+    dict update.
+    """
+
+    def __init__(self, name: str, labels: Tuple[Tuple[str, str], ...] = (), precision_bits: int = 7):
+        if precision_bits < 2:
+            raise ValueError("precision_bits must be at least 2.")
+        self.name = name
+        self.labels = labels
+        self._bits = precision_bits
+        self._half = 1 << (precision_bits - 1)
+        self._buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def _highest_of(self, bucket: int) -> int:
+        """Highest value of the bucket."""
+        if bucket < 2 * self._half:
+            return bucket
+        shift = bucket // self._half - 1
+        return ((bucket - shift * self._half + 1) << shift) - 1
+
+    def record(self, value: int):
+        if value < 0:
+            value = 0
+        shift = value.bit_length() - self._bits
+        bucket = value if shift <= 0 else shift * self._half + (value >> shift)
+        buckets = self._buckets
+        buckets[bucket] = buckets.get(bucket, 0) + 1
+        if self.count == 0 or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count > 0 else 0.0
+
+    def percentile(self, q: float) -> int:
+        """Value below which a fraction q of the recorded values are, 0 if none was recorded."""
+        if self.count == 0:
+            return 0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                return min(self._highest_of(bucket), self.max)
+        return self.max
+
+    def reset(self):
+        self._buckets.clear()
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "type": "histogram",
+            "name": self.name,
+            "labels": dict(self.labels),
+            "count": self.count,
+            "sum": self.total,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "quantiles": {str(q): self.percentile(q) for q in QUANTILES},
+        }
+
+
+class MetricsRegistry:
+    """
+    指标注册表
+
+    Holds the counters, gauges and histograms of the process, one per name
+    and set of labels, created on first use. When the registry is disabled
+    the decorators skip the measurement and cost one attribute lookup per
+    call, the metrics still exist but stop changing.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: Dict[MetricKey, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls: type, name: str, labels: Dict[str, Any]) -> Any:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = cls(name, key[1])
+                    self._metrics[key] = metric
+        if not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is a {type(metric).__name__}, not a {cls.__name__}.")
+        return metric
+
+    def counter(self, name: str, **labels) -> Counter:
+        return self._get(Counter, name, labels)
+
+    def gauge(self, name: str, **labels) -> Gauge:
+        return self._get(Gauge, name, labels)
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        return self._get(Histogram, name, labels)
+
+    def metrics(self) -> List[Any]:
+        return list(self._metrics.values())
+
+    def clear(self):
+        with self._lock:
+            self._metrics.clear()
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [metric.snapshot() for metric in self.metrics()]
+
+    def render_text(self) -> str:
+        """
+        The metrics in the Prometheus text format, the histograms as
+        summaries of their quantiles in ns.
+        """
+        lines = []
+        for metric in sorted(self.metrics(), key=lambda m: (m.name, m.labels)):
+            if isinstance(metric, Histogram):
+                for q in QUANTILES:
+                    labels = _labels_str(metric.labels + (("quantile", str(q)),))
+                    lines.append(f"{metric.name}{labels} {metric.percentile(q)}")
+                labels = _labels_str(metric.labels)
+                lines.append(f"{metric.name}_sum{labels} {metric.total}")
+                lines.append(f"{metric.name}_count{labels} {metric.count}")
+            else:
+                lines.append(f"{metric.name}{_labels_str(metric.labels)} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+    def timed(self, name: str, **labels) -> Callable[[Callable], Callable]:
+        """
+        Decorator recording the latency in ns of every call of a function
+        or coroutine function into the histogram 'name', labeled with the
+        'function' by default.
+        """
+        def decorator(func: Callable) -> Callable:
+            histogram = self.histogram(name, **(labels or {"function": func.__qualname__}))
+
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await func(*args, **kwargs)
+                    st = time.perf_counter_ns()
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        histogram.record(time.perf_counter_ns() - st)
+
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                st = time.perf_counter_ns()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    histogram.record(time.perf_counter_ns() - st)
+
+            return wrapper
+
+        return decorator
+
+
+_default_registry: Optional[MetricsRegistry] = None
+
+
+def default_registry() -> MetricsRegistry:
+    """The registry of the process, enabled by the METRICS_ENABLED env (1/true)."""
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = MetricsRegistry(enabled=os.getenv("METRICS_ENABLED", "").lower() in ("1", "true"))
+    return _default_registry
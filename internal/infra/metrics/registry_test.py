@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import math
+import random
+
+import pytest
+
+from internal.infra.metrics import Histogram, MetricsRegistry
+from internal.utils.helper import timeit
+
+
+def test_histogram_quantiles_within_precision():
+    rnd = random.Random(0)
+    # Latencies in ns from 50us to 50ms, log-normally spread.
+    values = [int(rnd.lognormvariate(13, 1.2)) for _ in range(20000)]
+    h = Histogram("latency")
+    for v in values:
+        h.record(v)
+    assert (h.count, h.total, h.min, h.max) == (len(values), sum(values), min(values), max(values))
+    ordered = sorted(values)
+    for q in (0.5, 0.9, 0.99, 0.999):
+        expected = ordered[math.ceil(q * len(values)) - 1]
+        assert h.percentile(q) == pytest.approx(expected, rel=1 / 64)
+    assert h.percentile(1.0) == max(values)
+
+    small = Histogram("small")
+    for v in range(100):
+        small.record(v)
+    # The small values are exact.
+    assert (small.percentile(0.5), small.percentile(0.99)) == (49, 98)
+
+
+def test_registry_counters_gauges_and_text():
+    registry = MetricsRegistry()
+    registry.counter("requests", endpoint="GET /api/v3/order").inc()
+    registry.counter("requests", endpoint="GET /api/v3/order").inc(2)
+    registry.gauge("in_flight", host="api.binance.com").inc()
+    registry.histogram("latency", endpoint="POST /api/v3/order").record(1000)
+    assert registry.counter("requests", endpoint="GET /api/v3/order").value == 3
+    with pytest.raises(ValueError):
+        registry.gauge("requests", endpoint="GET /api/v3/order")
+
+    text = registry.render_text()
+    assert 'requests{endpoint="GET /api/v3/order"} 3\n' in text
+    assert 'in_flight{host="api.binance.com"} 1' in text
+    assert 'latency{endpoint="POST /api/v3/order",quantile="0.99"} 1000\n' in text
+    assert 'latency_count{endpoint="POST /api/v3/order"} 1\n' in text
+    assert len(registry.snapshot()) == 3
+
+
+async def test_timed_records_only_when_enabled():
+    registry = MetricsRegistry(enabled=False)
+
+    @registry.timed("latency")
+    async def slow():
+        await asyncio.sleep(0.01)
+        return 1
+
+    @registry.timed("latency", op="add")
+    def add(a, b):
+        return a + b
+
+    assert await slow() == 1 and add(1, 2) == 3
+    assert registry.histogram("latency", function=slow.__qualname__).count == 0
+
+    registry.enabled = True
+    assert await slow() == 1 and add(1, 2) == 3
+    h = registry.histogram("latency", function=slow.__qualname__)
+    assert h.count == 1 and h.min >= 10 * 1000000
+    assert registry.histogram("latency", op="add").count == 1
+
+
+async def test_timeit_keeps_wrapping_into_coroutines():
+    @timeit
+    def add(a, b):
+        return a + b
+
+    assert asyncio.iscoroutinefunction(add)
+    assert await add(1, 2) == 3
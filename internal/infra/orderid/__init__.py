@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from .generator import (
+    MAX_NODES,
+    ORDER_ID_LENGTH,
+    OrderIdGenerator,
+    aclaim_node,
+    ainit_default_generator,
+    claim_node,
+    decode_base62,
+    default_generator,
+    encode_base62,
+    new_order_id,
+    random_node,
+)
+
+__all__ = [
+    "MAX_NODES",
+    "ORDER_ID_LENGTH",
+    "OrderIdGenerator",
+    "aclaim_node",
+    "ainit_default_generator",
+    "claim_node",
+    "decode_base62",
+    "default_generator",
+    "encode_base62",
+    "new_order_id",
+    "random_node",
+]
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+import itertools
+import os
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+import redis.asyncio as aio_redis
+from loguru import logger as loguru_logger
+
+# Digits of the IDs, in ASCII order so the IDs sort like the numbers they encode.
+BASE62_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+# Widths of the parts of an ID: milliseconds since the epoch (until the year 8888), node and sequence number.
+TIME_DIGITS = 8
+NODE_DIGITS = 4
+SEQ_DIGITS = 10
+ORDER_ID_LENGTH = TIME_DIGITS + NODE_DIGITS + SEQ_DIGITS
+# Number of distinct nodes.
+MAX_NODES = 62 ** NODE_DIGITS
+# Redis key of the node counter shared by the processes, see claim_node.
+NODE_COUNTER_KEY = "order_id:node"
+
+_DECODE = {c: i for i, c in enumerate(BASE62_ALPHABET)}
+# The 2 lowest digits of the sequence number come from this table, the others change every 3844 IDs.
+_LOW_DIGITS = 2
+_LOW_BASE = 62 ** _LOW_DIGITS
+_LOW_TABLE = [a + b for a in BASE62_ALPHABET for b in BASE62_ALPHABET]
+
+
+def encode_base62(n: int, width: int) -> str:
+    """Fixed-width base62 of n, which must fit in 'width' digits."""
+    if n < 0 or n >= 62 ** width:
+        raise ValueError(f"{n} does not fit in {width} base62 digits.")
+    digits = ["0"] * width
+    for i in range(width - 1, -1, -1):
+        n, r = divmod(n, 62)
+        digits[i] = BASE62_ALPHABET[r]
+    return "".join(digits)
+
+
+def decode_base62(s: str) -> int:
+    n = 0
+    for c in s:
+        n = n * 62 + _DECODE[c]
+    return n
+
+
+def random_node() -> int:
+    """A node drawn from os.urandom, unique among a few processes with a high probability only."""
+    return int.from_bytes(os.urandom(4), "big") % MAX_NODES
+
+
+def claim_node(redis_conn: Any, key: str = NODE_COUNTER_KEY) -> int:
+    """
+    A node no other process claimed from the same redis before, as long as
+    fewer than MAX_NODES were claimed.
+    """
+    return (redis_conn.incr(key) - 1) % MAX_NODES
+
+
+async def aclaim_node(redis_conn: Any, key: str = NODE_COUNTER_KEY) -> int:
+    return (await redis_conn.incr(key) - 1) % MAX_NODES
+
+
+class OrderIdGenerator:
+    """
+    订单ID生成器
+
+    Generates clientOrderIds of ORDER_ID_LENGTH base62 characters, after an
+    optional 'prefix': the time in ms, the 'node' of the process and a
+    sequence number. The sequence number alone makes the IDs of a generator
+    unique, the node those of different processes, so no two processes
+    sharing an account may use the same node: take it from claim_node on
+    the redis they share, the default one is random.
+
+    The IDs of a generator sort in the order they were generated, the time
+    part never goes back even if the clock does. The sequence number comes
+    from itertools.count and every cached part is read in one step, so a
+    generator may be shared by threads, and producing an ID costs a clock
+    read and a few string operations.
+    """
+
+    def __init__(
+        self,
+        node: Optional[int] = None,
+        *,
+        prefix: str = "",
+        clock: Callable[[], float] = time.time,
+    ):
+        if node is None:
+            node = random_node()
+        if node < 0 or node >= MAX_NODES:
+            raise ValueError(f"node must be in [0, {MAX_NODES}).")
+        if len(prefix) + ORDER_ID_LENGTH > 36:
+            raise ValueError("Binance takes clientOrderIds of at most 36 characters.")
+        self._node = node
+        self._prefix = prefix
+        self._node_str = encode_base62(node, NODE_DIGITS)
+        self._clock = clock
+        self._seq = itertools.count()
+        # (ms, prefix + encoded ms) and (high part of the sequence number, node + its encoding).
+        self._time_part: Tuple[int, str] = (-1, "")
+        self._seq_part: Tuple[int, str] = (-1, "")
+        self._lock = threading.Lock()
+
+    @property
+    def node(self) -> int:
+        return self._node
+
+    @property
+    def prefix(self) -> str:
+        return self._prefix
+
+    def _time_str(self) -> str:
+        ms = int(self._clock() * 1000)
+        time_part = self._time_part
+        if ms <= time_part[0]:
+            return time_part[1]
+        with self._lock:
+            # Another thread may have moved it further meanwhile.
+            if ms > self._time_part[0]:
+                self._time_part = (ms, self._prefix + encode_base62(ms, TIME_DIGITS))
+            return self._time_part[1]
+
+    def _seq_str(self, seq: int) -> str:
+        high, low = divmod(seq, _LOW_BASE)
+        seq_part = self._seq_part
+        if seq_part[0] != high:
+            seq_part = (high, self._node_str + encode_base62(high, SEQ_DIGITS - _LOW_DIGITS))
+            self._seq_part = seq_part
+        return seq_part[1] + _LOW_TABLE[low]
+
+    def new_id(self) -> str:
+        # The hot path of _time_str and _seq_str, inlined.
+        time_part = self._time_part
+        time_str = time_part[1] if int(self._clock() * 1000) <= time_part[0] else self._time_str()
+        high, low = divmod(next(self._seq), _LOW_BASE)
+        seq_part = self._seq_part
+        if seq_part[0] != high:
+            return time_str + self._seq_str(high * _LOW_BASE + low)
+        return time_str + seq_part[1] + _LOW_TABLE[low]
+
+    __call__ = new_id
+
+    def take(self, n: int) -> List[str]:
+        """n IDs at once, all with the same time part."""
+        time_str = self._time_str()
+        # (high part of the sequence number, time + node + its encoding), local to the batch.
+        seq_part = (-1, "")
+        ids = []
+        for seq in itertools.islice(self._seq, n):
+            high, low = divmod(seq, _LOW_BASE)
+            if seq_part[0] != high:
+                seq_part = (high, time_str + self._node_str + encode_base62(high, SEQ_DIGITS - _LOW_DIGITS))
+            ids.append(seq_part[1] + _LOW_TABLE[low])
+        return ids
+
+    def parse(self, order_id: str) -> Tuple[int, int, int]:
+        """(time in ms, node, sequence number) of an ID of this generator."""
+        s = order_id[len(self._prefix):]
+        if len(s) != ORDER_ID_LENGTH or not order_id.startswith(self._prefix):
+            raise ValueError(f"{order_id} is not an ID of this generator.")
+        return (
+            decode_base62(s[:TIME_DIGITS]),
+            decode_base62(s[TIME_DIGITS:TIME_DIGITS + NODE_DIGITS]),
+            decode_base62(s[TIME_DIGITS + NODE_DIGITS:]),
+        )
+
+
+_default_generator: Optional[OrderIdGenerator] = None
+
+
+async def ainit_default_generator(redis_url: Optional[str] = None, key: str = NODE_COUNTER_KEY) -> OrderIdGenerator:
+    """
+    Set up the generator of the process once, before its first order: on
+    the node of ORDER_ID_NODE if set, else on a node claimed from the
+    redis at 'redis_url' which the processes on the account share, else on
+    a random node, which is only safe for a single process. Raises the
+    error of redis if the node could not be claimed.
+    """
+    global _default_generator
+    if _default_generator is not None:
+        return _default_generator
+    node = os.getenv("ORDER_ID_NODE")
+    if node:
+        generator = OrderIdGenerator(int(node))
+    elif redis_url:
+        redis_conn = aio_redis.Redis.from_url(redis_url)
+        try:
+            generator = OrderIdGenerator(await aclaim_node(redis_conn, key=key))
+        finally:
+            await redis_conn.aclose()
+        loguru_logger.info(f"Claimed the clientOrderId node:{generator.node}.")
+    else:
+        generator = OrderIdGenerator()
+        loguru_logger.warning(
+            f"Generate clientOrderIds on the random node:{generator.node}, "
+            "processes sharing an account must set ORDER_ID_NODE or share a redis to claim their nodes from."
+        )
+    # Another caller may have set it up meanwhile.
+    if _default_generator is None:
+        _default_generator = generator
+    return _default_generator
+
+
+def default_generator() -> OrderIdGenerator:
+    """
+    The generator of the process, as set up by ainit_default_generator,
+    on the node of ORDER_ID_NODE or a random one if it was not.
+    """
+    global _default_generator
+    if _default_generator is None:
+        node = os.getenv("ORDER_ID_NODE")
+        _default_generator = OrderIdGenerator(int(node) if node else None)
+    return _default_generator
+
+
+def new_order_id() -> str:
+    return default_generator().new_id()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import re
+import threading
+
+import pytest
+import redis
+
+from internal.infra.orderid import (
+    MAX_NODES,
+    ORDER_ID_LENGTH,
+    OrderIdGenerator,
+    ainit_default_generator,
+    claim_node,
+    decode_base62,
+    default_generator,
+    encode_base62,
+    generator,
+)
+
+# Characters Binance accepts in a clientOrderId.
+CLIENT_ORDER_ID_PATTERN = re.compile(r"^[\.A-Z\:/a-z0-9_-]{1,36}$")
+
+
+def test_base62_round_trip():
+    for n in (0, 1, 61, 62, 3843, 3844, 62 ** 8 - 1):
+        assert decode_base62(encode_base62(n, 8)) == n
+    assert encode_base62(62, 3) == "010"
+    with pytest.raises(ValueError):
+        encode_base62(62 ** 2, 2)
+
+
+def test_ids_are_unique_and_sorted():
+    g = OrderIdGenerator(node=7)
+    ids = [g.new_id() for _ in range(10000)] + g.take(10000) + [g() for _ in range(10)]
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+    for order_id in ids[:100]:
+        assert len(order_id) == ORDER_ID_LENGTH
+        assert CLIENT_ORDER_ID_PATTERN.match(order_id)
+    _, node, seq = g.parse(ids[-1])
+    assert (node, seq) == (7, len(ids) - 1)
+
+
+def test_time_never_goes_back():
+    now = [1700000000.0]
+    g = OrderIdGenerator(node=1, prefix="grid-", clock=lambda: now[0])
+    a = g.new_id()
+    now[0] -= 5
+    b = g.new_id()
+    now[0] += 10
+    c = g.new_id()
+    assert a < b < c
+    assert a.startswith("grid-")
+    assert g.parse(a)[0] == g.parse(b)[0] == 1700000000000
+    assert g.parse(c)[0] == 1700000005000
+    with pytest.raises(ValueError):
+        OrderIdGenerator(node=MAX_NODES)
+    with pytest.raises(ValueError):
+        OrderIdGenerator(prefix="x" * 15)
+
+
+def test_nodes_never_collide():
+    # Two processes on the same clock, only the node tells their IDs apart.
+    a = OrderIdGenerator(node=1, clock=lambda: 1700000000.0)
+    b = OrderIdGenerator(node=2, clock=lambda: 1700000000.0)
+    ids_a, ids_b = set(a.take(5000)), set(b.take(5000))
+    assert len(ids_a | ids_b) == 10000
+
+
+def test_shared_by_threads():
+    g = OrderIdGenerator(node=3)
+    results = [[] for _ in range(8)]
+
+    def _generate(out):
+        for _ in range(5000):
+            out.append(g.new_id())
+
+    threads = [threading.Thread(target=_generate, args=(out,)) for out in results]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    ids = [order_id for out in results for order_id in out]
+    assert len(set(ids)) == len(ids) == 40000
+    assert sorted(g.parse(order_id)[2] for order_id in ids) == list(range(40000))
+
+
+def test_claim_node():
+    redis_conn = redis.Redis(host="localhost", port=6379, db=0, password="sOmE_sEcUrE_pAsS")
+    try:
+        redis_conn.delete("unittest_order_id:node")
+        nodes = [claim_node(redis_conn, key="unittest_order_id:node") for _ in range(3)]
+        assert nodes == [0, 1, 2]
+    finally:
+        redis_conn.delete("unittest_order_id:node")
+        redis_conn.close()
+
+
+async def test_default_generator_claims_its_node(monkeypatch):
+    redis_url = "redis://:sOmE_sEcUrE_pAsS@localhost:6379/0"
+    redis_conn = redis.Redis(host="localhost", port=6379, db=0, password="sOmE_sEcUrE_pAsS")
+    redis_conn.delete("unittest_order_id:default_node")
+    monkeypatch.delenv("ORDER_ID_NODE", raising=False)
+    monkeypatch.setattr(generator, "_default_generator", None)
+    try:
+        g = await ainit_default_generator(redis_url, key="unittest_order_id:default_node")
+        assert g.node == 0
+        # Set up once per process.
+        assert await ainit_default_generator(redis_url, key="unittest_order_id:default_node") is g
+        assert default_generator() is g
+
+        # Another process on the same redis.
+        monkeypatch.setattr(generator, "_default_generator", None)
+        assert (await ainit_default_generator(redis_url, key="unittest_order_id:default_node")).node == 1
+
+        monkeypatch.setattr(generator, "_default_generator", None)
+        monkeypatch.setenv("ORDER_ID_NODE", "7")
+        assert (await ainit_default_generator(redis_url, key="unittest_order_id:default_node")).node == 7
+    finally:
+        redis_conn.delete("unittest_order_id:default_node")
+        redis_conn.close()
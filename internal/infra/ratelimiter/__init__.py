@@ -1,4 +1,26 @@
 # -*- coding: utf-8 -*-
-from .redis_gcra import Limit, RateLimiter, Result
+from .acquire import AcquireStats
+from .factory import open_rate_limiter
+from .memory_gcra import MemoryRateLimiter
+from .redis_gcra import (
+    BINANCE_SPOT_REQUEST_WEIGHTS,
+    CompositeLimit,
+    CompositeResult,
+    Limit,
+    RateLimiter,
+    Result,
+    binance_spot_limits,
+)
 
-__all__ = ["Limit", "Result", "RateLimiter"]
+__all__ = [
+    "AcquireStats",
+    "BINANCE_SPOT_REQUEST_WEIGHTS",
+    "CompositeLimit",
+    "CompositeResult",
+    "Limit",
+    "Result",
+    "MemoryRateLimiter",
+    "RateLimiter",
+    "binance_spot_limits",
+    "open_rate_limiter",
+]
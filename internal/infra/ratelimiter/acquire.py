@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import contextlib
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .redis_gcra import CompositeLimit, CompositeResult, Limit, Result
+
+# check() -> (allowed, retry_after_in_sec, result) of one attempt.
+_Check = Callable[[], Awaitable[Tuple[bool, float, Any]]]
+
+
+@dataclass
+class AcquireStats:
+    """
+    -   'acquired' is the number of granted acquisitions.
+    -   'waited' is the number of them which had to wait for the limit.
+    -   'queue_depth' is the number of callers currently waiting, and
+        'max_queue_depth' the largest it has been.
+    -   'total_wait_in_sec' / 'max_wait_in_sec' are the time spent waiting,
+        from the call of acquire until the grant.
+    """
+    acquired: int = 0
+    waited: int = 0
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    total_wait_in_sec: float = 0.0
+    max_wait_in_sec: float = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"AcquireStats(acquired={self.acquired}, waited={self.waited}, queue_depth={self.queue_depth}, "
+            f"max_queue_depth={self.max_queue_depth}, avg_wait_in_sec={self.avg_wait_in_sec:.4f}, "
+            f"max_wait_in_sec={self.max_wait_in_sec:.4f})"
+        )
+
+    @property
+    def avg_wait_in_sec(self) -> float:
+        return self.total_wait_in_sec / self.acquired if self.acquired > 0 else 0.0
+
+
+class AcquireMixin:
+    """
+    Waiting on top of the GCRA check 'aallow_n' of a limiter: a caller
+    that is not allowed sleeps for exactly the 'retry_after_in_sec' the
+    check returned, then checks again. Callers of the same key are served
+    first come, first served, only the head of the queue checks the limit.
+    """
+
+    def __init__(self):
+        self._key_locks: Dict[str, asyncio.Lock] = {}
+        self._acquire_stats: Dict[str, AcquireStats] = {}
+
+    def acquire_stats(self, key: str) -> AcquireStats:
+        stats = self._acquire_stats.get(key)
+        if stats is None:
+            stats = self._acquire_stats[key] = AcquireStats()
+        return stats
+
+    async def acquire(self, key: str, limit: "Limit", n: int = 1, timeout: Optional[float] = None) -> "Result":
+        """
+        Wait until n events may happen, and count them.
+
+        Raises asyncio.TimeoutError if they were not allowed within
+        'timeout' secs, and the backend's error if the check failed.
+        """
+        if n > limit.burst:
+            raise ValueError(f"{n} events would never be allowed by limit:{limit}.")
+
+        async def check():
+            result, error = await self.aallow_n(key, limit, n)
+            if error is not None:
+                raise error
+            return (result.allowed > 0, float(result.retry_after_in_sec), result)
+
+        return await self._acquire(key, check, timeout)
+
+    async def acquire_composite(
+        self,
+        key: str,
+        composite: "CompositeLimit",
+        endpoint: Optional[str] = None,
+        costs: Optional[Dict[str, int]] = None,
+        timeout: Optional[float] = None,
+    ) -> "CompositeResult":
+        """
+        Wait until every bucket of composite admits a call of endpoint (or
+        of the given per-bucket costs), and charge them.
+
+        Raises asyncio.TimeoutError if it was not admitted within 'timeout'
+        secs, and the backend's error if the check failed.
+        """
+        if costs is None:
+            costs = composite.cost_of(endpoint)
+        for name, cost in costs.items():
+            if cost > composite.buckets[name].burst:
+                raise ValueError(f"A cost of {cost} would never be admitted by bucket:{name} ({composite.buckets[name]}).")
+
+        async def check():
+            result, error = await self.aallow_composite(key, composite, costs=costs)
+            if error is not None:
+                raise error
+            return (result.allowed, float(result.retry_after_in_sec), result)
+
+        return await self._acquire(key, check, timeout)
+
+    async def _acquire(self, key: str, check: _Check, timeout: Optional[float]) -> Any:
+        stats = self.acquire_stats(key)
+        lock = self._key_locks.get(key)
+        if lock is None:
+            lock = self._key_locks[key] = asyncio.Lock()
+        st = time.monotonic()
+        stats.queue_depth += 1
+        stats.max_queue_depth = max(stats.max_queue_depth, stats.queue_depth)
+        try:
+            return await asyncio.wait_for(self._acquire_in_turn(lock, check, stats, st), timeout=timeout)
+        finally:
+            stats.queue_depth -= 1
+
+    async def _acquire_in_turn(self, lock: asyncio.Lock, check: _Check, stats: AcquireStats, st: float) -> Any:
+        # asyncio.Lock wakes its waiters up in FIFO order.
+        async with lock:
+            waited = False
+            while 1:
+                allowed, retry_after_in_sec, result = await check()
+                if allowed:
+                    break
+                waited = True
+                await asyncio.sleep(max(0.0, retry_after_in_sec))
+        wait_in_sec = time.monotonic() - st
+        stats.acquired += 1
+        stats.waited += int(waited)
+        stats.total_wait_in_sec += wait_in_sec
+        stats.max_wait_in_sec = max(stats.max_wait_in_sec, wait_in_sec)
+        return result
+
+    @contextlib.asynccontextmanager
+    async def slot(self, key: str, limit: "Limit", n: int = 1, timeout: Optional[float] = None) -> AsyncIterator["Result"]:
+        """
+        async with limiter.slot(key, limit): ..., the body runs once the events are allowed.
+        """
+        yield await self.acquire(key, limit, n, timeout=timeout)
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+import pytest
+
+from internal.infra.ratelimiter import Limit, MemoryRateLimiter
+
+
+async def test_acquire_waits_for_retry_after_in_fifo_order():
+    limiter = MemoryRateLimiter()
+    limit = Limit(rate=20, burst=2, period_in_sec=1)
+    granted = []
+
+    async def caller(i):
+        await limiter.acquire("orders", limit)
+        granted.append((i, time.monotonic()))
+
+    st = time.monotonic()
+    await asyncio.gather(*[caller(i) for i in range(6)])
+    assert [i for i, _ in granted] == list(range(6))
+    # Two at once from the burst, then one every 50ms.
+    assert granted[-1][1] - st == pytest.approx(0.2, abs=0.05)
+
+    stats = limiter.acquire_stats("orders")
+    assert stats.acquired == 6
+    assert stats.waited == 4
+    assert stats.queue_depth == 0
+    # The first two went through before the others were even queued.
+    assert stats.max_queue_depth == 4
+    assert stats.max_wait_in_sec == pytest.approx(0.2, abs=0.05)
+
+
+async def test_slot_and_timeout():
+    limiter = MemoryRateLimiter()
+    limit = Limit(rate=1, burst=1, period_in_sec=10)
+    async with limiter.slot("orders", limit) as result:
+        assert result.allowed == 1
+    with pytest.raises(asyncio.TimeoutError):
+        await limiter.acquire("orders", limit, timeout=0.05)
+    assert limiter.acquire_stats("orders").queue_depth == 0
+    with pytest.raises(ValueError):
+        await limiter.acquire("orders", limit, n=2)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import pytest
+import redis
+
+from internal.infra.ratelimiter import (
+    CompositeLimit,
+    Limit,
+    MemoryRateLimiter,
+    RateLimiter,
+    binance_spot_limits,
+)
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _small_limits() -> CompositeLimit:
+    return CompositeLimit(
+        buckets={
+            "weight": Limit(rate=60, burst=60, period_in_sec=60),
+            "orders_10s": Limit(rate=3, burst=3, period_in_sec=10),
+        },
+        costs={
+            "POST /order": {"weight": 1, "orders_10s": 1},
+            "GET /account": {"weight": 20},
+        },
+    )
+
+
+@pytest.fixture(params=["memory", "redis"])
+def limiter(request):
+    if request.param == "memory":
+        yield MemoryRateLimiter(key_prefix="unittest_rate:")
+        return
+    redis_conn = redis.Redis(host="localhost", port=6379, db=0, password="sOmE_sEcUrE_pAsS")
+    limiter = RateLimiter(redis_conn=redis_conn, async_mode=False, key_prefix="unittest_rate:")
+    yield limiter
+    limiter.reset_composite("test_composite", _small_limits())
+    redis_conn.close()
+
+
+def test_composite_charges_all_buckets_or_none(limiter):
+    limits = _small_limits()
+    for i in range(3):
+        result, error = limiter.allow_composite("test_composite", limits, endpoint="POST /order")
+        assert error is None
+        assert result.allowed
+        assert result.remaining == {"weight": 59 - i, "orders_10s": 2 - i}
+
+    # The order budget is spent, the weight budget must not be charged for the rejected order.
+    result, error = limiter.allow_composite("test_composite", limits, endpoint="POST /order")
+    assert error is None
+    assert not result.allowed
+    assert result.limited_by == "orders_10s"
+    assert result.retry_after_in_sec == pytest.approx(10 / 3, abs=0.1)
+
+    result, error = limiter.allow_composite("test_composite", limits, endpoint="GET /account")
+    assert result.allowed
+    assert result.remaining == {"weight": 37}
+
+    result, error = limiter.allow_composite("test_composite", limits, endpoint="GET /account")
+    result, error = limiter.allow_composite("test_composite", limits, endpoint="GET /account")
+    assert not result.allowed
+    assert result.limited_by == "weight"
+
+
+def test_composite_waits_for_the_longest_bucket():
+    clock = FakeClock()
+    limiter = MemoryRateLimiter(clock=clock)
+    limits = _small_limits()
+    result, _ = limiter.allow_composite("acc", limits, costs={"weight": 60, "orders_10s": 3})
+    assert result.allowed
+    result, _ = limiter.allow_composite("acc", limits, endpoint="POST /order")
+    # One weight comes back after 1s, one order after 3.33s.
+    assert (result.allowed, result.limited_by) == (False, "orders_10s")
+    assert result.retry_after_in_sec == pytest.approx(10 / 3)
+
+    clock.now += 10 / 3
+    result, _ = limiter.allow_composite("acc", limits, endpoint="POST /order")
+    assert result.allowed
+
+
+async def test_acquire_composite():
+    limiter = MemoryRateLimiter()
+    limits = binance_spot_limits(orders_per_10s=100)
+    for _ in range(100):
+        await limiter.acquire_composite("account", limits, endpoint="POST /order")
+    result, _ = limiter.allow_composite("account", limits, endpoint="GET /ping")
+    assert result.remaining == {"weight": 5899}
+    with pytest.raises(ValueError):
+        await limiter.acquire_composite("account", limits, endpoint="GET /unknown")
+
+
+def test_set_usage_only_tightens(limiter):
+    limits = _small_limits()
+    for _ in range(2):
+        limiter.allow_composite("test_composite", limits, endpoint="POST /order")
+
+    # Other processes on the key spent 30 weight meanwhile, the server counted 1 order of ours so far.
+    raised, error = limiter.set_usage("test_composite", limits, {"weight": 32, "orders_10s": 1, "unknown": 5})
+    assert error is None
+    assert raised == 1
+    result, _ = limiter.allow_composite("test_composite", limits, endpoint="POST /order")
+    assert result.allowed
+    assert result.remaining == {"weight": 27, "orders_10s": 0}
+
+    # A Retry-After denies everything, whatever the usage.
+    raised, error = limiter.set_usage("test_composite", limits, {"weight": 0}, blocked_for_in_sec=5)
+    assert (raised, error) == (1, None)
+    result, _ = limiter.allow_composite("test_composite", limits, endpoint="GET /account")
+    assert (result.allowed, result.limited_by) == (False, "weight")
+    assert result.retry_after_in_sec == pytest.approx(5 + 20, abs=0.1)
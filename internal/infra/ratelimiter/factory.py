@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from typing import Optional, Union
+
+import redis.asyncio as aio_redis
+
+from .memory_gcra import MemoryRateLimiter
+from .redis_gcra import RateLimiter
+
+
+def open_rate_limiter(redis_url: Optional[str] = None, key_prefix: str = "rate:") -> Union[RateLimiter, MemoryRateLimiter]:
+    """
+    Open the async RateLimiter on the redis at 'redis_url', shared by all
+    the processes using it, or a MemoryRateLimiter of this process alone
+    when no URL is given.
+    """
+    if redis_url is None or len(redis_url) == 0:
+        return MemoryRateLimiter(key_prefix=key_prefix)
+    return RateLimiter(redis_conn=aio_redis.Redis.from_url(redis_url), async_mode=True, key_prefix=key_prefix)
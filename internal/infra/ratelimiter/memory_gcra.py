@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import redis.exceptions as redis_exceptions
+
+from .acquire import AcquireMixin
+from .redis_gcra import CompositeLimit, CompositeResult, Limit, Result, _costs_of
+
+# Sweep the keys whose TAT is in the past once per that many checks.
+_SWEEP_EVERY = 4096
+
+
+class MemoryRateLimiter(AcquireMixin):
+    """
+    进程内GCRA限频器
+
+    Same API and results as RateLimiter, with the theoretical arrival time
+    (TAT) of every key kept in a dict of this process instead of Redis,
+    against a monotonic clock. Meant for a single bot process, where the
+    Redis round trip would be the most expensive part of a check.
+    """
+
+    def __init__(self, *, key_prefix: str = "rate:", clock: Callable[[], float] = time.monotonic):
+        super().__init__()
+        self._prefix = key_prefix
+        self._clock = clock
+        self._tats: Dict[str, float] = {}
+        self._checks = 0
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+    def _sweep(self, now: float):
+        # An expired TAT means the same as no TAT, like the EX of the SET in the Lua scripts.
+        self._tats = {k: tat for k, tat in self._tats.items() if tat > now}
+
+    def _allow_n(self, key: str, limit: Limit, n: int) -> Result:
+        # Port of ALLOW_N_LUA_SCRIPT, Result(allowed, remaining, retry_after_in_sec, reset_after_in_sec).
+        now = self._clock()
+        self._checks += 1
+        if self._checks % _SWEEP_EVERY == 0:
+            self._sweep(now)
+        key = self._prefix + key
+        emission_interval = limit.period_in_sec / limit.rate
+        tat = self._tats.get(key, now)
+        if tat < now:
+            tat = now
+        new_tat = tat + emission_interval * n
+        diff = now - (new_tat - emission_interval * limit.burst)
+        remaining = diff / emission_interval
+        if remaining < 0:
+            return Result(0, 0, -diff, tat - now)
+        reset_after = new_tat - now
+        if reset_after > 0:
+            self._tats[key] = new_tat
+        # Truncated like the Lua number Redis turns into an integer reply.
+        return Result(n, int(remaining), -1.0, reset_after)
+
+    def _allow_at_most(self, key: str, limit: Limit, n: int) -> Result:
+        # Port of ALLOW_AT_MOST_LUA_SCRIPT, 'cost' may become fractional like in Lua.
+        now = self._clock()
+        self._checks += 1
+        if self._checks % _SWEEP_EVERY == 0:
+            self._sweep(now)
+        key = self._prefix + key
+        emission_interval = limit.period_in_sec / limit.rate
+        tat = self._tats.get(key, now)
+        if tat < now:
+            tat = now
+        diff = now - (tat - emission_interval * limit.burst)
+        remaining = diff / emission_interval
+        if remaining < 1:
+            return Result(0, 0, emission_interval - diff, tat - now)
+        cost = n
+        if remaining < cost:
+            cost = remaining
+            remaining = 0
+        else:
+            remaining = remaining - cost
+        new_tat = tat + emission_interval * cost
+        reset_after = new_tat - now
+        if reset_after > 0:
+            self._tats[key] = new_tat
+        return Result(int(cost), int(remaining), -1.0, reset_after)
+
+    def _allow_composite(self, key: str, charges: List[Tuple[str, Limit, int]]) -> CompositeResult:
+        # Port of ALLOW_COMPOSITE_LUA_SCRIPT.
+        now = self._clock()
+        self._checks += 1
+        if self._checks % _SWEEP_EVERY == 0:
+            self._sweep(now)
+        keys, new_tats, remaining = [], [], {}
+        limited_by, retry_after, reset_after, reset_after_if_denied = "", -1.0, 0.0, 0.0
+        for name, limit, cost in charges:
+            bucket_key = f"{self._prefix}{{{key}}}:{name}"
+            emission_interval = limit.period_in_sec / limit.rate
+            tat = self._tats.get(bucket_key, now)
+            if tat < now:
+                tat = now
+            new_tat = tat + emission_interval * cost
+            diff = now - (new_tat - emission_interval * limit.burst)
+            if diff < 0:
+                if -diff > retry_after:
+                    retry_after = -diff
+                    limited_by = name
+                remaining[name] = 0
+            else:
+                remaining[name] = int(diff / emission_interval + 1e-9)
+            keys.append(bucket_key)
+            new_tats.append(new_tat)
+            reset_after = max(reset_after, new_tat - now)
+            reset_after_if_denied = max(reset_after_if_denied, tat - now)
+        if limited_by != "":
+            return CompositeResult(False, limited_by, remaining, retry_after, reset_after_if_denied)
+        for bucket_key, new_tat, (_, _, cost) in zip(keys, new_tats, charges):
+            if cost > 0 and new_tat > now:
+                self._tats[bucket_key] = new_tat
+        return CompositeResult(True, "", remaining, -1.0, reset_after)
+
+    def _set_usage(self, key: str, composite: CompositeLimit, used: Dict[str, int], blocked_for_in_sec: float) -> int:
+        # Port of SET_USAGE_LUA_SCRIPT.
+        now = self._clock()
+        raised = 0
+        for name, n in used.items():
+            limit = composite.buckets.get(name)
+            if limit is None:
+                continue
+            bucket_key = f"{self._prefix}{{{key}}}:{name}"
+            emission_interval = limit.period_in_sec / limit.rate
+            usage_tat = now + emission_interval * n
+            if blocked_for_in_sec > 0:
+                usage_tat = max(usage_tat, now + emission_interval * limit.burst + blocked_for_in_sec)
+            if usage_tat > self._tats.get(bucket_key, now):
+                self._tats[bucket_key] = usage_tat
+                raised += 1
+        return raised
+
+    async def aallow(self, key: str, limit: Limit) -> Tuple[Optional[Result], Optional[redis_exceptions.RedisError]]:
+        """
+        allow is a shortcut for allow_n(key, limit, 1).
+        """
+        return (self._allow_n(key, limit, 1), None)
+
+    def allow(self, key: str, limit: Limit) -> Tuple[Optional[Result], Optional[redis_exceptions.RedisError]]:
+        """
+        allow is a shortcut for allow_n(key, limit, 1).
+        """
+        return (self._allow_n(key, limit, 1), None)
+
+    async def aallow_n(self, key: str, limit: Limit, n: int) -> Tuple[Optional[Result], Optional[redis_exceptions.RedisError]]:
+        """
+        Report whether n events may happen at time now.
+        """
+        return (self._allow_n(key, limit, n), None)
+
+    def allow_n(self, key: str, limit: Limit, n: int) -> Tuple[Optional[Result], Optional[redis_exceptions.RedisError]]:
+        """
+        Report whether n events may happen at time now.
+        """
+        return (self._allow_n(key, limit, n), None)
+
+    async def aallow_at_most(self, key: str, limit: Limit, n: int) -> Tuple[Optional[Result], Optional[redis_exceptions.RedisError]]:
+        """
+        Report whether at most n events may happen at time now.
+        It returns number of allowed events that is less than or equal to n.
+        """
+        return (self._allow_at_most(key, limit, n), None)
+
+    def allow_at_most(self, key: str, limit: Limit, n: int) -> Tuple[Optional[Result], Optional[redis_exceptions.RedisError]]:
+        """
+        Report whether at most n events may happen at time now.
+        It returns number of allowed events that is less than or equal to n.
+        """
+        return (self._allow_at_most(key, limit, n), None)
+
+    async def aallow_batch(
+        self,
+        requests: Sequence[Tuple[str, Limit, int]],
+        at_most: bool = False
+    ) -> Tuple[Optional[List[Result]], Optional[redis_exceptions.RedisError]]:
+        """
+        Report for every (key, limit, n) whether n events (at most n if
+        'at_most') may happen at time now, results keep the order of 'requests'.
+        """
+        return self.allow_batch(requests, at_most=at_most)
+
+    def allow_batch(
+        self,
+        requests: Sequence[Tuple[str, Limit, int]],
+        at_most: bool = False
+    ) -> Tuple[Optional[List[Result]], Optional[redis_exceptions.RedisError]]:
+        """
+        Report for every (key, limit, n) whether n events (at most n if
+        'at_most') may happen at time now, results keep the order of 'requests'.
+        """
+        check = self._allow_at_most if at_most else self._allow_n
+        return ([check(key, limit, n) for key, limit, n in requests], None)
+
+    async def aallow_composite(
+        self,
+        key: str,
+        composite: CompositeLimit,
+        endpoint: Optional[str] = None,
+        costs: Optional[Dict[str, int]] = None
+    ) -> Tuple[Optional[CompositeResult], Optional[redis_exceptions.RedisError]]:
+        """
+        Report whether a call of endpoint (or of the given per-bucket costs)
+        is admitted by every bucket of composite, charging all of them or none.
+        """
+        return (self._allow_composite(key, _costs_of(composite, endpoint, costs)), None)
+
+    def allow_composite(
+        self,
+        key: str,
+        composite: CompositeLimit,
+        endpoint: Optional[str] = None,
+        costs: Optional[Dict[str, int]] = None
+    ) -> Tuple[Optional[CompositeResult], Optional[redis_exceptions.RedisError]]:
+        """
+        Report whether a call of endpoint (or of the given per-bucket costs)
+        is admitted by every bucket of composite, charging all of them or none.
+        """
+        return (self._allow_composite(key, _costs_of(composite, endpoint, costs)), None)
+
+    async def aset_usage(
+        self,
+        key: str,
+        composite: CompositeLimit,
+        used: Dict[str, int],
+        blocked_for_in_sec: float = 0.0
+    ) -> Tuple[Optional[int], Optional[redis_exceptions.RedisError]]:
+        """
+        Align the buckets of composite with the usage the server reported,
+        a bucket is only ever tightened, it returns how many were.
+        """
+        return (self._set_usage(key, composite, used, blocked_for_in_sec), None)
+
+    def set_usage(
+        self,
+        key: str,
+        composite: CompositeLimit,
+        used: Dict[str, int],
+        blocked_for_in_sec: float = 0.0
+    ) -> Tuple[Optional[int], Optional[redis_exceptions.RedisError]]:
+        """
+        Align the buckets of composite with the usage the server reported,
+        a bucket is only ever tightened, it returns how many were.
+        """
+        return (self._set_usage(key, composite, used, blocked_for_in_sec), None)
+
+    async def aclose(self):
+        pass
+
+    def close(self):
+        pass
+
+    async def areset(self, key) -> bool:
+        """
+        Reset the rate limiter for the given key.
+        """
+        return self.reset(key)
+
+    def reset(self, key) -> bool:
+        """
+        Reset the rate limiter for the given key.
+        """
+        tat = self._tats.pop(self._prefix + key, None)
+        return tat is not None and tat > self._clock()
+
+    async def areset_composite(self, key: str, composite: CompositeLimit) -> bool:
+        """
+        Reset all the buckets of composite for the given key.
+        """
+        return self.reset_composite(key, composite)
+
+    def reset_composite(self, key: str, composite: CompositeLimit) -> bool:
+        """
+        Reset all the buckets of composite for the given key.
+        """
+        now = self._clock()
+        reset = False
+        for name in composite.buckets:
+            tat = self._tats.pop(f"{self._prefix}{{{key}}}:{name}", None)
+            reset = reset or (tat is not None and tat > now)
+        return reset
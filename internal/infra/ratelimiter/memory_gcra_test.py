@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+import redis
+
+from internal.infra.ratelimiter.memory_gcra import MemoryRateLimiter
+from internal.infra.ratelimiter.redis_gcra import Limit, RateLimiter
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_allow_n_refills_over_time():
+    clock = FakeClock()
+    limiter = MemoryRateLimiter(clock=clock)
+    limit = Limit(rate=10, burst=10, period_in_sec=10)
+
+    result, error = limiter.allow_n("orders", limit, 8)
+    assert error is None
+    assert (result.allowed, result.remaining, result.retry_after_in_sec, result.reset_after_in_sec) == (8, 2, -1.0, 8.0)
+
+    result, _ = limiter.allow_n("orders", limit, 5)
+    assert (result.allowed, result.remaining, result.retry_after_in_sec, result.reset_after_in_sec) == (0, 0, 3.0, 8.0)
+
+    clock.now += 3
+    result, _ = limiter.allow_n("orders", limit, 5)
+    assert (result.allowed, result.remaining, result.retry_after_in_sec, result.reset_after_in_sec) == (5, 0, -1.0, 10.0)
+
+
+def test_allow_at_most_takes_what_is_left():
+    clock = FakeClock()
+    limiter = MemoryRateLimiter(clock=clock)
+    limit = Limit(rate=10, burst=10, period_in_sec=10)
+
+    result, _ = limiter.allow_at_most("orders", limit, 8)
+    assert (result.allowed, result.remaining) == (8, 2)
+    clock.now += 0.5
+    result, _ = limiter.allow_at_most("orders", limit, 5)
+    assert (result.allowed, result.remaining, result.retry_after_in_sec) == (2, 0, -1.0)
+    result, _ = limiter.allow_at_most("orders", limit, 5)
+    assert (result.allowed, result.remaining, result.retry_after_in_sec) == (0, 0, 1.0)
+
+
+def test_reset_and_sweep():
+    clock = FakeClock()
+    limiter = MemoryRateLimiter(clock=clock)
+    limit = Limit(rate=1, burst=1, period_in_sec=1)
+    limiter.allow("a", limit)
+    assert limiter.reset("a") is True
+    assert limiter.reset("a") is False
+
+    for i in range(5000):
+        limiter.allow(f"key-{i}", limit)
+        clock.now += 0.01
+    # Keys idle for more than their period are swept.
+    assert len(limiter) < 5000
+
+
+@pytest.mark.parametrize("at_most", [False, True])
+def test_same_results_as_lua_scripts(at_most):
+    redis_conn = redis.Redis(host="localhost", port=6379, db=0, password="sOmE_sEcUrE_pAsS")
+    lua_limiter = RateLimiter(redis_conn=redis_conn, async_mode=False, key_prefix="unittest_rate:")
+    memory_limiter = MemoryRateLimiter(key_prefix="unittest_rate:")
+    # A slow refill, so that the few microseconds between both checks do not matter.
+    limit = Limit(rate=10, burst=10, period_in_sec=3600)
+    key = f"test_same_results_as_lua_scripts_{at_most}"
+    try:
+        # On a fresh key no time passed since its TAT, 'remaining' is an exact integer that the float
+        # error of either clock may truncate one lower, so the results are compared from the next checks on.
+        lua_limiter.allow_batch([(key, limit, 1)], at_most=at_most)
+        memory_limiter.allow_batch([(key, limit, 1)], at_most=at_most)
+        time.sleep(0.001)
+        for n in [3, 4, 5, 1, 2, 10]:
+            lua, _ = lua_limiter.allow_batch([(key, limit, n)], at_most=at_most)
+            memory, _ = memory_limiter.allow_batch([(key, limit, n)], at_most=at_most)
+            assert (memory[0].allowed, memory[0].remaining) == (lua[0].allowed, lua[0].remaining)
+            assert memory[0].retry_after_in_sec == pytest.approx(lua[0].retry_after_in_sec, abs=0.05)
+            assert memory[0].reset_after_in_sec == pytest.approx(lua[0].reset_after_in_sec, abs=0.05)
+    finally:
+        lua_limiter.reset(key)
+        redis_conn.close()
@@ -1,13 +1,32 @@
 # -*- coding: utf-8 -*-
-from dataclasses import dataclass
-from typing import Optional, Tuple, Union
+import hashlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import redis
 import redis.asyncio as aio_redis
 import redis.exceptions as redis_exceptions
 from loguru import logger as loguru_logger
 
-from .redis_gcra_lua import ALLOW_AT_MOST_LUA_SCRIPT, ALLOW_N_LUA_SCRIPT
+from .acquire import AcquireMixin
+from .redis_gcra_lua import (
+    ALLOW_AT_MOST_LUA_SCRIPT,
+    ALLOW_COMPOSITE_LUA_SCRIPT,
+    ALLOW_N_LUA_SCRIPT,
+    SET_USAGE_LUA_SCRIPT,
+)
+
+# The scripts are called by their SHA1 digest (EVALSHA), which is known without asking the server.
+ALLOW_N_LUA_SHA = hashlib.sha1(ALLOW_N_LUA_SCRIPT.encode("utf-8")).hexdigest()
+ALLOW_AT_MOST_LUA_SHA = hashlib.sha1(ALLOW_AT_MOST_LUA_SCRIPT.encode("utf-8")).hexdigest()
+ALLOW_COMPOSITE_LUA_SHA = hashlib.sha1(ALLOW_COMPOSITE_LUA_SCRIPT.encode("utf-8")).hexdigest()
+SET_USAGE_LUA_SHA = hashlib.sha1(SET_USAGE_LUA_SCRIPT.encode("utf-8")).hexdigest()
+_LUA_SCRIPTS: Dict[str, str] = {
+    ALLOW_N_LUA_SHA: ALLOW_N_LUA_SCRIPT,
+    ALLOW_AT_MOST_LUA_SHA: ALLOW_AT_MOST_LUA_SCRIPT,
+    ALLOW_COMPOSITE_LUA_SHA: ALLOW_COMPOSITE_LUA_SCRIPT,
+    SET_USAGE_LUA_SHA: SET_USAGE_LUA_SCRIPT,
+}
 
 
 @dataclass
@@ -35,6 +54,63 @@ def per_hour(rate: int) -> Limit:
     return Limit(rate=rate, burst=rate, period_in_sec=3600)
 
 
+@dataclass
+class CompositeLimit:
+    """
+    -   'buckets' maps the name of every budget to its Limit, a call is
+        admitted only if all the buckets it charges allow it.
+    -   'costs' maps an endpoint to what one call of it charges to each
+        bucket, the buckets left out are not charged.
+    """
+    buckets: Dict[str, Limit]
+    costs: Dict[str, Dict[str, int]] = field(default_factory=dict)
+
+    def __str__(self) -> str:
+        return "CompositeLimit(" + ", ".join(f"{name}={limit}" for name, limit in self.buckets.items()) + ")"
+
+    def cost_of(self, endpoint: str) -> Dict[str, int]:
+        cost = self.costs.get(endpoint)
+        if cost is None:
+            raise ValueError(f"Unknown endpoint:{endpoint}, no cost is defined for it.")
+        return cost
+
+
+# Request weights of the Binance spot REST API, keyed by "<METHOD> <path under /api/v3>".
+BINANCE_SPOT_REQUEST_WEIGHTS: Dict[str, int] = {
+    "GET /ping": 1,
+    "GET /time": 1,
+    "GET /exchangeInfo": 20,
+    "GET /depth": 5,
+    "GET /ticker/price": 2,
+    "GET /account": 20,
+    "POST /order": 1,
+    "GET /order": 4,
+    "DELETE /order": 1,
+    "GET /openOrders": 6,
+    "GET /allOrders": 20,
+    "POST /userDataStream": 2,
+    "PUT /userDataStream": 2,
+    "DELETE /userDataStream": 2,
+}
+
+
+def binance_spot_limits(weight_per_minute: int = 6000, orders_per_10s: int = 50, orders_per_day: int = 160000) -> CompositeLimit:
+    """
+    The budgets Binance enforces at once on a spot account: request weight
+    per minute, and new orders per 10 seconds and per day.
+    """
+    costs = {endpoint: {"weight": weight} for endpoint, weight in BINANCE_SPOT_REQUEST_WEIGHTS.items()}
+    costs["POST /order"].update({"orders_10s": 1, "orders_1d": 1})
+    return CompositeLimit(
+        buckets={
+            "weight": Limit(rate=weight_per_minute, burst=weight_per_minute, period_in_sec=60),
+            "orders_10s": Limit(rate=orders_per_10s, burst=orders_per_10s, period_in_sec=10),
+            "orders_1d": Limit(rate=orders_per_day, burst=orders_per_day, period_in_sec=86400),
+        },
+        costs=costs,
+    )
+
+
 @dataclass
 class Result:
     """
@@ -61,7 +137,42 @@ class Result:
         return f"Result(allowed={self.allowed}, remaining={self.remaining}, retry_after_in_sec={self.retry_after_in_sec}, reset_after_in_sec={self.reset_after_in_sec})"
 
 
-class RateLimiter:
+@dataclass
+class CompositeResult:
+    """
+    -   'allowed' tells whether the call was admitted, all its buckets are
+        charged then, and none of them otherwise.
+    -   'limited_by' is the bucket that makes the caller wait the longest,
+        empty if allowed.
+    -   'remaining' is, for every charged bucket, the number of further
+        calls of the same cost it would admit instantaneously.
+    -   'retry_after_in_sec' is the time until the call will be admitted,
+        -1 if allowed.
+    -   'reset_after_in_sec' is the time until all the buckets are back to
+        their initial state.
+    """
+    allowed: bool
+    limited_by: str
+    remaining: Dict[str, int]
+    retry_after_in_sec: float
+    reset_after_in_sec: float
+
+    def __str__(self) -> str:
+        return (
+            f"CompositeResult(allowed={self.allowed}, limited_by={self.limited_by}, remaining={self.remaining}, "
+            f"retry_after_in_sec={self.retry_after_in_sec}, reset_after_in_sec={self.reset_after_in_sec})"
+        )
+
+
+def _costs_of(composite: CompositeLimit, endpoint: Optional[str], costs: Optional[Dict[str, int]]) -> List[Tuple[str, Limit, int]]:
+    if costs is None:
+        if endpoint is None:
+            raise ValueError("Either endpoint or costs must be given.")
+        costs = composite.cost_of(endpoint)
+    return [(name, composite.buckets[name], cost) for name, cost in costs.items()]
+
+
+class RateLimiter(AcquireMixin):
     _instance: Optional["RateLimiter"] = None
 
     @staticmethod
@@ -86,9 +197,11 @@ class RateLimiter:
         async_mode: bool = True,
         key_prefix: str = "rate:"
     ):
+        super().__init__()
         self._rdb: Union[redis.Redis, aio_redis.Redis] = redis_conn
         self.async_mode = async_mode
         self._redis_prefix = key_prefix
+        self._scripts_loaded = False
 
     async def aallow(
         self,
@@ -110,6 +223,81 @@ class RateLimiter:
         """
         return self.allow_n(key, limit, 1)
 
+    def _to_result(self, values: List[Any]) -> Result:
+        return Result(
+            allowed=values[0],
+            remaining=values[1],
+            retry_after_in_sec=float(values[2].decode("utf-8") if isinstance(values[2], bytes) else values[2]),
+            reset_after_in_sec=float(values[3].decode("utf-8") if isinstance(values[3], bytes) else values[3])
+        )
+
+    def _evalsha_args(self, sha: str, key: str, limit: Limit, n: int) -> Tuple[Any, ...]:
+        return ("EVALSHA", sha, 1, self._redis_prefix + key, limit.burst, limit.rate, limit.period_in_sec, n)
+
+    def _composite_args(self, key: str, charges: List[Tuple[str, Limit, int]]) -> Tuple[Any, ...]:
+        # The hash tag keeps all the buckets of a key in the same slot of a Redis Cluster.
+        keys = [f"{self._redis_prefix}{{{key}}}:{name}" for name, _, _ in charges]
+        args = []
+        for _, limit, cost in charges:
+            args.extend((limit.burst, limit.rate, limit.period_in_sec, cost))
+        return ("EVALSHA", ALLOW_COMPOSITE_LUA_SHA, len(keys), *keys, *args)
+
+    def _usage_args(self, key: str, composite: CompositeLimit, used: Dict[str, int], blocked_for_in_sec: float) -> Tuple[Any, ...]:
+        names = [name for name in used if name in composite.buckets]
+        keys = [f"{self._redis_prefix}{{{key}}}:{name}" for name in names]
+        args = [blocked_for_in_sec]
+        for name in names:
+            limit = composite.buckets[name]
+            args.extend((limit.burst, limit.rate, limit.period_in_sec, used[name]))
+        return ("EVALSHA", SET_USAGE_LUA_SHA, len(keys), *keys, *args)
+
+    def _to_composite_result(self, charges: List[Tuple[str, Limit, int]], values: List[Any]) -> CompositeResult:
+        return CompositeResult(
+            allowed=values[0] == 1,
+            limited_by=charges[values[1] - 1][0] if values[1] > 0 else "",
+            remaining={name: int(remaining) for (name, _, _), remaining in zip(charges, values[4:])},
+            retry_after_in_sec=float(values[2].decode("utf-8") if isinstance(values[2], bytes) else values[2]),
+            reset_after_in_sec=float(values[3].decode("utf-8") if isinstance(values[3], bytes) else values[3])
+        )
+
+    async def _aload_scripts(self):
+        for script in _LUA_SCRIPTS.values():
+            await self._rdb.execute_command("SCRIPT", "LOAD", script)
+        self._scripts_loaded = True
+
+    def _load_scripts(self):
+        for script in _LUA_SCRIPTS.values():
+            self._rdb.execute_command("SCRIPT", "LOAD", script)
+        self._scripts_loaded = True
+
+    async def _aevalsha(self, *args: Any) -> List[Any]:
+        """
+        Run the cached script, it is loaded again if the server lost it
+        (restart, failover or SCRIPT FLUSH).
+        """
+        if not self._scripts_loaded:
+            await self._aload_scripts()
+        try:
+            return await self._rdb.execute_command(*args)
+        except redis_exceptions.NoScriptError:
+            loguru_logger.warning("Lua scripts of the rate limiter are missing on the redis server, load them again.")
+            await self._aload_scripts()
+            return await self._rdb.execute_command(*args)
+
+    def _evalsha(self, *args: Any) -> List[Any]:
+        """
+        Run the cached script, it is loaded again if the server lost it
+        (restart, failover or SCRIPT FLUSH).
+        """
+        if not self._scripts_loaded:
+            self._load_scripts()
+        try:
+            return self._rdb.execute_command(*args)
+        except redis_exceptions.NoScriptError:
+            loguru_logger.warning("Lua scripts of the rate limiter are missing on the redis server, load them again.")
+            self._load_scripts()
+            return self._rdb.execute_command(*args)
+
     async def aallow_n(
         self,
         key: str,
@@ -122,22 +310,7 @@ class RateLimiter:
         result: Optional[Result] = None
         redis_error: Optional[redis_exceptions.RedisError] = None
         try:
-            values = await self._rdb.execute_command(
-                "EVAL",
-                ALLOW_N_LUA_SCRIPT,
-                1,
-                self._redis_prefix + key,
-                limit.burst,
-                limit.rate,
-                limit.period_in_sec,
-                n
-            )
-            result = Result(
-                allowed=values[0],
-                remaining=values[1],
-                retry_after_in_sec=float(values[2].decode("utf-8")),
-                reset_after_in_sec=float(values[3].decode("utf-8"))
-            )
+            result = self._to_result(await self._aevalsha(*self._evalsha_args(ALLOW_N_LUA_SHA, key, limit, n)))
         except redis_exceptions.RedisError as e:
             loguru_logger.error(f"RedisError: {e}")
             redis_error = e
@@ -155,22 +328,7 @@ class RateLimiter:
         result: Optional[Result] = None
         redis_error: Optional[redis_exceptions.RedisError] = None
         try:
-            values = self._rdb.execute_command(
-                "EVAL",
-                ALLOW_N_LUA_SCRIPT,
-                1,
-                self._redis_prefix + key,
-                limit.burst,
-                limit.rate,
-                limit.period_in_sec,
-                n
-            )
-            result = Result(
-                allowed=values[0],
-                remaining=values[1],
-                retry_after_in_sec=float(values[2].decode("utf-8")),
-                reset_after_in_sec=float(values[3].decode("utf-8"))
-            )
+            result = self._to_result(self._evalsha(*self._evalsha_args(ALLOW_N_LUA_SHA, key, limit, n)))
         except redis_exceptions.RedisError as e:
             loguru_logger.error(f"RedisError: {e}")
             redis_error = e
@@ -189,22 +347,7 @@ class RateLimiter:
         result = None
         redis_error = None
         try:
-            values = await self._rdb.execute_command(
-                "EVAL",
-                ALLOW_AT_MOST_LUA_SCRIPT,
-                1,
-                self._redis_prefix + key,
-                limit.burst,
-                limit.rate,
-                limit.period_in_sec,
-                n
-            )
-            result = Result(
-                allowed=values[0],
-                remaining=values[1],
-                retry_after_in_sec=float(values[2].decode("utf-8")),
-                reset_after_in_sec=float(values[3].decode("utf-8"))
-            )
+            result = self._to_result(await self._aevalsha(*self._evalsha_args(ALLOW_AT_MOST_LUA_SHA, key, limit, n)))
         except redis_exceptions.RedisError as e:
             loguru_logger.error(f"RedisError: {e}")
             redis_error = e
@@ -223,28 +366,181 @@ class RateLimiter:
         result = None
         redis_error = None
         try:
-            values = self._rdb.execute_command(
-                "EVAL",
-                ALLOW_AT_MOST_LUA_SCRIPT,
-                1,
-                self._redis_prefix + key,
-                limit.burst,
-                limit.rate,
-                limit.period_in_sec,
-                n
-            )
-            result = Result(
-                allowed=values[0],
-                remaining=values[1],
-                retry_after_in_sec=float(values[2].decode("utf-8")),
-                reset_after_in_sec=float(values[3].decode("utf-8"))
-            )
+            result = self._to_result(self._evalsha(*self._evalsha_args(ALLOW_AT_MOST_LUA_SHA, key, limit, n)))
         except redis_exceptions.RedisError as e:
             loguru_logger.error(f"RedisError: {e}")
             redis_error = e
         finally:
             return (result, redis_error)
 
+    async def aallow_batch(
+        self,
+        requests: Sequence[Tuple[str, Limit, int]],
+        at_most: bool = False
+    ) -> Tuple[Optional[List[Result]], Optional[redis_exceptions.RedisError]]:
+        """
+        Report for every (key, limit, n) whether n events (at most n if
+        'at_most') may happen at time now, in one pipelined round trip.
+        Results keep the order of 'requests'.
+        """
+        sha = ALLOW_AT_MOST_LUA_SHA if at_most else ALLOW_N_LUA_SHA
+        results = None
+        redis_error = None
+        try:
+            if not self._scripts_loaded:
+                await self._aload_scripts()
+            for attempt in range(2):
+                pipe = self._rdb.pipeline(transaction=False)
+                for key, limit, n in requests:
+                    pipe.execute_command(*self._evalsha_args(sha, key, limit, n))
+                try:
+                    results = [self._to_result(values) for values in await pipe.execute()]
+                    break
+                except redis_exceptions.NoScriptError:
+                    # The scripts are all or none on the server, none of the calls was run.
+                    if attempt > 0:
+                        raise
+                    loguru_logger.warning("Lua scripts of the rate limiter are missing on the redis server, load them again.")
+                    await self._aload_scripts()
+        except redis_exceptions.RedisError as e:
+            loguru_logger.error(f"RedisError: {e}")
+            redis_error = e
+        return (results, redis_error)
+
+    def allow_batch(
+        self,
+        requests: Sequence[Tuple[str, Limit, int]],
+        at_most: bool = False
+    ) -> Tuple[Optional[List[Result]], Optional[redis_exceptions.RedisError]]:
+        """
+        Report for every (key, limit, n) whether n events (at most n if
+        'at_most') may happen at time now, in one pipelined round trip.
+        Results keep the order of 'requests'.
+        """
+        sha = ALLOW_AT_MOST_LUA_SHA if at_most else ALLOW_N_LUA_SHA
+        results = None
+        redis_error = None
+        try:
+            if not self._scripts_loaded:
+                self._load_scripts()
+            for attempt in range(2):
+                pipe = self._rdb.pipeline(transaction=False)
+                for key, limit, n in requests:
+                    pipe.execute_command(*self._evalsha_args(sha, key, limit, n))
+                try:
+                    results = [self._to_result(values) for values in pipe.execute()]
+                    break
+                except redis_exceptions.NoScriptError:
+                    # The scripts are all or none on the server, none of the calls was run.
+                    if attempt > 0:
+                        raise
+                    loguru_logger.warning("Lua scripts of the rate limiter are missing on the redis server, load them again.")
+                    self._load_scripts()
+        except redis_exceptions.RedisError as e:
+            loguru_logger.error(f"RedisError: {e}")
+            redis_error = e
+        return (results, redis_error)
+
+    async def aallow_composite(
+        self,
+        key: str,
+        composite: CompositeLimit,
+        endpoint: Optional[str] = None,
+        costs: Optional[Dict[str, int]] = None
+    ) -> Tuple[Optional[CompositeResult], Optional[redis_exceptions.RedisError]]:
+        """
+        Report whether a call of endpoint (or of the given per-bucket costs)
+        is admitted by every bucket of composite, charging all of them or
+        none in one atomic script call.
+        """
+        charges = _costs_of(composite, endpoint, costs)
+        result = None
+        redis_error = None
+        try:
+            result = self._to_composite_result(charges, await self._aevalsha(*self._composite_args(key, charges)))
+        except redis_exceptions.RedisError as e:
+            loguru_logger.error(f"RedisError: {e}")
+            redis_error = e
+        return (result, redis_error)
+
+    def allow_composite(
+        self,
+        key: str,
+        composite: CompositeLimit,
+        endpoint: Optional[str] = None,
+        costs: Optional[Dict[str, int]] = None
+    ) -> Tuple[Optional[CompositeResult], Optional[redis_exceptions.RedisError]]:
+        """
+        Report whether a call of endpoint (or of the given per-bucket costs)
+        is admitted by every bucket of composite, charging all of them or
+        none in one atomic script call.
+        """
+        charges = _costs_of(composite, endpoint, costs)
+        result = None
+        redis_error = None
+        try:
+            result = self._to_composite_result(charges, self._evalsha(*self._composite_args(key, charges)))
+        except redis_exceptions.RedisError as e:
+            loguru_logger.error(f"RedisError: {e}")
+            redis_error = e
+        return (result, redis_error)
+
+    async def aset_usage(
+        self,
+        key: str,
+        composite: CompositeLimit,
+        used: Dict[str, int],
+        blocked_for_in_sec: float = 0.0
+    ) -> Tuple[Optional[int], Optional[redis_exceptions.RedisError]]:
+        """
+        Align the buckets of composite with the usage the server reported,
+        'used' maps a bucket to the events the server counted in its window,
+        and 'blocked_for_in_sec' (a Retry-After) denies everything for that
+        long. A bucket is only ever tightened, it returns how many were.
+        """
+        raised = None
+        redis_error = None
+        try:
+            raised = int(await self._aevalsha(*self._usage_args(key, composite, used, blocked_for_in_sec)))
+        except redis_exceptions.RedisError as e:
+            loguru_logger.error(f"RedisError: {e}")
+            redis_error = e
+        return (raised, redis_error)
+
+    def set_usage(
+        self,
+        key: str,
+        composite: CompositeLimit,
+        used: Dict[str, int],
+        blocked_for_in_sec: float = 0.0
+    ) -> Tuple[Optional[int], Optional[redis_exceptions.RedisError]]:
+        """
+        Align the buckets of composite with the usage the server reported,
+        'used' maps a bucket to the events the server counted in its window,
+        and 'blocked_for_in_sec' (a Retry-After) denies everything for that
+        long. A bucket is only ever tightened, it returns how many were.
+        """
+        raised = None
+        redis_error = None
+        try:
+            raised = int(self._evalsha(*self._usage_args(key, composite, used, blocked_for_in_sec)))
+        except redis_exceptions.RedisError as e:
+            loguru_logger.error(f"RedisError: {e}")
+            redis_error = e
+        return (raised, redis_error)
+
+    async def aclose(self):
+        """
+        Close the redis connection, in async mode.
+        """
+        await self._rdb.aclose()
+
+    def close(self):
+        """
+        Close the redis connection, in sync mode.
+        """
+        self._rdb.close()
+
     async def areset(self, key) -> bool:
         """
         Reset the rate limiter for the given key.
@@ -256,3 +552,17 @@ class RateLimiter:
         Reset the rate limiter for the given key.
         """
         return self._rdb.execute_command("DEL", self._redis_prefix + key) == 1
+
+    async def areset_composite(self, key: str, composite: CompositeLimit) -> bool:
+        """
+        Reset all the buckets of composite for the given key.
+        """
+        keys = [f"{self._redis_prefix}{{{key}}}:{name}" for name in composite.buckets]
+        return await self._rdb.execute_command("DEL", *keys) > 0
+
+    def reset_composite(self, key: str, composite: CompositeLimit) -> bool:
+        """
+        Reset all the buckets of composite for the given key.
+        """
+        keys = [f"{self._redis_prefix}{{{key}}}:{name}" for name in composite.buckets]
+        return self._rdb.execute_command("DEL", *keys) > 0
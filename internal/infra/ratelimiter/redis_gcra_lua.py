@@ -137,3 +137,115 @@ return {
   tostring(reset_after),
 }
 '''
+
+# Checks the GCRA buckets KEYS[1..n] together, ARGV holds (burst, rate, period, cost)
+# of every bucket in turn. Either all buckets are charged or none of them is.
+ALLOW_COMPOSITE_LUA_SCRIPT = '''
+-- this script has side-effects, so it requires replicate commands mode
+redis.replicate_commands()
+
+local jan_1_2017 = 1483228800
+local now = redis.call("TIME")
+now = (now[1] - jan_1_2017) + (now[2] / 1000000)
+
+local new_tats = {}
+local remainings = {}
+local limited_by = 0
+local retry_after = -1
+local reset_after = 0
+local reset_after_if_denied = 0
+
+for i = 1, #KEYS do
+  local burst = tonumber(ARGV[4 * i - 3])
+  local rate = tonumber(ARGV[4 * i - 2])
+  local period = tonumber(ARGV[4 * i - 1])
+  local cost = tonumber(ARGV[4 * i])
+
+  local emission_interval = period / rate
+  local tat = redis.call("GET", KEYS[i])
+  if not tat then
+    tat = now
+  else
+    tat = tonumber(tat)
+  end
+  tat = math.max(tat, now)
+
+  local new_tat = tat + emission_interval * cost
+  local diff = now - (new_tat - emission_interval * burst)
+  -- the epsilon keeps a float error like 1.9999999 from counting as 1
+  local remaining = diff / emission_interval + 1e-9
+
+  if diff < 0 then
+    -- the bucket which makes the caller wait the longest is reported
+    if diff * -1 > retry_after then
+      retry_after = diff * -1
+      limited_by = i
+    end
+    remaining = 0
+  end
+  new_tats[i] = new_tat
+  remainings[i] = math.floor(remaining)
+  reset_after = math.max(reset_after, new_tat - now)
+  reset_after_if_denied = math.max(reset_after_if_denied, tat - now)
+end
+
+local reply
+if limited_by > 0 then
+  reply = {0, limited_by, tostring(retry_after), tostring(reset_after_if_denied)}
+else
+  for i = 1, #KEYS do
+    local cost = tonumber(ARGV[4 * i])
+    local bucket_reset_after = new_tats[i] - now
+    if cost > 0 and bucket_reset_after > 0 then
+      redis.call("SET", KEYS[i], new_tats[i], "EX", math.ceil(bucket_reset_after))
+    end
+  end
+  reply = {1, 0, tostring(-1), tostring(reset_after)}
+end
+for i = 1, #KEYS do
+  reply[4 + i] = remainings[i]
+end
+return reply
+'''
+
+SET_USAGE_LUA_SCRIPT = '''
+-- this script has side-effects, so it requires replicate commands mode
+redis.replicate_commands()
+
+local jan_1_2017 = 1483228800
+local now = redis.call("TIME")
+now = (now[1] - jan_1_2017) + (now[2] / 1000000)
+
+local blocked_for = tonumber(ARGV[1])
+local raised = 0
+
+for i = 1, #KEYS do
+  local burst = tonumber(ARGV[4 * i - 2])
+  local rate = tonumber(ARGV[4 * i - 1])
+  local period = tonumber(ARGV[4 * i])
+  local used = tonumber(ARGV[4 * i + 1])
+
+  local emission_interval = period / rate
+  -- 'used' events counted by the server mean a TAT of 'used' emission intervals ahead
+  local usage_tat = now + emission_interval * used
+  if blocked_for > 0 then
+    -- nothing is admitted before now + blocked_for
+    usage_tat = math.max(usage_tat, now + emission_interval * burst + blocked_for)
+  end
+
+  local tat = redis.call("GET", KEYS[i])
+  if not tat then
+    tat = now
+  else
+    tat = tonumber(tat)
+  end
+
+  -- the usage only ever tightens the bucket, what was charged here may not have reached the server yet
+  if usage_tat > tat then
+    redis.call("SET", KEYS[i], usage_tat, "EX", math.ceil(usage_tat - now))
+    raised = raised + 1
+  end
+end
+
+return raised
+'''
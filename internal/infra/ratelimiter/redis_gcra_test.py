@@ -172,3 +172,52 @@ def test_reset(my_fixture):
     assert my_fixture.limiter.reset(key) is True
     key = "test_allow_at_most_over_limit"
     assert my_fixture.limiter.reset(key) is True
+
+
+def test_allow_recovers_from_noscript(my_fixture):
+    limit = Limit(rate=10, burst=10, period_in_sec=60)
+    key = "test_allow_recovers_from_noscript"
+    result, error = my_fixture.limiter.allow(key, limit)
+    assert error is None and result.allowed == 1
+    # The server lost the cached scripts, e.g. after a restart.
+    my_fixture.redis_conn.script_flush()
+    result, error = my_fixture.limiter.allow(key, limit)
+    assert error is None
+    assert result.allowed == 1
+    assert result.remaining == 8
+    assert my_fixture.limiter.reset(key) is True
+
+
+def test_allow_batch(my_fixture):
+    limit = Limit(rate=10, burst=10, period_in_sec=60)
+    keys = ["test_allow_batch_btc", "test_allow_batch_eth"]
+    results, error = my_fixture.limiter.allow_batch([(keys[0], limit, 8), (keys[1], limit, 3), (keys[0], limit, 5)])
+    assert error is None
+    assert [(r.allowed, r.remaining) for r in results] == [(8, 2), (3, 7), (0, 0)]
+
+    results, error = my_fixture.limiter.allow_batch([(keys[0], limit, 5)], at_most=True)
+    assert error is None
+    assert [(r.allowed, r.remaining) for r in results] == [(2, 0)]
+    for key in keys:
+        assert my_fixture.limiter.reset(key) is True
+
+
+async def test_aallow_batch():
+    aio_redis_conn = aio_redis.Redis(host="localhost", port=6379, db=0, password="sOmE_sEcUrE_pAsS")
+    limiter = RateLimiter(redis_conn=aio_redis_conn, async_mode=True, key_prefix="unittest_rate:")
+    limit = Limit(rate=10, burst=10, period_in_sec=60)
+    keys = ["test_aallow_batch_btc", "test_aallow_batch_eth"]
+    try:
+        results, error = await limiter.aallow_batch([(keys[0], limit, 4), (keys[1], limit, 10)])
+        assert error is None
+        assert [(r.allowed, r.remaining) for r in results] == [(4, 6), (10, 0)]
+
+        await aio_redis_conn.script_flush()
+        result, error = await limiter.aallow_n(keys[1], limit, 1)
+        assert error is None
+        assert result.allowed == 0
+        assert result.retry_after_in_sec > 0
+    finally:
+        for key in keys:
+            await limiter.areset(key)
+        await aio_redis_conn.aclose()
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+from .order_placement import OrderPlacementScheduler, PlacementStats
+from .trigger import FIRE_ERROR_BUCKETS_IN_US, TriggerScheduler, TriggerStats
+
+__all__ = ["FIRE_ERROR_BUCKETS_IN_US", "OrderPlacementScheduler", "PlacementStats", "TriggerScheduler", "TriggerStats"]
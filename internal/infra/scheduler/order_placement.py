@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, List, Optional, Tuple
+
+from loguru import logger as loguru_logger
+
+PlacementJob = Callable[[], Awaitable[Any]]
+
+
+@dataclass
+class PlacementStats:
+    """
+    -   'batch' is the sequence number of the batch, starting from 1.
+    -   'placed' is the number of jobs that returned normally.
+    -   'throttled' is the number of jobs rejected by the exchange for
+        exceeding the order rate, they are queued again.
+    -   'failed' is the number of jobs that raised any other exception.
+    -   'elapsed_in_sec' is the wall time between the first submission and
+        the last response of the batch.
+    -   'throughput' is the number of placed orders per second of the batch.
+    -   'p50_latency_in_ms' / 'p99_latency_in_ms' / 'max_latency_in_ms' are
+        the per-order round-trip latencies of the batch.
+    """
+    batch: int
+    placed: int
+    throttled: int
+    failed: int
+    elapsed_in_sec: float
+    throughput: float
+    p50_latency_in_ms: float
+    p99_latency_in_ms: float
+    max_latency_in_ms: float
+
+    def __str__(self) -> str:
+        return (
+            f"PlacementStats(batch={self.batch}, placed={self.placed}, throttled={self.throttled}, failed={self.failed}, "
+            f"elapsed_in_sec={self.elapsed_in_sec:.3f}, throughput={self.throughput:.1f} orders/s, "
+            f"p50={self.p50_latency_in_ms:.1f}ms, p99={self.p99_latency_in_ms:.1f}ms, max={self.max_latency_in_ms:.1f}ms)"
+        )
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if len(sorted_values) == 0:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+class OrderPlacementScheduler:
+    """
+    下单调度器
+
+    Fans order placement jobs out concurrently while keeping the number of
+    submissions inside any sliding window of 'interval_in_sec' at or below
+    'max_orders'. A sliding window is stricter than the fixed windows the
+    exchange counts on, so a full budget is never exceeded whatever the
+    window alignment is. Jobs beyond the budget wait in a FIFO queue.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_orders: int = 50,
+        interval_in_sec: float = 10.0,
+        max_concurrency: int = 50,
+        safety_margin_in_sec: float = 0.1,
+        is_throttled: Optional[Callable[[BaseException], bool]] = None,
+    ):
+        if max_orders <= 0 or interval_in_sec <= 0 or max_concurrency <= 0:
+            raise ValueError("max_orders, interval_in_sec and max_concurrency must be positive.")
+        self._max_orders = max_orders
+        self._interval_in_sec = interval_in_sec
+        self._safety_margin_in_sec = safety_margin_in_sec
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._is_throttled = is_throttled
+        # Monotonic timestamps (boxed, so that every place_all moves only its own
+        # to the response time) of the submissions inside the current window.
+        # Concurrent calls finish in any order, so the window is not sorted.
+        self._window: List[List[float]] = []
+        self._blocked_until = 0.0
+        self.stats: List[PlacementStats] = []
+
+    def _prune(self, now: float):
+        horizon = now - self._interval_in_sec - self._safety_margin_in_sec
+        self._window = [slot for slot in self._window if slot[0] > horizon]
+
+    async def _reserve(self, wanted: int) -> List[List[float]]:
+        """Wait until the window has room, then reserve up to 'wanted' slots."""
+        while 1:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                await asyncio.sleep(self._blocked_until - now)
+                continue
+            self._prune(now)
+            available = self._max_orders - len(self._window)
+            if available > 0:
+                slots = [[now] for _ in range(min(available, wanted))]
+                self._window.extend(slots)
+                return slots
+            await asyncio.sleep(min(slot[0] for slot in self._window) + self._interval_in_sec + self._safety_margin_in_sec - now)
+
+    async def _run_one(self, job: PlacementJob) -> Tuple[Any, Optional[BaseException], float]:
+        async with self._semaphore:
+            st = time.perf_counter()
+            try:
+                return (await job(), None, time.perf_counter() - st)
+            except Exception as e:
+                return (None, e, time.perf_counter() - st)
+
+    async def place_all(self, jobs: List[PlacementJob]) -> List[Any]:
+        """Run all jobs within the order budget, results keep the order of 'jobs'.
+
+        A job that raised is reported as None, unless 'is_throttled' says the
+        exchange rejected it for the order rate, in which case it is queued
+        again and the whole budget is considered spent for one interval.
+        """
+        results: List[Any] = [None] * len(jobs)
+        pending: Deque[int] = deque(range(len(jobs)))
+        total_placed = 0
+        st = time.perf_counter()
+        while len(pending) > 0:
+            slots = await self._reserve(len(pending))
+            batch = [pending.popleft() for _ in range(len(slots))]
+
+            batch_st = time.perf_counter()
+            outcomes = await asyncio.gather(*[self._run_one(jobs[i]) for i in batch])
+            batch_elapsed = time.perf_counter() - batch_st
+            # Account the batch at the time its responses arrived, the latest instant
+            # the exchange may have counted the orders in.
+            done_at = time.monotonic()
+            for slot in slots:
+                slot[0] = done_at
+
+            placed, throttled, failed = 0, [], 0
+            latencies = []
+            for i, (result, exc, latency) in zip(batch, outcomes):
+                latencies.append(latency * 1000)
+                if exc is None:
+                    results[i] = result
+                    placed += 1
+                elif self._is_throttled is not None and self._is_throttled(exc):
+                    throttled.append(i)
+                else:
+                    loguru_logger.error(f"Failed to place order of job#{i}, internal exception:{exc}.")
+                    failed += 1
+            if len(throttled) > 0:
+                pending.extendleft(reversed(throttled))
+                self._blocked_until = time.monotonic() + self._interval_in_sec + self._safety_margin_in_sec
+                loguru_logger.warning(f"{len(throttled)} orders were throttled by the exchange, back off for {self._interval_in_sec}s.")
+
+            latencies.sort()
+            stats = PlacementStats(
+                batch=len(self.stats) + 1,
+                placed=placed,
+                throttled=len(throttled),
+                failed=failed,
+                elapsed_in_sec=batch_elapsed,
+                throughput=placed / batch_elapsed if batch_elapsed > 0 else 0.0,
+                p50_latency_in_ms=_percentile(latencies, 0.50),
+                p99_latency_in_ms=_percentile(latencies, 0.99),
+                max_latency_in_ms=latencies[-1] if len(latencies) > 0 else 0.0,
+            )
+            self.stats.append(stats)
+            total_placed += placed
+            loguru_logger.info(f"{stats}, {len(pending)} orders queued.")
+
+        total_elapsed = time.perf_counter() - st
+        loguru_logger.info(
+            f"Placed {total_placed}/{len(jobs)} orders in {total_elapsed:.3f} secs "
+            f"({total_placed / total_elapsed if total_elapsed > 0 else 0.0:.1f} orders/s)."
+        )
+        return results
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+from internal.infra.scheduler.order_placement import OrderPlacementScheduler
+
+
+class ThrottledError(Exception):
+    pass
+
+
+async def test_place_all_keeps_order_of_jobs():
+    scheduler = OrderPlacementScheduler(max_orders=10, interval_in_sec=0.2, max_concurrency=10)
+
+    def make_job(i):
+        async def job():
+            await asyncio.sleep(0.001 * (10 - i % 10))
+            return i
+        return job
+
+    results = await scheduler.place_all([make_job(i) for i in range(25)])
+    assert results == list(range(25))
+    assert [s.placed for s in scheduler.stats] == [10, 10, 5]
+
+
+async def test_place_all_never_exceeds_budget():
+    submitted_at = []
+
+    async def job():
+        submitted_at.append(time.monotonic())
+        return True
+
+    scheduler = OrderPlacementScheduler(max_orders=5, interval_in_sec=0.2, max_concurrency=5, safety_margin_in_sec=0.0)
+    results = await scheduler.place_all([job for _ in range(15)])
+    assert all(results)
+    for i in range(len(submitted_at) - 5):
+        assert submitted_at[i + 5] - submitted_at[i] >= 0.2
+
+
+async def test_concurrent_place_all_share_the_budget():
+    submitted_at = []
+
+    def make_job(delay):
+        async def job():
+            submitted_at.append(time.monotonic())
+            await asyncio.sleep(delay)
+            return True
+        return job
+
+    # The slow caller's batches finish after the fast caller's ones.
+    scheduler = OrderPlacementScheduler(max_orders=4, interval_in_sec=0.2, max_concurrency=8, safety_margin_in_sec=0.0)
+    slow, fast = await asyncio.gather(
+        scheduler.place_all([make_job(0.05) for _ in range(6)]),
+        scheduler.place_all([make_job(0.0) for _ in range(6)]),
+    )
+    assert all(slow) and all(fast)
+    submitted_at.sort()
+    for i in range(len(submitted_at) - 4):
+        assert submitted_at[i + 4] - submitted_at[i] >= 0.2
+
+
+async def test_place_all_retries_throttled_jobs():
+    calls = {"n": 0}
+
+    async def job():
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise ThrottledError()
+        return "ok"
+
+    async def failing_job():
+        raise ValueError("boom")
+
+    scheduler = OrderPlacementScheduler(
+        max_orders=5,
+        interval_in_sec=0.1,
+        max_concurrency=5,
+        is_throttled=lambda e: isinstance(e, ThrottledError),
+    )
+    results = await scheduler.place_all([job, failing_job])
+    assert results == ["ok", None]
+    assert scheduler.stats[0].throttled == 1
+    assert scheduler.stats[0].failed == 1
+    assert scheduler.stats[1].placed == 1
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import bisect
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List
+
+# Upper bounds in microseconds of the buckets of the fire-time error histogram, the last bucket is unbounded.
+FIRE_ERROR_BUCKETS_IN_US = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+@dataclass
+class TriggerStats:
+    """
+    -   'fired' is the number of triggers which fired.
+    -   'histogram' counts the fire-time errors (how late a trigger fired)
+        per bucket of FIRE_ERROR_BUCKETS_IN_US, plus one for the larger ones.
+    -   'total_error_in_us' / 'max_error_in_us' are the sum and the largest
+        fire-time error.
+    """
+    fired: int = 0
+    histogram: List[int] = field(default_factory=lambda: [0] * (len(FIRE_ERROR_BUCKETS_IN_US) + 1))
+    total_error_in_us: float = 0.0
+    max_error_in_us: float = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"TriggerStats(fired={self.fired}, avg_error={self.avg_error_in_us:.1f}us, max_error={self.max_error_in_us:.1f}us, "
+            f"histogram={{{self.histogram_str()}}})"
+        )
+
+    @property
+    def avg_error_in_us(self) -> float:
+        return self.total_error_in_us / self.fired if self.fired > 0 else 0.0
+
+    def histogram_str(self) -> str:
+        labels = [f"<={bound}us" for bound in FIRE_ERROR_BUCKETS_IN_US] + [f">{FIRE_ERROR_BUCKETS_IN_US[-1]}us"]
+        return ", ".join(f"{label}: {count}" for label, count in zip(labels, self.histogram) if count > 0)
+
+    def observe(self, error_in_us: float):
+        self.fired += 1
+        self.histogram[bisect.bisect_left(FIRE_ERROR_BUCKETS_IN_US, error_in_us)] += 1
+        self.total_error_in_us += error_in_us
+        self.max_error_in_us = max(self.max_error_in_us, error_in_us)
+
+
+class TriggerScheduler:
+    """
+    定时触发器
+
+    Waits until an instant given in Binance server time: it sleeps on the
+    event loop until 'spin_in_sec' before the instant, then spins on the
+    clock for the rest, so the loop is not woken up a thousand times a
+    second during the wait and the trigger does not inherit its timer
+    jitter. 'offset_in_sec' is the server clock minus the local clock, it
+    may be updated while waiting since the sleep is cut in slices of at
+    most 'max_sleep_in_sec'.
+
+    The spin blocks the loop for at most 'spin_in_sec', which is the point:
+    nothing else may run right before the trigger fires.
+    """
+
+    def __init__(
+        self,
+        *,
+        spin_in_sec: float = 0.002,
+        max_sleep_in_sec: float = 1.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        if spin_in_sec < 0 or max_sleep_in_sec <= 0:
+            raise ValueError("spin_in_sec must not be negative, max_sleep_in_sec must be positive.")
+        self._spin_in_sec = spin_in_sec
+        self._max_sleep_in_sec = max_sleep_in_sec
+        self._clock = clock
+        self.offset_in_sec = 0.0
+        self.stats = TriggerStats()
+
+    def local_time_of(self, when: float) -> float:
+        """Local clock time of the server time 'when'."""
+        return when - self.offset_in_sec
+
+    async def wait_until(self, when: float) -> float:
+        """
+        Return at the server time 'when' (unix time in secs), with how late
+        it fired in secs, which is also counted in 'stats'.
+        """
+        clock = self._clock
+        while 1:
+            remaining = self.local_time_of(when) - clock()
+            if remaining <= self._spin_in_sec:
+                break
+            await asyncio.sleep(min(remaining - self._spin_in_sec, self._max_sleep_in_sec))
+        target = self.local_time_of(when)
+        now = clock()
+        while now < target:
+            now = clock()
+        error = now - target
+        # What the caller does next is time-critical, the stats tell how late it fired.
+        self.stats.observe(error * 1e6)
+        return error
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+from internal.infra.scheduler.trigger import (
+    FIRE_ERROR_BUCKETS_IN_US,
+    TriggerScheduler,
+    TriggerStats,
+)
+
+
+async def test_wait_until_fires_on_time():
+    trigger = TriggerScheduler(spin_in_sec=0.002)
+    errors = []
+    for _ in range(5):
+        when = time.time() + 0.02
+        errors.append(await trigger.wait_until(when))
+        assert time.time() >= when
+    # The median, a preempted process may fire late once in a while.
+    assert 0 <= sorted(errors)[2] < 0.005
+    assert trigger.stats.fired == 5
+    assert sum(trigger.stats.histogram) == 5
+    # A trigger in the past fires at once, as late as it was given.
+    assert await trigger.wait_until(time.time() - 1) >= 1
+    assert trigger.stats.histogram[-1] == 1
+
+
+async def test_wait_until_corrects_for_server_offset():
+    trigger = TriggerScheduler()
+    # The server clock is 50ms ahead of the local one, its time 'when' comes 50ms earlier here.
+    trigger.offset_in_sec = 0.05
+    when = time.time() + 0.08
+    error = await trigger.wait_until(when)
+    assert 0 <= error < 0.005
+    # It fired at the server time 'when', well before the local time 'when'.
+    assert when - 0.05 <= time.time() < when
+
+
+async def test_wait_does_not_block_the_loop():
+    ticks = []
+
+    async def ticker():
+        while 1:
+            ticks.append(time.time())
+            await asyncio.sleep(0.01)
+
+    task = asyncio.create_task(ticker())
+    await TriggerScheduler(spin_in_sec=0.002).wait_until(time.time() + 0.1)
+    task.cancel()
+    assert len(ticks) >= 5
+
+
+def test_stats_histogram():
+    stats = TriggerStats()
+    for error_in_us in (5, 10, 40, 20000):
+        stats.observe(error_in_us)
+    assert stats.histogram[0] == 2 and stats.histogram[1] == 1 and stats.histogram[len(FIRE_ERROR_BUCKETS_IN_US)] == 1
+    assert stats.max_error_in_us == 20000
+    assert "<=10us: 2" in str(stats) and ">10000us: 1" in str(stats)
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+from .grid_ladder import GridLadder
+from .grid_rebalancer import GridRebalancer
+
+__all__ = ["GridLadder", "GridRebalancer"]
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import bisect
+from typing import List, Optional, Tuple
+
+
+class GridLadder:
+    """
+    网格价格阶梯
+
+    The price levels of a grid, in ascending order, with O(log n) lookups
+    of the level of a price and of its neighbours.
+    """
+
+    def __init__(self, lower_range_price: float, upper_range_price: float, grids: int):
+        if grids <= 0:
+            raise ValueError("grids must be positive.")
+        if upper_range_price <= lower_range_price:
+            raise ValueError("upper_range_price must be greater than lower_range_price.")
+        self._lower_range_price = lower_range_price
+        self._upper_range_price = upper_range_price
+        self._grids = grids
+        self._step_price = (upper_range_price - lower_range_price) // grids
+        if self._step_price <= 0:
+            raise ValueError(f"Price range ({lower_range_price}, {upper_range_price}) is too narrow for {grids} grids.")
+        self._prices: List[float] = [lower_range_price + i * self._step_price for i in range(grids)]
+
+    def __len__(self) -> int:
+        return self._grids
+
+    @property
+    def step_price(self) -> float:
+        return self._step_price
+
+    @property
+    def prices(self) -> List[float]:
+        return self._prices
+
+    def price_of(self, index: int) -> float:
+        return self._prices[index]
+
+    def nearest_index(self, price: float) -> int:
+        """Index of the level closest to 'price'."""
+        i = bisect.bisect_left(self._prices, price)
+        if i == 0:
+            return 0
+        if i == self._grids:
+            return self._grids - 1
+        return i if self._prices[i] - price < price - self._prices[i - 1] else i - 1
+
+    def index_of(self, price: float) -> Optional[int]:
+        """Index of the level at 'price', None if 'price' is not on the ladder."""
+        i = self.nearest_index(price)
+        if abs(self._prices[i] - price) * 2 >= self._step_price:
+            return None
+        return i
+
+    def level_above(self, index: int) -> Optional[int]:
+        return index + 1 if index + 1 < self._grids else None
+
+    def level_below(self, index: int) -> Optional[int]:
+        return index - 1 if index > 0 else None
+
+    def split(self, latest_price: float) -> Tuple[List[int], List[int]]:
+        """Split the ladder around 'latest_price' into (buy levels, sell levels).
+
+        The level nearest to 'latest_price' is left empty, so that every level
+        holds at most one order once fills start to move orders up and down.
+        """
+        empty = self.nearest_index(latest_price)
+        return (list(range(0, empty)), list(range(empty + 1, self._grids)))
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger as loguru_logger
+
+from .grid_ladder import GridLadder
+from internal.db.order_store import GridOrder, OrderStore
+from internal.exchange.user_data_stream import OrderState
+from internal.infra.scheduler import OrderPlacementScheduler
+
+# make_job(side, level_index, base_qty) returns a placement job which resolves to
+# (client_order_id, binance_order_id, ok), like BinanceGridTradingBot._buy_base_asset.
+MakeJob = Callable[[str, int, float], Callable[[], Awaitable[Tuple[str, str, bool]]]]
+
+
+class GridRebalancer:
+    """
+    网格再平衡引擎
+
+    Reacts to fills of the grid orders: a filled BUY at level i places the
+    matching SELL at level i+1 for the filled quantity, a filled SELL at
+    level i places the matching BUY at level i-1. Fills are pushed by the
+    user data stream, the level of a fill is the one its order was
+    registered at, and the counter orders of all fills received in the
+    same event-loop tick are placed as one batch through the placement
+    scheduler. Every order is registered as soon as its own placement
+    returns, with the updates 'lookup' (like UserDataStream.get) received
+    for it before. Every registered order and status change is written to
+    'store', if given.
+    """
+
+    def __init__(
+        self,
+        ladder: GridLadder,
+        scheduler: OrderPlacementScheduler,
+        make_job: MakeJob,
+        on_change: Optional[Callable[["GridRebalancer"], None]] = None,
+        store: Optional[OrderStore] = None,
+        symbol: str = "",
+        lookup: Optional[Callable[[str], Optional[OrderState]]] = None,
+    ):
+        self._ladder = ladder
+        self._scheduler = scheduler
+        self._make_job = make_job
+        self._on_change = on_change
+        self._store = store
+        self._symbol = symbol
+        self._lookup = lookup
+        # clientOrderId -> (level index, side) of the active grid orders.
+        self._active: Dict[str, Tuple[int, str]] = {}
+        self._fills: asyncio.Queue = asyncio.Queue()
+        self.filled_buys = 0
+        self.filled_sells = 0
+
+    def register(self, client_order_id: str, level: int, side: str):
+        self._active[client_order_id] = (level, side)
+        if self._store is not None:
+            self._store.upsert(GridOrder(
+                client_order_id=client_order_id,
+                symbol=self._symbol,
+                side=side,
+                level=level,
+                price=self._ladder.price_of(level),
+            ))
+
+    def registering_job(self, side: str, level: int, job: Callable[[], Awaitable[Tuple[str, str, bool]]]):
+        """Wrap the placement job of a grid order so that the order is registered as soon as it is placed."""
+        async def _place():
+            result = await job()
+            if result is None or not result[2]:
+                return result
+            self.register(result[0], level, side)
+            if self._lookup is not None:
+                # The updates which arrived before the registration were dropped by on_order_update.
+                state = self._lookup(result[0])
+                if state is not None:
+                    self.on_order_update(state)
+            return result
+        return _place
+
+    def active_order_ids(self, side: str) -> List[str]:
+        return [cid for cid, (_, s) in self._active.items() if s == side]
+
+    def on_order_update(self, state: OrderState):
+        """Listener of UserDataStream, only the grid's own orders are considered."""
+        if state.client_order_id not in self._active:
+            return
+        if self._store is not None:
+            self._store.set_status(state.client_order_id, state.status)
+        if state.status == "FILLED":
+            self._fills.put_nowait(state)
+        elif state.is_final:
+            loguru_logger.warning(f"Grid order<order_id:{state.client_order_id}> ended with status:{state.status}.")
+            self._active.pop(state.client_order_id, None)
+            self._notify()
+
+    def _counter_order(self, state: OrderState) -> Optional[Tuple[str, int, float]]:
+        entry = self._active.pop(state.client_order_id, None)
+        if entry is None:
+            # Already rebalanced, the fill was reported twice.
+            return None
+        # The registered level, a lookup of the price as float could land on a neighbouring level.
+        level, side = entry
+        if side == "BUY":
+            self.filled_buys += 1
+            target = self._ladder.level_above(level)
+            counter_side = "SELL"
+        else:
+            self.filled_sells += 1
+            target = self._ladder.level_below(level)
+            counter_side = "BUY"
+        if target is None:
+            loguru_logger.info(f"Filled {side} order<order_id:{state.client_order_id}> at the edge of the grid, no counter order.")
+            return None
+        return (counter_side, target, float(state.executed_qty))
+
+    async def run(self):
+        """Place the counter orders of the fills, until cancelled."""
+        while 1:
+            fills = [await self._fills.get()]
+            while not self._fills.empty():
+                fills.append(self._fills.get_nowait())
+
+            counters = []
+            for state in fills:
+                counter = self._counter_order(state)
+                if counter is not None:
+                    counters.append(counter)
+            if len(counters) == 0:
+                self._notify()
+                continue
+
+            # A counter order may fill before the whole batch is placed, each one is registered on its own.
+            jobs = [self.registering_job(side, level, self._make_job(side, level, qty)) for side, level, qty in counters]
+            results: List[Any] = await self._scheduler.place_all(jobs)
+            for (side, level, _), result in zip(counters, results):
+                if result is None or not result[2]:
+                    loguru_logger.error(f"Failed to place counter {side} order at level:{level} (price:{self._ladder.price_of(level)}).")
+            loguru_logger.info(f"Rebalanced {len(fills)} fills, filled buys:{self.filled_buys}, filled sells:{self.filled_sells}.")
+            self._notify()
+
+    def _notify(self):
+        if self._on_change is not None:
+            self._on_change(self)
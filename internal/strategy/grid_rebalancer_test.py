@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+
+from internal.db.order_store import MemoryOrderStore
+from internal.exchange.user_data_stream import OrderState, UserDataStream
+from internal.exchange.user_data_stream_test import execution_report
+from internal.infra.scheduler import OrderPlacementScheduler
+from internal.strategy import GridLadder, GridRebalancer
+
+
+def filled(client_order_id, side, price, qty="0.01000000"):
+    return OrderState(
+        client_order_id=client_order_id,
+        order_id=1,
+        symbol="BTCUSDT",
+        side=side,
+        order_type="LIMIT",
+        status="FILLED",
+        price=f"{price:.8f}",
+        orig_qty=qty,
+        executed_qty=qty,
+        cummulative_quote_qty="0",
+        last_executed_qty=qty,
+        last_executed_price=f"{price:.8f}",
+        update_time=0,
+    )
+
+
+def test_ladder_lookup():
+    ladder = GridLadder(30000, 50000, 2000)
+    assert ladder.step_price == 10
+    assert len(ladder.prices) == 2000
+    assert ladder.index_of(30010.0) == 1
+    assert ladder.index_of(30015.0) is None
+    assert ladder.nearest_index(30014.0) == 1
+    assert ladder.nearest_index(1.0) == 0
+    assert ladder.nearest_index(99999.0) == 1999
+    assert ladder.level_below(0) is None
+    assert ladder.level_above(1999) is None
+
+
+def test_ladder_split_leaves_nearest_level_empty():
+    ladder = GridLadder(100, 200, 10)
+    buys, sells = ladder.split(131)
+    assert buys == [0, 1, 2]
+    assert sells == [4, 5, 6, 7, 8, 9]
+
+
+def test_ladder_rejects_narrow_range():
+    with pytest.raises(ValueError):
+        GridLadder(100, 105, 10)
+
+
+async def test_rebalancer_places_counter_orders():
+    ladder = GridLadder(100, 200, 10)
+    placed = []
+
+    def make_job(side, level, qty):
+        async def job():
+            placed.append((side, ladder.price_of(level), qty))
+            return (f"{side}-{level}", "1", True)
+        return job
+
+    changes = []
+    store = MemoryOrderStore()
+    rebalancer = GridRebalancer(
+        ladder=ladder,
+        scheduler=OrderPlacementScheduler(max_orders=10, interval_in_sec=1),
+        make_job=make_job,
+        on_change=lambda r: changes.append((r.active_order_ids("BUY"), r.active_order_ids("SELL"))),
+        store=store,
+        symbol="BTCUSDT",
+    )
+    rebalancer.register("buy-2", 2, "BUY")
+    rebalancer.register("sell-9", 9, "SELL")
+    rebalancer.register("sell-4", 4, "SELL")
+    task = asyncio.create_task(rebalancer.run())
+
+    rebalancer.on_order_update(filled("buy-2", "BUY", 120))
+    rebalancer.on_order_update(filled("sell-4", "SELL", 140, qty="0.02000000"))
+    rebalancer.on_order_update(filled("unknown", "SELL", 150))
+    await asyncio.sleep(0.05)
+    task.cancel()
+
+    assert placed == [("SELL", 130, 0.01), ("BUY", 130, 0.02)]
+    assert rebalancer.filled_buys == 1 and rebalancer.filled_sells == 1
+    assert sorted(changes[-1][0]) == ["BUY-3"]
+    assert sorted(changes[-1][1]) == ["SELL-3", "sell-9"]
+    assert store.count("FILLED") == 2
+    assert [(o.client_order_id, o.price) for o in store.active_orders(symbol="BTCUSDT")] == [("BUY-3", 130), ("SELL-3", 130), ("sell-9", 190)]
+
+
+async def test_rebalancer_uses_the_registered_level():
+    ladder = GridLadder(100, 200, 10)
+    placed = []
+
+    def make_job(side, level, qty):
+        async def job():
+            placed.append((side, level))
+            return (f"{side}-{level}", "1", True)
+        return job
+
+    rebalancer = GridRebalancer(ladder=ladder, scheduler=OrderPlacementScheduler(max_orders=10, interval_in_sec=1), make_job=make_job)
+    rebalancer.register("buy-3", 3, "BUY")
+    task = asyncio.create_task(rebalancer.run())
+
+    # The price the order was placed at after rounding, not exactly the one of the level.
+    rebalancer.on_order_update(filled("buy-3", "BUY", 130.00001))
+    # The same fill reported twice.
+    rebalancer.on_order_update(filled("buy-3", "BUY", 130.00001))
+    await asyncio.sleep(0.05)
+    task.cancel()
+
+    assert placed == [("SELL", 4)]
+    assert rebalancer.filled_buys == 1
+
+
+async def test_orders_registered_as_soon_as_placed():
+    ladder = GridLadder(100, 200, 10)
+    stream = UserDataStream(sock_mgr=None)
+    placed = []
+
+    def make_job(side, level, qty):
+        async def job():
+            cid = f"{side}-{level}-{len(placed)}"
+            placed.append(cid)
+            if cid == "SELL-4-2":
+                # The counter order fills before its batch is placed, the rebalancer does not know it yet.
+                stream.on_execution_report(execution_report(cid, "FILLED", executed_qty="0.01000000"))
+            return (cid, "1", True)
+        return job
+
+    store = MemoryOrderStore()
+    rebalancer = GridRebalancer(
+        ladder=ladder,
+        scheduler=OrderPlacementScheduler(max_orders=10, interval_in_sec=1),
+        make_job=make_job,
+        store=store,
+        lookup=stream.get,
+    )
+    stream.add_listener(rebalancer.on_order_update)
+    await OrderPlacementScheduler().place_all([
+        rebalancer.registering_job("BUY", 3, make_job("BUY", 3, 0.01)),
+        rebalancer.registering_job("BUY", 2, make_job("BUY", 2, 0.01)),
+    ])
+    task = asyncio.create_task(rebalancer.run())
+
+    stream.on_execution_report(execution_report("BUY-3-0", "FILLED", executed_qty="0.01000000"))
+    await asyncio.sleep(0.05)
+    task.cancel()
+
+    # BUY-3-0 filled, its counter SELL-4-2 filled while it was placed and got its own counter.
+    assert placed == ["BUY-3-0", "BUY-2-1", "SELL-4-2", "BUY-3-3"]
+    assert store.get("SELL-4-2").status == "FILLED"
+    assert rebalancer.filled_buys == 1 and rebalancer.filled_sells == 1
+    assert sorted(rebalancer.active_order_ids("BUY")) == ["BUY-2-1", "BUY-3-3"]
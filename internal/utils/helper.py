@@ -2,14 +2,20 @@
 import asyncio
 import hashlib
 import random
-import sys
 import time
 from functools import wraps
 
-from loguru import logger as loguru_logger
+from internal.infra.metrics import default_registry
 
 
 def timeit(func):
+    """
+    Turn func into a coroutine function which records the latency in ns of
+    every call into the 'function_latency' histogram of the metrics
+    registry, labeled with the function, when the registry is enabled.
+    """
+    registry = default_registry()
+    histogram = registry.histogram("function_latency", function=func.__qualname__)
 
     async def process(func, *args, **kwargs):
         if asyncio.iscoroutinefunction(func):
@@ -19,11 +25,13 @@ def timeit(func):
 
     @wraps(func)
     async def wrapper(*args, **kwargs):
-        st = time.time()
-        result = await process(func, *args, **kwargs)
-        ed = time.time()
-        loguru_logger.debug(f"{func.__name__} took time: {ed - st:.3f} secs")
-        return result
+        if not registry.enabled:
+            return await process(func, *args, **kwargs)
+        st = time.perf_counter_ns()
+        try:
+            return await process(func, *args, **kwargs)
+        finally:
+            histogram.record(time.perf_counter_ns() - st)
 
     return wrapper
 
@@ -45,10 +53,5 @@ ALL_DIGIT_NUMS_AND_LETTERS_TOTAL = len(ALL_DIGIT_NUMS_AND_LETTERS)
 
 
 def gen_n_digit_nums_and_letters(n: int) -> str:
-    seed = random.randrange(sys.maxsize)
-    random.seed(seed)
-    for i in range(len(ALL_DIGIT_NUMS_AND_LETTERS) - 1, 0, -1):
-        j = random.randrange(i + 1)
-        ALL_DIGIT_NUMS_AND_LETTERS[i], ALL_DIGIT_NUMS_AND_LETTERS[j] = ALL_DIGIT_NUMS_AND_LETTERS[j], ALL_DIGIT_NUMS_AND_LETTERS[i]
-    nums_and_letters = [ALL_DIGIT_NUMS_AND_LETTERS[random.randrange(ALL_DIGIT_NUMS_AND_LETTERS_TOTAL)] for _ in range(n)]
-    return "".join(nums_and_letters)
+    """Random string of n digits and letters, the clientOrderIds come from internal.infra.orderid."""
+    return "".join(random.choices(ALL_DIGIT_NUMS_AND_LETTERS, k=n))
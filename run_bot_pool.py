@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+curdir = os.path.abspath(os.curdir)
+sys.path.append(os.path.join(curdir, "internal"))
+
+import urllib3
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+import argparse
+import asyncio
+import sys
+import time
+import traceback
+
+from loguru import logger as loguru_logger
+
+from internal.bot.grid_trading_bot import BinanceGridTradingBot
+from internal.bot.pool import BotPool
+from internal.db import init_instance as init_db_instance
+from internal.db import instance as db_instance
+from internal.infra.metrics import default_registry, start_exporters
+from internal.utils.global_vars import get_config, set_config
+from internal.utils.loguru_logger import init_global_logger
+
+# Coroutine to be invoked when the event loop is shutting down.
+_cleanup_coroutine = None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="output debug-level message"
+    )
+    parser.add_argument(
+        "--metrics_port",
+        type=int,
+        help="serve the latency metrics on http://127.0.0.1:<port>/metrics",
+    )
+    parser.add_argument(
+        "--metrics_snapshot",
+        type=str,
+        help="JSON file to write the latency metrics to every minute",
+    )
+    parser.add_argument(
+        "--conf",
+        type=str,
+        default="./etc/bot_pool.json",
+        help="the bot pool config file, with one entry per grid",
+    )
+    parser.add_argument(
+        "--elapse",
+        type=int,
+        default=10,
+        help="the relative unix timestamp when you want to start grid-trading",
+    )
+
+    args = parser.parse_args()
+    return args
+
+
+def prepare_env(loop):
+    # Setup mongodb connection (pool).
+    try:
+        init_db_instance(
+            client_conf={
+                "endpoint": conf["mongodb"]["endpoint"],
+                "username": conf["mongodb"]["username"],
+                "password": conf["mongodb"]["password"],
+                "auth_mechanism": conf["mongodb"]["auth_mechanism"],
+                "database": conf["mongodb"]["database"],
+                "collection": conf["mongodb"]["collection"],
+            },
+            io_loop=loop,
+        )
+    except Exception as e:
+        loguru_logger.error(f"Failed to setup mongodb connection (pool), err{e}.")
+        sys.exit(-1)
+    task = asyncio.ensure_future(db_instance().is_connected())
+    connected = loop.run_until_complete(task)
+    if connected:
+        loguru_logger.info("Setup mongodb connection (pool).")
+    else:
+        loguru_logger.error("Cannot setup mongodb connection (pool).")
+        sys.exit(-1)
+
+
+def clear_env(loop):
+    # Flush the buffered orders and release mongodb connection (pool).
+    loop.run_until_complete(db_instance().close())
+
+
+async def run_grids(pool: BotPool, when: int):
+    """Add every grid of the config to the pool, then trade all of them at 'when'."""
+    trades = []
+    for entry in conf["bots"]:
+        bot = await pool.add(
+            entry["name"],
+            BinanceGridTradingBot,
+            api_key=os.getenv(entry["api_key_env"]),
+            api_secret=os.getenv(entry["secret_key_env"]),
+            base_asset=entry["symbol"][:-4],
+            quote_asset="USDT",
+            lower_range_price=entry["lower_range_price"],
+            upper_range_price=entry["upper_range_price"],
+            grids=entry["grids"],
+            total_investment=entry["total_investment"],
+        )
+        if bot is not None:
+            trades.append(bot.trade(sym=entry["symbol"], when=when))
+    loguru_logger.info(f"Ready to run {len(trades)} of {len(conf['bots'])} grids in one bot pool.")
+    await asyncio.gather(*trades)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    set_config(args.conf)
+    conf = get_config()
+    init_global_logger()
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    # The metrics are recorded only when they are exported.
+    stop_metrics = None
+    if args.metrics_port is not None or args.metrics_snapshot is not None:
+        task = asyncio.ensure_future(start_exporters(default_registry(), port=args.metrics_port, snapshot_path=args.metrics_snapshot))
+        stop_metrics = loop.run_until_complete(task)
+
+    pool = BotPool(use_proxy=False, use_testnet=True, connection_limit=conf["pool"]["connection_limit"])
+    _cleanup_coroutine = pool.close
+    try:
+        prepare_env(loop=loop)
+        task = asyncio.ensure_future(run_grids(pool, when=int(time.time()) + args.elapse))
+        loop.run_until_complete(task)
+    except Exception:
+        traceback.print_exc()
+    finally:
+        if _cleanup_coroutine is not None:
+            loop.run_until_complete(asyncio.ensure_future(_cleanup_coroutine()))
+        clear_env(loop=loop)
+        if stop_metrics is not None:
+            loop.run_until_complete(stop_metrics())
+        # NOTE: Wait 250 ms for the underlying connections to close.
+        # https://docs.aiohttp.org/en/stable/client_advanced.html#Graceful_Shutdown
+        loop.run_until_complete(asyncio.sleep(0.250))
+        loop.close()
@@ -11,16 +11,19 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 import argparse
 import asyncio
-import shelve
 import sys
 import time
 import traceback
 
+import tabulate
+from colorama import Fore, Style
 from loguru import logger as loguru_logger
 
+from internal.backtest import backtest_grid, grid_param_space, load_price_path, sweep_grid_params
 from internal.bot.grid_trading_bot import BinanceGridTradingBot
 from internal.db import init_instance as init_db_instance
 from internal.db import instance as db_instance
+from internal.infra.metrics import default_registry, start_exporters
 from internal.utils.global_vars import get_config, set_config
 from internal.utils.loguru_logger import init_global_logger
 
@@ -35,6 +38,16 @@ def parse_args():
         action="store_true",
         help="output debug-level message"
     )
+    parser.add_argument(
+        "--metrics_port",
+        type=int,
+        help="serve the latency metrics on http://127.0.0.1:<port>/metrics",
+    )
+    parser.add_argument(
+        "--metrics_snapshot",
+        type=str,
+        help="JSON file to write the latency metrics to every minute",
+    )
     parser.add_argument(
         "--conf",
         type=str,
@@ -188,11 +201,170 @@ def parse_args():
         help="coin symbol, like BTCUSDT",
         required=True,
     )
+    backtest_parser = subparsers.add_parser(
+        "backtest",
+        help="Replay historical klines or trades through grid-trading.",
+    )
+    backtest_parser.add_argument(
+        "--data",
+        type=str,
+        help="kline or trade CSV/Parquet file, like BTCUSDT-1m-2023.csv",
+        required=True,
+    )
+    backtest_parser.add_argument(
+        "--kind",
+        type=str,
+        choices=["klines", "trades"],
+        default="klines",
+        help="kind of market data in the file",
+    )
+    backtest_parser.add_argument(
+        "--lower_range_price",
+        type=int,
+        help="the lower range price in USDT curreny",
+        required=True,
+    )
+    backtest_parser.add_argument(
+        "--upper_range_price",
+        type=int,
+        help="the upper range price in USDT curreny",
+        required=True,
+    )
+    backtest_parser.add_argument(
+        "--grids",
+        type=int,
+        help="total grid quantity",
+        required=True,
+    )
+    backtest_parser.add_argument(
+        "--total_investment",
+        type=int,
+        help="total investment in USDT curreny",
+        required=True,
+    )
+    backtest_parser.add_argument(
+        "--fee_rate",
+        type=float,
+        default=0.001,
+        help="commission rate of the grid orders",
+    )
+    backtest_parser.add_argument(
+        "--output",
+        type=str,
+        help="prefix of the CSV files to save fills and curves to",
+    )
+    optimize_parser = subparsers.add_parser(
+        "optimize",
+        help="Sweep grid-trading parameters over historical klines or trades.",
+    )
+    optimize_parser.add_argument(
+        "--data",
+        type=str,
+        help="kline or trade CSV/Parquet file, like BTCUSDT-1m-2023.csv",
+        required=True,
+    )
+    optimize_parser.add_argument(
+        "--kind",
+        type=str,
+        choices=["klines", "trades"],
+        default="klines",
+        help="kind of market data in the file",
+    )
+    optimize_parser.add_argument(
+        "--lower_range_prices",
+        type=str,
+        help="candidate lower range prices, like 20000:30000:1000 or 20000,25000",
+        required=True,
+    )
+    optimize_parser.add_argument(
+        "--upper_range_prices",
+        type=str,
+        help="candidate upper range prices, like 40000:50000:1000 or 40000,45000",
+        required=True,
+    )
+    optimize_parser.add_argument(
+        "--grids",
+        type=str,
+        help="candidate grid quantities, like 100:2000:100",
+        required=True,
+    )
+    optimize_parser.add_argument(
+        "--total_investments",
+        type=str,
+        help="candidate total investments in USDT curreny, like 10000",
+        required=True,
+    )
+    optimize_parser.add_argument(
+        "--fee_rate",
+        type=float,
+        default=0.001,
+        help="commission rate of the grid orders",
+    )
+    optimize_parser.add_argument(
+        "--workers",
+        type=int,
+        help="number of worker processes, all CPU cores by default",
+    )
+    optimize_parser.add_argument(
+        "--top",
+        type=int,
+        default=20,
+        help="show the top n parameter sets",
+    )
+    optimize_parser.add_argument(
+        "--output",
+        type=str,
+        help="CSV file to save all ranked parameter sets to",
+    )
 
     args = parser.parse_args()
     return args
 
 
+def parse_candidates(spec: str) -> list:
+    """Parse 'start:stop:step' (stop included) or 'a,b,c' into a list of ints."""
+    if ":" in spec:
+        start, stop, step = [int(x) for x in spec.split(":")]
+        return list(range(start, stop + 1, step))
+    return [int(x) for x in spec.split(",")]
+
+
+def run_backtest(args):
+    timestamps, prices = load_price_path(args.data, kind=args.kind)
+    st = time.perf_counter()
+    result = backtest_grid(
+        timestamps,
+        prices,
+        lower_range_price=args.lower_range_price,
+        upper_range_price=args.upper_range_price,
+        grids=args.grids,
+        total_investment=args.total_investment,
+        fee_rate=args.fee_rate,
+        with_fills=args.output is not None,
+    )
+    loguru_logger.info(f"Replayed {len(prices)} ticks in {time.perf_counter() - st:.3f} secs.")
+    print(f"{Fore.GREEN} ======================================= GRID TRADING BACKTEST ======================================= {Style.RESET_ALL}")
+    table = [["Fills", "Buys", "Sells", "RealizedPnL", "Fees", "FeeDrag", "FinalEquity", "Return", "MaxDrawdown"]]
+    table.append([
+        result.fill_count,
+        result.buy_count,
+        result.sell_count,
+        f"{result.realized_pnl:.2f}",
+        f"{result.fees:.2f}",
+        f"{result.fee_drag:.2%}",
+        f"{result.final_equity:.2f}",
+        f"{result.total_return:.2%}",
+        f"{result.max_drawdown:.2%}",
+    ])
+    table_output = tabulate.tabulate(table, headers="firstrow", tablefmt="mixed_grid")
+    print(f"{Fore.CYAN}{table_output}{Style.RESET_ALL}")
+    print(f"{Fore.GREEN} ======================================= GRID TRADING BACKTEST ======================================= {Style.RESET_ALL}")
+    if args.output is not None:
+        result.fills.to_csv(f"{args.output}_fills.csv", index=False)
+        result.curves.to_csv(f"{args.output}_curves.csv", index=False)
+        loguru_logger.info(f"Saved fills and curves to {args.output}_fills.csv and {args.output}_curves.csv.")
+
+
 def prepare_env(loop):
     # Setup mongodb connection (pool).
     try:
@@ -219,9 +391,41 @@ def prepare_env(loop):
         sys.exit(-1)
 
 
-def clear_env():
-    # Release mongodb connection (pool).
-    db_instance().close()
+def clear_env(loop):
+    # Flush the buffered orders and release mongodb connection (pool).
+    loop.run_until_complete(db_instance().close())
+
+
+def run_optimize(args):
+    timestamps, prices = load_price_path(args.data, kind=args.kind)
+    param_sets = grid_param_space(
+        parse_candidates(args.lower_range_prices),
+        parse_candidates(args.upper_range_prices),
+        parse_candidates(args.grids),
+        parse_candidates(args.total_investments),
+    )
+    results = sweep_grid_params(timestamps, prices, param_sets, fee_rate=args.fee_rate, max_workers=args.workers)
+    print(f"{Fore.GREEN} ======================================= GRID TRADING PARAMETERS ======================================= {Style.RESET_ALL}")
+    table = [["Rank", "Lower", "Upper", "Grids", "Investment", "Fills", "RealizedPnL", "Fees", "Return", "MaxDrawdown"]]
+    for rank, row in zip(results.index[:args.top], results.head(args.top).itertuples()):
+        table.append([
+            rank,
+            row.lower_range_price,
+            row.upper_range_price,
+            row.grids,
+            row.total_investment,
+            row.fill_count,
+            f"{row.realized_pnl:.2f}",
+            f"{row.fees:.2f}",
+            f"{row.total_return:.2%}",
+            f"{row.max_drawdown:.2%}",
+        ])
+    table_output = tabulate.tabulate(table, headers="firstrow", tablefmt="mixed_grid")
+    print(f"{Fore.CYAN}{table_output}{Style.RESET_ALL}")
+    print(f"{Fore.GREEN} ======================================= GRID TRADING PARAMETERS ======================================= {Style.RESET_ALL}")
+    if args.output is not None:
+        results.to_csv(args.output)
+        loguru_logger.info(f"Saved {len(results)} ranked parameter sets to {args.output}.")
 
 
 if __name__ == "__main__":
@@ -232,9 +436,23 @@ if __name__ == "__main__":
     conf = get_config()
     init_global_logger()
 
+    # Backtests run offline, no need for the exchange or the database.
+    if action == "backtest":
+        run_backtest(args)
+        sys.exit(0)
+    if action == "optimize":
+        run_optimize(args)
+        sys.exit(0)
+
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
 
+    # The metrics are recorded only when they are exported.
+    stop_metrics = None
+    if args.metrics_port is not None or args.metrics_snapshot is not None:
+        task = asyncio.ensure_future(start_exporters(default_registry(), port=args.metrics_port, snapshot_path=args.metrics_snapshot))
+        stop_metrics = loop.run_until_complete(task)
+
     bot = BinanceGridTradingBot(use_proxy=False, use_testnet=True)
     _cleanup_coroutine = bot.close
     try:
@@ -280,15 +498,8 @@ if __name__ == "__main__":
                 task = asyncio.ensure_future(bot.cancel_order(sym=args.symbol, order_id=args.order_id))
                 loop.run_until_complete(task)
             elif action == "cancelall":
-                with shelve.open("grid_trading_orders.db", flag="r") as db:
-                    if "active_sell" in db.keys():
-                        for order_id in db["active_sell"]:
-                            task = asyncio.ensure_future(bot.cancel_order(sym=args.symbol, order_id=order_id))
-                            loop.run_until_complete(task)
-                    if "active_buy" in db.keys():
-                        for order_id in db["active_buy"]:
-                            task = asyncio.ensure_future(bot.cancel_order(sym=args.symbol, order_id=order_id))
-                            loop.run_until_complete(task)
+                task = asyncio.ensure_future(bot.cancel_all_orders(sym=args.symbol))
+                loop.run_until_complete(task)
     except Exception:
         traceback.print_exc()
     finally:
@@ -296,7 +507,9 @@ if __name__ == "__main__":
         if _cleanup_coroutine is not None:
             tasks.append(asyncio.ensure_future(_cleanup_coroutine()))
         if action == "profit" or action == "trade":
-            clear_env()
+            clear_env(loop=loop)
+        if stop_metrics is not None:
+            loop.run_until_complete(stop_metrics())
         # NOTE: Wait 250 ms for the underlying connections to close.
         # https://docs.aiohttp.org/en/stable/client_advanced.html#Graceful_Shutdown
         loop.run_until_complete(asyncio.sleep(0.250))
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+curdir = os.path.abspath(os.curdir)
+sys.path.append(os.path.join(curdir, "internal"))
+
+import argparse
+import asyncio
+import traceback
+from decimal import Decimal
+
+from loguru import logger as loguru_logger
+
+from internal.exchange.mock import MockBinanceServer, MockExchange, SymbolRules
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help="the address to listen on",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=18080,
+        help="the port to listen on",
+    )
+    parser.add_argument(
+        "--symbol",
+        type=str,
+        default="BTCUSDT",
+        help="coin symbol, like BTCUSDT",
+    )
+    parser.add_argument(
+        "--price",
+        type=str,
+        default="30000.00",
+        help="the mid price of the scripted order book",
+    )
+    parser.add_argument(
+        "--levels",
+        type=int,
+        default=100,
+        help="price levels per side of the scripted order book",
+    )
+    parser.add_argument(
+        "--level_qty",
+        type=str,
+        default="1.00000",
+        help="base asset quantity of every price level",
+    )
+    parser.add_argument(
+        "--quote_balance",
+        type=str,
+        default="100000",
+        help="initial balance of the quote asset (USDT)",
+    )
+    parser.add_argument(
+        "--base_balance",
+        type=str,
+        default="10",
+        help="initial balance of the base asset",
+    )
+    parser.add_argument(
+        "--latency_in_ms",
+        type=float,
+        default=0.0,
+        help="latency injected into every request and pushed event",
+    )
+    parser.add_argument(
+        "--jitter_in_ms",
+        type=float,
+        default=0.0,
+        help="uniform jitter around the injected latency",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="seed of the latency jitter",
+    )
+    parser.add_argument(
+        "--order_limit_per_10s",
+        type=int,
+        default=50,
+        help="the ORDERS rate limit per 10 seconds",
+    )
+    parser.add_argument(
+        "--weight_limit_per_minute",
+        type=int,
+        default=6000,
+        help="the REQUEST_WEIGHT rate limit per minute",
+    )
+
+    args = parser.parse_args()
+    return args
+
+
+async def serve(args):
+    base_asset, quote_asset = args.symbol[:-4], args.symbol[-4:]
+    exchange = MockExchange(
+        [SymbolRules(symbol=args.symbol, base_asset=base_asset, quote_asset=quote_asset)],
+        balances={quote_asset: args.quote_balance, base_asset: args.base_balance},
+        weight_limit_per_minute=args.weight_limit_per_minute,
+        order_limit_per_10s=args.order_limit_per_10s,
+    )
+    mid, tick = Decimal(args.price), Decimal("0.01")
+    exchange.set_book(
+        args.symbol,
+        bids=[(f"{mid - tick * i:.2f}", args.level_qty) for i in range(1, args.levels + 1)],
+        asks=[(f"{mid + tick * i:.2f}", args.level_qty) for i in range(1, args.levels + 1)],
+    )
+    server = MockBinanceServer(
+        exchange,
+        host=args.host,
+        port=args.port,
+        latency_in_ms=args.latency_in_ms,
+        jitter_in_ms=args.jitter_in_ms,
+        seed=args.seed,
+    )
+    await server.start()
+    loguru_logger.info(f"export BINANCE_API_URL={server.api_url} BINANCE_STREAM_URL={server.stream_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    except Exception:
+        traceback.print_exc()
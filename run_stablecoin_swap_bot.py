@@ -135,9 +135,9 @@ def prepare_env(loop):
         sys.exit(-1)
 
 
-def clear_env():
-    # Release mongodb connection (pool).
-    db_instance().close()
+def clear_env(loop):
+    # Flush the buffered orders and release mongodb connection (pool).
+    loop.run_until_complete(db_instance().close())
 
 
 if __name__ == "__main__":
@@ -193,7 +193,7 @@ if __name__ == "__main__":
         if _cleanup_coroutine is not None:
             tasks.append(asyncio.ensure_future(_cleanup_coroutine()))
         if action == "profit" or action == "swap":
-            clear_env()
+            clear_env(loop=loop)
         # NOTE: Wait 250 ms for the underlying connections to close.
         # https://docs.aiohttp.org/en/stable/client_advanced.html#Graceful_Shutdown
         loop.run_until_complete(asyncio.sleep(0.250))
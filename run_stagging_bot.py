@@ -91,6 +91,24 @@ def parse_args():
         type=int,
         help="the relative unix timestamp when you want to trade",
     )
+    trade_parser.add_argument(
+        "--prewarm_connections",
+        type=int,
+        default=4,
+        help="the number of connections to open and keep warm before trading, 0 to disable",
+    )
+    trade_parser.add_argument(
+        "--prewarm_in_sec",
+        type=float,
+        default=3.0,
+        help="how many seconds before trading the connections are opened",
+    )
+    trade_parser.add_argument(
+        "--hedge_endpoints",
+        type=int,
+        default=1,
+        help="send the order through that many of the fastest API hosts (api, api1-api4) at once, duplicate fills are sold back, 1 to disable",
+    )
 
     args = parser.parse_args()
     return args
@@ -145,10 +163,26 @@ if __name__ == "__main__":
                     sys.exit(-1)
                 
                 if args.when is not None and args.when > 0:
-                    task = asyncio.ensure_future(bot.trade(sym=args.symbol, quantity=args.quantity, when=args.when, side=args.side))
+                    task = asyncio.ensure_future(bot.trade(
+                        sym=args.symbol,
+                        quantity=args.quantity,
+                        when=args.when,
+                        side=args.side,
+                        prewarm_connections=args.prewarm_connections,
+                        prewarm_in_sec=args.prewarm_in_sec,
+                        hedge_endpoints=args.hedge_endpoints,
+                    ))
                     loop.run_until_complete(task)
                 elif args.elapse is not None and args.elapse > 0:
-                    task = asyncio.ensure_future(bot.trade(sym=args.symbol, quantity=args.quantity, when=int(time.time()) + args.elapse, side=args.side))
+                    task = asyncio.ensure_future(bot.trade(
+                        sym=args.symbol,
+                        quantity=args.quantity,
+                        when=int(time.time()) + args.elapse,
+                        side=args.side,
+                        prewarm_connections=args.prewarm_connections,
+                        prewarm_in_sec=args.prewarm_in_sec,
+                        hedge_endpoints=args.hedge_endpoints,
+                    ))
                     loop.run_until_complete(task)
     except Exception:
         traceback.print_exc()
@@ -157,8 +191,8 @@ if __name__ == "__main__":
         if _cleanup_coroutine is not None:
             tasks.append(asyncio.ensure_future(_cleanup_coroutine()))
         if action == "trade":
-            # Release mongodb connection (pool).
-            db_instance().close()
+            # Flush the buffered orders and release mongodb connection (pool).
+            loop.run_until_complete(db_instance().close())
         # NOTE: Wait 250 ms for the underlying connections to close.
         # https://docs.aiohttp.org/en/stable/client_advanced.html#Graceful_Shutdown
         loop.run_until_complete(asyncio.sleep(0.250))
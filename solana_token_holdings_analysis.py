@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
+import array
 from datetime import datetime
-from typing import Dict, List
+from typing import Any, Dict, Iterator, List
 
+import numpy as np
 import pandas as pd
 
 from internal.infra.http.http_client import HttpClient
+from internal.infra.http.http_json_stream import iter_json_array
 
 
 class SolanaTokenAnalyzer:
@@ -38,6 +41,30 @@ class SolanaTokenAnalyzer:
         except Exception as exc:
             raise Exception(f"RPC 请求失败: {str(exc)}")
 
+    def _stream_rpc_request(self, method: str, params: List) -> Iterator[Any]:
+        """
+        发送 RPC 请求到 Solana 节点，边接收边逐个解析返回的 result 数组元素，不在内存中保留整个响应
+        """
+        payload = {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": method,
+            "params": params
+        }
+
+        try:
+            with HttpClient.get_instance().get_client().stream(
+                "POST",
+                self.rpc_url,
+                headers=self.headers,
+                json=payload,
+                extensions={"trace": HttpClient.get_instance().log_event}
+            ) as response:
+                response.raise_for_status()
+                yield from iter_json_array(response.iter_bytes(), "result")
+        except Exception as exc:
+            raise Exception(f"RPC 请求失败: {str(exc)}")
+
     def get_token_accounts(self, mint_address: str, limit: int = 100) -> pd.DataFrame:
         """
         获取代币的所有持有账户信息
@@ -69,30 +96,27 @@ class SolanaTokenAnalyzer:
         ]
         
         try:
-            response = self._make_rpc_request(method, params)
-            if "result" in response:
-                accounts_data = []
-                
-                for account in response["result"]:
-                    parsed_data = account["account"]["data"]["parsed"]["info"]
-                    # 只收集非零余额账户
-                    if float(parsed_data["tokenAmount"]["amount"]) > 0:
-                        accounts_data.append({
-                            "address": account["pubkey"],
-                            "owner": parsed_data["owner"],
-                            "balance": float(parsed_data["tokenAmount"]["amount"]) / (10 ** parsed_data["tokenAmount"]["decimals"]),
-                        })
-
-                df = pd.DataFrame(accounts_data)
-                # 计算持仓百分比
-                total_supply = df['balance'].sum()
-                df['percentage'] = (df['balance'] / total_supply * 100).round(4)
-                # 按持仓量排序并限制数量
-                df = df.sort_values('balance', ascending=False).head(limit)
-                df = df.reset_index(drop=True)
-                return df
-            else:
-                raise Exception("API 返回数据格式错误")
+            # 按列收集非零余额账户，内存只随持有者数量增长，与响应大小无关
+            addresses, owners = [], []
+            amounts, decimals = array.array("Q"), array.array("B")
+            for account in self._stream_rpc_request(method, params):
+                parsed_data = account["account"]["data"]["parsed"]["info"]
+                amount = int(parsed_data["tokenAmount"]["amount"])
+                if amount > 0:
+                    addresses.append(account["pubkey"])
+                    owners.append(parsed_data["owner"])
+                    amounts.append(amount)
+                    decimals.append(parsed_data["tokenAmount"]["decimals"])
+
+            balance = np.frombuffer(amounts, dtype=np.uint64).astype(np.float64) / np.power(10.0, np.frombuffer(decimals, dtype=np.uint8))
+            df = pd.DataFrame({"address": addresses, "owner": owners, "balance": balance})
+            # 计算持仓百分比
+            total_supply = df['balance'].sum()
+            df['percentage'] = (df['balance'] / total_supply * 100).round(4)
+            # 按持仓量排序并限制数量
+            df = df.sort_values('balance', ascending=False).head(limit)
+            df = df.reset_index(drop=True)
+            return df
         except Exception as exc:
             raise Exception(f"获取账户数据失败: {str(exc)}")
 